@@ -0,0 +1,6 @@
+-- ML 모델 학습 캐시 키 조회용 인덱스
+-- scripts/train_ml_model.py --register-models 가 iracing_ml_models.model_file_hash 에
+-- 학습 캐시 키(데이터/특성/모델/파라미터 해시)를 기록하므로 같은 학습 입력의 모델을 찾을 수 있도록 인덱스를 추가
+
+CREATE INDEX IF NOT EXISTS idx_iracing_ml_models_model_file_hash 
+ON iracing_ml_models(model_file_hash);
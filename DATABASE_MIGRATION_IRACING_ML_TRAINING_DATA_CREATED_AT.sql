@@ -0,0 +1,6 @@
+-- ML 학습 데이터 증분 동기화용 인덱스
+-- scripts/train_ml_model.py 의 로컬 스냅샷 델타 동기화가 created_at 기준으로
+-- 스냅샷 이후에 추가된 레코드만 조회하므로 인덱스를 추가
+
+CREATE INDEX IF NOT EXISTS idx_iracing_ml_training_data_created_at 
+ON iracing_ml_training_data(created_at);
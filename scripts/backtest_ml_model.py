@@ -0,0 +1,344 @@
+"""
+시간순 롤링 백테스트 (walk-forward)
+
+session_start_time 기준으로 테스트 구간을 앞으로 옮겨 가며, 각 fold는 테스트 구간 이전 레코드로만
+카테고리 인코더와 모델을 학습하고 테스트 구간을 평가한다 (무작위 분할은 미래 레이스가 학습에 섞인다).
+사고 영향도는 이전 세션만으로 계산한다 (--incident-point-in-time과 같음).
+결측 대체값(완주율/특성 중앙값)은 fold마다 학습 구간 레코드로만 계산해서 학습/테스트 구간에 적용한다
+(전체 기간으로 계산하면 테스트 구간 타겟이 학습 특성에 섞인다).
+
+fold별 특성 행렬은 한 번만 만들어 ml_models/cache/backtest/ 아래 .npy로 저장하고, 워커 프로세스는
+np.load(mmap_mode='r')로 열어 (fold × 모델) 작업을 병렬로 실행한다. 같은 데이터/구간/인코딩이면
+다음 실행은 행렬을 다시 만들지 않는다.
+
+앙상블은 main()과 같은 규칙(R² 상위 3개, R² 비례 가중치)을 직전 fold 결과에 적용한 가중치로 평가한다
+(첫 fold는 모든 모델 동일 가중치).
+
+사용법:
+    python scripts/backtest_ml_model.py --source parquet --source-path ml_models/cache/iracing_ml_training_data.parquet
+    python scripts/backtest_ml_model.py --folds 6 --test-days 7 --train-days 90 --jobs 16 --output ml_models/backtest_pre.json
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import train_ml_model as tm  # noqa: E402
+
+BACKTEST_CACHE_DIR = os.path.join(tm.SNAPSHOT_DIR, 'backtest')
+BACKTEST_CACHE_VERSION = 3  # fold 행렬 형식/내용이 바뀌면 올린다
+MIN_TRAIN_ROWS = 100        # 학습 레코드가 이보다 적은 fold는 건너뜀
+
+
+def walk_forward_folds(times, folds=5, test_days=7.0, train_days=None, min_train_rows=MIN_TRAIN_ROWS):
+    """마지막 레코드에서 거꾸로 test_days 크기의 테스트 구간 folds개를 만든다
+
+    학습 구간은 테스트 시작 이전 전체(train_days=None, 확장 창) 또는 직전 train_days일(이동 창).
+
+    Returns:
+        [{'fold', 'train_start', 'test_start', 'test_end', 'train_idx', 'test_idx'}] (시간순, 위치 인덱스)
+    """
+    times = pd.to_datetime(pd.Series(times), utc=True)
+    step = pd.Timedelta(days=test_days)
+    end = times.max() + pd.Timedelta(microseconds=1)  # 마지막 레코드가 마지막 구간에 들어가도록
+    result = []
+    for k in range(folds):
+        test_start = end - (folds - k) * step
+        test_end = test_start + step
+        train_start = test_start - pd.Timedelta(days=train_days) if train_days else times.min()
+        train_idx = np.flatnonzero(((times >= train_start) & (times < test_start)).to_numpy())
+        test_idx = np.flatnonzero(((times >= test_start) & (times < test_end)).to_numpy())
+        if len(train_idx) < min_train_rows or len(test_idx) == 0:
+            print(f"   ⏭️  fold {k}: 학습 {len(train_idx)}개 / 테스트 {len(test_idx)}개 → 건너뜀")
+            continue
+        result.append({
+            'fold': k,
+            'train_start': train_start.isoformat(),
+            'test_start': test_start.isoformat(),
+            'test_end': test_end.isoformat(),
+            'train_idx': train_idx,
+            'test_idx': test_idx,
+        })
+    return result
+
+
+def fold_cache_key(df_clean, mode, encoding, folds, test_days, train_days):
+    """전처리 데이터 내용 + fold 설정 + 인코딩으로 만든 캐시 키"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(pd.util.hash_pandas_object(df_clean, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(
+        [BACKTEST_CACHE_VERSION, mode, encoding, folds, test_days, train_days, list(df_clean.columns)]
+    ).encode())
+    return digest.hexdigest()
+
+
+def fill_fold_frames(df_train, df_test):
+    """학습 구간 레코드만으로 결측 대체값을 계산해 두 구간에 적용
+
+    preprocess_data()는 대체값을 입력 전체로 계산하므로 백테스트는 fill_nan=False로 전처리하고 여기서 채운다.
+    """
+    fills = tm.fit_nan_fills(df_train)
+    return [tm.apply_nan_fills(frame.copy(), fills) for frame in (df_train, df_test)]
+
+
+def build_fold_cache(df_clean, fold_specs, mode='pre', encoding='onehot', cache_dir=None):
+    """fold마다 학습 구간으로 결측 대체값과 인코더를 학습하고 (X_train, y_train, X_test, y_test)를 .npy로 저장
+
+    Returns:
+        fold 디렉터리 목록 (각 디렉터리의 fold.json에 구간/특성/행렬 형식)
+    """
+    base_features = list(tm.BASE_FEATURES) + (tm.POST_ONLY_FEATURES if mode == 'post' else [])
+    fold_dirs = []
+    for spec in fold_specs:
+        fold_dir = os.path.join(cache_dir, f"fold_{spec['fold']}")
+        fold_dirs.append(fold_dir)
+        if os.path.exists(os.path.join(fold_dir, 'fold.json')):
+            continue
+        os.makedirs(fold_dir, exist_ok=True)
+
+        df_train, df_test = fill_fold_frames(df_clean.iloc[spec['train_idx']], df_clean.iloc[spec['test_idx']])
+        train_encoded, encoder, encoded_feature_names = tm.encode_categorical_features(
+            df_train, tm.CATEGORICAL_COLUMNS, encoding=encoding
+        )
+        test_encoded, _, _ = tm.encode_categorical_features(
+            df_test, tm.CATEGORICAL_COLUMNS, use_onehot=encoder is not None, encoding=encoding, encoder=encoder
+        )
+        available = set(train_encoded.columns) | set(encoded_feature_names)
+        features = [f for f in base_features + encoded_feature_names if f in available]
+
+        matrices = {}
+        for name, frame in (('train', train_encoded), ('test', test_encoded)):
+            X = tm.build_feature_matrix(frame, features, encoding, encoder, encoded_feature_names)
+            matrices[f'X_{name}'] = tm.save_matrix(os.path.join(fold_dir, f'X_{name}'), X)
+            np.save(os.path.join(fold_dir, f'y_{name}.npy'), frame[tm.TARGET_COLUMN].to_numpy(dtype=np.float32))
+        meta = {key: spec[key] for key in ('fold', 'train_start', 'test_start', 'test_end')}
+        meta.update({
+            'features': features,
+            'categorical_features': tm.categorical_feature_indices(features, encoding, encoded_feature_names),
+            'n_train': len(df_train),
+            'n_test': len(df_test),
+            'matrices': matrices,
+        })
+        # fold.json은 마지막에 써서 중간에 끊긴 fold를 캐시로 쓰지 않게 한다
+        with open(os.path.join(fold_dir, 'fold.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+    return fold_dirs
+
+
+def load_fold(fold_dir):
+    """fold 디렉터리를 (meta, X_train, y_train, X_test, y_test) 메모리 맵으로 연다"""
+    with open(os.path.join(fold_dir, 'fold.json'), 'r') as f:
+        meta = json.load(f)
+    X_train = tm.load_matrix(os.path.join(fold_dir, 'X_train'), meta['matrices']['X_train'])
+    X_test = tm.load_matrix(os.path.join(fold_dir, 'X_test'), meta['matrices']['X_test'])
+    y_train = np.load(os.path.join(fold_dir, 'y_train.npy'), mmap_mode='r')
+    y_test = np.load(os.path.join(fold_dir, 'y_test.npy'), mmap_mode='r')
+    return meta, X_train, y_train, X_test, y_test
+
+
+def _evaluate_worker(fold_dir, model_type, n_jobs, gb_engine='exact', early_stopping=False):
+    """프로세스 풀 작업 단위: fold 하나에서 모델 하나를 학습/평가"""
+    from contextlib import nullcontext
+    if importlib.util.find_spec('threadpoolctl') is not None:
+        from threadpoolctl import threadpool_limits
+        limits = threadpool_limits(limits=n_jobs)
+    else:
+        limits = nullcontext()
+
+    meta, X_train, y_train, X_test, y_test = load_fold(fold_dir)
+    if model_type == 'gradient_boosting' and gb_engine == 'hist':
+        X_train, X_test = tm._dense_for_hist(X_train), tm._dense_for_hist(X_test)
+    with limits:
+        model, _, fit_params = tm.build_model(
+            model_type, X_train, categorical_features=meta['categorical_features'], n_jobs=n_jobs, gb_engine=gb_engine
+        )
+        start = time.perf_counter()
+        model, _ = tm._fit_model(model, model_type, X_train, y_train, fit_params, early_stopping)
+        fit_time = time.perf_counter() - start
+        start = time.perf_counter()
+        y_pred = model.predict(X_test)
+        predict_time = time.perf_counter() - start
+
+    result = {'fold': meta['fold'], 'model': model_type, 'n_train': meta['n_train'], 'n_test': meta['n_test']}
+    result.update(tm._regression_metrics(y_test, y_pred))
+    result.update({
+        'fit_time': fit_time,
+        'predict_us_per_row': predict_time / max(len(y_pred), 1) * 1e6,
+        'n_jobs': n_jobs,
+        'y_pred': y_pred,
+    })
+    return result
+
+
+def evaluate_folds(fold_dirs, model_types, total_cores=None, max_workers=None, gb_engine='exact',
+                   early_stopping=False):
+    """(fold × 모델) 작업을 프로세스 풀에서 실행하고 결과 목록 반환 (fold, 모델 순)"""
+    tasks = [(fold_dir, model_type) for fold_dir in fold_dirs for model_type in model_types]
+    total_cores = total_cores or os.cpu_count() or 1
+    max_workers = max(1, min(max_workers or len(tasks), len(tasks), total_cores))
+    n_jobs = max(1, total_cores // max_workers)
+    print(f"\n⚙️  백테스트: {len(fold_dirs)}개 fold × {len(model_types)}개 모델, 동시 {max_workers}개 (작업당 {n_jobs}코어)")
+
+    if max_workers == 1:
+        return [_evaluate_worker(fold_dir, model_type, n_jobs, gb_engine, early_stopping)
+                for fold_dir, model_type in tasks]
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    # train_models_parallel과 같은 이유로 spawn 사용 (행렬은 경로만 넘기고 워커가 메모리 맵으로 연다)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(_evaluate_worker, fold_dir, model_type, n_jobs, gb_engine, early_stopping)
+            for fold_dir, model_type in tasks
+        ]
+        return [future.result() for future in futures]
+
+
+def ensemble_weights(fold_results):
+    """main()의 앙상블 규칙: R² 상위 3개 모델, R² 비례 가중치 (음수 R²는 0, 모두 0이면 동일 가중치)"""
+    top = sorted(fold_results, key=lambda r: r['r2'], reverse=True)[:3]
+    scores = np.array([max(r['r2'], 0.0) for r in top])
+    if scores.sum() <= 0:
+        scores = np.ones(len(top))
+    return {r['model']: float(s / scores.sum()) for r, s in zip(top, scores)}
+
+
+def add_ensemble_results(results, fold_dirs):
+    """fold별 앙상블 결과 추가 (가중치는 직전 fold 결과, 첫 fold는 동일 가중치)"""
+    by_fold = {}
+    for r in results:
+        by_fold.setdefault(r['fold'], []).append(r)
+    previous = None
+    ensemble = []
+    for fold_dir in fold_dirs:
+        meta, _, _, _, y_test = load_fold(fold_dir)
+        fold_results = by_fold[meta['fold']]
+        if previous is None:
+            weights = {r['model']: 1.0 / len(fold_results) for r in fold_results}
+        else:
+            weights = ensemble_weights(previous)
+        preds = {r['model']: r['y_pred'] for r in fold_results}
+        y_pred = sum(w * preds[m] for m, w in weights.items())
+        result = {'fold': meta['fold'], 'model': 'ensemble', 'n_train': meta['n_train'], 'n_test': meta['n_test'],
+                  'weights': weights}
+        result.update(tm._regression_metrics(y_test, y_pred))
+        result.update({
+            'fit_time': sum(r['fit_time'] for r in fold_results if r['model'] in weights),
+            'predict_us_per_row': sum(r['predict_us_per_row'] for r in fold_results if r['model'] in weights),
+        })
+        ensemble.append(result)
+        previous = fold_results
+    return results + ensemble
+
+
+def summarize(results, model_types):
+    """fold별 결과 표와 모델별 평균/표준편차 출력, 요약 dict 반환"""
+    print(f"\n{'fold':>4s} {'model':18s} {'train':>7s} {'test':>6s} {'MAE':>6s} {'R²':>7s} {'fit(s)':>8s} {'pred(us/row)':>13s}")
+    for r in sorted(results, key=lambda r: (r['fold'], (model_types + ['ensemble']).index(r['model']))):
+        print(f"{r['fold']:4d} {r['model']:18s} {r['n_train']:7d} {r['n_test']:6d} {r['mae']:6.2f} {r['r2']:7.4f} "
+              f"{r['fit_time']:8.2f} {r['predict_us_per_row']:13.2f}")
+
+    summary = {}
+    print(f"\n📈 모델별 평균 (fold {len({r['fold'] for r in results})}개):")
+    for model_type in model_types + ['ensemble']:
+        rows = [r for r in results if r['model'] == model_type]
+        if not rows:
+            continue
+        maes, r2s = np.array([r['mae'] for r in rows]), np.array([r['r2'] for r in rows])
+        summary[model_type] = {
+            'mae_mean': float(maes.mean()), 'mae_std': float(maes.std()),
+            'r2_mean': float(r2s.mean()), 'r2_std': float(r2s.std()),
+            'fit_time_mean': float(np.mean([r['fit_time'] for r in rows])),
+        }
+        print(f"   {model_type:18s}: MAE={maes.mean():.2f}±{maes.std():.2f}, R²={r2s.mean():.4f}±{r2s.std():.4f}")
+    return summary
+
+
+def main(mode='pre', source='supabase', source_path=None, use_snapshot=False, encoding='onehot', folds=5,
+         test_days=7.0, train_days=None, model_types=None, n_jobs=None, parallel=None, gb_engine='exact',
+         early_stopping=False, use_cache=True, output=None):
+    df = tm.load_data(use_snapshot=use_snapshot, mode=mode, source=tm.create_data_source(source, source_path))
+    df_clean = tm.preprocess_data(df, incident_point_in_time=True, fill_nan=False)
+    # 전처리가 유저/시간 순으로 다시 정렬하므로 fold 위치 인덱스는 정렬된 결과 기준
+    df_clean = df_clean.sort_values(tm.TIME_COLUMN, kind='stable').reset_index(drop=True)
+
+    print(f"\n🗓️  walk-forward fold 생성: {folds}개 × {test_days}일 (학습 창: {f'{train_days}일' if train_days else '확장'})")
+    fold_specs = walk_forward_folds(df_clean[tm.TIME_COLUMN], folds, test_days, train_days)
+    if not fold_specs:
+        print("❌ 평가할 fold가 없습니다. --test-days/--folds를 줄여 보세요.")
+        return None
+
+    key = fold_cache_key(df_clean, mode, encoding, folds, test_days, train_days)
+    cache_dir = os.path.join(BACKTEST_CACHE_DIR, f'{mode}_{encoding}_{key[:16]}')
+    if not use_cache and os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
+    cached = all(os.path.exists(os.path.join(cache_dir, f"fold_{s['fold']}", 'fold.json')) for s in fold_specs)
+    start = time.perf_counter()
+    fold_dirs = build_fold_cache(df_clean, fold_specs, mode, encoding, cache_dir)
+    print(f"{'♻️  fold 행렬 캐시 재사용' if cached else '✅ fold 행렬 저장'}: {cache_dir} ({time.perf_counter() - start:.1f}초)")
+
+    model_types = list(model_types or tm.available_model_types())
+    results = evaluate_folds(fold_dirs, model_types, n_jobs, parallel, gb_engine, early_stopping)
+    results = add_ensemble_results(results, fold_dirs)
+    summary = summarize(results, model_types)
+
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        report = {
+            'mode': mode,
+            'encoding': encoding,
+            'gb_engine': gb_engine,
+            'folds': [{k: v for k, v in s.items() if not k.endswith('_idx')} for s in fold_specs],
+            'results': [{k: v for k, v in r.items() if k != 'y_pred'} for r in results],
+            'summary': summary,
+        }
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ 결과 저장: {output}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='시간순 롤링 백테스트 (walk-forward)')
+    parser.add_argument('--mode', choices=['pre', 'post'], default='pre', help='모델 모드')
+    parser.add_argument('--source', choices=list(tm.DATA_SOURCES), default='supabase', help='학습 데이터 소스')
+    parser.add_argument('--source-path', help='로컬 데이터 소스 파일 경로 (parquet/csv/sqlite)')
+    parser.add_argument('--snapshot', action='store_true', help='로컬 스냅샷(ml_models/cache) 사용, 새 레코드만 동기화')
+    parser.add_argument('--encoding', choices=tm.CATEGORICAL_ENCODINGS, default='onehot', help='카테고리 인코딩 방식')
+    parser.add_argument('--folds', type=int, default=5, help='테스트 구간 수')
+    parser.add_argument('--test-days', type=float, default=7.0, help='테스트 구간 길이 (일)')
+    parser.add_argument('--train-days', type=float, default=None, help='학습 구간 길이 (일, 기본: 테스트 이전 전체)')
+    parser.add_argument('--models', nargs='+', choices=tm.MODEL_TYPES, help='평가할 모델 (기본: 설치된 전체)')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='전체 코어 예산 (기본: CPU 코어 수)')
+    parser.add_argument('--parallel', type=int, default=None, help='동시에 실행할 (fold × 모델) 작업 수 (1: 순차)')
+    parser.add_argument('--gb-engine', choices=tm.GB_ENGINES, default='exact', help='gradient_boosting 엔진')
+    parser.add_argument('--early-stopping', action='store_true', help='XGBoost/LightGBM 검증 fold 조기 종료')
+    parser.add_argument('--no-cache', action='store_true', help='fold 행렬 캐시를 지우고 다시 생성')
+    parser.add_argument('--output', help='결과 JSON 저장 경로')
+    args = parser.parse_args()
+    main(
+        mode=args.mode,
+        source=args.source,
+        source_path=args.source_path,
+        use_snapshot=args.snapshot,
+        encoding=args.encoding,
+        folds=args.folds,
+        test_days=args.test_days,
+        train_days=args.train_days,
+        model_types=args.models,
+        n_jobs=args.jobs,
+        parallel=args.parallel,
+        gb_engine=args.gb_engine,
+        early_stopping=args.early_stopping,
+        use_cache=not args.no_cache,
+        output=args.output,
+    )
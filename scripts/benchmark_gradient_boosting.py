@@ -0,0 +1,129 @@
+"""
+gradient_boosting 엔진 벤치마크 (exact vs hist)
+
+train_ml_model.py와 같은 데이터 로드/전처리/인코딩/분할을 거친 뒤 같은 학습/테스트 세트에서
+GradientBoostingRegressor(exact)와 HistGradientBoostingRegressor(hist, 조기 종료)를 비교한다.
+학습 시간, 배치 예측 지연(행당), 단건 예측 지연(p50), MAE/R²를 출력한다.
+
+사용법:
+    python scripts/benchmark_gradient_boosting.py --source parquet --source-path ml_models/cache/iracing_ml_training_data.parquet
+    python scripts/benchmark_gradient_boosting.py --encoding native --output ml_models/benchmark_gb.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import train_ml_model as tm  # noqa: E402
+
+# 메인 모델과 같은 하이퍼파라미터 (train_model의 gradient_boosting 기본값)
+GB_PARAMS = {
+    'n_estimators': 300,
+    'learning_rate': 0.1,
+    'max_depth': 12,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+}
+
+
+def prepare_split(mode='pre', encoding='onehot', source='supabase', source_path=None, sample=None):
+    """train_ml_model.main()과 같은 방식으로 (X_train, X_test, y_train, y_test, categorical_features) 생성"""
+    from sklearn.model_selection import train_test_split
+
+    df = tm.load_data(mode=mode, source=tm.create_data_source(source, source_path))
+    if sample and len(df) > sample:
+        df = df.sample(n=sample, random_state=42)
+    df_clean = tm.preprocess_data(df)
+    df_encoded, encoder, encoded_feature_names = tm.encode_categorical_features(
+        df_clean, tm.CATEGORICAL_COLUMNS, encoding=encoding
+    )
+    base_features = list(tm.BASE_FEATURES) + (tm.POST_ONLY_FEATURES if mode == 'post' else [])
+    available = set(df_encoded.columns) | set(encoded_feature_names)
+    features = [f for f in base_features + encoded_feature_names if f in available]
+
+    X = tm.build_feature_matrix(df_encoded, features, encoding, encoder, encoded_feature_names)
+    y = df_encoded[tm.TARGET_COLUMN].values
+    categorical_features = tm.categorical_feature_indices(features, encoding, encoded_feature_names)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    return X_train, X_test, y_train, y_test, categorical_features
+
+
+def benchmark_engine(engine, X_train, X_test, y_train, y_test, categorical_features, single_rows=200):
+    """엔진 하나를 학습/예측하고 측정값 반환"""
+    from sklearn.metrics import mean_absolute_error, r2_score
+
+    if engine == 'hist':
+        X_train, X_test = tm._dense_for_hist(X_train), tm._dense_for_hist(X_test)
+    model = tm.make_gradient_boosting(engine, X_train, categorical_features, **GB_PARAMS)
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    batch_time = time.perf_counter() - start
+
+    # 단건 예측 (서빙 경로: 한 번에 한 행)
+    latencies = []
+    for i in range(min(single_rows, X_test.shape[0])):
+        row = X_test[i:i + 1]
+        start = time.perf_counter()
+        model.predict(row)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        'engine': engine,
+        'estimator': type(model).__name__,
+        'fit_time': fit_time,
+        'n_iter': int(getattr(model, 'n_iter_', getattr(model, 'n_estimators_', 0))),
+        'predict_us_per_row': batch_time / X_test.shape[0] * 1e6,
+        'single_predict_p50_ms': float(np.percentile(latencies, 50) * 1e3) if latencies else None,
+        'mae': float(mean_absolute_error(y_test, y_pred)),
+        'r2': float(r2_score(y_test, y_pred)),
+    }
+
+
+def main(mode='pre', encoding='onehot', source='supabase', source_path=None, sample=None, output=None):
+    X_train, X_test, y_train, y_test, categorical_features = prepare_split(
+        mode, encoding, source, source_path, sample
+    )
+    print(f"\n📊 벤치마크: 학습 {X_train.shape[0]}개, 테스트 {X_test.shape[0]}개, 특성 {X_train.shape[1]}개 ({encoding})")
+
+    results = []
+    for engine in tm.GB_ENGINES:
+        print(f"\n⏱️  {engine} 엔진 측정 중...")
+        results.append(benchmark_engine(engine, X_train, X_test, y_train, y_test, categorical_features))
+
+    print(f"\n{'engine':8s} {'fit(s)':>8s} {'iters':>6s} {'pred(us/row)':>13s} {'single p50(ms)':>15s} {'MAE':>6s} {'R²':>7s}")
+    for r in results:
+        print(f"{r['engine']:8s} {r['fit_time']:8.2f} {r['n_iter']:6d} {r['predict_us_per_row']:13.2f} "
+              f"{r['single_predict_p50_ms']:15.3f} {r['mae']:6.2f} {r['r2']:7.4f}")
+    exact, hist = results
+    print(f"\n✅ hist 엔진 학습 속도: exact 대비 {exact['fit_time'] / hist['fit_time']:.1f}배, "
+          f"MAE 차이 {hist['mae'] - exact['mae']:+.3f}, R² 차이 {hist['r2'] - exact['r2']:+.4f}")
+
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump({'mode': mode, 'encoding': encoding, 'rows': int(X_train.shape[0] + X_test.shape[0]),
+                       'results': results}, f, indent=2)
+        print(f"✅ 결과 저장: {output}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='gradient_boosting 엔진 벤치마크 (exact vs hist)')
+    parser.add_argument('--mode', choices=['pre', 'post'], default='pre', help='모델 모드')
+    parser.add_argument('--encoding', choices=tm.CATEGORICAL_ENCODINGS, default='onehot', help='카테고리 인코딩 방식')
+    parser.add_argument('--source', choices=list(tm.DATA_SOURCES), default='supabase', help='학습 데이터 소스')
+    parser.add_argument('--source-path', help='로컬 데이터 소스 파일 경로 (parquet/csv/sqlite)')
+    parser.add_argument('--sample', type=int, help='이 행 수만큼 샘플링해서 측정')
+    parser.add_argument('--output', help='결과 JSON 저장 경로')
+    args = parser.parse_args()
+    main(args.mode, args.encoding, args.source, args.source_path, args.sample, args.output)
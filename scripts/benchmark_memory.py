@@ -0,0 +1,193 @@
+"""
+병렬 학습 메모리 리포트 (워커별 복사본 vs 공유 메모리 맵)
+
+합성 특성 행렬(기본 1,000,000행)로 train_models_parallel()과 같은 spawn 프로세스 풀에서 모델을 동시에 학습하고
+프로세스별 최대 메모리를 비교한다. 시나리오마다 새 인터프리터에서 실행한다.
+
+- copy:   기존 방식. float64 행렬을 워커마다 피클로 전달 (워커마다 복사본)
+- shared: float32 행렬을 share_matrices()로 한 번 저장하고 워커는 메모리 맵으로 연결
+
+/proc/self/status의 RssAnon(프로세스 전용 메모리)과 RssFile(파일 페이지, 프로세스끼리 공유)을 주기적으로
+읽어 최댓값을 기록한다. 합계는 모든 프로세스의 RssAnon 최댓값 합 + RssFile 최댓값(한 번만)으로 추정한다.
+/proc이 없는 환경에서는 ru_maxrss만 기록한다.
+
+사용법:
+    python scripts/benchmark_memory.py
+    python scripts/benchmark_memory.py --rows 200000 --models lightgbm xgboost --output ml_models/memory_report.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import train_ml_model as tm  # noqa: E402
+
+SCENARIOS = ['copy', 'shared']
+# 리포트용 모델 크기 (메모리는 행렬 크기가 좌우하므로 트리 수는 작게)
+REPORT_PARAMS = {
+    'random_forest': {'n_estimators': 10, 'max_depth': 12},
+    'gradient_boosting': {'n_estimators': 10, 'max_depth': 6},
+    'xgboost': {'n_estimators': 50},
+    'lightgbm': {'n_estimators': 50},
+}
+
+
+class PeakMemory:
+    """백그라운드 스레드로 현재 프로세스의 최대 RssAnon/RssFile(MB)을 기록"""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = {'anon_mb': 0.0, 'file_mb': 0.0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def read():
+        try:
+            with open('/proc/self/status', 'r') as f:
+                fields = dict(line.split(':', 1) for line in f if line.startswith(('RssAnon', 'RssFile')))
+        except OSError:
+            return None
+        return {
+            'anon_mb': int(fields['RssAnon'].split()[0]) / 1024,
+            'file_mb': int(fields['RssFile'].split()[0]) / 1024,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def sample(self):
+        current = self.read()
+        if current:
+            for key, value in current.items():
+                self.peak[key] = max(self.peak[key], value)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def report(self):
+        import resource
+        return {**self.peak, 'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def synthetic_matrix(rows, n_features, dtype, seed=42):
+    """학습 행렬과 비슷한 합성 데이터 (수치 특성 + 0/1 원-핫 블록, 순위 타겟)"""
+    rng = np.random.default_rng(seed)
+    n_numeric = n_features // 2
+    X = np.empty((rows, n_features), dtype=dtype)
+    X[:, :n_numeric] = rng.standard_normal((rows, n_numeric), dtype=np.float32)
+    X[:, n_numeric:] = rng.random((rows, n_features - n_numeric), dtype=np.float32) < 0.05
+    y = np.clip(np.round(10 + 3 * X[:, 0] - 2 * X[:, 1] + rng.standard_normal(rows)), 1, 30)
+    return X, y.astype(dtype)
+
+
+def _fit_worker(X, y, model_type):
+    """spawn 워커: 행렬을 받거나(copy) 메모리 맵으로 연결(shared)하고 모델 하나를 학습"""
+    with PeakMemory() as memory:
+        X, y = tm.attach_matrix(X), tm.attach_matrix(y)
+        model, _, fit_params = tm.build_model(model_type, X, n_jobs=1)
+        model.set_params(**REPORT_PARAMS.get(model_type, {}))
+        start = time.perf_counter()
+        model.fit(X, y, **fit_params)
+        fit_time = time.perf_counter() - start
+    return {'model': model_type, 'fit_time': fit_time, **memory.report()}
+
+
+def run_scenario(scenario, rows, n_features, model_types):
+    """시나리오 하나를 현재 프로세스(부모)에서 실행하고 프로세스별 메모리 반환"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    shared_dir = None
+    with PeakMemory() as memory:
+        X, y = synthetic_matrix(rows, n_features, np.float32 if scenario == 'shared' else np.float64)
+        if scenario == 'shared':
+            shared_dir, shared = tm.share_matrices({'X': X, 'y': y})
+            del X, y
+            X, y = shared['X'], shared['y']
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(model_types), mp_context=context) as executor:
+            futures = [executor.submit(_fit_worker, X, y, model_type) for model_type in model_types]
+            workers = [future.result() for future in futures]
+    if shared_dir:
+        import shutil
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+    parent = memory.report()
+    processes = [parent] + workers
+    return {
+        'scenario': scenario,
+        'parent': parent,
+        'workers': workers,
+        'total_anon_mb': sum(p['anon_mb'] for p in processes),
+        'total_estimate_mb': sum(p['anon_mb'] for p in processes) + max(p['file_mb'] for p in processes),
+        'sum_max_rss_mb': sum(p['max_rss_mb'] for p in processes),
+    }
+
+
+def main(rows=1_000_000, n_features=64, model_types=None, output=None):
+    model_types = list(model_types or tm.available_model_types())
+    matrix_mb = rows * n_features * 4 / 1024 ** 2
+    print(f"📊 메모리 리포트: {rows}행 × {n_features}특성 (float32 {matrix_mb:.0f} MB), 모델 {len(model_types)}개 동시 학습")
+
+    reports = []
+    for scenario in SCENARIOS:
+        print(f"\n⏱️  {scenario} 시나리오 실행 중...")
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--scenario', scenario, '--rows', str(rows),
+             '--features', str(n_features), '--models', *model_types],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"{scenario} 시나리오 실패:\n{result.stderr}")
+        reports.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'scenario':9s} {'process':20s} {'anon(MB)':>9s} {'file(MB)':>9s} {'maxrss(MB)':>11s} {'fit(s)':>7s}")
+    for report in reports:
+        for p in [{'model': 'parent', **report['parent']}] + report['workers']:
+            fit_time = f"{p['fit_time']:7.1f}" if 'fit_time' in p else f"{'':>7s}"
+            print(f"{report['scenario']:9s} {p['model']:20s} {p['anon_mb']:9.0f} {p['file_mb']:9.0f} {p['max_rss_mb']:11.0f} {fit_time}")
+    print()
+    for report in reports:
+        print(f"   {report['scenario']:7s}: 전용 메모리 합계 {report['total_anon_mb']:.0f} MB, "
+              f"추정 합계 {report['total_estimate_mb']:.0f} MB (프로세스별 maxrss 합계 {report['sum_max_rss_mb']:.0f} MB)")
+    copy, shared = reports
+    print(f"\n✅ 공유 메모리 맵: 추정 최대 메모리 {copy['total_estimate_mb']:.0f} → {shared['total_estimate_mb']:.0f} MB "
+          f"({copy['total_estimate_mb'] / max(shared['total_estimate_mb'], 1):.1f}배 감소)")
+
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump({'rows': rows, 'features': n_features, 'models': model_types, 'reports': reports}, f, indent=2)
+        print(f"✅ 결과 저장: {output}")
+    return reports
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='병렬 학습 메모리 리포트 (복사본 vs 공유 메모리 맵)')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='합성 데이터 행 수')
+    parser.add_argument('--features', type=int, default=64, help='특성 수')
+    parser.add_argument('--models', nargs='+', choices=tm.MODEL_TYPES, help='동시에 학습할 모델 (기본: 설치된 전체)')
+    parser.add_argument('--scenario', choices=SCENARIOS, help=argparse.SUPPRESS)  # 시나리오별 하위 프로세스
+    parser.add_argument('--output', help='결과 JSON 저장 경로')
+    args = parser.parse_args()
+    if args.scenario:
+        print(json.dumps(run_scenario(args.scenario, args.rows, args.features,
+                                      list(args.models or tm.available_model_types()))))
+    else:
+        main(args.rows, args.features, args.models, args.output)
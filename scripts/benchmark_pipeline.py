@@ -0,0 +1,206 @@
+"""
+ML 파이프라인 단계별 벤치마크 (합성 데이터 10k / 100k / 1M행)
+
+generate_synthetic_data.py의 시드 고정 데이터로 preprocess_data (add_user_sof_performance_features,
+add_incident_impact_features 포함), encode_categorical_features, build_feature_matrix, train_model,
+predict_ranks_batch를 실행하고 단계별 처리량(행/초), wall/CPU 시간, 추가 메모리(단계 중 최대 RSS - 시작 RSS)를
+기록한다. 단계 측정은 train_ml_model의 RunProfiler를 그대로 사용하고, 크기마다 새 인터프리터에서 실행한다.
+
+기준 결과(--baseline)가 있으면 단계별로 비교해서 처리량이 threshold 넘게 떨어지거나 추가 메모리가
+threshold 넘게 늘면 회귀로 보고 종료 코드 1로 끝난다 (CI에서 실패 처리).
+
+사용법:
+    python scripts/benchmark_pipeline.py --update-baseline                # 기준 결과 저장
+    python scripts/benchmark_pipeline.py                                  # 기준 대비 회귀 검사
+    python scripts/benchmark_pipeline.py --sizes 10000 100000 --models lightgbm xgboost --threshold 0.3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import train_ml_model as tm  # noqa: E402
+
+BENCHMARK_SIZES = [10_000, 100_000, 1_000_000]
+BENCHMARK_BASELINE = os.path.join('ml_models', 'benchmark_pipeline_baseline.json')
+REGRESSION_THRESHOLD = 0.25       # 처리량 25% 넘게 감소 또는 추가 메모리 25% 넘게 증가하면 회귀
+MIN_STAGE_SECONDS = 0.05          # 이보다 짧은 단계의 처리량은 비교하지 않음 (측정 잡음)
+MIN_STAGE_MEMORY_MB = 16          # 이보다 적게 쓰는 단계의 메모리는 비교하지 않음
+
+
+def default_models():
+    """기본 벤치마크 모델 (1M행에서도 몇 분 안에 끝나는 모델만)"""
+    return ['lightgbm'] if tm.LIGHTGBM_AVAILABLE else ['gradient_boosting']
+
+
+def run_size(rows, seed=42, model_types=None, encoding='onehot', gb_engine='hist', trace_memory=False):
+    """한 크기의 파이프라인을 현재 프로세스에서 실행하고 단계별 측정값 반환"""
+    from sklearn.model_selection import train_test_split
+    import generate_synthetic_data as synthetic
+    import load_ensemble_model as lem
+
+    model_types = list(model_types or default_models())
+    output_dir = tempfile.mkdtemp(prefix='benchmark_pipeline_')
+    tm._run_profiler = tm.RunProfiler(output_dir, f'{rows}', trace_memory=trace_memory)
+    try:
+        with tm.profile_stage('generate_synthetic_data', rows=rows):
+            df = synthetic.generate_training_data(rows, seed=seed)
+        with tm.profile_stage('preprocess_data', rows=len(df)):
+            df_clean = tm.preprocess_data(df)
+        with tm.profile_stage('encode_categorical_features', rows=len(df_clean)):
+            df_encoded, encoder, encoded_feature_names = tm.encode_categorical_features(
+                df_clean, tm.CATEGORICAL_COLUMNS, encoding=encoding
+            )
+        available = set(df_encoded.columns) | set(encoded_feature_names)
+        features = [f for f in list(tm.BASE_FEATURES) + encoded_feature_names if f in available]
+        with tm.profile_stage('build_feature_matrix', rows=len(df_encoded)):
+            X = tm.build_feature_matrix(df_encoded, features, encoding, encoder, encoded_feature_names)
+        y = df_encoded[tm.TARGET_COLUMN].values
+        categorical_features = tm.categorical_feature_indices(features, encoding, encoded_feature_names)
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+        loaded_models = []
+        for model_type in model_types:
+            with tm.profile_stage(f'train_model:{model_type}', rows=X_train.shape[0]):
+                model, _ = tm.train_model(
+                    X_train, y_train, X_test, y_test, model_type, categorical_features=categorical_features,
+                    n_jobs=os.cpu_count(), gb_engine=gb_engine, features=features, use_cache=False
+                )
+            loaded_models.append({'name': model_type, 'model': model, 'weight': 1.0 / len(model_types)})
+        with tm.profile_stage('predict_ranks_batch', rows=X_test.shape[0]):
+            lem.predict_ranks_batch({'loaded_models': loaded_models}, X_test)
+        report = tm._run_profiler.report(rows=rows, seed=seed, models=model_types, encoding=encoding,
+                                         gb_engine=gb_engine, features=len(features))
+    finally:
+        tm._run_profiler = None
+        import shutil
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    stages = {}
+    for stage in report.pop('stages'):
+        wall = stage['wall_time']
+        memory = None
+        if stage.get('peak_rss_mb') is not None and stage.get('rss_start_mb') is not None:
+            memory = stage['peak_rss_mb'] - stage['rss_start_mb']
+        stages[stage['name']] = {
+            'rows': stage['rows'],
+            'wall_time': wall,
+            'cpu_time': stage['cpu_time'],
+            'rows_per_sec': stage['rows'] / wall if stage['rows'] and wall > 0 else None,
+            'memory_mb': memory,
+            'traced_peak_mb': stage.get('traced_peak_mb'),
+        }
+    return {**report, 'stages': stages}
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """기준 결과 대비 회귀 목록 [(크기, 단계, 지표, 기준값, 현재값)]"""
+    regressions = []
+    for size, result in results.items():
+        base_stages = baseline.get('sizes', {}).get(size, {}).get('stages', {})
+        for name, stage in result['stages'].items():
+            base = base_stages.get(name)
+            if not base:
+                continue
+            if (base['rows_per_sec'] and stage['rows_per_sec'] and base['wall_time'] >= MIN_STAGE_SECONDS
+                    and stage['rows_per_sec'] < base['rows_per_sec'] / (1 + threshold)):
+                regressions.append((size, name, 'rows_per_sec', base['rows_per_sec'], stage['rows_per_sec']))
+            if (base['memory_mb'] is not None and stage['memory_mb'] is not None
+                    and max(base['memory_mb'], stage['memory_mb']) >= MIN_STAGE_MEMORY_MB
+                    and stage['memory_mb'] > max(base['memory_mb'], 0) * (1 + threshold) + 1):
+                regressions.append((size, name, 'memory_mb', base['memory_mb'], stage['memory_mb']))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    """크기별 단계 표 출력 (기준 결과가 있으면 처리량 비율도 출력)"""
+    for size, result in results.items():
+        base_stages = (baseline or {}).get('sizes', {}).get(size, {}).get('stages', {})
+        print(f"\n📊 {int(size):,}행 (wall {result['wall_time']:.1f}초, 최대 RSS {result['peak_rss_mb'] or 0:.0f} MB)")
+        print(f"   {'stage':50s} {'wall(s)':>8s} {'rows/s':>12s} {'mem(MB)':>8s} {'기준 대비':>9s}")
+        for name, stage in result['stages'].items():
+            rate = f"{stage['rows_per_sec']:12,.0f}" if stage['rows_per_sec'] else f"{'':>12s}"
+            memory = f"{stage['memory_mb']:8.0f}" if stage['memory_mb'] is not None else f"{'':>8s}"
+            base = base_stages.get(name)
+            ratio = ''
+            if base and base['rows_per_sec'] and stage['rows_per_sec']:
+                ratio = f"{stage['rows_per_sec'] / base['rows_per_sec']:8.2f}x"
+            print(f"   {name[:50]:50s} {stage['wall_time']:8.2f} {rate} {memory} {ratio:>9s}")
+
+
+def main(sizes=None, seed=42, model_types=None, encoding='onehot', gb_engine='hist', trace_memory=False,
+         baseline_path=BENCHMARK_BASELINE, update_baseline=False, threshold=REGRESSION_THRESHOLD, output=None):
+    sizes = list(sizes or BENCHMARK_SIZES)
+    model_types = list(model_types or default_models())
+    print(f"🚀 파이프라인 벤치마크: {', '.join(f'{s:,}' for s in sizes)}행, 모델 {', '.join(model_types)} "
+          f"(seed={seed}, encoding={encoding})")
+
+    results = {}
+    for rows in sizes:
+        print(f"\n⏱️  {rows:,}행 실행 중...")
+        command = [sys.executable, os.path.abspath(__file__), '--run-size', str(rows), '--seed', str(seed),
+                   '--models', *model_types, '--encoding', encoding, '--gb-engine', gb_engine]
+        if trace_memory:
+            command.append('--trace-memory')
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{rows}행 벤치마크 실패:\n{result.stderr}")
+        results[str(rows)] = json.loads(result.stdout.strip().splitlines()[-1])
+
+    baseline = None
+    if baseline_path and os.path.exists(baseline_path) and not update_baseline:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    summary = {'seed': seed, 'models': model_types, 'encoding': encoding, 'gb_engine': gb_engine, 'sizes': results}
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n✅ 결과 저장: {output}")
+    if update_baseline:
+        os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n✅ 기준 결과 저장: {baseline_path}")
+        return []
+    if baseline is None:
+        print(f"\nℹ️  기준 결과가 없습니다 ({baseline_path}). --update-baseline으로 먼저 저장하세요.")
+        return []
+
+    regressions = compare(results, baseline, threshold)
+    if regressions:
+        print(f"\n❌ 기준 대비 회귀 {len(regressions)}건 (threshold {threshold:.0%}):")
+        for size, name, metric, before, after in regressions:
+            print(f"   {int(size):,}행 {name}: {metric} {before:,.1f} → {after:,.1f}")
+    else:
+        print(f"\n✅ 기준 대비 회귀 없음 (threshold {threshold:.0%})")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ML 파이프라인 단계별 벤치마크 (합성 데이터)')
+    parser.add_argument('--sizes', type=int, nargs='+', help='행 수 목록 (기본: 10000 100000 1000000)')
+    parser.add_argument('--seed', type=int, default=42, help='합성 데이터 시드')
+    parser.add_argument('--models', nargs='+', choices=tm.MODEL_TYPES, help='train_model 단계에서 학습할 모델 (기본: lightgbm)')
+    parser.add_argument('--encoding', choices=tm.CATEGORICAL_ENCODINGS, default='onehot', help='카테고리 인코딩 방식')
+    parser.add_argument('--gb-engine', choices=tm.GB_ENGINES, default='hist', help='gradient_boosting 엔진')
+    parser.add_argument('--trace-memory', action='store_true', help='단계별 tracemalloc 최대 할당량도 기록 (느려짐)')
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE, help='비교할 기준 결과 JSON 경로')
+    parser.add_argument('--update-baseline', action='store_true', help='이번 결과를 기준 결과로 저장')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help='회귀 판정 비율 (0.25 = 25%%)')
+    parser.add_argument('--output', help='결과 JSON 저장 경로')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)  # 크기별 하위 프로세스
+    args = parser.parse_args()
+    if args.run_size:
+        print(json.dumps(run_size(args.run_size, args.seed, args.models, args.encoding, args.gb_engine,
+                                  args.trace_memory), default=tm._json_default))
+    else:
+        regressions = main(args.sizes, args.seed, args.models, args.encoding, args.gb_engine, args.trace_memory,
+                           args.baseline, args.update_baseline, args.threshold, args.output)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,151 @@
+"""
+특성 저장소 1행 경로 점검 (feature_vector vs feature_matrix)
+
+시드 고정 합성 데이터로 DriverFeatureStore를 만들고, 참가자 요청 dict 하나에 대해
+feature_vector()(1행 경로)와 feature_matrix()(배치 경로)가 같은 행을 내는지 onehot/native 인코딩에서 비교한다.
+요청은 학습 행에서 뽑되 일부 필드를 빼거나 None으로 두고, 저장소에 없는 드라이버와 as_of 지정도 섞는다.
+그대로 / add_result() 이후 (꼬리 버퍼, 과거 시각 재누적) / save()+load() 이후 (메모리 맵) 세 상태를 모두 본다.
+
+마지막으로 1행 조회 지연 시간(중앙값)을 재서 예산을 넘으면 실패한다. 다르거나 느리면 종료 코드 1로 끝난다.
+
+사용법:
+    python scripts/check_feature_store.py
+    python scripts/check_feature_store.py --rows 5000 --requests 500 --budget-scale 2   # 느린 CI 머신
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import train_ml_model as tm  # noqa: E402
+import feature_store as fs  # noqa: E402
+import generate_synthetic_data as synthetic  # noqa: E402
+
+VECTOR_BUDGET_US = 150  # feature_vector 1회 (중앙값) 예산, 마이크로초
+TIMING_CALLS = 2000
+
+
+def make_layouts(df):
+    """{인코딩: FeatureLayout} — 학습과 같은 전처리/인코더로 만든 앙상블 특성 순서"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_clean = tm.preprocess_data(df.copy())
+    layouts = {}
+    for encoding in ('onehot', 'native'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, encoder, encoded = tm.encode_categorical_features(df_clean, tm.CATEGORICAL_COLUMNS, encoding=encoding)
+        features = list(tm.BASE_FEATURES) + [f for f in encoded if f not in tm.BASE_FEATURES]
+        layouts[encoding] = fs.FeatureLayout({
+            'features': features, 'encoding': encoding, 'encoder': encoder, 'encoded_features': encoded,
+        })
+    return layouts
+
+
+def make_requests(df, count, seed):
+    """(요청 dict, as_of) 목록 — 필드 누락/None, 없는 드라이버, as_of 지정을 섞는다"""
+    rng = np.random.default_rng(seed)
+    keys = fs.CONTEXT_COLUMNS + tm.CATEGORICAL_COLUMNS
+    requests = []
+    for i in rng.choice(len(df), size=count, replace=False):
+        record = df.iloc[i]
+        row = {'cust_id': int(record['cust_id']), tm.TIME_COLUMN: record[tm.TIME_COLUMN]}
+        for key in keys:
+            draw = rng.random()
+            if draw < 0.1:
+                continue  # 필드 없음
+            row[key] = None if draw < 0.2 or pd.isna(record[key]) else float(record[key])
+        if rng.random() < 0.1:
+            row['cust_id'] = -int(row['cust_id'])  # 저장소에 없는 드라이버
+        as_of = None
+        draw = rng.random()
+        if draw < 0.2:
+            del row[tm.TIME_COLUMN]  # 전체 이력
+        elif draw < 0.4:
+            as_of = record[tm.TIME_COLUMN] + pd.Timedelta(days=int(rng.integers(-30, 30)))
+        requests.append((row, as_of))
+    return requests
+
+
+def compare(store, layouts, requests):
+    """1행 경로와 배치 경로가 다른 (인코딩, 요청 번호) 목록"""
+    mismatches = []
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for encoding, layout in layouts.items():
+            for i, (row, as_of) in enumerate(requests):
+                vector = store.feature_vector(layout, row, as_of)
+                matrix = store.feature_matrix(layout, row, as_of)
+                if vector.shape != matrix.shape or not np.array_equal(vector, matrix, equal_nan=True):
+                    mismatches.append((encoding, i))
+    return mismatches
+
+
+def add_results(store, df, seed):
+    """드라이버 몇 명에게 최신 결과와 과거 시각 결과를 추가 (꼬리 버퍼 / 재누적 경로)"""
+    rng = np.random.default_rng(seed)
+    for cust_id in rng.choice(df['cust_id'].unique(), size=20, replace=False):
+        history = df[df['cust_id'] == cust_id][tm.TIME_COLUMN]
+        for when in (history.max() + pd.Timedelta(hours=1), history.min() + (history.max() - history.min()) / 2):
+            store.add_result(int(cust_id), when, finish_position=int(rng.integers(1, 20)), total_participants=20,
+                             ir_diff_from_avg=float(rng.normal(0, 150)), incidents=int(rng.integers(0, 6)),
+                             i_rating=float(rng.normal(2000, 300)))
+
+
+def median_us(function, requests, calls=TIMING_CALLS):
+    """requests를 돌아가며 function(row, as_of) 호출, 1회 중앙값 (마이크로초)"""
+    times = []
+    for i in range(calls):
+        row, as_of = requests[i % len(requests)]
+        start = time.perf_counter()
+        function(row, as_of)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1e6
+
+
+def main(rows=3000, count=300, seed=42, budget_scale=1.0):
+    df = synthetic.generate_training_data(rows, seed=seed)
+    layouts = make_layouts(df)
+    requests = make_requests(df, count, seed)
+    store = fs.DriverFeatureStore.from_frame(df)
+    failed = False
+
+    def report(state):
+        nonlocal failed
+        mismatches = compare(store, layouts, requests)
+        failed = failed or bool(mismatches)
+        print(f"{'❌' if mismatches else '✅'} {state:20s} 요청 {len(requests)}개 × 인코딩 {len(layouts)}개: "
+              f"불일치 {len(mismatches)}개{f' (처음: {mismatches[0]})' if mismatches else ''}")
+
+    report('from_frame')
+    add_results(store, df, seed)
+    report('add_result')
+    with tempfile.TemporaryDirectory() as directory:
+        store.save(directory)
+        store = fs.DriverFeatureStore.load(directory)
+        report('save + load (mmap)')
+
+        layout = layouts['onehot']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vector_us = median_us(lambda row, as_of: store.feature_vector(layout, row, as_of), requests)
+            matrix_us = median_us(lambda row, as_of: store.feature_matrix(layout, row, as_of), requests, calls=300)
+    budget = VECTOR_BUDGET_US * budget_scale
+    status = '✅' if vector_us <= budget else '❌'
+    failed = failed or status == '❌'
+    print(f"{status} feature_vector 1행: {vector_us:.0f}us (예산 {budget:.0f}us, feature_matrix 1행 {matrix_us:.0f}us)")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='특성 저장소 1행 경로 점검 (feature_vector vs feature_matrix)')
+    parser.add_argument('--rows', type=int, default=3000, help='합성 데이터 행 수')
+    parser.add_argument('--requests', type=int, default=300, help='비교할 요청 수')
+    parser.add_argument('--seed', type=int, default=42, help='합성 데이터/요청 시드')
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='지연 시간 예산 배수 (느린 머신용)')
+    args = parser.parse_args()
+    sys.exit(main(args.rows, args.requests, args.seed, args.budget_scale))
@@ -0,0 +1,178 @@
+"""
+fetch_training_rows() 점검 (가짜 Supabase 클라이언트)
+
+PostgREST처럼 응답을 max-rows로 자르고 요청마다 지연을 넣는 가짜 클라이언트로
+키셋 페이지네이션 + 동시 요청 내보내기를 실행한다. 다음을 확인하고 하나라도 틀리면 종료 코드 1로 끝난다.
+    - 서버 상한보다 작은/같은/큰 page_size 모두에서 모든 레코드를 정확히 한 번씩 받는다
+    - since(sync_column) 조건이 적용된다
+    - 실패한 페이지는 재시도되어 결과가 같다
+    - 동시 요청 수를 늘리면 왕복 지연이 같아도 내보내기가 빨라진다
+
+사용법:
+    python scripts/check_fetch_training_rows.py
+    python scripts/check_fetch_training_rows.py --rows 20000 --latency-ms 50
+"""
+
+import argparse
+import bisect
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import train_ml_model as tm  # noqa: E402
+
+SERVER_MAX_ROWS = 1000   # PostgREST db-max-rows 기본값
+COLUMNS = ['id', 'cust_id', 'created_at']
+MIN_SPEEDUP = 1.5       # 동시 요청 8 / 1의 최소 속도 비율 (구간이 많아 요청 수는 늘어난다)
+
+
+class FakeQuery:
+    """supabase-py 쿼리 빌더 흉내 (select/gte/gt/lt/order/limit/execute)"""
+
+    def __init__(self, client, filters=(), limit=None):
+        self.client = client
+        self.filters = list(filters)
+        self._limit = limit
+
+    def _with(self, op, column, value):
+        return FakeQuery(self.client, self.filters + [(op, column, value)], self._limit)
+
+    def select(self, columns):
+        return self
+
+    def gte(self, column, value):
+        return self._with('gte', column, value)
+
+    def gt(self, column, value):
+        return self._with('gt', column, value)
+
+    def lt(self, column, value):
+        return self._with('lt', column, value)
+
+    def order(self, column):
+        return self
+
+    def limit(self, n):
+        return FakeQuery(self.client, self.filters, n)
+
+    def execute(self):
+        return self.client.execute(self)
+
+
+class FakeClient:
+    """id 순으로 정렬된 메모리 테이블, 요청마다 latency 지연, failure_rate 확률로 요청 실패"""
+
+    OPS = {
+        'gte': lambda a, b: a >= b,
+        'gt': lambda a, b: a > b,
+        'lt': lambda a, b: a < b,
+    }
+
+    def __init__(self, rows, latency=0.0, failure_rate=0.0, max_rows=SERVER_MAX_ROWS, seed=0):
+        self.rows = sorted(rows, key=lambda r: r['id'])
+        self.ids = [r['id'] for r in self.rows]
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_rows = max_rows
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self)
+
+    def execute(self, query):
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            if self._random.random() < self.failure_rate:
+                self.failures += 1
+                raise ConnectionError('fake network error')
+        # id 조건은 정렬된 id에서 이분 탐색 (기본키 인덱스), 나머지 조건은 그 범위에서 limit까지 검사
+        start, end = 0, len(self.ids)
+        others = []
+        for op, column, value in query.filters:
+            if column != 'id':
+                others.append((self.OPS[op], column, value))
+            elif op == 'gte':
+                start = max(start, bisect.bisect_left(self.ids, value))
+            elif op == 'gt':
+                start = max(start, bisect.bisect_right(self.ids, value))
+            else:
+                end = min(end, bisect.bisect_left(self.ids, value))
+        limit = min(query._limit or self.max_rows, self.max_rows)
+        data = []
+        for row in self.rows[start:end]:
+            if all(compare(row[column], value) for compare, column, value in others):
+                data.append(row)
+                if len(data) == limit:
+                    break
+        return SimpleNamespace(data=data)
+
+
+def make_rows(n, seed=42):
+    rng = random.Random(seed)
+    return [
+        {
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'cust_id': rng.randrange(1, 500_000),
+            'created_at': f'2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}T00:00:00+00:00',
+        }
+        for _ in range(n)
+    ]
+
+
+def fetched_ids(client, **kwargs):
+    df = tm.fetch_training_rows(columns=COLUMNS, client=client, retries=5, **kwargs)
+    return list(df['id'])
+
+
+def main(rows=12_000, latency_ms=20.0):
+    table = make_rows(rows)
+    expected = sorted(r['id'] for r in table)
+    results = []
+
+    def check(name, passed, detail=''):
+        results.append(passed)
+        print(f"{'✅' if passed else '❌'} {name}{f' ({detail})' if detail else ''}")
+
+    # 동시 요청 1이면 구간이 하나라서 구간당 레코드가 서버 상한보다 많다 (잘린 응답이 반드시 생긴다)
+    for page_size in (250, SERVER_MAX_ROWS, 5000):
+        for concurrency in (1, 4):
+            ids = fetched_ids(FakeClient(table), page_size=page_size, concurrency=concurrency)
+            check(f'page_size={page_size}, 동시 요청 {concurrency} (서버 상한 {SERVER_MAX_ROWS})',
+                  ids == expected, f'{len(ids)}/{len(expected)}행')
+
+    since = '2025-07-01T00:00:00+00:00'
+    ids = fetched_ids(FakeClient(table), since=since, page_size=5000, concurrency=1)
+    check('since 조건', ids == sorted(r['id'] for r in table if r['created_at'] >= since), f'{len(ids)}행')
+
+    flaky = FakeClient(table, failure_rate=0.05, seed=7)
+    ids = fetched_ids(flaky, page_size=500, concurrency=4)
+    check('실패한 페이지 재시도', ids == expected and flaky.failures > 0, f'실패 {flaky.failures}회')
+
+    timings = {}
+    for concurrency in (1, 8):
+        client = FakeClient(table, latency=latency_ms / 1e3)
+        start = time.perf_counter()
+        ids = fetched_ids(client, page_size=500, concurrency=concurrency)
+        timings[concurrency] = time.perf_counter() - start
+        check(f'동시 요청 {concurrency}', ids == expected,
+              f'{timings[concurrency]:.2f}초, 요청 {client.requests}회')
+    speedup = timings[1] / timings[8]
+    check('동시 요청 수에 따른 속도 향상', speedup >= MIN_SPEEDUP, f'{speedup:.1f}배')
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='fetch_training_rows() 점검 (가짜 Supabase 클라이언트)')
+    parser.add_argument('--rows', type=int, default=12_000, help='가짜 테이블 레코드 수')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='요청당 지연 (ms)')
+    args = parser.parse_args()
+    sys.exit(main(args.rows, args.latency_ms))
@@ -0,0 +1,70 @@
+"""
+학습/추론 스크립트 import 시간 점검
+
+python -X importtime 으로 각 엔트리 포인트를 새 프로세스에서 import 하고,
+누적 import 시간이 예산을 넘거나 무거운 라이브러리가 import 시점에 로드되면 실패한다.
+
+사용법:
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --budget-scale 2   # 느린 CI 머신
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 엔트리 포인트별 import 시간 예산 (초)
+IMPORT_BUDGETS = {
+    'train_ml_model': 1.5,       # pandas + numpy
+    'load_ensemble_model': 0.5,  # numpy
+    'model_registry': 0.5,       # numpy + sqlite3
+}
+
+# import 시점에 로드되면 안 되는 라이브러리 (모델/그래프가 실제로 필요할 때만 로드)
+LAZY_MODULES = ['sklearn', 'xgboost', 'lightgbm', 'matplotlib', 'joblib', 'dotenv', 'supabase', 'scipy']
+
+
+def measure_import(module):
+    """새 인터프리터에서 module을 import 하고 (누적 시간(초), import된 최상위 모듈 집합) 반환"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{module} import 실패:\n{result.stderr}")
+
+    total_us = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        imported.add(name.split('.')[0])
+        if name == module:
+            total_us = int(cumulative)
+    return (total_us or 0) / 1e6, imported
+
+
+def main(budget_scale=1.0):
+    failed = False
+    for module, budget in IMPORT_BUDGETS.items():
+        budget *= budget_scale
+        seconds, imported = measure_import(module)
+        eager = sorted(m for m in LAZY_MODULES if m in imported)
+        status = '✅' if seconds <= budget and not eager else '❌'
+        print(f"{status} {module}: {seconds:.3f}초 (예산 {budget:.2f}초)")
+        if eager:
+            print(f"   import 시점에 로드된 무거운 라이브러리: {', '.join(eager)}")
+        failed = failed or status == '❌'
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='학습/추론 스크립트 import 시간 점검')
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='예산 배수 (느린 머신용)')
+    args = parser.parse_args()
+    sys.exit(main(budget_scale=args.budget_scale))
@@ -0,0 +1,201 @@
+"""
+add_user_sof_performance_features() 동등성 점검 (기존 레코드별 루프 대비)
+
+벡터화 이전의 유저 × 레이스 루프(baseline_user_sof_performance_features, 아래에 그대로 복사)와
+현재 구현을 시드 고정 합성 데이터에서 실행해 7개 user_* 컬럼을 비교한다. 다르면 종료 코드 1로 끝난다.
+
+비교하는 데이터 (시드마다):
+    - 합성 데이터 그대로
+    - ir_diff_from_avg 일부 결측 (구간 없음 → 구간 통계에서 빠지고 예상 완주율도 없음)
+    - 같은 유저의 session_start_time 동점 + 입력 행 순서 섞기
+
+동점 처리: 두 구현 모두 안정 정렬이다. 같은 유저의 동점 레이스는 입력 행 순서대로 "과거"가 된다.
+(기존 루프는 유저별 sort_values('session_start_time')가 불안정 정렬이라 동점 순서가 정해지지 않았으므로,
+복사본은 그 정렬만 kind='stable'로 바꿨다. 현재 구현의 [cust_id, session_start_time] 정렬도 안정 정렬이고
+feature_store.py의 np.lexsort와 같은 순서다.)
+
+입력 float 컬럼은 float64로 맞춘다. 기존 루프의 float32 평균은 1e-7 수준 반올림 차이를 내므로
+계산 로직만 1e-12 이내로 비교한다.
+
+사용법:
+    python scripts/check_user_sof_features.py
+    python scripts/check_user_sof_features.py --rows 3000 --seeds 1 2 3 4
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import train_ml_model as tm  # noqa: E402
+import generate_synthetic_data as synthetic  # noqa: E402
+
+TOLERANCE = 1e-12
+FLOAT_COLUMNS = ['actual_finish_position', 'total_participants', 'ir_diff_from_avg']
+
+
+def baseline_user_sof_performance_features(df):
+    """벡터화 이전 구현 (178fa55 이전 train_ml_model.py, 진행 출력만 제거하고 유저별 정렬은 안정 정렬)"""
+    def get_ir_diff_range(ir_diff):
+        if pd.isna(ir_diff):
+            return None
+        if ir_diff < -200:
+            return 'much_lower'
+        elif ir_diff < -50:
+            return 'lower'
+        elif ir_diff < 50:
+            return 'similar'
+        elif ir_diff < 200:
+            return 'higher'
+        else:
+            return 'much_higher'
+
+    df['ir_diff_range'] = df['ir_diff_from_avg'].apply(get_ir_diff_range)
+
+    if 'session_start_time' in df.columns:
+        df = df.sort_values(['cust_id', 'session_start_time']).reset_index(drop=True)
+    else:
+        df = df.sort_values('cust_id').reset_index(drop=True)
+
+    for ir_diff_range in ['much_lower', 'lower', 'similar', 'higher', 'much_higher']:
+        df[f'user_avg_finish_pct_{ir_diff_range}'] = None
+    df['user_ir_diff_performance_diff'] = None
+    df['user_expected_finish_pct_by_ir_diff'] = None
+
+    for cust_id, user_data in df.groupby('cust_id'):
+        if 'session_start_time' in user_data.columns:
+            user_data = user_data.sort_values('session_start_time', kind='stable')
+
+        user_indices = user_data.index.values
+        for i, idx in enumerate(user_indices):
+            past_data = user_data.iloc[:i]
+
+            if len(past_data) > 0:
+                all_finish_pcts = past_data['actual_finish_position'] / past_data['total_participants']
+                overall_avg_finish_pct = all_finish_pcts.mean()
+            else:
+                overall_avg_finish_pct = None
+
+            stats = {}
+            for ir_diff_range in ['much_lower', 'lower', 'similar', 'higher', 'much_higher']:
+                if len(past_data) > 0:
+                    range_data = past_data[past_data['ir_diff_range'] == ir_diff_range]
+                    if len(range_data) >= 1:
+                        finish_pcts = range_data['actual_finish_position'] / range_data['total_participants']
+                        stats[f'avg_finish_pct_{ir_diff_range}'] = finish_pcts.mean()
+                    else:
+                        stats[f'avg_finish_pct_{ir_diff_range}'] = None
+                else:
+                    stats[f'avg_finish_pct_{ir_diff_range}'] = None
+
+            strong_opponent_pcts = []
+            if stats.get('avg_finish_pct_much_lower') is not None:
+                strong_opponent_pcts.append(stats['avg_finish_pct_much_lower'])
+            if stats.get('avg_finish_pct_lower') is not None:
+                strong_opponent_pcts.append(stats['avg_finish_pct_lower'])
+            strong_avg = np.mean(strong_opponent_pcts) if len(strong_opponent_pcts) > 0 else None
+
+            weak_opponent_pcts = []
+            if stats.get('avg_finish_pct_much_higher') is not None:
+                weak_opponent_pcts.append(stats['avg_finish_pct_much_higher'])
+            if stats.get('avg_finish_pct_higher') is not None:
+                weak_opponent_pcts.append(stats['avg_finish_pct_higher'])
+            weak_avg = np.mean(weak_opponent_pcts) if len(weak_opponent_pcts) > 0 else None
+
+            ir_diff_performance_diff = None
+            if strong_avg is not None and weak_avg is not None:
+                ir_diff_performance_diff = strong_avg - weak_avg
+            elif strong_avg is not None and overall_avg_finish_pct is not None:
+                ir_diff_performance_diff = strong_avg - overall_avg_finish_pct
+            elif weak_avg is not None and overall_avg_finish_pct is not None:
+                ir_diff_performance_diff = overall_avg_finish_pct - weak_avg
+            elif stats.get('avg_finish_pct_similar') is not None and overall_avg_finish_pct is not None:
+                ir_diff_performance_diff = stats['avg_finish_pct_similar'] - overall_avg_finish_pct
+            elif overall_avg_finish_pct is not None:
+                current_ir_diff = user_data.loc[idx, 'ir_diff_from_avg']
+                if pd.notna(current_ir_diff):
+                    ir_diff_performance_diff = 0.0
+                else:
+                    ir_diff_performance_diff = 0.0
+            else:
+                ir_diff_performance_diff = 0.0
+
+            stats['ir_diff_performance_diff'] = ir_diff_performance_diff
+
+            for ir_diff_range in ['much_lower', 'lower', 'similar', 'higher', 'much_higher']:
+                df.at[idx, f'user_avg_finish_pct_{ir_diff_range}'] = stats.get(f'avg_finish_pct_{ir_diff_range}', None)
+            df.at[idx, 'user_ir_diff_performance_diff'] = stats.get('ir_diff_performance_diff', None)
+            current_ir_diff_range = user_data.loc[idx, 'ir_diff_range']
+            if current_ir_diff_range:
+                df.at[idx, 'user_expected_finish_pct_by_ir_diff'] = stats.get(
+                    f'avg_finish_pct_{current_ir_diff_range}', None
+                )
+    return df
+
+
+def make_frames(rows, seed):
+    """(이름, DataFrame) 목록: 그대로 / ir_diff_from_avg 결측 / 동점 시각 + 행 순서 섞기"""
+    rng = np.random.default_rng(seed)
+    base = synthetic.generate_training_data(rows, seed=seed, races_per_driver=15)
+    base = base.dropna(subset=['actual_finish_position', 'total_participants']).reset_index(drop=True)
+    # 기존 루프는 float32 컬럼의 pandas 평균(float32 누적)이라 1e-7 수준의 반올림 차이가 난다.
+    # 계산 로직만 비교하도록 입력을 float64로 맞춘다.
+    base = base.astype({c: 'float64' for c in FLOAT_COLUMNS})
+
+    missing = base.copy()
+    missing.loc[rng.random(len(missing)) < 0.15, 'ir_diff_from_avg'] = np.nan
+
+    tied = missing.sort_values(['cust_id', tm.TIME_COLUMN], kind='stable').reset_index(drop=True)
+    # 같은 유저의 직전 레이스와 같은 시각으로 만든 뒤 행 순서를 섞는다 (동점은 입력 순서로 정해진다)
+    same_user = tied['cust_id'].to_numpy()[1:] == tied['cust_id'].to_numpy()[:-1]
+    tie = np.flatnonzero(same_user & (rng.random(len(tied) - 1) < 0.3)) + 1
+    times = tied[tm.TIME_COLUMN].to_numpy().copy()
+    for i in tie:  # 연속 동점(3개 이상)도 생기도록 순서대로 복사
+        times[i] = times[i - 1]
+    tied[tm.TIME_COLUMN] = pd.to_datetime(times, utc=True)
+    tied = tied.iloc[rng.permutation(len(tied))].reset_index(drop=True)
+    return [('synthetic', base), ('missing_ir_diff', missing), (f'tied_times({len(tie)})', tied)]
+
+
+def compare(df):
+    """(최대 차이, 결측 위치 불일치 수, 행 순서 일치 여부)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        current = tm.add_user_sof_performance_features(df.copy())
+    baseline = baseline_user_sof_performance_features(df.copy())
+    same_order = all(
+        current[c].equals(baseline[c]) for c in ('cust_id', tm.TIME_COLUMN, 'subsession_id')
+    )
+    max_diff, nan_mismatch = 0.0, 0
+    for feature in tm.USER_IR_DIFF_FEATURES:
+        a = pd.to_numeric(current[feature], errors='coerce').to_numpy(dtype=float)
+        b = pd.to_numeric(baseline[feature], errors='coerce').to_numpy(dtype=float)
+        nan_mismatch += int((np.isnan(a) != np.isnan(b)).sum())
+        both = ~np.isnan(a) & ~np.isnan(b)
+        if both.any():
+            max_diff = max(max_diff, float(np.abs(a[both] - b[both]).max()))
+    return max_diff, nan_mismatch, same_order
+
+
+def main(rows=2000, seeds=(1, 2, 3)):
+    failed = False
+    for seed in seeds:
+        for name, df in make_frames(rows, seed):
+            max_diff, nan_mismatch, same_order = compare(df)
+            passed = same_order and nan_mismatch == 0 and max_diff <= TOLERANCE
+            failed = failed or not passed
+            print(f"{'✅' if passed else '❌'} seed={seed} {name:20s} {len(df):6d}행: 최대 차이 {max_diff:.1e}, "
+                  f"결측 불일치 {nan_mismatch}, 행 순서 {'일치' if same_order else '불일치'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='add_user_sof_performance_features() 동등성 점검 (기존 루프 대비)')
+    parser.add_argument('--rows', type=int, default=2000, help='합성 데이터 행 수 (기존 루프는 O(n²)이라 작게)')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[1, 2, 3], help='합성 데이터 시드')
+    args = parser.parse_args()
+    sys.exit(main(args.rows, args.seeds))
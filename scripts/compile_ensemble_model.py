@@ -0,0 +1,363 @@
+"""
+가중 앙상블을 구조-배열(structure-of-arrays) 트리 하나로 컴파일 (load_ensemble_model.CompiledEnsemble)
+
+랜덤 포레스트, GradientBoosting(exact/hist), XGBoost, LightGBM 모델의 트리를 모두 펼쳐서
+feature / threshold / left / missing_left / zero_missing / value 배열 하나씩으로 합친다 (형제 노드는 붙여서 저장).
+앙상블 가중치, 학습률, 랜덤 포레스트 트리 평균은 리프 값에, 초기 예측값(base score)은 bias에 미리 곱해 둔다.
+
+컴파일 후에는 원본 모델과의 일치 검사(parity)를 하고 통과해야만 앙상블 설정 옆에
+compiled_ensemble_*.npz로 저장한다. load_ensemble_model()은 이 파일이 있으면 개별 모델 대신 로드한다.
+
+지원하지 않는 경우 (원본 모델을 그대로 사용):
+- 네이티브 카테고리 분기 (native 인코딩의 LightGBM/XGBoost/hist 카테고리 특성)
+- 항등 링크가 아닌 손실 (poisson, gamma 등), DART/랜덤 포레스트 모드 부스터, LightGBM zero_as_missing
+
+사용법:
+    python scripts/compile_ensemble_model.py --config ml_models/pre/ensemble_config_pre_20251119_160720.json
+    python scripts/compile_ensemble_model.py --mode pre --rows 20000   # 최신 앙상블, 합성 데이터 2만 행으로 검사
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import load_ensemble_model as lem  # noqa: E402
+
+PARITY_TOLERANCE = 1e-4         # 원본 앙상블과의 최대 허용 차이 (순위 단위, XGBoost float32 누적 오차 포함)
+PARITY_MISSING_FRACTION = 0.05  # 결측 분기 검사용으로 NaN을 넣을 값 비율
+IDENTITY_SKLEARN_LOSSES = ('squared_error', 'absolute_error', 'huber', 'quantile')
+IDENTITY_XGBOOST_OBJECTIVES = ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror', 'reg:quantileerror')
+IDENTITY_LIGHTGBM_OBJECTIVES = ('regression', 'regression_l1', 'huber', 'fair', 'quantile')
+
+
+def _tree(feature, threshold, left, right, missing_left, value, zero_missing=False):
+    """트리 하나 (지역 노드 번호, 루트 = 0, 리프는 left == -1)"""
+    feature = np.asarray(feature, dtype=np.int32)
+    return {
+        'feature': feature,
+        'threshold': np.asarray(threshold, dtype=np.float64),
+        'left': np.asarray(left, dtype=np.int32),
+        'right': np.asarray(right, dtype=np.int32),
+        'missing_left': np.asarray(missing_left, dtype=bool),
+        'zero_missing': np.full(len(feature), zero_missing, dtype=bool),
+        'value': np.asarray(value, dtype=np.float64),
+    }
+
+
+def _sklearn_tree(tree, scale):
+    """sklearn Tree 객체 (DecisionTreeRegressor.tree_): x <= threshold면 왼쪽"""
+    missing_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=bool))
+    return _tree(tree.feature, tree.threshold, tree.children_left, tree.children_right,
+                 missing_left, tree.value[:, 0, 0] * scale)
+
+
+def compile_random_forest(model, weight, sparse_input=False):
+    scale = weight / len(model.estimators_)
+    return [_sklearn_tree(estimator.tree_, scale) for estimator in model.estimators_], 0.0
+
+
+def compile_gradient_boosting(model, weight, sparse_input=False):
+    if model.loss not in IDENTITY_SKLEARN_LOSSES:
+        raise NotImplementedError(f"GradientBoostingRegressor loss={model.loss}는 지원하지 않습니다")
+    init = 0.0 if model.init_ == 'zero' else float(np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[0])
+    scale = weight * model.learning_rate
+    return [_sklearn_tree(estimator.tree_, scale) for estimator in model.estimators_[:, 0]], weight * init
+
+
+def compile_hist_gradient_boosting(model, weight, sparse_input=False):
+    if model.loss not in IDENTITY_SKLEARN_LOSSES:
+        raise NotImplementedError(f"HistGradientBoostingRegressor loss={model.loss}는 지원하지 않습니다")
+    if getattr(model, 'is_categorical_', None) is not None and np.any(model.is_categorical_):
+        raise NotImplementedError("HistGradientBoosting 네이티브 카테고리 분기는 지원하지 않습니다")
+    trees = []
+    for (predictor,) in model._predictors:
+        nodes = predictor.nodes
+        leaf = nodes['is_leaf'].astype(bool)
+        trees.append(_tree(
+            nodes['feature_idx'], nodes['num_threshold'], np.where(leaf, -1, nodes['left']),
+            np.where(leaf, -1, nodes['right']), nodes['missing_go_to_left'], nodes['value'] * weight
+        ))
+    return trees, weight * float(np.ravel(model._baseline_prediction)[0])
+
+
+def compile_xgboost(model, weight, sparse_input=False):
+    """XGBoost JSON 모델 (x < split_condition이면 왼쪽, 리프 값은 split_conditions에 저장됨)
+
+    XGBoost는 CSR 입력에 저장되지 않은 값(0)을 결측으로 보므로 sparse 인코딩 앙상블은 0도 결측 방향으로 보낸다.
+    """
+    learner = json.loads(model.get_booster().save_raw('json'))['learner']
+    objective = learner['objective']['name']
+    if objective not in IDENTITY_XGBOOST_OBJECTIVES:
+        raise NotImplementedError(f"XGBoost objective={objective}는 지원하지 않습니다")
+    booster = learner['gradient_booster']
+    if booster['name'] != 'gbtree':
+        raise NotImplementedError(f"XGBoost booster={booster['name']}는 지원하지 않습니다")
+    trees_json = booster['model']['trees']
+    # XGBRegressor.predict()와 같이 조기 종료 모델은 best_iteration까지만 사용
+    try:
+        n_iterations = model.best_iteration + 1
+    except AttributeError:
+        n_iterations = None
+    if n_iterations is not None:
+        indptr = booster['model'].get('iteration_indptr')
+        trees_json = trees_json[:indptr[n_iterations]] if indptr else trees_json[:n_iterations]
+    trees = []
+    for tree in trees_json:
+        if any(tree.get('split_type', [])):
+            raise NotImplementedError("XGBoost 네이티브 카테고리 분기는 지원하지 않습니다")
+        left = np.asarray(tree['left_children'])
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32).astype(np.float64)
+        leaf = left < 0
+        # float32 입력에서 x < t  ⇔  x <= (t 바로 아래 float64 값)
+        threshold = np.where(leaf, 0.0, np.nextafter(conditions, -np.inf))
+        trees.append(_tree(tree['split_indices'], threshold, left, tree['right_children'], tree['default_left'],
+                           np.where(leaf, conditions, 0.0) * weight, zero_missing=sparse_input))
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+    return trees, weight * base_score
+
+
+def _lightgbm_tree(structure, weight):
+    """LightGBM dump_model()의 중첩 dict 트리를 배열로 (x <= threshold면 왼쪽)"""
+    columns = {key: [] for key in ('feature', 'threshold', 'left', 'right', 'missing_left', 'value')}
+    stack = [(structure, None, None)]
+    while stack:
+        node, parent, side = stack.pop()
+        index = len(columns['value'])
+        if parent is not None:
+            columns[side][parent] = index
+        if 'leaf_value' in node:
+            if 'leaf_coeff' in node:
+                raise NotImplementedError("LightGBM linear_tree는 지원하지 않습니다")
+            for key, value in zip(columns, (0, 0.0, -1, -1, False, node['leaf_value'] * weight)):
+                columns[key].append(value)
+            continue
+        if node['decision_type'] != '<=':
+            raise NotImplementedError("LightGBM 네이티브 카테고리 분기는 지원하지 않습니다")
+        missing_type = node['missing_type']
+        if missing_type == 'Zero':
+            raise NotImplementedError("LightGBM zero_as_missing 분기는 지원하지 않습니다")
+        # 'None': 결측은 0으로 바꿔 비교, 'NaN': 학습 시 정한 기본 방향
+        missing_left = node['default_left'] if missing_type == 'NaN' else 0.0 <= node['threshold']
+        for key, value in zip(columns, (node['split_feature'], node['threshold'], -1, -1, missing_left, 0.0)):
+            columns[key].append(value)
+        stack.append((node['right_child'], index, 'right'))
+        stack.append((node['left_child'], index, 'left'))
+    return _tree(**columns)
+
+
+def compile_lightgbm(model, weight, sparse_input=False):
+    dump = model.booster_.dump_model()  # LGBMRegressor.predict()와 같이 best_iteration까지
+    objective = dump.get('objective', '').split()[0]
+    if objective not in IDENTITY_LIGHTGBM_OBJECTIVES:
+        raise NotImplementedError(f"LightGBM objective={objective}는 지원하지 않습니다")
+    if dump.get('average_output'):
+        raise NotImplementedError("LightGBM 랜덤 포레스트 모드는 지원하지 않습니다")
+    return [_lightgbm_tree(info['tree_structure'], weight) for info in dump['tree_info']], 0.0
+
+
+ESTIMATOR_COMPILERS = {
+    'RandomForestRegressor': compile_random_forest,
+    'ExtraTreesRegressor': compile_random_forest,
+    'GradientBoostingRegressor': compile_gradient_boosting,
+    'HistGradientBoostingRegressor': compile_hist_gradient_boosting,
+    'XGBRegressor': compile_xgboost,
+    'LGBMRegressor': compile_lightgbm,
+}
+
+
+def _breadth_first(tree):
+    """너비 우선 순서로 노드 번호를 다시 매김 (형제 노드가 붙어 있어 오른쪽 자식 = 왼쪽 자식 + 1)
+
+    루트에서 닿지 않는 노드(XGBoost 가지치기로 지워진 노드)는 빠진다. (노드 순서, 깊이) 반환.
+    """
+    left, right = tree['left'], tree['right']
+    levels = [np.array([0])]
+    while True:
+        internal = levels[-1][left[levels[-1]] >= 0]
+        if not len(internal):
+            break
+        levels.append(np.column_stack([left[internal], right[internal]]).ravel())
+    return np.concatenate(levels), len(levels) - 1
+
+
+def compile_ensemble(ensemble):
+    """load_ensemble_model(use_compiled=False)로 로드한 앙상블을 CompiledEnsemble로 변환"""
+    trees, bias, sources = [], 0.0, []
+    sparse_input = ensemble.get('encoding') == 'sparse'
+    for model_info in ensemble['loaded_models']:
+        model = model_info['model']
+        estimator = type(model).__name__
+        if estimator not in ESTIMATOR_COMPILERS:
+            raise NotImplementedError(f"{estimator}는 컴파일할 수 없습니다")
+        model_trees, model_bias = ESTIMATOR_COMPILERS[estimator](model, model_info['weight'], sparse_input)
+        trees += model_trees
+        bias += model_bias
+        sources.append({
+            'name': model_info['name'], 'estimator': estimator, 'weight': model_info['weight'],
+            'trees': len(model_trees), 'nodes': int(sum(len(t['value']) for t in model_trees)),
+        })
+
+    layouts = [_breadth_first(tree) for tree in trees]
+    depths = np.array([depth for _, depth in layouts], dtype=np.int32)
+    # 깊은 트리부터 저장 (CompiledEnsemble.predict가 깊이별로 진행 중인 트리 앞부분만 처리)
+    order = np.argsort(-depths, kind='stable')
+    parts = {name: [] for name in ('feature', 'threshold', 'left', 'missing_left', 'zero_missing', 'value')}
+    roots, offset = [], 0
+    for i in order:
+        tree, (nodes, _) = trees[i], layouts[i]
+        position = np.zeros(len(tree['value']), dtype=np.int64)
+        position[nodes] = np.arange(len(nodes))
+        leaf = tree['left'][nodes] < 0
+        own = np.arange(len(nodes)) + offset
+        parts['feature'].append(np.where(leaf, 0, tree['feature'][nodes]))
+        parts['threshold'].append(np.where(leaf, np.inf, tree['threshold'][nodes]))
+        parts['left'].append(np.where(leaf, own, position[tree['left'][nodes]] + offset))
+        parts['missing_left'].append(leaf | tree['missing_left'][nodes])
+        parts['zero_missing'].append(~leaf & tree['zero_missing'][nodes])
+        parts['value'].append(np.where(leaf, tree['value'][nodes], 0.0))
+        roots.append(offset)
+        offset += len(nodes)
+    arrays = {
+        'feature': np.concatenate(parts['feature']).astype(np.int32),
+        'threshold': np.concatenate(parts['threshold']),
+        'left': np.concatenate(parts['left']).astype(np.int32),
+        'missing_left': np.concatenate(parts['missing_left']),
+        'zero_missing': np.concatenate(parts['zero_missing']),
+        'value': np.concatenate(parts['value']),
+        'roots': np.array(roots, dtype=np.int32),
+        'depths': depths[order],
+    }
+    meta = {
+        'signature': lem.ensemble_signature(ensemble),
+        'sources': sources,
+        'compiled_at': datetime.now().isoformat(),
+    }
+    return lem.CompiledEnsemble(arrays, bias, len(ensemble['features']), meta)
+
+
+def ensemble_predict(ensemble, X):
+    """원본 모델별 predict()의 가중 합 (일치 검사 기준)"""
+    prediction = np.zeros(X.shape[0])
+    for model_info in ensemble['loaded_models']:
+        model = model_info['model']
+        prediction += model_info['weight'] * model.predict(lem._model_input(model, X))
+    return prediction
+
+
+def parity_inputs(ensemble, rows=5000, seed=42, source=None, source_path=None):
+    """일치 검사 입력: 전처리한 학습 데이터(기본: 합성 데이터) + 일부 값을 NaN으로 바꾼 복사본"""
+    import train_ml_model as tm
+    if source:
+        df = tm.load_data(mode=ensemble.get('mode', 'pre'), source=tm.create_data_source(source, source_path))
+        df = df.sample(n=min(rows, len(df)), random_state=seed)
+    else:
+        import generate_synthetic_data as synthetic
+        df = synthetic.generate_training_data(rows, seed=seed)
+    X = lem.build_features(ensemble, tm.preprocess_data(df))
+    X_missing = X.toarray() if hasattr(X, 'toarray') else np.array(X)
+    rng = np.random.default_rng(seed)
+    X_missing[rng.random(X_missing.shape) < PARITY_MISSING_FRACTION] = np.nan
+    if hasattr(X, 'toarray'):
+        from scipy import sparse
+        X_missing = sparse.csr_matrix(X_missing)  # build_features()처럼 0은 저장하지 않는 CSR
+    return X, X_missing
+
+
+def check_parity(ensemble, compiled, inputs, tolerance=PARITY_TOLERANCE):
+    """입력별 원본/컴파일 예측 최대 차이 목록과 통과 여부
+
+    원본 모델이 받지 않는 입력(NaN을 거부하는 exact GradientBoosting 등)은 차이를 None으로 두고 건너뛴다.
+    """
+    differences = []
+    for X in inputs:
+        try:
+            expected = ensemble_predict(ensemble, X)
+        except ValueError:
+            differences.append(None)
+            continue
+        differences.append(float(np.max(np.abs(expected - compiled.predict(X)))))
+    checked = [d for d in differences if d is not None]
+    return differences, bool(checked) and all(d <= tolerance for d in checked)
+
+
+def latency_ms(predict, X, repeat=200):
+    """단건 예측 지연 p50 (ms)"""
+    timings = []
+    for i in range(min(repeat, X.shape[0])):
+        row = X[i:i + 1]
+        start = time.perf_counter()
+        predict(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.percentile(timings, 50) * 1e3)
+
+
+def main(config_path=None, mode='pre', rows=5000, seed=42, source=None, source_path=None,
+         tolerance=PARITY_TOLERANCE):
+    if config_path is None:
+        config_path = lem.find_latest_ensemble_config(os.path.join('ml_models', mode))
+        if config_path is None:
+            raise FileNotFoundError(f"ml_models/{mode}에서 앙상블 설정을 찾을 수 없습니다.")
+    ensemble = lem.load_ensemble_model(config_path, use_compiled=False)
+
+    print("\n🔧 앙상블 컴파일 중...")
+    start = time.perf_counter()
+    try:
+        compiled = compile_ensemble(ensemble)
+    except NotImplementedError as e:
+        print(f"❌ 컴파일할 수 없는 앙상블입니다: {e}")
+        return None
+    print(f"   {time.perf_counter() - start:.1f}초, 트리 {len(compiled.roots)}개, 노드 {len(compiled.value)}개, "
+          f"최대 깊이 {int(compiled.depths.max(initial=0))}, {compiled.nbytes / 1024 ** 2:.1f} MB")
+    for source_info in compiled.meta['sources']:
+        print(f"   {source_info['name']:20s}: 트리 {source_info['trees']}개, 노드 {source_info['nodes']}개 "
+              f"(가중치 {source_info['weight']:.3f})")
+
+    X, X_missing = parity_inputs(ensemble, rows, seed, source, source_path)
+    differences, passed = check_parity(ensemble, compiled, [X, X_missing], tolerance)
+    missing = f"{differences[1]:.2e}" if differences[1] is not None else '생략 (원본 모델이 NaN 입력 거부)'
+    print(f"\n🔍 일치 검사 ({X.shape[0]}행): 최대 차이 {differences[0]:.2e}, 결측 주입 {missing} (허용 {tolerance:.0e})")
+    if not passed:
+        print("❌ 원본 앙상블과 예측이 달라 저장하지 않습니다.")
+        return None
+
+    start = time.perf_counter()
+    ensemble_predict(ensemble, X)
+    original_batch = time.perf_counter() - start
+    start = time.perf_counter()
+    compiled.predict(X)
+    compiled_batch = time.perf_counter() - start
+    model_bytes = sum(
+        os.path.getsize(os.path.join(os.path.dirname(config_path), m['model_path']))
+        for m in ensemble['models'] if os.path.exists(os.path.join(os.path.dirname(config_path), m['model_path']))
+    )
+    print(f"\n{'':10s} {'batch(us/row)':>14s} {'single p50(ms)':>15s} {'size(MB)':>9s}")
+    print(f"{'original':10s} {original_batch / X.shape[0] * 1e6:14.1f} "
+          f"{latency_ms(lambda row: ensemble_predict(ensemble, row), X):15.3f} {model_bytes / 1024 ** 2:9.1f}")
+    print(f"{'compiled':10s} {compiled_batch / X.shape[0] * 1e6:14.1f} "
+          f"{latency_ms(compiled.predict, X):15.3f} {compiled.nbytes / 1024 ** 2:9.1f}")
+
+    compiled.meta['parity'] = {'rows': int(X.shape[0]), 'max_abs_diff': differences, 'tolerance': tolerance}
+    path = lem.compiled_ensemble_path(config_path)
+    compiled.save(str(path))
+    print(f"\n✅ 컴파일된 앙상블 저장: {path}")
+    return str(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='가중 앙상블을 구조-배열 트리 하나로 컴파일')
+    parser.add_argument('--config', help='앙상블 설정 JSON 경로 (기본: ml_models/{mode}의 최신 설정)')
+    parser.add_argument('--mode', choices=['pre', 'post'], default='pre', help='모델 모드')
+    parser.add_argument('--rows', type=int, default=5000, help='일치 검사 행 수')
+    parser.add_argument('--seed', type=int, default=42, help='일치 검사 데이터 시드')
+    parser.add_argument('--source', choices=['parquet', 'csv', 'sqlite'], help='일치 검사에 쓸 학습 데이터 소스 (기본: 합성 데이터)')
+    parser.add_argument('--source-path', help='로컬 데이터 소스 파일 경로')
+    parser.add_argument('--tolerance', type=float, default=PARITY_TOLERANCE, help='허용 최대 차이')
+    args = parser.parse_args()
+    if main(args.config, args.mode, args.rows, args.seed, args.source, args.source_path, args.tolerance) is None:
+        sys.exit(1)
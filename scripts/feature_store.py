@@ -0,0 +1,638 @@
+"""
+시점 기준(point-in-time) 온라인 특성 저장소
+
+앙상블 입력 중 유저 이력에서 나오는 특성(user_avg_finish_pct_*, incident_impact_*, high_incident_risk)은
+지금까지 배치 preprocess_data() 안에서만 계산됐다. 이 저장소는 드라이버별로 session_start_time 순서의
+누적 집계(레이스 수, 상대 전력 구간별 완주율 합계, 사고/무사고 레이스 집계)를 CSR 형태의 배열에 담고,
+"시각 T 이전" 조회는 드라이버 구간 안에서 이진 탐색 한 번으로 끝낸다.
+ir_* 파생 변수는 요청의 세션 컨텍스트(상대 iRating, SOF)로 계산하며, 식은 학습과 같은 함수
+(train_ml_model.add_relative_features, _user_ir_diff_from_counts, _incident_impact_from_counts)를 쓴다.
+
+누적 집계에서 바로 나오는 특성(구간별 완주율, 성능 차이, 사고 영향도)은 레이스마다 미리 계산해 derived 배열에 두므로
+조회는 그 행을 읽고 요청 값으로 ir_* 파생 변수만 계산한다. 참가자 한 명은 feature_vector()가
+DataFrame/배열 변환 없이 1행을 채운다 (feature_matrix와 같은 값, check_feature_store.py).
+
+새 결과는 드라이버 꼬리 버퍼에 O(1)로 추가되고 (이전 결과보다 과거 시각이면 그 드라이버만 다시 누적),
+save()가 기본 배열과 합쳐 .npy 파일로 쓴다. load()는 메모리 맵으로 열어 시작이 거의 즉시 끝난다.
+
+사용법:
+    python scripts/feature_store.py --build --source parquet --source-path data/training.parquet
+    python scripts/feature_store.py --lookup 123456 --as-of 2026-10-01T12:00:00Z
+
+    from scripts.feature_store import DriverFeatureStore, FeatureLayout
+    store = DriverFeatureStore.load('ml_models/feature_store')          # 메모리 맵
+    layout = FeatureLayout(ensemble)                                     # 앙상블마다 한 번
+    X = store.feature_matrix(layout, grid_rows, as_of=session_start)     # ensemble['features'] 순서
+    x = store.feature_vector(layout, grid_rows[0], as_of=session_start)  # 참가자 한 명 (1행)
+    frame = store.features(grid_df, as_of=session_start)                 # build_features/predict_session 입력
+    store.add_result(cust_id, session_start, finish_position=3, total_participants=24,
+                     ir_diff_from_avg=120.0, incidents=4, i_rating=2150)
+    store.save('ml_models/feature_store')
+"""
+
+import argparse
+import bisect
+import json
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import train_ml_model as tm  # noqa: E402
+
+FEATURE_STORE_DIR = os.path.join('ml_models', 'feature_store')
+FEATURE_STORE_FORMAT_VERSION = 2
+LATEST_TIME = np.iinfo(np.int64).max  # as_of를 주지 않으면 모든 이력
+
+# 드라이버별 누적 집계 (add_user_sof_performance_features / add_incident_impact_features와 같은 값)
+AGGREGATE_COLUMNS = ['races', 'sum_all', 'valid_all'] + [
+    f'{kind}_{ir_range}' for ir_range in tm.IR_DIFF_RANGES for kind in ('sum', 'races', 'valid')
+] + ['with_races', 'with_sum', 'with_valid', 'without_races', 'without_sum', 'without_valid']
+_AGGREGATE_INDEX = {name: i for i, name in enumerate(AGGREGATE_COLUMNS)}
+
+# 누적 집계 행마다 미리 계산해 두는 특성 (결측 대체까지 적용한 값)
+DERIVED_COLUMNS = [f'user_avg_finish_pct_{ir_range}' for ir_range in tm.IR_DIFF_RANGES] + [
+    'user_ir_diff_performance_diff', 'incident_impact_on_position', 'high_incident_risk',
+]
+
+# 요청에 없으면 드라이버의 직전 레이스 값으로 채우는 컬럼
+LATEST_COLUMNS = ['i_rating', 'safety_rating', 'best_lap_time', 'average_lap_time']
+
+# 요청(세션 컨텍스트)에서 받는 수치 컬럼
+CONTEXT_COLUMNS = [
+    'i_rating', 'safety_rating', 'avg_opponent_ir', 'max_opponent_ir', 'min_opponent_ir',
+    'ir_diff_from_avg', 'sof', 'total_participants', 'best_lap_time', 'average_lap_time',
+    'starting_position', 'qualifying_position', 'qualifying_best_lap_time', 'practice_best_lap_time',
+    'fastest_qualifying_lap_time',
+]
+_CONTEXT_INDEX = {name: i for i, name in enumerate(CONTEXT_COLUMNS)}
+_LATEST_CONTEXT = np.array([_CONTEXT_INDEX[name] for name in LATEST_COLUMNS])
+
+ARRAYS = ('cust_ids', 'offsets', 'times', 'aggregates', 'latest', 'derived')
+
+
+def to_ns(value):
+    """시각(문자열/datetime/Timestamp/정수 ns) → UTC 정수 ns, None/NaT는 LATEST_TIME"""
+    if value is None:
+        return LATEST_TIME
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp is pd.NaT:
+        return LATEST_TIME
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return int(timestamp.value)
+
+
+def _times_ns(values):
+    """시각 배열 → UTC 정수 ns 배열 (NaT는 LATEST_TIME)"""
+    index = pd.DatetimeIndex(pd.to_datetime(values, utc=True)).as_unit('ns')
+    return np.where(index.isna(), LATEST_TIME, index.asi8)
+
+
+def result_increments(finish_pct, ir_diff_from_avg, incidents):
+    """레이스 결과 행마다 AGGREGATE_COLUMNS 증분 (n × len(AGGREGATE_COLUMNS))"""
+    finish_pct = np.asarray(finish_pct, dtype=np.float64)
+    pct_valid = ~np.isnan(finish_pct)
+    pct_filled = np.where(pct_valid, finish_pct, 0.0)
+    ir_diff_range = tm.get_ir_diff_ranges(ir_diff_from_avg)
+    incidents = np.nan_to_num(np.asarray(incidents, dtype=np.float64), nan=0.0)
+    with_incident = incidents > 0
+    without_incident = incidents == 0
+
+    increments = np.zeros((len(finish_pct), len(AGGREGATE_COLUMNS)))
+    column = lambda name: increments[:, _AGGREGATE_INDEX[name]]  # noqa: E731
+    column('races')[:] = 1
+    column('sum_all')[:] = pct_filled
+    column('valid_all')[:] = pct_valid
+    for ir_range in tm.IR_DIFF_RANGES:
+        in_range = ir_diff_range == ir_range
+        column(f'sum_{ir_range}')[:] = np.where(in_range, pct_filled, 0.0)
+        column(f'races_{ir_range}')[:] = in_range
+        column(f'valid_{ir_range}')[:] = in_range & pct_valid
+    column('with_races')[:] = with_incident
+    column('with_sum')[:] = np.where(with_incident, pct_filled, 0.0)
+    column('with_valid')[:] = with_incident & pct_valid
+    column('without_races')[:] = without_incident
+    column('without_sum')[:] = np.where(without_incident, pct_filled, 0.0)
+    column('without_valid')[:] = without_incident & pct_valid
+    return increments
+
+
+def derived_features(aggregates, finish_pct_fill):
+    """누적 집계 행마다 DERIVED_COLUMNS 값 (n × len(DERIVED_COLUMNS), preprocess_data와 같은 결측 대체)"""
+    aggregates = np.asarray(aggregates, dtype=np.float64).reshape(-1, len(AGGREGATE_COLUMNS))
+    past = {name: aggregates[:, i] for name, i in _AGGREGATE_INDEX.items()}
+    # 현재 레코드 구간에 따른 user_expected_finish_pct_by_ir_diff는 조회 때 구간별 값에서 고른다
+    no_range = np.full(len(aggregates), None, dtype=object)
+    user = tm._user_ir_diff_from_counts(past, past['races'], no_range)
+    counts = {**past, 'all_sum': past['sum_all'], 'all_valid': past['valid_all']}
+    impact, risk, _ = tm._incident_impact_from_counts(counts)
+
+    derived = np.empty((len(aggregates), len(DERIVED_COLUMNS)))
+    for i, ir_range in enumerate(tm.IR_DIFF_RANGES):
+        values = user[f'user_avg_finish_pct_{ir_range}']
+        derived[:, i] = np.where(np.isnan(values), finish_pct_fill, values)
+    derived[:, -3] = np.nan_to_num(user['user_ir_diff_performance_diff'], nan=0.0)
+    derived[:, -2] = np.nan_to_num(impact, nan=0.0)
+    derived[:, -1] = risk
+    return derived
+
+
+class FeatureLayout:
+    """
+    앙상블 특성 순서대로 행렬을 채우는 위치 정보 (앙상블마다 한 번 만든다)
+
+    onehot/sparse: 카테고리 값 → 원-핫 컬럼 위치 (drop='first'의 첫 카테고리와 처음 보는 값은 모두 0)
+    native: 카테고리 값 → OrdinalEncoder 코드 (처음 보는 값/결측은 -1)
+    """
+
+    def __init__(self, ensemble):
+        self.features = list(ensemble['features'])
+        self.encoding = ensemble.get('encoding', 'onehot')
+        encoder = ensemble.get('encoder')
+        encoded = set(ensemble.get('encoded_features', []))
+        position = {name: i for i, name in enumerate(self.features)}
+        self.numeric = [(i, name) for i, name in enumerate(self.features) if name not in encoded]
+        self.categorical = []  # (컬럼, {값: 위치 또는 코드}, native 코드 위치)
+        if encoder is not None:
+            for column, categories in zip(encoder.feature_names_in_, encoder.categories_):
+                if self.encoding == 'native':
+                    codes = {int(c): float(code) for code, c in enumerate(categories)}
+                    self.categorical.append((column, codes, position[column]))
+                    self.numeric = [(i, name) for i, name in self.numeric if name != column]
+                else:
+                    columns = {int(c): position[f'{column}_{int(c)}'] for c in categories[1:]}
+                    self.categorical.append((column, columns, None))
+        self._numeric_positions = np.array([i for i, _ in self.numeric], dtype=np.intp)
+        self._numeric_names = [name for _, name in self.numeric]
+
+    def matrix(self, arrays, n):
+        """특성 배열 dict → (n × 특성 수) float32 행렬 (sparse 인코딩이면 CSR)"""
+        X = np.zeros((n, len(self.features)), dtype=np.float32)
+        for i, name in self.numeric:
+            values = arrays.get(name)
+            X[:, i] = np.nan if values is None else values
+        for column, mapping, code_position in self.categorical:
+            values = arrays.get(column)
+            values = np.zeros(n) if values is None else np.nan_to_num(values, nan=0.0)
+            for row, value in enumerate(values):
+                target = mapping.get(int(value))
+                if code_position is not None:
+                    X[row, code_position] = -1.0 if target is None else target
+                elif target is not None:
+                    X[row, target] = 1.0
+        if self.encoding == 'sparse':
+            from scipy import sparse
+            return sparse.csr_matrix(X)
+        return X
+
+    def row(self, values):
+        """특성 이름 → 스칼라 값 → (1 × 특성 수) 행렬 (matrix()의 1행 경로, 배열 변환 없음)"""
+        X = np.zeros((1, len(self.features)), dtype=np.float32)
+        X[0, self._numeric_positions] = [values.get(name, np.nan) for name in self._numeric_names]
+        for column, mapping, code_position in self.categorical:
+            value = values.get(column)
+            target = mapping.get(0 if value is None or np.isnan(value) else int(value))
+            if code_position is not None:
+                X[0, code_position] = -1.0 if target is None else target
+            elif target is not None:
+                X[0, target] = 1.0
+        if self.encoding == 'sparse':
+            from scipy import sparse
+            return sparse.csr_matrix(X)
+        return X
+
+
+class DriverFeatureStore:
+    """
+    드라이버별 시점 기준 누적 집계 저장소
+
+    기본 배열 (CSR, cust_id 오름차순, 드라이버 안에서는 session_start_time 오름차순):
+        cust_ids[d], offsets[d]:offsets[d + 1] 가 드라이버 d의 레이스 구간
+        times[k]: k번째 레이스 시각 (UTC ns)
+        aggregates[k]: k번째 레이스까지 포함한 누적 집계 (AGGREGATE_COLUMNS)
+        latest[k]: k번째 레이스의 LATEST_COLUMNS 값
+        derived[k]: aggregates[k]로 계산한 DERIVED_COLUMNS 값 (k번째 레이스 다음 세션의 특성)
+    꼬리 버퍼 (_tail): 저장 이후 추가된 결과 {cust_id: (times, aggregates, latest, derived) 리스트}
+    """
+
+    def __init__(self, arrays=None, meta=None):
+        arrays = arrays or {
+            'cust_ids': np.zeros(0, dtype=np.int64), 'offsets': np.zeros(1, dtype=np.int64),
+            'times': np.zeros(0, dtype=np.int64), 'aggregates': np.zeros((0, len(AGGREGATE_COLUMNS))),
+            'latest': np.zeros((0, len(LATEST_COLUMNS))), 'derived': np.zeros((0, len(DERIVED_COLUMNS))),
+        }
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        meta = meta or {}
+        self.finish_pct_fill = meta.get('finish_pct_fill', 0.5)
+        self.fill_values = meta.get('fill_values', {})
+        self.participants_sum = meta.get('participants_sum', 0.0)
+        self.participants_count = meta.get('participants_count', 0)
+        # feature_vector용: CONTEXT_COLUMNS 순서의 학습 중앙값 (없으면 NaN)
+        self._context_fill = np.array([self.fill_values.get(name, np.nan) for name in CONTEXT_COLUMNS])
+        self._empty_derived = derived_features(np.zeros(len(AGGREGATE_COLUMNS)), self.finish_pct_fill)[0]
+        self._tail = {}
+        self._replaced = set()  # 기본 배열 구간 대신 꼬리 버퍼에 전체 이력이 있는 드라이버
+
+    # ------------------------------------------------------------------ 생성 / 저장
+
+    @classmethod
+    def from_frame(cls, df):
+        """학습 데이터(load_data 결과)로 저장소 생성 (preprocess_data와 같은 필수 필드 기준으로 레코드 선택)"""
+        df = df.dropna(subset=tm.REQUIRED_FIELDS + [tm.TIME_COLUMN])
+        cust = df['cust_id'].to_numpy(dtype=np.int64)
+        times = _times_ns(df[tm.TIME_COLUMN])
+        order = np.lexsort((times, cust))
+        cust, times = cust[order], times[order]
+
+        finish_pct = (df['actual_finish_position'] / df['total_participants']).to_numpy(dtype=np.float64)
+        if 'incidents' in df.columns:
+            incidents = df['incidents'].to_numpy(dtype=np.float64)
+        elif 'actual_incidents' in df.columns:
+            incidents = df['actual_incidents'].to_numpy(dtype=np.float64)
+        else:
+            incidents = np.zeros(len(df))
+        increments = result_increments(finish_pct, df['ir_diff_from_avg'].to_numpy(dtype=np.float64), incidents)
+        aggregates = pd.DataFrame(increments[order]).groupby(cust, sort=False).cumsum().to_numpy()
+
+        latest = df.reindex(columns=LATEST_COLUMNS).to_numpy(dtype=np.float64)[order]
+        cust_ids, starts = np.unique(cust, return_index=True)
+        finish_pct_fill = float(np.nanmedian(finish_pct)) if len(finish_pct) else 0.5
+        meta = {
+            'finish_pct_fill': finish_pct_fill,
+            'fill_values': {
+                column: float(df[column].median()) for column in CONTEXT_COLUMNS
+                if column in df.columns and pd.notna(df[column].median())
+            },
+            'participants_sum': float(df['total_participants'].sum()),
+            'participants_count': int(len(df)),
+        }
+        arrays = {
+            'cust_ids': cust_ids, 'offsets': np.append(starts, len(cust)).astype(np.int64),
+            'times': times, 'aggregates': aggregates, 'latest': latest,
+            'derived': derived_features(aggregates, finish_pct_fill),
+        }
+        return cls(arrays, meta)
+
+    @classmethod
+    def load(cls, directory=FEATURE_STORE_DIR, mmap=True):
+        """save()한 디렉토리를 연다 (mmap=True면 배열을 읽기 전용 메모리 맵으로, 복사 없음)"""
+        with open(os.path.join(directory, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        if meta.get('format_version') != FEATURE_STORE_FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 특성 저장소 형식입니다: {directory}")
+        if (meta.get('aggregate_columns') != AGGREGATE_COLUMNS or meta.get('latest_columns') != LATEST_COLUMNS
+                or meta.get('derived_columns') != DERIVED_COLUMNS):
+            raise ValueError(f"특성 저장소 컬럼 구성이 현재 코드와 다릅니다. --build로 다시 만드세요: {directory}")
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None)
+            for name in ARRAYS
+        }
+        return cls(arrays, meta)
+
+    def compact(self):
+        """꼬리 버퍼를 기본 배열에 합친다 (기본 배열은 메모리 배열이 된다)"""
+        if not self._tail:
+            return
+        counts = np.diff(self.offsets)
+        base_cust = np.repeat(np.asarray(self.cust_ids), counts)
+        keep = ~np.isin(base_cust, list(self._replaced)) if self._replaced else np.ones(len(base_cust), dtype=bool)
+        tail_cust = np.concatenate([np.full(len(tail[0]), cust_id, dtype=np.int64)
+                                    for cust_id, tail in self._tail.items()])
+        cust = np.concatenate([base_cust[keep], tail_cust])
+        times = np.concatenate([np.asarray(self.times)[keep]] + [np.asarray(tail[0], dtype=np.int64)
+                                                                for tail in self._tail.values()])
+        aggregates, latest, derived = (
+            np.concatenate([np.asarray(getattr(self, name))[keep]] + [np.array(tail[j]).reshape(-1, len(columns))
+                                                                     for tail in self._tail.values()])
+            for j, name, columns in ((1, 'aggregates', AGGREGATE_COLUMNS), (2, 'latest', LATEST_COLUMNS),
+                                     (3, 'derived', DERIVED_COLUMNS))
+        )
+        order = np.lexsort((times, cust))
+        cust = cust[order]
+        self.cust_ids, starts = np.unique(cust, return_index=True)
+        self.offsets = np.append(starts, len(cust)).astype(np.int64)
+        self.times, self.aggregates, self.latest = times[order], aggregates[order], latest[order]
+        self.derived = derived[order]
+        self._tail, self._replaced = {}, set()
+
+    def save(self, directory=FEATURE_STORE_DIR):
+        """꼬리 버퍼를 합쳐 .npy 배열과 meta.json으로 저장 (임시 파일에 쓰고 교체)"""
+        self.compact()
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            path = os.path.join(directory, f'{name}.npy')
+            with open(f'{path}.tmp', 'wb') as f:
+                np.save(f, np.asarray(getattr(self, name)))
+            os.replace(f'{path}.tmp', path)
+        meta = {
+            'format_version': FEATURE_STORE_FORMAT_VERSION,
+            'saved_at': datetime.now().isoformat(),
+            'aggregate_columns': AGGREGATE_COLUMNS,
+            'latest_columns': LATEST_COLUMNS,
+            'derived_columns': DERIVED_COLUMNS,
+            'drivers': int(len(self.cust_ids)),
+            'rows': int(len(self.times)),
+            'finish_pct_fill': self.finish_pct_fill,
+            'fill_values': self.fill_values,
+            'participants_sum': self.participants_sum,
+            'participants_count': self.participants_count,
+        }
+        path = os.path.join(directory, 'meta.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(f'{path}.tmp', path)
+        return directory
+
+    # ------------------------------------------------------------------ 조회 / 갱신
+
+    def _base_range(self, cust_id):
+        """기본 배열에서 드라이버 구간 (start, end), 없으면 None"""
+        if cust_id in self._replaced:
+            return None
+        d = int(np.searchsorted(self.cust_ids, cust_id))
+        if d < len(self.cust_ids) and self.cust_ids[d] == cust_id:
+            return int(self.offsets[d]), int(self.offsets[d + 1])
+        return None
+
+    def _find(self, cust_id, t):
+        """
+        시각 t(UTC ns) 이전 마지막 레이스의 (배열 묶음, 위치), 없으면 (None, None)
+
+        배열 묶음은 꼬리 버퍼 항목이나 기본 배열의 (times, aggregates, latest, derived)다.
+        """
+        tail = self._tail.get(cust_id)
+        if tail is not None:
+            k = bisect.bisect_left(tail[0], t)
+            if k > 0:
+                return tail, k - 1
+        base = self._base_range(cust_id)
+        if base is None:
+            return None, None
+        start, end = base
+        k = start + int(np.searchsorted(self.times[start:end], t, side='left'))
+        if k == start:
+            return None, None
+        return (self.times, self.aggregates, self.latest, self.derived), k - 1
+
+    def lookup(self, cust_id, as_of=None):
+        """
+        as_of 이전(미만) 레이스까지의 누적 집계와 직전 레이스 값
+
+        Returns:
+            (aggregates 1D 배열 또는 None, latest 1D 배열 또는 None) — 이전 레이스가 없으면 None
+        """
+        arrays, k = self._find(cust_id, to_ns(as_of))
+        if arrays is None:
+            return None, None
+        return arrays[1][k], arrays[2][k]
+
+    def _history(self, cust_id):
+        """드라이버 전체 이력 (times, aggregates, latest) — 기본 배열 구간 + 꼬리 버퍼"""
+        times, aggregates, latest = [], [], []
+        base = self._base_range(cust_id)
+        if base is not None:
+            start, end = base
+            times = np.asarray(self.times[start:end]).tolist()
+            aggregates = list(np.array(self.aggregates[start:end]))
+            latest = list(np.array(self.latest[start:end]))
+        tail = self._tail.get(cust_id, ([], [], [], []))
+        return times + tail[0], aggregates + tail[1], latest + tail[2]
+
+    def add_result(self, cust_id, session_start_time, finish_position, total_participants, ir_diff_from_avg,
+                   incidents=0, **latest):
+        """
+        새 레이스 결과 추가 (드라이버의 마지막 결과보다 늦은 시각이면 O(1))
+
+        Args:
+            cust_id, session_start_time: 드라이버와 세션 시작 시각
+            finish_position, total_participants, ir_diff_from_avg, incidents: 집계에 들어가는 결과 값
+            latest: LATEST_COLUMNS 값 (i_rating, safety_rating, best_lap_time, average_lap_time)
+        """
+        cust_id = int(cust_id)
+        t = to_ns(session_start_time)
+        # 학습 데이터와 같은 float32 나눗셈 (from_frame과 같은 누적값)
+        finish_pct = np.float32(finish_position) / np.float32(total_participants) if total_participants else np.nan
+        increment = result_increments([finish_pct], [ir_diff_from_avg], [incidents])[0]
+        latest_row = np.array([latest.get(c, np.nan) for c in LATEST_COLUMNS], dtype=np.float64)
+        self.participants_sum += float(total_participants or 0)
+        self.participants_count += 1
+
+        tail = self._tail.setdefault(cust_id, ([], [], [], []))
+        if tail[0]:
+            last_time, last_aggregates = tail[0][-1], tail[1][-1]
+        else:
+            base = self._base_range(cust_id)
+            last_time = int(self.times[base[1] - 1]) if base else None
+            last_aggregates = self.aggregates[base[1] - 1] if base else None
+
+        if last_time is None or t >= last_time:
+            aggregates = increment if last_aggregates is None else last_aggregates + increment
+            tail[0].append(t)
+            tail[1].append(aggregates)
+            tail[2].append(latest_row)
+            tail[3].append(derived_features(aggregates, self.finish_pct_fill)[0])
+            return
+
+        # 과거 시각 결과: 이 드라이버의 이력만 증분으로 되돌려 끼워 넣고 다시 누적 (O(드라이버 레이스 수))
+        times, aggregates, latest_rows = self._history(cust_id)
+        increments = np.diff(np.array(aggregates), axis=0, prepend=np.zeros((1, len(AGGREGATE_COLUMNS))))
+        k = bisect.bisect_right(times, t)
+        times.insert(k, t)
+        increments = np.insert(increments, k, increment, axis=0)
+        latest_rows.insert(k, latest_row)
+        aggregates = np.cumsum(increments, axis=0)
+        self._tail[cust_id] = (times, list(aggregates), latest_rows,
+                               list(derived_features(aggregates, self.finish_pct_fill)))
+        self._replaced.add(cust_id)
+
+    # ------------------------------------------------------------------ 특성 계산
+
+    def _feature_arrays(self, rows, as_of=None):
+        """rows(dict 하나, dict 목록, DataFrame)의 특성 배열 dict와 행 수"""
+        if isinstance(rows, dict):
+            rows = [rows]
+        if isinstance(rows, pd.DataFrame):
+            column = lambda name: rows[name].to_numpy(dtype=np.float64, na_value=np.nan) if name in rows.columns else None  # noqa: E731
+            cust_ids = rows['cust_id'].to_numpy(dtype=np.int64)
+            n = len(rows)
+        else:
+            def column(name):
+                if not any(name in row for row in rows):
+                    return None
+                return np.array([np.nan if row.get(name) is None else row.get(name) for row in rows], dtype=np.float64)
+            cust_ids = [int(row['cust_id']) for row in rows]
+            n = len(rows)
+
+        if as_of is None and isinstance(rows, pd.DataFrame) and tm.TIME_COLUMN in rows.columns:
+            as_of = rows[tm.TIME_COLUMN]
+        elif as_of is None and not isinstance(rows, pd.DataFrame) and any(tm.TIME_COLUMN in row for row in rows):
+            as_of = [row.get(tm.TIME_COLUMN) for row in rows]
+        if as_of is None or np.ndim(as_of) == 0:
+            times = [to_ns(as_of)] * n
+        else:
+            times = _times_ns(as_of)
+
+        derived = np.tile(self._empty_derived, (n, 1))
+        latest = np.full((n, len(LATEST_COLUMNS)), np.nan)
+        for i, (cust_id, t) in enumerate(zip(cust_ids, times)):
+            past, k = self._find(int(cust_id), int(t))
+            if past is not None:
+                derived[i] = past[3][k]
+                latest[i] = past[2][k]
+
+        arrays = {name: column(name) for name in CONTEXT_COLUMNS}
+        arrays = {name: values for name, values in arrays.items() if values is not None}
+        # preprocess_data처럼 average_lap_time 결측은 같은 행의 best_lap_time으로, 그래도 없으면 직전 레이스 값
+        if 'average_lap_time' in arrays and 'best_lap_time' in arrays:
+            arrays['average_lap_time'] = np.where(np.isnan(arrays['average_lap_time']),
+                                                  arrays['best_lap_time'], arrays['average_lap_time'])
+        for i, name in enumerate(LATEST_COLUMNS):
+            values = arrays.get(name)
+            arrays[name] = latest[:, i] if values is None else np.where(np.isnan(values), latest[:, i], values)
+        if 'ir_diff_from_avg' not in arrays and 'i_rating' in arrays and 'avg_opponent_ir' in arrays:
+            arrays['ir_diff_from_avg'] = arrays['i_rating'] - arrays['avg_opponent_ir']
+        for name in CONTEXT_COLUMNS:
+            fill = self.fill_values.get(name)
+            if fill is None:
+                continue
+            values = arrays.get(name)
+            arrays[name] = np.full(n, fill) if values is None else np.where(np.isnan(values), fill, values)
+        tm.add_relative_features(arrays)
+
+        # 유저 상대 전력 구간별 성능과 사고 영향도 (이전 세션만 사용하는 시점 기준 모드와 같은 값)
+        for i, name in enumerate(DERIVED_COLUMNS):
+            arrays[name] = derived[:, i]
+        expected = np.full(n, self.finish_pct_fill)
+        ir_diff_range = tm.get_ir_diff_ranges(arrays['ir_diff_from_avg'])
+        for i, ir_range in enumerate(tm.IR_DIFF_RANGES):
+            in_range = ir_diff_range == ir_range
+            expected[in_range] = derived[in_range, i]
+        arrays['user_expected_finish_pct_by_ir_diff'] = expected
+        arrays['incident_impact_rank_drop'] = arrays['incident_impact_on_position'] * self._avg_participants()
+
+        for name in tm.CATEGORICAL_COLUMNS:
+            values = column(name)
+            if values is not None:
+                arrays[name] = values
+        return arrays, n
+
+    def _avg_participants(self):
+        return self.participants_sum / self.participants_count if self.participants_count else 20
+
+    def features(self, rows, as_of=None):
+        """
+        원본 특성 DataFrame (build_features()/predict_session() 입력)
+
+        Args:
+            rows: 참가자 세션 컨텍스트 (DataFrame, dict 목록 또는 dict 하나) — cust_id 필수,
+                  i_rating/상대 iRating/SOF/total_participants/series_id/track_id/car_id 등
+            as_of: 이 시각 이전 레이스만 사용 (None이면 rows의 session_start_time, 그것도 없으면 전체 이력)
+        """
+        arrays, n = self._feature_arrays(rows, as_of)
+        frame = pd.DataFrame(arrays, index=rows.index if isinstance(rows, pd.DataFrame) else None)
+        if isinstance(rows, pd.DataFrame):
+            for key in ('subsession_id', 'cust_id'):
+                if key in rows.columns:
+                    frame[key] = rows[key]
+        else:
+            frame['cust_id'] = [int(row['cust_id']) for row in ([rows] if isinstance(rows, dict) else rows)]
+        return frame
+
+    def feature_matrix(self, layout, rows, as_of=None):
+        """
+        앙상블 입력 행렬 (ensemble['features'] 순서, dict 하나면 1행)
+
+        Args:
+            layout: FeatureLayout (또는 앙상블 dict — 매번 만들면 느리므로 반복 호출에는 FeatureLayout)
+        """
+        if not isinstance(layout, FeatureLayout):
+            layout = FeatureLayout(layout)
+        arrays, n = self._feature_arrays(rows, as_of)
+        return layout.matrix(arrays, n)
+
+    def feature_vector(self, layout, row, as_of=None):
+        """
+        참가자 한 명(dict)의 앙상블 입력 1행 — feature_matrix(layout, row, as_of)와 같은 값
+
+        DataFrame/배열 dict를 만들지 않고 저장소의 derived 한 행과 요청 값으로 채운다 (단일 조회 지연 시간용).
+
+        Args:
+            layout: FeatureLayout
+            row: 세션 컨텍스트 dict (cust_id 필수)
+            as_of: 이 시각 이전 레이스만 사용 (None이면 row의 session_start_time, 그것도 없으면 전체 이력)
+        """
+        if as_of is None:
+            as_of = row.get(tm.TIME_COLUMN)
+        past, k = self._find(int(row['cust_id']), to_ns(as_of))
+        derived = self._empty_derived if past is None else past[3][k]
+
+        # _feature_arrays와 같은 순서로 채운다: 평균 랩타임 → 직전 레이스 값 → ir_diff_from_avg → 학습 중앙값
+        context = np.array([row.get(name) for name in CONTEXT_COLUMNS], dtype=np.float64)
+        average, best = _CONTEXT_INDEX['average_lap_time'], _CONTEXT_INDEX['best_lap_time']
+        if 'average_lap_time' in row and 'best_lap_time' in row and np.isnan(context[average]):
+            context[average] = context[best]
+        if past is not None:
+            current = context[_LATEST_CONTEXT]
+            context[_LATEST_CONTEXT] = np.where(np.isnan(current), past[2][k], current)
+        if 'ir_diff_from_avg' not in row:
+            context[_CONTEXT_INDEX['ir_diff_from_avg']] = (
+                context[_CONTEXT_INDEX['i_rating']] - context[_CONTEXT_INDEX['avg_opponent_ir']]
+            )
+        missing = np.isnan(context)
+        context[missing] = self._context_fill[missing]
+
+        values = dict(zip(CONTEXT_COLUMNS, context))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tm.add_relative_features(values)
+        values.update(zip(DERIVED_COLUMNS, derived))
+        ir_diff = values['ir_diff_from_avg']
+        values['user_expected_finish_pct_by_ir_diff'] = (
+            self.finish_pct_fill if np.isnan(ir_diff) else derived[bisect.bisect_right(tm.IR_DIFF_BOUNDS, ir_diff)]
+        )
+        values['incident_impact_rank_drop'] = values['incident_impact_on_position'] * self._avg_participants()
+        for name in tm.CATEGORICAL_COLUMNS:
+            if row.get(name) is not None:
+                values[name] = float(row[name])
+        return layout.row(values)
+
+    def describe(self):
+        tail_rows = sum(len(t[0]) for t in self._tail.values())
+        return (f"드라이버 {len(self.cust_ids):,}명, 레이스 {len(self.times):,}개"
+                f"{f', 추가 대기 {tail_rows:,}개' if tail_rows else ''}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='시점 기준 온라인 특성 저장소 (드라이버별 누적 집계)')
+    parser.add_argument('--store', default=FEATURE_STORE_DIR, help='저장소 디렉토리')
+    parser.add_argument('--build', action='store_true', help='학습 데이터 전체로 저장소를 새로 만든다')
+    parser.add_argument('--source', choices=list(tm.DATA_SOURCES), default='supabase', help='학습 데이터 소스')
+    parser.add_argument('--source-path', help='로컬 데이터 소스 파일 경로 (parquet/csv/sqlite)')
+    parser.add_argument('--lookup', type=int, metavar='CUST_ID', help='드라이버의 시점 기준 특성 출력')
+    parser.add_argument('--as-of', help='조회 기준 시각 (ISO 8601, 기본: 전체 이력)')
+    args = parser.parse_args()
+
+    if args.build:
+        df = tm.load_data(source=tm.create_data_source(args.source, args.source_path))
+        store = DriverFeatureStore.from_frame(df)
+        store.save(args.store)
+        print(f"✅ 특성 저장소 저장: {args.store} ({store.describe()})")
+    if args.lookup is not None:
+        store = DriverFeatureStore.load(args.store)
+        print(f"📂 {args.store}: {store.describe()}")
+        aggregates, latest = store.lookup(args.lookup, args.as_of)
+        if aggregates is None:
+            print(f"ℹ️  {args.lookup}: {args.as_of or '현재'} 이전 레이스가 없습니다.")
+        else:
+            print(f"🔍 {args.lookup} ({args.as_of or '전체 이력'}): 레이스 {int(aggregates[0])}개")
+            for name, value in store.features({'cust_id': args.lookup}, args.as_of).iloc[0].items():
+                if name.startswith(('user_', 'incident_', 'high_')) or name in LATEST_COLUMNS:
+                    print(f"   {name:40s} {value:.4f}")
+    if not args.build and args.lookup is None:
+        parser.print_help()
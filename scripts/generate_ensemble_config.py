@@ -1,6 +1,7 @@
 import argparse
 import datetime
 import glob
+import hashlib
 import json
 import os
 from collections import defaultdict
@@ -39,13 +40,27 @@ for path in metadata_paths:
         continue
     with open(features_path, 'r', encoding='utf-8') as f:
         features = json.load(f)
+    # 카테고리 인코더: native 코드는 인코더마다 매핑이 다를 수 있으므로 같은 인코더끼리만 묶는다
+    encoding = data.get('encoding', 'onehot')
+    encoder_path = data.get('encoder_path')
+    encoder_digest = None
+    if encoder_path:
+        encoder_path = os.path.join(mode_dir, encoder_path)
+        if not os.path.exists(encoder_path):
+            continue
+        if encoding == 'native':
+            with open(encoder_path, 'rb') as f:
+                encoder_digest = hashlib.sha1(f.read()).hexdigest()
     records.append({
         'model_type': model_type,
         'timestamp': timestamp,
         'r2': float(r2),
         'model_path': model_path,
         'features': features,
-        'feature_key': tuple(features),
+        'feature_key': (tuple(features), encoding, encoder_digest),
+        'encoding': encoding,
+        'encoder_path': encoder_path,
+        'encoded_features': data.get('encoded_features', []),
     })
 
 if len(records) < 2:
@@ -72,7 +87,7 @@ best_group.sort(key=lambda r: r['r2'], reverse=True)
 top = best_group[:3]
 total_r2 = sum(r['r2'] for r in top)
 weights = [r['r2'] / total_r2 for r in top]
-features = list(top[0]['feature_key'])
+features = list(top[0]['feature_key'][0])
 
 timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
 config = {
@@ -95,6 +110,10 @@ config = {
         'r2': sum(rec['r2'] for rec in top) / len(top),
     },
 }
+if top[0]['encoder_path']:
+    config['encoding'] = top[0]['encoding']
+    config['encoded_features'] = top[0]['encoded_features']
+    config['encoder_path'] = os.path.relpath(top[0]['encoder_path'], mode_dir)
 
 output_path = os.path.join(mode_dir, f'ensemble_config_{args.mode}_{timestamp}.json')
 with open(output_path, 'w', encoding='utf-8') as f:
@@ -0,0 +1,255 @@
+"""
+iracing_ml_training_data 스키마의 합성 학습 데이터 생성기 (시드 고정)
+
+운영 데이터 없이 파이프라인(전처리, 특성 계산, 인코딩, 학습, 예측) 성능을 측정하기 위한 데이터.
+분포는 실제 데이터의 모양을 대략 따른다:
+- 드라이버 수 ≈ 행 수 / 평균 출전 수, 출전 수는 파레토 분포 (소수의 드라이버가 대부분의 레이스를 뛴다)
+- iRating은 로그정규 분포 (중앙값 ≈ 1500), 세이프티 레이팅은 iRating과 약하게 상관
+- 시리즈는 인기도가 지프 분포, 시리즈마다 차량 1~3대와 주간 트랙 로테이션
+- 세션 인원 6~40명, SOF는 수집 API처럼 참가자 평균 iRating
+- 완주 순위는 iRating + 드라이버 실력 + 레이스 잡음 - 사고로 정한 세션 내 순위
+
+사용법:
+    python scripts/generate_synthetic_data.py --rows 100000 --output ml_models/cache/synthetic_100k.parquet
+    python scripts/train_ml_model.py --source parquet --source-path ml_models/cache/synthetic_100k.parquet
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import train_ml_model as tm  # noqa: E402
+
+# 분포 기본값 (실제 데이터의 대략적인 규모)
+RACES_PER_DRIVER = 25          # 드라이버당 평균 출전 수
+SERIES_COUNT = 60
+TRACK_COUNT = 150
+CAR_COUNT = 80
+FIELD_SIZE_MEAN = 18
+FIELD_SIZE_RANGE = (6, 40)
+IRATING_MEDIAN = 1500
+DAYS = 365                     # 세션 시작 시각 범위 (일)
+START_TIME = pd.Timestamp('2025-01-01', tz='UTC')
+
+
+def _field_sizes(rng, rows):
+    """세션별 인원 (합계가 정확히 rows가 되도록 마지막 세션을 자른다)"""
+    low, high = FIELD_SIZE_RANGE
+    sizes = np.clip(np.round(rng.normal(FIELD_SIZE_MEAN, 7, rows // low + 1)), low, high).astype(np.int64)
+    n_sessions = int(np.searchsorted(np.cumsum(sizes), rows)) + 1
+    sizes = sizes[:n_sessions]
+    sizes[-1] -= sizes.sum() - rows
+    return sizes
+
+
+def _unique_per_session(rng, session, driver, weights):
+    """같은 세션에 같은 드라이버가 두 번 나오지 않도록 중복된 행만 다시 뽑는다"""
+    n_drivers = len(weights)
+    for _ in range(100):
+        duplicated = pd.DataFrame({'s': session, 'd': driver}).duplicated().to_numpy()
+        if not duplicated.any():
+            break
+        driver[duplicated] = rng.choice(n_drivers, duplicated.sum(), p=weights)
+    return driver
+
+
+def _opponent_stats(session, ir, sizes):
+    """세션 안에서 자기 자신을 제외한 상대 평균/최고/최저 iRating과 SOF"""
+    starts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    n = np.repeat(sizes, sizes).astype(np.float64)
+    total = np.bincount(session, weights=ir)[session]
+    avg_opponent = np.where(n > 1, (total - ir) / np.maximum(n - 1, 1), np.nan)
+
+    # 세션별 iRating 오름차순 정렬 후 1·2번째 최소/최대를 구해 자기 자신이면 다음 값 사용
+    order = np.lexsort((ir, session))
+    sorted_ir = ir[order]
+    ends = starts + n.astype(np.int64) - 1
+    lowest, second_lowest = sorted_ir[starts], sorted_ir[np.minimum(starts + 1, ends)]
+    highest, second_highest = sorted_ir[ends], sorted_ir[np.maximum(ends - 1, starts)]
+    rank = np.empty(len(ir), dtype=np.int64)
+    rank[order] = np.arange(len(ir)) - starts[order]
+    is_min, is_max = rank == 0, rank == n - 1
+    min_opponent = np.where(is_min, second_lowest, lowest)
+    max_opponent = np.where(is_max, second_highest, highest)
+    solo = n == 1
+    min_opponent[solo] = np.nan
+    max_opponent[solo] = np.nan
+    return avg_opponent, max_opponent, min_opponent, total / n
+
+
+def _rank_in_session(session, score):
+    """세션별 score 내림차순 순위 (1부터)"""
+    order = np.lexsort((-score, session))
+    starts = np.r_[0, np.flatnonzero(np.diff(session[order])) + 1]
+    sizes = np.diff(np.r_[starts, len(session)])
+    rank = np.empty(len(session), dtype=np.int64)
+    rank[order] = np.arange(len(session)) - np.repeat(starts, sizes) + 1
+    return rank
+
+
+def _uuid_strings(rng, n):
+    """gen_random_uuid()와 같은 형식의 id 문자열"""
+    raw = rng.integers(0, 2 ** 63, size=(n, 2), dtype=np.int64).astype(np.uint64)
+    raw[:, 0] = (raw[:, 0] & np.uint64(0xFFFFFFFFFFFF0FFF)) | np.uint64(0x4000)
+    raw[:, 1] = (raw[:, 1] & np.uint64(0x3FFFFFFFFFFFFFFF)) | np.uint64(0x8000000000000000)
+    return [
+        f'{hi >> 32:08x}-{(hi >> 16) & 0xFFFF:04x}-{hi & 0xFFFF:04x}-{lo >> 48:04x}-{lo & 0xFFFFFFFFFFFF:012x}'
+        for hi, lo in raw.tolist()
+    ]
+
+
+def generate_training_data(rows, seed=42, races_per_driver=RACES_PER_DRIVER, days=DAYS):
+    """iracing_ml_training_data 스키마(TRAINING_DATA_SCHEMA dtype)의 합성 DataFrame 생성
+
+    같은 (rows, seed, races_per_driver, days)면 항상 같은 데이터가 나온다.
+    행은 session_start_time 순이고, (subsession_id, cust_id)는 고유하다.
+    """
+    rng = np.random.default_rng(seed)
+
+    # 세션: 인원, 시작 시각, 시리즈/트랙/차량
+    sizes = _field_sizes(rng, rows)
+    n_sessions = len(sizes)
+    series_popularity = 1.0 / np.arange(1, SERIES_COUNT + 1) ** 1.1
+    series_popularity /= series_popularity.sum()
+    series_ids = np.sort(rng.choice(np.arange(200, 600), SERIES_COUNT, replace=False))
+    track_ids = np.sort(rng.choice(np.arange(1, 600), TRACK_COUNT, replace=False))
+    car_ids = np.sort(rng.choice(np.arange(1, 200), CAR_COUNT, replace=False))
+    rotation = rng.integers(0, TRACK_COUNT, size=(SERIES_COUNT, 12))         # 시리즈별 12주 트랙 로테이션
+    series_cars = rng.integers(0, CAR_COUNT, size=(SERIES_COUNT, 3))
+    series_car_count = rng.integers(1, 4, SERIES_COUNT)
+
+    start_offsets = np.sort(rng.uniform(0, days * 86400, n_sessions))
+    session_series = rng.choice(SERIES_COUNT, n_sessions, p=series_popularity)
+    week = (start_offsets // (7 * 86400)).astype(np.int64) % rotation.shape[1]
+    session_track = rotation[session_series, week]
+    session_car = series_cars[session_series, rng.integers(0, 3, n_sessions) % series_car_count[session_series]]
+
+    # 드라이버: 출전 빈도(파레토), 기본 iRating(로그정규), 실력 잡음, 세이프티 레이팅
+    n_drivers = max(50, rows // max(races_per_driver, 1))
+    activity = rng.pareto(1.5, n_drivers) + 1.0
+    activity /= activity.sum()
+    driver_z = rng.standard_normal(n_drivers)
+    driver_ir = np.clip(IRATING_MEDIAN * np.exp(0.45 * driver_z), 100, 12000)
+    driver_skill = rng.normal(0, 0.15, n_drivers)
+    driver_sr = np.clip(rng.normal(2.6 + 0.4 * driver_z, 0.8), 1.0, 4.99)
+    cust_ids = rng.choice(np.arange(10_000, 1_200_000), n_drivers, replace=False)
+
+    # 행: 세션별 드라이버 배정
+    session = np.repeat(np.arange(n_sessions), sizes)
+    driver = _unique_per_session(rng, session, rng.choice(n_drivers, rows, p=activity), activity)
+    ir = np.round(driver_ir[driver] * np.exp(rng.normal(0, 0.05, rows)))
+    avg_opponent, max_opponent, min_opponent, sof = _opponent_stats(session, ir, sizes)
+    field = np.repeat(sizes, sizes)
+
+    # 결과: 사고(세이프티 레이팅이 낮을수록 많음)와 완주 순위
+    incidents = rng.poisson(0.8 + 4.0 / driver_sr[driver])
+    score = np.log(ir) + driver_skill[driver] + rng.normal(0, 0.35, rows) - 0.04 * incidents
+    finish = _rank_in_session(session, score)
+    grid = _rank_in_session(session, np.log(ir) + rng.normal(0, 0.2, rows))
+
+    # 랩 타임: 트랙 기준 시간 × 차량 계수, iRating이 높을수록 빠름
+    track_base = rng.uniform(70, 140, TRACK_COUNT)
+    car_factor = rng.uniform(0.95, 1.05, CAR_COUNT)
+    base_lap = track_base[session_track[session]] * car_factor[session_car[session]]
+    best_lap = base_lap * (1.03 - 0.012 * np.log(ir / IRATING_MEDIAN) + rng.normal(0, 0.006, rows))
+    average_lap = best_lap * (1 + np.abs(rng.normal(0.015, 0.008, rows)))
+    best_lap[rng.random(rows) < 0.03] = np.nan
+    average_lap[rng.random(rows) < 0.10] = np.nan
+    has_qualifying = (rng.random(n_sessions) < 0.6)[session]
+    qualifying_lap = np.where(has_qualifying, best_lap * (1 + rng.normal(0.002, 0.003, rows)), np.nan)
+    fastest_qualifying = pd.Series(qualifying_lap).groupby(session).transform('min').to_numpy()
+    practice_lap = np.where(rng.random(rows) < 0.7, best_lap * (1 + np.abs(rng.normal(0.004, 0.004, rows))), np.nan)
+
+    session_start = START_TIME + pd.to_timedelta(start_offsets[session], unit='s')
+    collected_after = pd.to_timedelta(3600 + rng.exponential(12 * 3600, rows), unit='s')  # 수집 지연
+    series = series_ids[session_series[session]].astype(np.float64)
+    series[rng.random(rows) < 0.02] = np.nan  # 일부 레코드는 시리즈 정보 없음
+
+    df = pd.DataFrame({
+        'id': _uuid_strings(rng, rows),
+        'subsession_id': 50_000_000 + session,
+        'cust_id': cust_ids[driver],
+        'created_at': session_start + collected_after,
+        'session_start_time': session_start,
+        'series_id': series,
+        'track_id': track_ids[session_track[session]],
+        'car_id': car_ids[session_car[session]],
+        'i_rating': ir,
+        'safety_rating': np.round(np.clip(driver_sr[driver] + rng.normal(0, 0.15, rows), 1.0, 4.99), 2),
+        'avg_opponent_ir': np.round(avg_opponent),
+        'max_opponent_ir': max_opponent,
+        'min_opponent_ir': min_opponent,
+        'ir_diff_from_avg': np.round(ir - avg_opponent),
+        'sof': np.round(sof),
+        'total_participants': field,
+        'best_lap_time': best_lap,
+        'average_lap_time': average_lap,
+        'starting_position': grid,
+        'qualifying_position': np.where(has_qualifying, grid, np.nan),
+        'qualifying_best_lap_time': qualifying_lap,
+        'practice_best_lap_time': practice_lap,
+        'fastest_qualifying_lap_time': fastest_qualifying,
+        'actual_incidents': incidents,
+        'actual_finish_position': finish,
+    })
+    df['id'] = df['id'].astype('string')
+    return tm.apply_training_schema(df)
+
+
+def save_training_data(df, path):
+    """확장자에 맞춰 저장 (.parquet / .csv / .sqlite·.db는 iracing_ml_training_data 테이블)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        df.to_parquet(path, index=False)
+    elif extension == '.csv':
+        df.to_csv(path, index=False)
+    elif extension in ('.sqlite', '.db'):
+        import sqlite3
+        out = df.copy()
+        for column in ('created_at', 'session_start_time'):
+            out[column] = out[column].map(lambda t: t.isoformat())
+        for column in tm.CATEGORICAL_COLUMNS:
+            out[column] = out[column].astype('float64')
+        with sqlite3.connect(path) as conn:
+            out.to_sql(tm.TRAINING_TABLE, conn, if_exists='replace', index=False)
+    else:
+        raise ValueError(f"지원하지 않는 형식입니다: {path} (.parquet, .csv, .sqlite)")
+
+
+def describe(df):
+    """생성된 데이터 규모 요약 (드라이버/세션/카디널리티)"""
+    races = df.groupby('cust_id', observed=True).size()
+    return {
+        'rows': int(len(df)),
+        'drivers': int(df['cust_id'].nunique()),
+        'sessions': int(df['subsession_id'].nunique()),
+        'races_per_driver_median': float(races.median()),
+        'races_per_driver_max': int(races.max()),
+        'i_rating_median': float(df['i_rating'].median()),
+        'series': int(df['series_id'].nunique()),
+        'tracks': int(df['track_id'].nunique()),
+        'cars': int(df['car_id'].nunique()),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='iracing_ml_training_data 스키마의 합성 학습 데이터 생성')
+    parser.add_argument('--rows', type=int, default=100_000, help='생성할 행 수')
+    parser.add_argument('--seed', type=int, default=42, help='난수 시드')
+    parser.add_argument('--races-per-driver', type=int, default=RACES_PER_DRIVER, help='드라이버당 평균 출전 수')
+    parser.add_argument('--days', type=float, default=DAYS, help='세션 시작 시각 범위 (일)')
+    parser.add_argument('--output', required=True, help='저장 경로 (.parquet, .csv, .sqlite)')
+    args = parser.parse_args()
+    df = generate_training_data(args.rows, args.seed, args.races_per_driver, args.days)
+    save_training_data(df, args.output)
+    summary = describe(df)
+    print(f"✅ 합성 데이터 저장: {args.output}")
+    print(f"   {summary['rows']}행, 드라이버 {summary['drivers']}명, 세션 {summary['sessions']}개 "
+          f"(드라이버당 중앙값 {summary['races_per_driver_median']:.0f}회, 최대 {summary['races_per_driver_max']}회)")
+    print(f"   iRating 중앙값 {summary['i_rating_median']:.0f}, 시리즈 {summary['series']}개, "
+          f"트랙 {summary['tracks']}개, 차량 {summary['cars']}개")
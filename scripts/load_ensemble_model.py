@@ -10,25 +10,152 @@
     # 예측
     features = [...]  # 특성 벡터
     predicted_rank = predict_rank(ensemble, features)
+    
+    # 원본 카테고리 ID가 들어있는 DataFrame에서 바로 예측
+    X = build_features(ensemble, rows_df)
+    predicted_ranks = predict_ranks_batch(ensemble, X)
+    
+    # 유저/트랙/차량 특화 모델 라우팅 (없으면 전역 앙상블)
+    router = load_specialized_router('ml_models/pre', mode='pre')
+    predicted_ranks = predict_ranks_routed(ensemble, router, rows_df)
+    
+    # 서브세션 전체 그리드: 한 번의 배치 예측 + 1..N 순서/기대 순위 정규화 (Supabase upsert 행 포함)
+    result = predict_session(ensemble, grid_df, router)
+    supabase.table('iracing_session_participant_stats').upsert(
+        result['participant_stats_rows'], on_conflict='subsession_id,cust_id').execute()
+    supabase.table('iracing_session_predictions').upsert(
+        result['session_prediction_row'], on_conflict='subsession_id').execute()
+
+컴파일된 앙상블:
+    python scripts/compile_ensemble_model.py --config ml_models/pre/ensemble_config_pre_20251119_160720.json
+    # 설정 옆에 compiled_ensemble_*.npz가 있으면 load_ensemble_model()이 개별 모델 대신 그것을 로드하고
+    # predict_rank/predict_ranks_batch는 predict() 한 번으로 전체 가중 앙상블을 계산한다
 """
 
 import json
-import joblib
+import os
+import sys
 import numpy as np
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
 
-def load_ensemble_model(config_path: str) -> Dict[str, Any]:
+# 컴파일된 앙상블 배치 평가 시 한 번에 다루는 (행 × 트리) 셀 수 (노드 인덱스 배열 메모리 상한)
+COMPILED_CHUNK_CELLS = 1 << 16
+COMPILED_FORMAT_VERSION = 1
+# 이 행 수를 넘는 배치는 원본 모델로 예측한다 (처음 필요할 때 로드).
+# 컴파일된 트리 순회는 호출당 고정 비용이 작지만 행당 비용은 원본 라이브러리보다 크다
+# (531트리 앙상블: 1행 0.3ms vs 23ms, 2900행 83 vs 47us/행, 교차점 약 512행).
+COMPILED_MAX_BATCH_ROWS = 512
+
+
+class CompiledEnsemble:
+    """
+    가중 앙상블 전체를 하나로 펼친 구조-배열(structure-of-arrays) 트리 모델
+    
+    모든 모델의 트리 노드가 연속된 NumPy 배열 하나씩에 들어 있다:
+    feature(분기 특성), threshold(x > threshold면 오른쪽), left(왼쪽 자식 위치, 오른쪽 자식은 left + 1),
+    missing_left(결측값이 왼쪽으로 가는지), zero_missing(0도 결측으로 보는 노드: 희소 입력으로 학습한 XGBoost),
+    value(리프 값, 앙상블 가중치와 학습률/트리 평균이 곱해진 값).
+    리프는 자기 자신을 왼쪽 자식으로 가리키고 threshold가 +inf라서 트리 깊이만큼 반복하면 모든 행이 리프에 머문다.
+    예측 = bias + 도착한 리프 value의 합 (compile_ensemble_model.py가 생성).
+    """
+    
+    ARRAYS = ('feature', 'threshold', 'left', 'missing_left', 'zero_missing', 'value', 'roots', 'depths')
+    
+    def __init__(self, arrays: Dict[str, np.ndarray], bias: float, n_features: int,
+                 meta: Optional[Dict[str, Any]] = None):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.bias = float(bias)
+        self.n_features = int(n_features)
+        self.meta = meta or {}
+        self._missing_right = ~self.missing_left
+        self._has_zero_missing = bool(self.zero_missing.any())
+        # 트리는 깊이 내림차순으로 저장되어 있어 d번째 단계에서는 앞쪽 active[d]개 트리만 진행하면 된다
+        self._active = [int(np.count_nonzero(self.depths > d)) for d in range(int(self.depths.max(initial=0)))]
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+    
+    @classmethod
+    def load(cls, path: str) -> 'CompiledEnsemble':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('format_version') != COMPILED_FORMAT_VERSION:
+                raise ValueError(f"지원하지 않는 컴파일 앙상블 형식입니다: {path}")
+            arrays = {name: data[name] for name in cls.ARRAYS}
+        return cls(arrays, meta['bias'], meta['n_features'], meta)
+    
+    def save(self, path: str) -> None:
+        meta = {**self.meta, 'format_version': COMPILED_FORMAT_VERSION, 'bias': self.bias,
+                'n_features': self.n_features}
+        np.savez(path, meta=np.array(json.dumps(meta)), **{name: getattr(self, name) for name in self.ARRAYS})
+    
+    def predict(self, features: Any) -> np.ndarray:
+        """
+        배치 예측 (2D dense 배열 또는 CSR 행렬)
+        
+        (트리 × 행) 노드 인덱스 배열을 깊이만큼 한꺼번에 진행한다.
+        임계값 비교는 float64로 한다 (float32 입력은 손실 없이 변환된다).
+        """
+        if features.shape[1] != self.n_features:
+            raise ValueError(f"특성 수가 다릅니다: {features.shape[1]} (컴파일된 앙상블: {self.n_features})")
+        n_samples = features.shape[0]
+        predictions = np.empty(n_samples)
+        step = max(1, COMPILED_CHUNK_CELLS // max(len(self.roots), 1))
+        for start in range(0, n_samples, step):
+            chunk = features[start:start + step]
+            chunk = chunk.toarray() if hasattr(chunk, 'toarray') else np.asarray(chunk)
+            chunk = np.ascontiguousarray(chunk, dtype=np.float64)
+            has_missing = bool(np.isnan(chunk).any())
+            values = chunk.ravel()
+            offsets = np.arange(chunk.shape[0]) * self.n_features
+            nodes = np.repeat(self.roots[:, None], chunk.shape[0], axis=1)
+            for active in self._active:
+                node = nodes[:active]
+                x = values.take(self.feature.take(node) + offsets)
+                go_right = x > self.threshold.take(node)
+                if has_missing:
+                    go_right |= np.isnan(x) & self._missing_right.take(node)
+                if self._has_zero_missing:
+                    zero = (x == 0) & self.zero_missing.take(node)
+                    go_right[zero] = self._missing_right.take(node[zero])
+                np.add(self.left.take(node), go_right, out=node)
+            predictions[start:start + step] = self.value.take(nodes).sum(axis=0) + self.bias
+        return predictions
+
+
+def compiled_ensemble_path(config_path: str) -> Path:
+    """앙상블 설정 옆의 컴파일 파일 경로 (ensemble_config_*.json → compiled_ensemble_*.npz)"""
+    config_path = Path(config_path)
+    return config_path.with_name(config_path.stem.replace('ensemble_config', 'compiled_ensemble', 1) + '.npz')
+
+
+def ensemble_signature(config: Dict[str, Any]) -> List[List[Any]]:
+    """컴파일 결과가 이 설정에서 만들어졌는지 확인하는 구성 모델 목록 (이름, 모델 파일, 가중치)"""
+    return [[m['name'], m['model_path'], float(m['weight'])] for m in config['models']]
+
+
+def load_ensemble_model(config_path: str, use_compiled: bool = True) -> Dict[str, Any]:
     """
     앙상블 모델 설정 파일 로드
     
     Args:
         config_path: 앙상블 설정 JSON 파일 경로
+        use_compiled: 설정 옆에 같은 구성으로 컴파일된 앙상블(compiled_ensemble_*.npz)이 있으면
+            개별 모델을 언피클링하지 않고 그것만 로드 (config['compiled']).
+            COMPILED_MAX_BATCH_ROWS보다 큰 배치를 처음 예측할 때 개별 모델을 로드한다.
         
     Returns:
-        앙상블 설정 딕셔너리 (모델 객체 포함)
+        앙상블 설정 딕셔너리 (모델 객체 또는 컴파일된 앙상블 포함)
     """
+    # joblib과 모델 라이브러리(sklearn, xgboost, lightgbm)는 여기서 처음 import 된다.
+    # 언피클링은 앙상블에 실제로 포함된 모델의 라이브러리만 불러온다.
+    import joblib
+    
     config_path = Path(config_path)
     if not config_path.exists():
         raise FileNotFoundError(f"앙상블 설정 파일을 찾을 수 없습니다: {config_path}")
@@ -38,16 +165,42 @@ def load_ensemble_model(config_path: str) -> Dict[str, Any]:
     
     # 각 모델 로드
     config_dir = config_path.parent
-    loaded_models = []
+    config['config_dir'] = str(config_dir)
     
+    compiled_path = compiled_ensemble_path(config_path)
+    if use_compiled and compiled_path.exists():
+        compiled = CompiledEnsemble.load(str(compiled_path))
+        if compiled.meta.get('signature') == ensemble_signature(config):
+            config['compiled'] = compiled
+            print(f"✅ 컴파일된 앙상블 로드: {compiled_path.name} "
+                  f"(트리 {len(compiled.roots)}개, 노드 {len(compiled.value)}개, {compiled.nbytes / 1024 ** 2:.1f} MB)")
+        else:
+            print(f"⚠️  {compiled_path.name}이 현재 앙상블 구성과 달라 개별 모델을 로드합니다.")
+    
+    config['loaded_models'] = [] if 'compiled' in config else _load_models(config, config_dir)
+    
+    # 카테고리 인코더 (학습 시 저장된 OneHotEncoder / OrdinalEncoder)
+    if config.get('encoder_path'):
+        encoder_file = config_dir / config['encoder_path']
+        if not encoder_file.exists():
+            raise FileNotFoundError(f"카테고리 인코더 파일을 찾을 수 없습니다: {config['encoder_path']}")
+        config['encoder'] = joblib.load(encoder_file)
+    print(f"\n✅ 앙상블 모델 로드 완료: {len(config['models'])}개 모델")
+    print(f"   예상 성능: R²={config['metrics']['r2']:.4f}, MAE={config['metrics']['mae']:.2f}")
+    
+    return config
+
+
+def _load_models(config: Dict[str, Any], config_dir: Path) -> List[Dict[str, Any]]:
+    """앙상블 구성 모델 언피클링 ([{'name', 'model', 'weight', 'r2'}, ...])"""
+    import joblib
+    loaded_models = []
     for model_info in config['models']:
         model_file = config_dir / model_info['model_path']
         if not model_file.exists():
-            # 파일명만 있는 경우 파일명으로 검색
-            model_file = list(config_dir.glob(f"*{model_info['name']}*.pkl"))
-            if model_file:
-                model_file = model_file[0]
-            else:
+            # 파일명만 있거나 옮겨진 경우: 레지스트리에서 같은 파일명, 없으면 같은 종류/특성의 모델
+            model_file = _model_registry(config_dir).resolve_model(config, config_dir, model_info)
+            if model_file is None:
                 raise FileNotFoundError(f"모델 파일을 찾을 수 없습니다: {model_info['model_path']}")
         
         model = joblib.load(model_file)
@@ -58,12 +211,66 @@ def load_ensemble_model(config_path: str) -> Dict[str, Any]:
             'r2': model_info['r2']
         })
         print(f"✅ {model_info['name']} 모델 로드 완료 (가중치: {model_info['weight']:.3f})")
+    return loaded_models
+
+
+def _native_models(ensemble: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """원본 모델 목록 (컴파일된 앙상블만 로드했으면 여기서 처음 로드해 둔다, 모델 파일이 없으면 None)"""
+    if not ensemble.get('loaded_models') and 'compiled' in ensemble:
+        if not ensemble.get('config_dir'):
+            return None
+        try:
+            ensemble['loaded_models'] = _load_models(ensemble, Path(ensemble['config_dir']))
+        except FileNotFoundError as e:
+            print(f"⚠️  원본 모델을 로드할 수 없어 큰 배치도 컴파일된 앙상블로 예측합니다: {e}")
+            ensemble['config_dir'] = None
+            return None
+    return ensemble['loaded_models']
+
+
+def build_features(ensemble: Dict[str, Any], rows) -> Any:
+    """
+    원본 특성 DataFrame(series_id/track_id/car_id 포함)을 앙상블 입력 행렬로 변환
     
-    config['loaded_models'] = loaded_models
-    print(f"\n✅ 앙상블 모델 로드 완료: {len(loaded_models)}개 모델")
-    print(f"   예상 성능: R²={config['metrics']['r2']:.4f}, MAE={config['metrics']['mae']:.2f}")
+    Args:
+        ensemble: load_ensemble_model()로 로드한 앙상블 설정
+        rows: 수치 특성과 원본 카테고리 컬럼을 가진 pandas DataFrame
+        
+    Returns:
+        특성 행렬 (onehot/native: 2D float32 NumPy 배열, sparse: CSR 행렬) — 학습 행렬과 같은 dtype
+    """
+    features = ensemble['features']
+    encoder = ensemble.get('encoder')
+    if encoder is None:
+        return rows[features].to_numpy(dtype=np.float32)
     
-    return config
+    encoding = ensemble.get('encoding', 'onehot')
+    categorical_cols = list(encoder.feature_names_in_)
+    encoded = set(ensemble.get('encoded_features', []))
+    dense_features = [f for f in features if f not in encoded]
+    transformed = encoder.transform(rows[categorical_cols])
+    
+    if encoding == 'sparse':
+        from scipy import sparse
+        dense = sparse.csr_matrix(rows[dense_features].to_numpy(dtype=np.float32))
+        return sparse.hstack([dense, transformed], format='csr')
+    
+    if encoding == 'native':
+        # 카테고리 코드 컬럼이 features 안의 원래 위치에 들어간다
+        columns = {col: transformed[:, i] for i, col in enumerate(categorical_cols)}
+    else:
+        columns = {name: transformed[:, i] for i, name in enumerate(ensemble['encoded_features'])}
+    return np.column_stack([
+        columns[f] if f in columns else rows[f].to_numpy(dtype=np.float32)
+        for f in features
+    ]).astype(np.float32)
+
+
+def _model_input(model: Any, features: Any) -> Any:
+    """HistGradientBoosting 모델은 sparse 입력을 받지 않으므로 dense로 변환"""
+    if hasattr(features, 'toarray') and type(model).__name__.startswith('HistGradientBoosting'):
+        return features.toarray()
+    return features
 
 
 def predict_rank(ensemble: Dict[str, Any], features: np.ndarray) -> float:
@@ -77,20 +284,23 @@ def predict_rank(ensemble: Dict[str, Any], features: np.ndarray) -> float:
     Returns:
         예측된 순위 (float)
     """
-    if 'loaded_models' not in ensemble:
+    if 'loaded_models' not in ensemble and 'compiled' not in ensemble:
         raise ValueError("앙상블 모델이 로드되지 않았습니다. load_ensemble_model()을 먼저 호출하세요.")
     
     # features를 2D 배열로 변환
     if features.ndim == 1:
         features = features.reshape(1, -1)
     
+    if 'compiled' in ensemble:
+        return float(ensemble['compiled'].predict(features[:1])[0])
+    
     # 각 모델의 예측을 가중 평균
     ensemble_pred = 0.0
     
     for model_info in ensemble['loaded_models']:
         model = model_info['model']
         weight = model_info['weight']
-        pred = model.predict(features)[0]  # 첫 번째 샘플의 예측
+        pred = model.predict(_model_input(model, features))[0]  # 첫 번째 샘플의 예측
         ensemble_pred += weight * pred
     
     return float(ensemble_pred)
@@ -107,28 +317,368 @@ def predict_ranks_batch(ensemble: Dict[str, Any], features_array: np.ndarray) ->
     Returns:
         예측된 순위 배열 (1D: [n_samples])
     """
-    if 'loaded_models' not in ensemble:
+    if 'loaded_models' not in ensemble and 'compiled' not in ensemble:
         raise ValueError("앙상블 모델이 로드되지 않았습니다. load_ensemble_model()을 먼저 호출하세요.")
     
-    if features_array.ndim != 2:
+    if getattr(features_array, 'ndim', 2) != 2:
         raise ValueError("features_array는 2D 배열이어야 합니다: [n_samples, n_features]")
     
+    # 작은 배치는 컴파일된 앙상블, 큰 배치는 원본 모델 (행당 비용이 더 작다)
+    if 'compiled' in ensemble and (features_array.shape[0] <= COMPILED_MAX_BATCH_ROWS
+                                   or _native_models(ensemble) is None):
+        return ensemble['compiled'].predict(features_array)
+    
     # 각 모델의 예측을 가중 평균
     ensemble_pred = np.zeros(features_array.shape[0])
     
     for model_info in ensemble['loaded_models']:
         model = model_info['model']
         weight = model_info['weight']
-        pred = model.predict(features_array)
+        pred = model.predict(_model_input(model, features_array))
         ensemble_pred += weight * pred
     
     return ensemble_pred
 
 
+# 특화 모델 라우팅 우선순위 (앞 차원의 특화 모델이 있으면 그 모델로 예측)
+SPECIALIZED_ROUTE_ORDER = ['user', 'track', 'car']
+GLOBAL_ROUTE = 'global'
+
+
+class SpecializedModelRouter:
+    """
+    train_ml_model.save_specialized_models()가 저장한 특화 모델 라우터
+    
+    시작 시에는 차원별 JSON 인덱스(그룹 ID → offset/length)만 읽고, 모델은 처음 라우팅될 때
+    아티팩트의 offset에서 하나만 역직렬화해 크기가 제한된 LRU 캐시에 넣는다.
+    
+    특화 모델은 저장 시 기록된 같은 테스트 행의 전역 앙상블 MAE(global_mae)보다 MAE가 낮을 때만 라우팅한다
+    (그룹 안 R²는 전역 R²와 비교할 수 없고, 고정 하한은 전역보다 나쁜 모델도 고른다).
+    """
+    
+    def __init__(self, index_paths: Dict[str, str], cache_size: int = 64,
+                 order: Optional[List[str]] = None, min_r2: Optional[float] = None,
+                 require_beats_global: bool = True):
+        """
+        Args:
+            index_paths: {dimension: specialized_index_*.json 경로}
+            cache_size: 메모리에 유지할 최대 특화 모델 수
+            order: 라우팅 우선순위 (기본: SPECIALIZED_ROUTE_ORDER)
+            min_r2: 추가 하한, 이 R² 미만인 특화 모델은 건너뛴다 (None이면 확인하지 않음)
+            require_beats_global: True면 global_mae보다 MAE가 낮은 특화 모델만 사용
+                                  (global_mae가 없는 이전 인덱스의 모델은 사용하지 않는다)
+        """
+        self.cache_size = cache_size
+        self.indices = {}
+        for dimension, index_path in index_paths.items():
+            index_path = Path(index_path)
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            index['artifact_file'] = index_path.parent / index['artifact_path']
+            index['routable'] = {
+                key for key, entry in index['models'].items()
+                if (not require_beats_global or entry.get('global_mae') is not None and entry['mae'] < entry['global_mae'])
+                and (min_r2 is None or entry['r2'] >= min_r2)
+            }
+            index['routable_keys'] = np.array(sorted(index['routable']))
+            self.indices[dimension] = index
+        self.order = [d for d in (order or SPECIALIZED_ROUTE_ORDER) if d in self.indices]
+        self._cache = OrderedDict()
+        self._encoders = {}
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    def get_model(self, dimension: str, key: str):
+        """특화 모델 반환 (캐시에 없으면 아티팩트에서 로드하고 가장 오래 안 쓴 모델을 내보낸다)"""
+        cache_key = (dimension, key)
+        if cache_key in self._cache:
+            self._cache.move_to_end(cache_key)
+            self.stats['hits'] += 1
+            return self._cache[cache_key]
+        
+        import pickle
+        index = self.indices[dimension]
+        entry = index['models'][key]
+        with open(index['artifact_file'], 'rb') as f:
+            f.seek(entry['offset'])
+            model = pickle.loads(f.read(entry['length']))
+        self.stats['misses'] += 1
+        self._cache[cache_key] = model
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self.stats['evictions'] += 1
+        return model
+    
+    def route(self, rows) -> np.ndarray:
+        """행마다 '{dimension}:{group_id}' 또는 'global' 라우팅 키 반환"""
+        routes = np.full(len(rows), GLOBAL_ROUTE, dtype=object)
+        unrouted = np.ones(len(rows), dtype=bool)
+        for dimension in self.order:
+            index = self.indices[dimension]
+            column = index['column']
+            if column not in rows.columns:
+                continue
+            keys = rows[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            candidates = np.flatnonzero(unrouted & ~np.isnan(keys))
+            key_str = keys[candidates].astype(np.int64).astype(str)
+            hit = np.isin(key_str, index['routable_keys'])
+            positions = candidates[hit]
+            routes[positions] = np.char.add(f'{dimension}:', key_str[hit])
+            unrouted[positions] = False
+        return routes
+    
+    def build_features(self, dimension: str, rows):
+        """특화 모델 입력 행렬 (차원 인덱스에 기록된 특성/인코더 사용)"""
+        index = self.indices[dimension]
+        if index.get('encoder_path') and dimension not in self._encoders:
+            import joblib
+            self._encoders[dimension] = joblib.load(index['artifact_file'].parent / index['encoder_path'])
+        return build_features({**index, 'encoder': self._encoders.get(dimension)}, rows)
+
+
+def load_specialized_router(models_dir: str, mode: str = 'pre', cache_size: int = 64,
+                            min_r2: Optional[float] = None,
+                            require_beats_global: bool = True) -> Optional[SpecializedModelRouter]:
+    """
+    차원별로 가장 최근 특화 모델 인덱스로 라우터 생성
+    
+    학습 캐시로 재사용된 차원은 이전 실행의 인덱스를 그대로 쓰므로 실행 단위가 아니라
+    차원 단위로 최신 인덱스를 고른다 (인덱스마다 자체 특성/인코더를 가진다).
+    
+    Args:
+        models_dir: 모델 디렉토리 (예: 'ml_models/pre')
+        mode: 모델 모드
+        cache_size: LRU 캐시 크기
+        min_r2: 라우팅할 특화 모델의 최소 R² (추가 하한)
+        require_beats_global: 같은 테스트 행에서 전역 앙상블보다 나은 특화 모델만 라우팅
+        
+    Returns:
+        SpecializedModelRouter (특화 모델 인덱스가 없으면 None)
+    """
+    index_files = list(Path(models_dir).glob(f'specialized_index_{mode}_*.json'))
+    if not index_files:
+        return None
+    
+    # 파일명: specialized_index_{mode}_{dimension}_{YYYYmmdd}_{HHMMSS}.json
+    latest = {}
+    for path in index_files:
+        parts = path.stem.split('_')
+        dimension, timestamp = parts[3], '_'.join(parts[4:])
+        if dimension not in latest or timestamp > latest[dimension][0]:
+            latest[dimension] = (timestamp, str(path))
+    router = SpecializedModelRouter(
+        {dimension: path for dimension, (_, path) in latest.items()}, cache_size=cache_size, min_r2=min_r2,
+        require_beats_global=require_beats_global
+    )
+    counts = ', '.join(f"{d}={len(router.indices[d]['routable'])}/{len(router.indices[d]['models'])}({latest[d][0]})"
+                       for d in router.order)
+    print(f"✅ 특화 모델 라우터 로드: {counts} (캐시 {cache_size}개)")
+    return router
+
+
+def predict_ranks_routed(ensemble: Dict[str, Any], router: Optional[SpecializedModelRouter], rows,
+                         return_routes: bool = False):
+    """
+    특화 모델 라우팅 예측: 유저/트랙/차량 특화 모델이 있으면 그 모델로, 없으면 전역 앙상블로 예측
+    
+    같은 모델로 라우팅되는 행끼리 묶어 모델당 predict()를 한 번만 호출한다.
+    
+    Args:
+        ensemble: load_ensemble_model()로 로드한 앙상블 설정
+        router: load_specialized_router()로 만든 라우터 (None이면 전부 전역 앙상블)
+        rows: 원본 특성 DataFrame (cust_id/track_id/car_id 포함)
+        return_routes: True면 (예측, 행별 라우팅 키) 반환
+        
+    Returns:
+        예측된 순위 배열 (1D: [n_samples])
+    """
+    predictions = np.zeros(len(rows))
+    routes = router.route(rows) if router is not None else np.full(len(rows), GLOBAL_ROUTE, dtype=object)
+    
+    # 라우팅 키별 행 위치
+    unique_routes, inverse = np.unique(routes.astype(str), return_inverse=True)
+    features_by_dimension = {}
+    for i, route_key in enumerate(unique_routes):
+        positions = np.flatnonzero(inverse == i)
+        if route_key == GLOBAL_ROUTE:
+            X = build_features(ensemble, rows.iloc[positions])
+            predictions[positions] = predict_ranks_batch(ensemble, X)
+            continue
+        
+        dimension, key = route_key.split(':', 1)
+        if dimension not in features_by_dimension:
+            features_by_dimension[dimension] = router.build_features(dimension, rows)
+        model = router.get_model(dimension, key)
+        X = features_by_dimension[dimension][positions]
+        predictions[positions] = model.predict(_model_input(model, X))
+    
+    if return_routes:
+        return predictions, routes
+    return predictions
+
+
+def normalize_session_ranks(predictions: np.ndarray, rmse: Optional[float] = None):
+    """
+    한 그리드의 원시 예측 순위를 1..N 순서와 기대 순위로 정규화
+
+    원시 예측은 그리드마다 범위가 다르고 1..N을 벗어날 수 있다. 두 참가자의 예측 차이를
+    모델 오차(RMSE, 두 예측 오차의 차이이므로 sqrt(2)배)를 갖는 로지스틱 분포로 보고
+    P(j가 i보다 앞) 쌍별 확률을 만든 뒤, 기대 순위 = 1 + Σ_j P(j가 i보다 앞)으로 계산한다.
+    기대 순위는 [1, N] 안에 있고 합이 N(N+1)/2이며 원시 예측과 순서가 같다.
+
+    Args:
+        predictions: 한 그리드 참가자의 원시 예측 순위 (1D)
+        rmse: 앙상블 검증 RMSE (ensemble['metrics']['rmse'], 없으면 1.0)
+
+    Returns:
+        (예측 순서 1..N 정수 배열, 기대 순위 배열, 순위 신뢰도 0~1 배열)
+        신뢰도는 1 - (기대 순위 표준편차 / 모든 쌍이 반반일 때의 표준편차)
+    """
+    predictions = np.asarray(predictions, dtype=np.float64)
+    n = len(predictions)
+    order = np.empty(n, dtype=np.int64)
+    order[np.argsort(predictions, kind='stable')] = np.arange(1, n + 1)
+    if n < 2:
+        return order, order.astype(np.float64), np.ones(n)
+
+    # 같은 분산의 로지스틱 척도: std * sqrt(3) / pi
+    scale = max(float(rmse or 1.0), 1e-6) * np.sqrt(2.0) * np.sqrt(3.0) / np.pi
+    z = (predictions[:, None] - predictions[None, :]) / scale
+    ahead = 0.5 * (1.0 + np.tanh(z / 2.0))  # ahead[i, j] = P(j가 i보다 앞), tanh 형태라 overflow 없음
+    np.fill_diagonal(ahead, 0.0)
+    expected = 1.0 + ahead.sum(axis=1)
+    variance = (ahead * (1.0 - ahead)).sum(axis=1)
+    confidence = 1.0 - np.sqrt(variance / ((n - 1) * 0.25))
+    return order, expected, np.clip(confidence, 0.0, 1.0)
+
+
+def _session_value(rows, column: str, reducer=np.nanmean) -> Optional[float]:
+    """세션 요약 값 (컬럼이 없거나 전부 결측이면 None)"""
+    if column not in rows.columns:
+        return None
+    values = rows[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    if np.isnan(values).all():
+        return None
+    return float(reducer(values))
+
+
+def predict_sessions(ensemble: Dict[str, Any], rows, router: Optional[SpecializedModelRouter] = None
+                     ) -> List[Dict[str, Any]]:
+    """
+    여러 서브세션 그리드를 한 번의 배치 예측으로 처리하고 그리드별로 순위 정규화
+
+    Args:
+        ensemble: load_ensemble_model()로 로드한 앙상블 설정
+        rows: 참가자 원본 특성 DataFrame (subsession_id, cust_id, series_id/track_id/car_id 포함)
+        router: 특화 모델 라우터 (None이면 전역 앙상블만)
+
+    Returns:
+        서브세션별 predict_session() 결과 목록 (rows에 처음 나온 순서)
+    """
+    raw = predict_ranks_routed(ensemble, router, rows)
+    if 'subsession_id' in rows.columns:
+        import pandas as pd
+        codes, _ = pd.factorize(rows['subsession_id'], sort=False)
+    else:
+        codes = np.zeros(len(rows), dtype=np.int64)
+
+    rmse = ensemble.get('metrics', {}).get('rmse')
+    model_version = f"{ensemble.get('mode', 'ensemble')}_{ensemble.get('timestamp', '')}".rstrip('_')
+    results = []
+    for code in range(codes.max(initial=-1) + 1):
+        positions = np.flatnonzero(codes == code)
+        grid = rows.iloc[positions]
+        order, expected, confidence = normalize_session_ranks(raw[positions], rmse)
+        subsession_id = int(grid['subsession_id'].iloc[0]) if 'subsession_id' in grid.columns else None
+        cust_ids = grid['cust_id'].tolist() if 'cust_id' in grid.columns else list(range(len(grid)))
+        ranked = np.argsort(order)
+
+        predictions = [{
+            'cust_id': cust_ids[i],
+            'predicted_order': int(order[i]),
+            'expected_position': float(expected[i]),
+            'confidence': float(confidence[i]),
+            'raw_prediction': float(raw[positions[i]]),
+        } for i in ranked]
+        series_id = _session_value(grid, 'series_id', np.nanmin)
+        track_id = _session_value(grid, 'track_id', np.nanmin)
+        sof = _session_value(grid, 'sof', np.nanmedian)
+        avg_i_rating = _session_value(grid, 'i_rating')
+        avg_safety_rating = _session_value(grid, 'safety_rating')
+        results.append({
+            'subsession_id': subsession_id,
+            'model_version': model_version,
+            'finishing_order': [p['cust_id'] for p in predictions],
+            'predictions': predictions,
+            # iracing_session_participant_stats upsert 행 (on_conflict='subsession_id,cust_id')
+            'participant_stats_rows': [{
+                'subsession_id': subsession_id,
+                'cust_id': p['cust_id'],
+                'predicted_finish_position': round(p['expected_position'], 2),
+                'predicted_finish_confidence': round(p['confidence'], 4),
+            } for p in predictions],
+            # iracing_session_predictions upsert 행 (on_conflict='subsession_id')
+            'session_prediction_row': {
+                'subsession_id': subsession_id,
+                'series_id': int(series_id) if series_id is not None else None,
+                'track_id': int(track_id) if track_id is not None else None,
+                'sof': int(round(sof)) if sof is not None else None,
+                'avg_i_rating': round(avg_i_rating, 2) if avg_i_rating is not None else None,
+                'avg_safety_rating': round(avg_safety_rating, 2) if avg_safety_rating is not None else None,
+                'total_participants': len(grid),
+                # 예측 순위가 서로 가까울수록(신뢰도가 낮을수록) 경쟁이 치열한 세션
+                'predicted_competitiveness_score': round(1.0 - float(confidence.mean()), 4),
+                'model_version': model_version,
+                'prediction_confidence': round(float(confidence.mean()), 4),
+            },
+        })
+    return results
+
+
+def predict_session(ensemble: Dict[str, Any], rows, router: Optional[SpecializedModelRouter] = None
+                    ) -> Dict[str, Any]:
+    """
+    서브세션 한 개의 전체 그리드 예측
+
+    참가자 전원의 특성 행을 한 행렬로 만들어 앙상블을 한 번만 호출하고(predict_rank를 참가자마다
+    부르지 않는다), 원시 예측을 normalize_session_ranks()로 1..N 순서와 기대 순위로 정규화한다.
+
+    Args:
+        ensemble: load_ensemble_model()로 로드한 앙상블 설정
+        rows: 한 서브세션 참가자 전원의 원본 특성 DataFrame (cust_id, series_id/track_id/car_id 포함)
+        router: 특화 모델 라우터 (None이면 전역 앙상블만)
+
+    Returns:
+        {
+            'subsession_id', 'model_version',
+            'finishing_order': 예측 순서대로 정렬한 cust_id 목록,
+            'predictions': [{cust_id, predicted_order, expected_position, confidence, raw_prediction}] (순서대로),
+            'participant_stats_rows': iracing_session_participant_stats 일괄 upsert 행,
+            'session_prediction_row': iracing_session_predictions upsert 행,
+        }
+    """
+    if 'subsession_id' in rows.columns and rows['subsession_id'].nunique(dropna=False) > 1:
+        raise ValueError("rows에 여러 서브세션이 있습니다. predict_sessions()를 사용하세요.")
+    if len(rows) == 0:
+        raise ValueError("예측할 참가자가 없습니다.")
+    return predict_sessions(ensemble, rows, router)[0]
+
+
+def _model_registry(models_dir):
+    """models_dir를 색인하는 ModelRegistry (scripts/model_registry.py)"""
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    if scripts_dir not in sys.path:
+        sys.path.insert(0, scripts_dir)
+    import model_registry
+    return model_registry.ModelRegistry.for_directory(models_dir)
+
+
 def find_latest_ensemble_config(models_dir: str = 'ml_models') -> Optional[str]:
     """
     가장 최근 앙상블 설정 파일 찾기
     
+    모델 레지스트리(ml_models/registry.sqlite)에서 설정 타임스탬프 기준으로 찾는다.
+    디렉토리가 바뀌지 않았으면 파일 목록을 다시 읽지 않는다. 레지스트리를 쓸 수 없으면 glob으로 찾는다.
+    
     Args:
         models_dir: 모델 디렉토리 경로
         
@@ -139,6 +689,11 @@ def find_latest_ensemble_config(models_dir: str = 'ml_models') -> Optional[str]:
     if not models_path.exists():
         return None
     
+    try:
+        return _model_registry(models_path).latest_path(models_path, 'ensemble')
+    except Exception as e:
+        print(f"⚠️  모델 레지스트리를 사용할 수 없어 파일 목록에서 찾습니다: {e}")
+    
     ensemble_configs = list(models_path.glob('ensemble_config_*.json'))
     if not ensemble_configs:
         return None
@@ -156,9 +711,9 @@ if __name__ == '__main__':
     if latest_config:
         print(f"✅ 최신 앙상블 설정: {latest_config}")
         ensemble = load_ensemble_model(latest_config)
-        print(f"\n📊 앙상블 정보:")
+        print("\n📊 앙상블 정보:")
         print(f"   특성 수: {len(ensemble['features'])}")
-        print(f"   모델 수: {len(ensemble['loaded_models'])}")
+        print(f"   모델 수: {len(ensemble['models'])}")
         print(f"   성능: R²={ensemble['metrics']['r2']:.4f}, MAE={ensemble['metrics']['mae']:.2f}")
     else:
         print("❌ 앙상블 설정 파일을 찾을 수 없습니다.")
@@ -0,0 +1,585 @@
+"""
+모델 레지스트리 (ml_models/registry.sqlite)
+
+ml_models/{mode}의 모델/앙상블/특화 모델 아티팩트를 SQLite 인덱스 하나로 관리한다.
+항목마다 모드, 종류, 타임스탬프, 특성 목록, 성능 지표, 학습 캐시 키, 파일 SHA-256/크기,
+함께 저장된 파일(특성 목록, 메타데이터, 인코더, 컴파일 파일)과 참조하는 모델 파일을 기록한다.
+디렉토리 mtime이 기록과 다를 때만 새로 생긴/사라진 파일을 반영하므로 최신 앙상블 조회는
+glob + 파일별 stat 대신 stat 한 번과 인덱스 조회로 끝난다 (학습 스크립트는 지금처럼 파일만 쓰면 된다).
+인덱스는 파일에서 다시 만들 수 있는 캐시이고, is_active/is_production만 --sync로 iracing_ml_models에서 가져온다.
+
+로드한 앙상블은 프로세스 안 LRU 캐시(설정 해시 키)에 두고, 합계 크기가 상한을 넘으면 오래 안 쓴 것부터 버린다.
+
+사용법:
+    python scripts/model_registry.py                          # 디렉토리별 등록 현황
+    python scripts/model_registry.py --rebuild                # 인덱스 전체 다시 만들기
+    python scripts/model_registry.py --sync --push            # iracing_ml_models와 동기화 (누락된 모델 등록)
+    python scripts/model_registry.py --prune --keep 3 --dry-run
+
+    from model_registry import load_ensemble_cached
+    ensemble = load_ensemble_cached(config_path)   # 같은 설정 해시면 이미 로드한 앙상블 재사용
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import load_ensemble_model as lem  # noqa: E402
+
+REGISTRY_FILE = 'registry.sqlite'
+REGISTRY_SCHEMA_VERSION = 1
+MODEL_MODES = ('pre', 'post')
+ENSEMBLE_CACHE_BYTES = 1024 ** 3   # 프로세스 안 앙상블 LRU 캐시 상한
+DEFAULT_KEEP = 3                   # prune: 디렉토리/종류/그룹별로 남길 최신 항목 수
+
+# 항목을 정의하는 파일 (파일명 접두사 → 종류)
+DEFINING_PREFIXES = {
+    'model_metadata_': 'model',
+    'ensemble_config_': 'ensemble',
+    'specialized_index_': 'specialized',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    path TEXT PRIMARY KEY,                   -- 로드하는 파일 (레지스트리 루트 기준 상대 경로)
+    source TEXT NOT NULL UNIQUE,             -- 항목을 정의하는 JSON (메타데이터/앙상블 설정/특화 인덱스)
+    directory TEXT NOT NULL,
+    kind TEXT NOT NULL,                      -- model | ensemble | specialized
+    mode TEXT,
+    name TEXT,                               -- 모델 종류 / ensemble / 특화 차원
+    timestamp TEXT,
+    features TEXT,                           -- JSON
+    metrics TEXT,                            -- JSON
+    cache_key TEXT,                          -- 학습 캐시 키 (iracing_ml_models.model_file_hash)
+    sha256 TEXT,                             -- path 내용 해시 (앙상블은 설정 + 컴파일 파일)
+    size INTEGER NOT NULL DEFAULT 0,         -- files 합계 바이트
+    files TEXT NOT NULL,                     -- JSON: 항목과 함께 삭제되는 파일
+    depends TEXT NOT NULL DEFAULT '[]',      -- JSON: 참조하는 다른 항목의 path (앙상블 → 모델)
+    is_active INTEGER NOT NULL DEFAULT 0,
+    is_production INTEGER NOT NULL DEFAULT 0,
+    synced_at TEXT                           -- iracing_ml_models 행과 마지막으로 맞춘 시각
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_latest ON artifacts(directory, kind, timestamp);
+CREATE TABLE IF NOT EXISTS directories (
+    directory TEXT PRIMARY KEY,
+    mtime_ns INTEGER                         -- 마지막 반영 시점의 디렉토리 mtime (NULL이면 다음 조회 때 다시 확인)
+);
+"""
+
+JSON_COLUMNS = ('features', 'metrics', 'files', 'depends')
+
+# (레지스트리, 디렉토리, 종류) → (디렉토리 mtime, 최신 경로): 디렉토리가 그대로면 SQLite도 열지 않는다
+_latest_paths = {}
+
+
+def registry_root(models_dir):
+    """models_dir를 색인하는 레지스트리 루트 (ml_models/{mode}면 ml_models)"""
+    path = Path(models_dir)
+    return path.parent if path.name in MODEL_MODES else path
+
+
+def file_sha256(paths):
+    """파일들을 순서대로 이어붙인 내용의 SHA-256"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class IncompleteArtifact(Exception):
+    """정의 파일을 아직 읽을 수 없음 (쓰는 중) — 다음 조회 때 다시 확인"""
+
+
+class ModelRegistry:
+    """
+    ml_models 아티팩트 인덱스
+
+    연결은 호출마다 열고 닫는다 (예측 서비스의 실행자 스레드와 학습 프로세스가 함께 써도 된다).
+    조회 메서드는 대상 디렉토리의 mtime이 바뀌었을 때만 파일 목록을 다시 읽는다.
+    """
+
+    def __init__(self, root='ml_models'):
+        self.root = Path(root)
+        self.path = self.root / REGISTRY_FILE
+
+    @classmethod
+    def for_directory(cls, models_dir):
+        return cls(registry_root(models_dir))
+
+    def _connect(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if conn.execute('PRAGMA user_version').fetchone()[0] != REGISTRY_SCHEMA_VERSION:
+            # 인덱스는 파일에서 다시 만들 수 있으므로 스키마가 바뀌면 새로 만든다
+            conn.executescript('DROP TABLE IF EXISTS artifacts; DROP TABLE IF EXISTS directories;' + SCHEMA)
+            conn.execute(f'PRAGMA user_version = {REGISTRY_SCHEMA_VERSION}')
+            conn.execute('PRAGMA journal_mode = WAL')
+        return conn
+
+    def _relative(self, path):
+        return Path(os.path.normpath(os.path.relpath(path, self.root))).as_posix()
+
+    def directory_key(self, models_dir):
+        """루트 기준 디렉토리 키 (루트 자체는 '')"""
+        key = self._relative(models_dir)
+        return '' if key == '.' else key
+
+    def directories(self):
+        """색인하는 디렉토리 키: 루트(모드 구분 없던 예전 배치)와 모드 디렉토리"""
+        return [''] + [mode for mode in MODEL_MODES if (self.root / mode).is_dir()]
+
+    # ------------------------------------------------------------------ 색인
+
+    def _describe(self, directory, name, kind):
+        """정의 파일 하나 → 항목 dict (아티팩트 파일이 없으면 None)"""
+        base = self.root / directory
+        source = base / name
+        data = _read_json(source)
+        if not isinstance(data, dict):
+            raise IncompleteArtifact(str(source))
+        files, depends = [source], []
+        if kind == 'model':
+            # model_metadata_{prefix}.json ↔ iracing_rank_predictor_{prefix}.pkl, model_features_{prefix}.json
+            prefix = source.stem[len('model_metadata_'):]
+            path = base / f'iracing_rank_predictor_{prefix}.pkl'
+            if not path.exists():
+                return None
+            files += [path, base / f'model_features_{prefix}.json']
+            entry_name, metrics, sha_paths = data.get('model_type'), data.get('metrics'), [path]
+        elif kind == 'ensemble':
+            path = source
+            compiled = lem.compiled_ensemble_path(source)
+            files.append(compiled)
+            depends = [self._relative(base / m['model_path']) for m in data.get('models', [])]
+            entry_name, metrics = 'ensemble', data.get('metrics')
+            sha_paths = [source] + ([compiled] if compiled.exists() else [])
+        else:
+            path = source
+            if not data.get('artifact_path') or not (base / data['artifact_path']).exists():
+                return None
+            files.append(base / data['artifact_path'])
+            entry_name = data.get('dimension')
+            r2s = [m['r2'] for m in data.get('models', {}).values() if m.get('r2') is not None]
+            metrics = {'groups': len(data.get('models', {})), 'mean_r2': sum(r2s) / len(r2s) if r2s else None}
+            sha_paths = [source]
+        if data.get('encoder_path'):
+            files.append(base / data['encoder_path'])
+        files = [f for f in files if f.exists()]
+        return {
+            'path': self._relative(path),
+            'source': self._relative(source),
+            'directory': directory,
+            'kind': kind,
+            'mode': data.get('mode'),
+            'name': entry_name,
+            'timestamp': data.get('timestamp'),
+            'features': json.dumps(data.get('features')),
+            'metrics': json.dumps(metrics),
+            'cache_key': data.get('cache_key'),
+            'sha256': file_sha256(sha_paths),
+            'size': sum(f.stat().st_size for f in files),
+            'files': json.dumps([self._relative(f) for f in files]),
+            'depends': json.dumps(depends),
+        }
+
+    def _register(self, conn, directory, name, kind):
+        entry = self._describe(directory, name, kind)
+        if entry is None:
+            return False
+        columns = list(entry)
+        updates = ', '.join(f'{c} = excluded.{c}' for c in columns if c != 'path')
+        conn.execute(
+            f"INSERT INTO artifacts ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT(path) DO UPDATE SET {updates}",
+            [entry[c] for c in columns]
+        )
+        return True
+
+    def _refresh_directory(self, conn, directory, force=False):
+        """디렉토리 mtime이 기록과 다르면 새로 생긴 항목을 등록하고 사라진 항목을 지운다"""
+        base = self.root / directory
+        try:
+            mtime_ns = base.stat().st_mtime_ns  # 목록보다 먼저 읽어야 그 사이에 생긴 파일을 다음 조회 때 반영한다
+            names = set(os.listdir(base))
+        except FileNotFoundError:
+            mtime_ns, names = None, set()
+        recorded = conn.execute('SELECT mtime_ns FROM directories WHERE directory = ?', (directory,)).fetchone()
+        if not force and recorded is not None and recorded[0] is not None and recorded[0] == mtime_ns:
+            return False
+
+        known = {
+            row['source']: row for row in
+            conn.execute('SELECT source, path, kind, files FROM artifacts WHERE directory = ?', (directory,))
+        }
+        complete = True
+        for source, row in known.items():
+            if Path(source).name not in names or Path(row['path']).name not in names:
+                conn.execute('DELETE FROM artifacts WHERE source = ?', (source,))
+                continue
+            if row['kind'] == 'ensemble':
+                # 나중에 컴파일된 앙상블은 같은 항목에 파일만 추가된다 (설정 해시도 바뀐다)
+                compiled = lem.compiled_ensemble_path(source).name
+                has_compiled = any(Path(f).name == compiled for f in json.loads(row['files']))
+                if not force and has_compiled == (compiled in names):
+                    continue
+            elif not force:
+                continue
+            try:
+                if not self._register(conn, directory, Path(source).name, row['kind']):
+                    conn.execute('DELETE FROM artifacts WHERE source = ?', (source,))
+            except IncompleteArtifact:
+                complete = False
+        for name in sorted(names):
+            kind = next((k for prefix, k in DEFINING_PREFIXES.items()
+                         if name.startswith(prefix) and name.endswith('.json')), None)
+            if kind is None or self._relative(base / name) in known:
+                continue
+            try:
+                self._register(conn, directory, name, kind)
+            except IncompleteArtifact:
+                complete = False
+        conn.execute('INSERT OR REPLACE INTO directories (directory, mtime_ns) VALUES (?, ?)',
+                     (directory, mtime_ns if complete else None))
+        return True
+
+    def refresh(self, directory=None, force=False):
+        """directory(디렉토리 키, 기본: 전체)를 파일 상태와 맞추고 다시 읽은 디렉토리 목록 반환"""
+        directories = self.directories() if directory is None else [directory]
+        with closing(self._connect()) as conn, conn:
+            return [d for d in directories if self._refresh_directory(conn, d, force)]
+
+    def rebuild(self):
+        """인덱스를 파일에서 다시 만든다 (동기화된 is_active/is_production은 유지)"""
+        return self.refresh(force=True)
+
+    # ------------------------------------------------------------------ 조회
+
+    def entries(self, kind=None, directory=None, mode=None, refresh=True):
+        """항목 dict 목록 (JSON 컬럼은 풀어서, 타임스탬프 최신 우선)"""
+        if refresh:
+            self.refresh(directory)
+        clauses, params = [], []
+        for column, value in (('kind', kind), ('directory', directory), ('mode', mode)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f'SELECT * FROM artifacts{where} ORDER BY timestamp DESC, path DESC', params).fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            for column in JSON_COLUMNS:
+                entry[column] = json.loads(entry[column]) if entry[column] is not None else None
+            entries.append(entry)
+        return entries
+
+    def latest_path(self, models_dir, kind='ensemble'):
+        """models_dir의 가장 최근 항목 파일 경로 (없으면 None)"""
+        directory = self.directory_key(models_dir)
+        memo_key = (str(self.path.resolve()), directory, kind)
+        mtime_ns = (self.root / directory).stat().st_mtime_ns
+        if _latest_paths.get(memo_key, (None,))[0] == mtime_ns:
+            return _latest_paths[memo_key][1]
+        with closing(self._connect()) as conn, conn:
+            self._refresh_directory(conn, directory)
+            row = conn.execute(
+                'SELECT path FROM artifacts WHERE directory = ? AND kind = ? ORDER BY timestamp DESC, path DESC LIMIT 1',
+                (directory, kind)
+            ).fetchone()
+        path = str(self.root / row['path']) if row else None
+        _latest_paths[memo_key] = (mtime_ns, path)
+        return path
+
+    def config_hash(self, config_path):
+        """앙상블 설정 해시 (설정 + 컴파일 파일, 색인되지 않은 파일이면 직접 계산)"""
+        config_path = Path(config_path)
+        directory = self.directory_key(config_path.parent)
+        with closing(self._connect()) as conn, conn:
+            self._refresh_directory(conn, directory)
+            row = conn.execute('SELECT sha256 FROM artifacts WHERE path = ?',
+                               (self._relative(config_path),)).fetchone()
+        if row:
+            return row['sha256']
+        compiled = lem.compiled_ensemble_path(config_path)
+        return file_sha256([config_path] + ([compiled] if compiled.exists() else []))
+
+    def resolve_model(self, config, config_dir, model_info):
+        """
+        앙상블 설정의 model_path가 없을 때 구성 모델 파일 찾기
+
+        같은 파일명으로 색인된 모델이 있으면 그것을, 없으면 같은 모드/종류/특성 목록이면서
+        설정보다 늦게 만들어지지 않은 모델 중 최신을 쓴다 (다른 특성으로 학습된 모델은 고르지 않는다).
+
+        Returns:
+            모델 파일 Path (없으면 None)
+        """
+        filename = Path(model_info['model_path']).name
+        candidates = [
+            e for e in self.entries(kind='model')
+            if e['name'] == model_info['name'] and e['mode'] == config.get('mode')
+        ]
+        same_file = [e for e in candidates if Path(e['path']).name == filename]
+        if same_file:
+            preferred = self.directory_key(config_dir)
+            same_file.sort(key=lambda e: e['directory'] != preferred)
+            return self.root / same_file[0]['path']
+        compatible = [
+            e for e in candidates
+            if e['features'] == config.get('features')
+            and (not config.get('timestamp') or (e['timestamp'] or '') <= config['timestamp'])
+        ]
+        if not compatible:
+            return None
+        print(f"⚠️  {model_info['model_path']}이 없어 레지스트리의 {compatible[0]['path']}을 사용합니다 "
+              f"(같은 종류/특성, {compatible[0]['timestamp']})")
+        return self.root / compatible[0]['path']
+
+    # ------------------------------------------------------------------ iracing_ml_models 동기화
+
+    def sync_with_supabase(self, client=None, push=False):
+        """
+        iracing_ml_models와 동기화
+
+        (model_name, model_version) = (iracing_rank_predictor_{mode}_{model_type}, timestamp)로 로컬 모델과 맞춰
+        is_active/is_production을 가져오고, 학습 캐시 키(model_file_hash)가 다르거나 로컬 파일이 없는 행을 알린다.
+        push=True면 테이블에 없는 로컬 모델을 train_ml_model.register_model()로 등록한다.
+
+        Returns:
+            {'matched', 'pushed', 'missing_rows', 'missing_files', 'hash_mismatch'} 개수
+        """
+        import train_ml_model as tm
+        client = client or tm.get_supabase_client()
+        response = tm._execute_with_retry(
+            lambda: client.table('iracing_ml_models')
+            .select('model_name,model_version,model_file_hash,is_active,is_production')
+            .like('model_name', 'iracing_rank_predictor_%')
+        )
+        rows = {(r['model_name'], r['model_version']): r for r in response.data or []}
+
+        models = self.entries(kind='model')
+        local = {(f"iracing_rank_predictor_{e['mode']}_{e['name']}", e['timestamp']): e for e in models if e['mode']}
+        summary = {'matched': 0, 'pushed': 0, 'missing_rows': 0, 'missing_files': 0, 'hash_mismatch': 0}
+        synced_at = datetime.now().astimezone().isoformat()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE artifacts SET is_active = 0, is_production = 0 WHERE kind = 'model'")
+            for key, entry in local.items():
+                row = rows.get(key)
+                if row is None:
+                    summary['missing_rows'] += 1
+                    continue
+                summary['matched'] += 1
+                if row.get('model_file_hash') and entry['cache_key'] and row['model_file_hash'] != entry['cache_key']:
+                    summary['hash_mismatch'] += 1
+                    print(f"⚠️  {key[0]} {key[1]}: 테이블 해시({row['model_file_hash'][:12]})와 "
+                          f"로컬 캐시 키({entry['cache_key'][:12]})가 다릅니다")
+                conn.execute(
+                    'UPDATE artifacts SET is_active = ?, is_production = ?, synced_at = ? WHERE path = ?',
+                    (int(bool(row.get('is_active'))), int(bool(row.get('is_production'))), synced_at, entry['path'])
+                )
+        for key, row in rows.items():
+            if key not in local:
+                summary['missing_files'] += 1
+                if row.get('is_active') or row.get('is_production'):
+                    print(f"⚠️  활성 모델 {key[0]} {key[1]}의 로컬 파일이 없습니다")
+
+        if push:
+            for key, entry in local.items():
+                if key in rows:
+                    continue
+                metadata = _read_json(self.root / entry['source']) or {}
+                training_samples = (metadata.get('training_data') or {}).get('rows')
+                if not training_samples:
+                    print(f"ℹ️  {entry['path']}: 학습 레코드 수가 메타데이터에 없어 등록하지 않습니다")
+                    continue
+                try:
+                    tm.register_model(str(self.root / entry['path']), str(self.root / entry['source']),
+                                      training_samples, client=client)
+                    summary['pushed'] += 1
+                except Exception as e:
+                    print(f"⚠️  모델 등록 실패 ({entry['path']}): {e}")
+        return summary
+
+    # ------------------------------------------------------------------ 정리
+
+    def prune(self, keep=DEFAULT_KEEP, dry_run=False):
+        """
+        밀려난 아티팩트 삭제
+
+        디렉토리/종류/그룹(모델 종류, 특화 차원)별 최신 keep개, 유지되는 앙상블이 참조하는 모델,
+        iracing_ml_models에서 활성/운영 중인 모델(--sync로 가져온 값)은 남긴다.
+        증분 학습의 부모(종류별 최신 모델)와 특화 라우터(차원별 최신 인덱스)는 항상 최신 keep개 안에 있다.
+
+        Returns:
+            (삭제 대상 항목 목록, 삭제한(dry_run이면 삭제할) 바이트)
+        """
+        if keep < 1:
+            raise ValueError('keep은 1 이상이어야 합니다')
+        entries = self.entries()
+        groups = defaultdict(list)
+        for entry in entries:  # 타임스탬프 최신 우선
+            groups[(entry['directory'], entry['kind'], entry['name'])].append(entry)
+        kept = {e['path'] for group in groups.values() for e in group[:keep]}
+        kept |= {e['path'] for e in entries if e['is_active'] or e['is_production']}
+        kept |= {path for e in entries if e['kind'] == 'ensemble' and e['path'] in kept for path in e['depends']}
+
+        removed = [e for e in entries if e['path'] not in kept]
+        protected = {f for e in entries if e['path'] in kept for f in e['files']}
+        freed = 0
+        for entry in removed:
+            for relative in entry['files']:
+                path = self.root / relative
+                if relative in protected or not path.exists():
+                    continue
+                freed += path.stat().st_size
+                if not dry_run:
+                    path.unlink()
+        if not dry_run and removed:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany('DELETE FROM artifacts WHERE path = ?', [(e['path'],) for e in removed])
+            self.refresh()
+        return removed, freed
+
+
+class EnsembleCache:
+    """
+    설정 해시 → 로드한 앙상블 LRU
+
+    항목 크기는 컴파일된 앙상블이면 배열 크기, 아니면 모델/인코더 파일 크기로 어림한다.
+    합계가 max_bytes를 넘으면 오래 안 쓴 것부터 버린다 (방금 넣은 항목 하나는 상한보다 커도 남긴다).
+    캐시된 앙상블은 여러 호출자가 공유하므로 수정하면 안 된다.
+    """
+
+    def __init__(self, max_bytes=ENSEMBLE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()  # key -> (ensemble, nbytes)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, ensemble, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (ensemble, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'mb': round(self.nbytes / 1024 ** 2, 1),
+                'max_mb': round(self.max_bytes / 1024 ** 2, 1),
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+ENSEMBLE_CACHE = EnsembleCache()
+
+
+def ensemble_nbytes(config_path, ensemble):
+    """캐시 크기 계산용 앙상블 크기 (컴파일된 앙상블 배열, 아니면 모델/인코더 파일 크기)"""
+    config_dir = Path(config_path).parent
+    nbytes = ensemble['compiled'].nbytes if 'compiled' in ensemble else sum(
+        (config_dir / m['model_path']).stat().st_size
+        for m in ensemble['models'] if (config_dir / m['model_path']).exists()
+    )
+    if ensemble.get('encoder_path') and (config_dir / ensemble['encoder_path']).exists():
+        nbytes += (config_dir / ensemble['encoder_path']).stat().st_size
+    return nbytes
+
+
+def load_ensemble_cached(config_path, use_compiled=True, registry=None, cache=None):
+    """load_ensemble_model()과 같지만 같은 설정 해시로 이미 로드한 앙상블은 캐시에서 반환"""
+    registry = registry or ModelRegistry.for_directory(Path(config_path).parent)
+    cache = cache if cache is not None else ENSEMBLE_CACHE
+    key = f'{registry.config_hash(config_path)}:{int(use_compiled)}'
+    ensemble = cache.get(key)
+    if ensemble is None:
+        ensemble = lem.load_ensemble_model(config_path, use_compiled=use_compiled)
+        cache.put(key, ensemble, ensemble_nbytes(config_path, ensemble))
+    return ensemble
+
+
+def print_summary(registry):
+    """디렉토리/종류별 항목 수, 크기, 최신 항목"""
+    entries = registry.entries()
+    if not entries:
+        print(f"ℹ️  {registry.root}에 색인된 아티팩트가 없습니다.")
+        return
+    groups = defaultdict(list)
+    for entry in entries:
+        groups[(entry['directory'] or '.', entry['kind'])].append(entry)
+    print(f"📚 모델 레지스트리: {registry.path}")
+    print(f"   {'directory':10s} {'kind':12s} {'count':>6s} {'size(MB)':>9s} {'active':>7s}  latest")
+    for (directory, kind), group in sorted(groups.items()):
+        active = sum(1 for e in group if e['is_active'] or e['is_production'])
+        print(f"   {directory:10s} {kind:12s} {len(group):6d} {sum(e['size'] for e in group) / 1024 ** 2:9.1f} "
+              f"{active:7d}  {Path(group[0]['path']).name}")
+
+
+def main(models_dir='ml_models', rebuild=False, sync=False, push=False, prune=False, keep=DEFAULT_KEEP,
+         dry_run=False):
+    registry = ModelRegistry(models_dir)
+    if rebuild:
+        refreshed = registry.rebuild()
+        print(f"✅ 인덱스 다시 만들기: {', '.join(d or '.' for d in refreshed)}")
+    if sync:
+        summary = registry.sync_with_supabase(push=push)
+        print(f"✅ iracing_ml_models 동기화: 일치 {summary['matched']}, 등록 {summary['pushed']}, "
+              f"테이블에 없음 {summary['missing_rows']}, 로컬 파일 없음 {summary['missing_files']}, "
+              f"해시 불일치 {summary['hash_mismatch']}")
+    if prune:
+        removed, freed = registry.prune(keep=keep, dry_run=dry_run)
+        label = '삭제 예정' if dry_run else '삭제'
+        for entry in removed:
+            print(f"   🗑️  {entry['kind']:12s} {entry['path']} ({entry['size'] / 1024 ** 2:.1f} MB)")
+        print(f"✅ 정리 ({label}): 항목 {len(removed)}개, {freed / 1024 ** 2:.1f} MB (최신 {keep}개 유지)")
+    print_summary(registry)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='모델 레지스트리 (아티팩트 인덱스, iracing_ml_models 동기화, 정리)')
+    parser.add_argument('--models-dir', default='ml_models', help='레지스트리 루트 (모드별 하위 디렉토리 포함)')
+    parser.add_argument('--rebuild', action='store_true', help='인덱스를 파일에서 전부 다시 만들기')
+    parser.add_argument('--sync', action='store_true', help='iracing_ml_models에서 is_active/is_production 가져오기')
+    parser.add_argument('--push', action='store_true', help='--sync 시 테이블에 없는 로컬 모델 등록')
+    parser.add_argument('--prune', action='store_true', help='밀려난 아티팩트 삭제')
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP, help='디렉토리/종류/그룹별로 남길 최신 항목 수')
+    parser.add_argument('--dry-run', action='store_true', help='--prune 시 삭제하지 않고 대상만 출력')
+    args = parser.parse_args()
+    main(args.models_dir, args.rebuild, args.sync, args.push, args.prune, args.keep, args.dry_run)
@@ -0,0 +1,419 @@
+"""
+로컬 순위 예측 서비스 (앙상블 상주 + 마이크로 배치)
+
+모드별(pre/post) 최신 앙상블을 한 번 로드해 두고, 요청을 JSON-lines로 받는다 (Unix 소켓 또는 localhost TCP).
+동시에 들어온 요청은 짧은 시간 창(--window-ms) 안에서 모아 predict_ranks_batch()를 배치당 한 번만 호출한다.
+ml_models/{mode}에 더 새로운 앙상블 설정이 생기면 --reload-interval마다 확인해서 교체한다.
+
+프로토콜 (한 줄에 JSON 하나, 응답도 한 줄, 같은 연결에서 여러 요청을 이어 보내도 되고 응답은 id로 구분):
+    → {"id": 1, "mode": "pre", "participants": [{"custId": "123", "features": {"i_rating": 2100, ...}}]}
+    ← {"id": 1, "mode": "pre", "model": "ensemble_config_pre_...json", "predictions": [{"custId": "123", "predicted_rank": 5.2}]}
+    "session": true를 주면 요청 참가자를 한 그리드로 보고 predicted_order(1..N), expected_position, confidence를 추가한다.
+    → {"id": 2, "op": "stats"}      ← 요청 수, 배치 수, 요청별 재예측 수, 평균 배치 크기, 지연 p50/p99(ms), 처리량, 앙상블 캐시
+    → {"id": 3, "op": "reload"}     ← 최신 앙상블 다시 확인
+features에는 앙상블 특성(features)과 원본 카테고리 컬럼(series_id/track_id/car_id)을 넣는다. 없는 수치 특성은
+앙상블 설정의 학습 결측 대체값으로 채우고, 대체값이 없으면(이전 설정) 그 요청만 오류로 응답한다.
+participants가 비어 있으면 예측 없이 빈 predictions를 돌려준다.
+
+사용법:
+    python scripts/prediction_server.py                          # Unix 소켓 ml_models/prediction.sock (Windows는 TCP)
+    python scripts/prediction_server.py --port 8765 --window-ms 3
+    python scripts/prediction_server.py --mode pre --unix-socket /tmp/iracing_predict.sock
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import load_ensemble_model as lem  # noqa: E402
+import model_registry  # noqa: E402
+
+DEFAULT_SOCKET = os.path.join('ml_models', 'prediction.sock')
+DEFAULT_PORT = 8765
+BATCH_WINDOW_MS = 2.0          # 첫 요청 이후 같은 배치로 모으는 시간
+MAX_BATCH_ROWS = 4096          # 배치당 최대 행 수
+RELOAD_INTERVAL = 30.0         # 최신 앙상블 확인 간격 (초)
+LATENCY_WINDOW = 10_000        # p50/p99 계산에 쓰는 최근 요청 수
+MAX_LINE_BYTES = 16 * 1024 ** 2
+
+
+class EnsembleStore:
+    """
+    모드별 최신 앙상블 보관 (새 설정이 생기면 백그라운드 스레드에서 로드 후 교체)
+
+    최신 설정은 모델 레지스트리에서 찾고, 로드한 앙상블은 설정 해시 키 LRU 캐시에 남아서
+    이전 설정으로 되돌아가면 다시 언피클링하지 않는다.
+    """
+
+    def __init__(self, models_dir='ml_models', modes=('pre', 'post'), cache_bytes=model_registry.ENSEMBLE_CACHE_BYTES):
+        self.models_dir = models_dir
+        self.modes = list(modes)
+        self.ensembles = {}  # mode -> (config_path, ensemble)
+        self.cache = model_registry.EnsembleCache(cache_bytes)
+
+    def refresh(self):
+        """최신 설정이 바뀐 모드만 다시 로드하고 바뀐 모드 목록 반환 (실행자 스레드에서 호출)"""
+        changed = []
+        for mode in self.modes:
+            config_path = lem.find_latest_ensemble_config(os.path.join(self.models_dir, mode))
+            if config_path is None or self.ensembles.get(mode, (None,))[0] == config_path:
+                continue
+            try:
+                ensemble = model_registry.load_ensemble_cached(config_path, cache=self.cache)
+            except Exception as e:
+                print(f"⚠️  {mode} 앙상블 로드 실패 ({config_path}): {e}")
+                continue
+            self.ensembles[mode] = (config_path, ensemble)  # 진행 중인 배치는 이전 앙상블로 끝난다
+            changed.append(mode)
+            print(f"✅ {mode} 앙상블 로드: {config_path}")
+        return changed
+
+    def get(self, mode):
+        if mode not in self.ensembles:
+            raise KeyError(f"{mode} 모드 앙상블이 없습니다 ({self.models_dir}/{mode})")
+        return self.ensembles[mode]
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def rows_frame(ensemble, feature_dicts):
+    """
+    participants의 features dict 목록을 build_features() 입력 DataFrame으로
+
+    없거나 숫자가 아닌 수치 특성은 앙상블 설정의 학습 결측 대체값(fill_values)으로 채운다.
+    대체값이 없는 특성(fill_values가 없는 이전 설정)이 비어 있으면 ValueError — 결측을 받지 않는 모델이
+    배치 전체를 실패시키지 않도록 여기서 어느 참가자의 어느 특성인지 알린다.
+    카테고리 컬럼(series_id/track_id/car_id)은 결측도 인코더가 처리한다 (처음 보는 값과 같게).
+    """
+    import pandas as pd
+    encoded = set(ensemble.get('encoded_features', []))
+    numeric = [f for f in ensemble['features'] if f not in encoded]
+    columns = list(numeric)
+    if ensemble.get('encoder') is not None:
+        columns += [c for c in ensemble['encoder'].feature_names_in_ if c not in columns]
+    # 컬럼별 변환 대신 행렬 하나로 만든다 (작은 배치에서 DataFrame 변환 비용이 예측보다 커짐)
+    values = np.array([[_number(row.get(c)) for c in columns] for row in feature_dicts], dtype=np.float64)
+    values = values.reshape(len(feature_dicts), len(columns))
+    fill_values = ensemble.get('fill_values', {})
+    fills = np.array([fill_values.get(c, np.nan) for c in numeric])
+    block = values[:, :len(numeric)]
+    missing = np.isnan(block)
+    block[missing] = np.broadcast_to(fills, block.shape)[missing]
+    if np.isnan(block).any():
+        row = np.flatnonzero(np.isnan(block).any(axis=1))[0]
+        absent = [numeric[i] for i in np.flatnonzero(np.isnan(block[row]))]
+        raise ValueError(f"participants[{row}]의 특성 값이 없습니다: {', '.join(absent)} "
+                         f"(앙상블 설정에 결측 대체값이 없어 채울 수 없음)")
+    return pd.DataFrame(values, columns=columns)
+
+
+def predict_rows(ensemble, feature_dicts):
+    """features dict 목록 → 예측 순위 배열 (배치 전체를 한 번에)"""
+    X = lem.build_features(ensemble, rows_frame(ensemble, feature_dicts))
+    return lem.predict_ranks_batch(ensemble, X)
+
+
+class ServiceStats:
+    """요청/배치 수, 요청 지연(p50/p99), 처리량 카운터"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+        self.fallbacks = 0  # 배치 예측이 실패해 요청별로 다시 예측한 횟수
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.batch_rows = deque(maxlen=LATENCY_WINDOW)
+        self.recent = deque(maxlen=LATENCY_WINDOW)  # 완료 시각 (최근 처리량)
+
+    def record_request(self, rows, latency):
+        self.requests += 1
+        self.rows += rows
+        self.latencies.append(latency)
+        self.recent.append(time.perf_counter())
+
+    def record_batch(self, rows):
+        self.batches += 1
+        self.batch_rows.append(rows)
+
+    def record_fallback(self):
+        self.fallbacks += 1
+
+    def snapshot(self):
+        uptime = time.perf_counter() - self.started
+        now = time.perf_counter()
+        last_minute = sum(1 for t in self.recent if now - t <= 60.0)
+        latencies = np.array(self.latencies) * 1e3
+        return {
+            'uptime_sec': round(uptime, 1),
+            'requests': self.requests,
+            'rows': self.rows,
+            'batches': self.batches,
+            'errors': self.errors,
+            'batch_fallbacks': self.fallbacks,
+            'avg_batch_rows': round(float(np.mean(self.batch_rows)), 2) if self.batch_rows else None,
+            'latency_p50_ms': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+            'latency_p99_ms': round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+            'requests_per_sec': round(self.requests / uptime, 2) if uptime > 0 else None,
+            'requests_per_sec_1m': round(last_minute / min(uptime, 60.0), 2) if uptime > 0 else None,
+        }
+
+
+class MicroBatcher:
+    """
+    모드 하나의 요청 큐: 첫 요청 이후 window 동안 모인 요청을 predict_rows() 한 번으로 처리
+
+    배치 예측이 실패하면 요청별로 다시 예측해서 잘못된 입력을 보낸 요청만 실패시킨다.
+    """
+
+    def __init__(self, mode, store, executor, stats, window=BATCH_WINDOW_MS / 1e3, max_rows=MAX_BATCH_ROWS):
+        self.mode = mode
+        self.store = store
+        self.executor = executor
+        self.stats = stats
+        self.window = window
+        self.max_rows = max_rows
+        self.queue = asyncio.Queue()
+
+    async def submit(self, feature_dicts):
+        """예측 요청 하나를 큐에 넣고 (설정 경로, 앙상블, 예측 배열)을 기다린다"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((feature_dicts, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            rows = len(batch[0][0])
+            deadline = loop.time() + self.window
+            while rows < self.max_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            await self._predict(batch, rows)
+
+    async def _predict(self, batch, rows):
+        loop = asyncio.get_running_loop()
+        try:
+            config_path, ensemble = self.store.get(self.mode)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        feature_dicts = [row for dicts, _ in batch for row in dicts]
+        try:
+            predictions = await loop.run_in_executor(self.executor, predict_rows, ensemble, feature_dicts)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            # 잘못된 요청 하나 때문에 같은 배치의 다른 요청까지 실패하지 않도록 요청별로 다시 예측
+            self.stats.record_fallback()
+            for dicts, future in batch:
+                try:
+                    result = await loop.run_in_executor(self.executor, predict_rows, ensemble, dicts)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                if not future.done():
+                    future.set_result((config_path, ensemble, result))
+            return
+        self.stats.record_batch(rows)
+        start = 0
+        for dicts, future in batch:
+            if not future.done():
+                future.set_result((config_path, ensemble, predictions[start:start + len(dicts)]))
+            start += len(dicts)
+
+
+class PredictionService:
+    """JSON-lines 요청 처리 (연결마다 줄 단위로 읽고, 요청마다 태스크를 만들어 같은 배치에 모이게 한다)"""
+
+    def __init__(self, store, window=BATCH_WINDOW_MS / 1e3, max_rows=MAX_BATCH_ROWS,
+                 reload_interval=RELOAD_INTERVAL):
+        self.store = store
+        self.stats = ServiceStats()
+        self.reload_interval = reload_interval
+        # 예측은 전용 스레드 하나에서 순서대로 (이벤트 루프는 요청 수집만 한다)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict')
+        self.batchers = {
+            mode: MicroBatcher(mode, store, self.executor, self.stats, window, max_rows) for mode in store.modes
+        }
+
+    async def reload(self):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.store.refresh)
+
+    async def _reload_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload()
+
+    async def handle_request(self, request):
+        op = request.get('op', 'predict')
+        if op == 'stats':
+            return {'stats': self.stats.snapshot(), 'ensemble_cache': self.store.cache.stats(),
+                    'models': {mode: os.path.basename(path) for mode, (path, _) in self.store.ensembles.items()}}
+        if op == 'reload':
+            return {'reloaded': await self.reload()}
+        if op != 'predict':
+            raise ValueError(f"알 수 없는 op: {op}")
+
+        mode = request.get('mode', 'pre')
+        if mode not in self.batchers:
+            raise ValueError(f"지원하지 않는 mode: {mode}")
+        participants = request.get('participants') or []
+        if not participants:
+            config_path, _ = self.store.get(mode)
+            return {'mode': mode, 'model': os.path.basename(config_path), 'predictions': []}
+        start = time.perf_counter()
+        config_path, ensemble, predictions = await self.batchers[mode].submit(
+            [p.get('features') or {} for p in participants]
+        )
+        results = [
+            {'custId': p.get('custId', p.get('cust_id')), 'predicted_rank': float(rank)}
+            for p, rank in zip(participants, predictions)
+        ]
+        if request.get('session') and len(results):
+            # 요청 하나 = 그리드 하나: 1..N 예측 순서와 기대 순위로 정규화
+            order, expected, confidence = lem.normalize_session_ranks(
+                predictions, ensemble.get('metrics', {}).get('rmse')
+            )
+            for result, rank, position, conf in zip(results, order, expected, confidence):
+                result.update(predicted_order=int(rank), expected_position=float(position), confidence=float(conf))
+        self.stats.record_request(len(participants), time.perf_counter() - start)
+        return {'mode': mode, 'model': os.path.basename(config_path), 'predictions': results}
+
+    async def _respond(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = await self.handle_request(request)
+        except Exception as e:
+            self.stats.errors += 1
+            response = {'error': f'{type(e).__name__}: {e}'}
+        writer.write((json.dumps({'id': request_id, **response}) + '\n').encode())
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(self._respond(line, writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=None, unix_socket=None):
+        # 학습에 없던 series/track/car는 서비스 중 흔하다 (전부 0으로 인코딩)
+        warnings.filterwarnings('ignore', message='Found unknown categories')
+        changed = await self.reload()
+        if not changed:
+            print(f"⚠️  로드된 앙상블이 없습니다 ({self.store.models_dir}/{{{','.join(self.store.modes)}}}), "
+                  f"{self.reload_interval:.0f}초마다 다시 확인합니다.")
+        for batcher in self.batchers.values():
+            asyncio.ensure_future(batcher.run())
+        asyncio.ensure_future(self._reload_loop())
+
+        if unix_socket and hasattr(socket, 'AF_UNIX'):
+            if os.path.exists(unix_socket):
+                os.remove(unix_socket)
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket, limit=MAX_LINE_BYTES)
+            address = unix_socket
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port or DEFAULT_PORT,
+                                                limit=MAX_LINE_BYTES)
+            address = f'{host}:{port or DEFAULT_PORT}'
+        print(f"🚀 예측 서비스 시작: {address} (모드 {', '.join(self.store.modes)}, "
+              f"배치 창 {self.batchers[self.store.modes[0]].window * 1e3:.1f}ms)")
+        if hasattr(signal, 'SIGTERM'):
+            try:
+                asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+            except NotImplementedError:  # Windows 이벤트 루프
+                pass
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:  # SIGTERM → server.close()
+            pass
+        finally:
+            print(f"\n📊 서비스 통계: {json.dumps(self.stats.snapshot(), ensure_ascii=False)}")
+            if unix_socket and os.path.exists(unix_socket):
+                os.remove(unix_socket)
+
+
+def request_predictions(participants, mode='pre', unix_socket=None, host='127.0.0.1', port=DEFAULT_PORT,
+                        timeout=5.0):
+    """예측 서비스에 요청 하나를 보내고 응답 dict 반환 (파이썬 스크립트용 동기 클라이언트)"""
+    if unix_socket:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(timeout)
+        conn.connect(unix_socket)
+    else:
+        conn = socket.create_connection((host, port), timeout=timeout)
+    with conn, conn.makefile('rwb') as stream:
+        stream.write((json.dumps({'id': 0, 'mode': mode, 'participants': participants}) + '\n').encode())
+        stream.flush()
+        response = json.loads(stream.readline())
+    if 'error' in response:
+        raise RuntimeError(response['error'])
+    return response
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='로컬 순위 예측 서비스 (앙상블 상주 + 마이크로 배치, JSON-lines)')
+    parser.add_argument('--mode', nargs='+', choices=['pre', 'post'], default=['pre', 'post'], help='로드할 모델 모드')
+    parser.add_argument('--models-dir', default='ml_models', help='모델 디렉토리 (모드별 하위 디렉토리)')
+    parser.add_argument('--unix-socket', default=DEFAULT_SOCKET, help='Unix 소켓 경로 (--port를 주면 TCP 사용)')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP 주소 (localhost만 권장)')
+    parser.add_argument('--port', type=int, help=f'TCP 포트 (지정하면 Unix 소켓 대신 TCP, 기본 {DEFAULT_PORT})')
+    parser.add_argument('--window-ms', type=float, default=BATCH_WINDOW_MS, help='마이크로 배치 수집 시간 (ms)')
+    parser.add_argument('--max-batch-rows', type=int, default=MAX_BATCH_ROWS, help='배치당 최대 행 수')
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL, help='최신 앙상블 확인 간격 (초)')
+    parser.add_argument('--cache-mb', type=float, default=model_registry.ENSEMBLE_CACHE_BYTES / 1024 ** 2,
+                        help='로드한 앙상블 LRU 캐시 상한 (MB)')
+    args = parser.parse_args()
+    service = PredictionService(
+        EnsembleStore(args.models_dir, args.mode, int(args.cache_mb * 1024 ** 2)), window=args.window_ms / 1e3,
+        max_rows=args.max_batch_rows, reload_interval=args.reload_interval
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port, None if args.port else args.unix_socket))
+    except KeyboardInterrupt:
+        pass
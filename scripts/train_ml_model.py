@@ -3,6 +3,15 @@ iRacing 순위 예측 ML 모델 학습 스크립트
 
 사용법:
     python scripts/train_ml_model.py
+    python scripts/train_ml_model.py --snapshot   # 로컬 스냅샷 + 새 레코드만 동기화
+    python scripts/train_ml_model.py --source parquet --source-path ml_models/cache/iracing_ml_training_data.parquet
+    python scripts/train_ml_model.py --tune --jobs 16   # 16코어 예산 안에서 모델 동시 학습
+    python scripts/train_ml_model.py --gb-engine hist   # HistGradientBoosting (조기 종료)
+    python scripts/train_ml_model.py --tune --tune-strategy halving   # 연속 절반 탐색 + 이전 탐색 기록 재사용
+    python scripts/train_ml_model.py --early-stopping   # XGBoost/LightGBM 검증 fold 조기 종료
+    python scripts/train_ml_model.py --register-models   # iracing_ml_models 등록 (같은 입력이면 학습 캐시 재사용, --no-cache로 무시)
+    python scripts/train_ml_model.py --snapshot --incremental   # 최신 모델을 새 레코드로 이어서 학습
+    python scripts/train_ml_model.py --trace-memory --profile-stage train_model   # 단계별 실행 리포트 + cProfile
 
 환경 설정:
     pip install pandas scikit-learn numpy matplotlib supabase
@@ -10,40 +19,34 @@ iRacing 순위 예측 ML 모델 학습 스크립트
 
 import os
 import sys
+import time
 import argparse
+import importlib.util
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.model_selection import train_test_split, GridSearchCV, RandomizedSearchCV
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-import warnings
-warnings.filterwarnings('ignore')
-
-# 고급 모델 시도 (설치되어 있으면)
-try:
-    import xgboost as xgb
-    XGBOOST_AVAILABLE = True
-except ImportError:
-    XGBOOST_AVAILABLE = False
-    print("ℹ️  XGBoost가 설치되지 않았습니다. 설치하면 성능이 향상될 수 있습니다: pip install xgboost")
-
-try:
-    import lightgbm as lgb
-    LIGHTGBM_AVAILABLE = True
-except ImportError:
-    LIGHTGBM_AVAILABLE = False
-    print("ℹ️  LightGBM이 설치되지 않았습니다. 설치하면 성능이 향상될 수 있습니다: pip install lightgbm")
-import matplotlib.pyplot as plt
-import joblib
 import json
 from datetime import datetime
 from pathlib import Path
+import warnings
+warnings.filterwarnings('ignore')
+
+# 무거운 라이브러리(sklearn 모델/탐색, xgboost, lightgbm, matplotlib, joblib, dotenv)는
+# 실제로 해당 모델이나 그래프가 필요할 때 함수 안에서 import 한다 (import 시간 단축).
+# 고급 모델은 설치 여부만 미리 확인 (import 하지 않음)
+XGBOOST_AVAILABLE = importlib.util.find_spec('xgboost') is not None
+LIGHTGBM_AVAILABLE = importlib.util.find_spec('lightgbm') is not None
 
-# .env 파일 지원
-try:
-    from dotenv import load_dotenv
+
+def _load_env():
+    """.env 파일 지원 (Supabase 연결 직전에만 로드)"""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        print("ℹ️  python-dotenv가 설치되지 않았습니다. .env 파일을 사용하려면: pip install python-dotenv")
+        return
     # 프로젝트 루트에서 .env 파일 찾기
     env_path = Path(__file__).parent.parent / '.env'
     if env_path.exists():
@@ -52,52 +55,344 @@ try:
     else:
         # 현재 디렉토리에서도 시도
         load_dotenv()
-except ImportError:
-    print("ℹ️  python-dotenv가 설치되지 않았습니다. .env 파일을 사용하려면: pip install python-dotenv")
-    pass
-
-# Supabase 연결 (환경 변수에서 가져오기)
-try:
-    from supabase import create_client
-    
-    # 환경 변수 읽기 (여러 이름 시도)
-    SUPABASE_URL = (
-        os.getenv('NEXT_PUBLIC_SUPABASE_URL') or 
-        os.getenv('SUPABASE_URL') or
-        os.environ.get('NEXT_PUBLIC_SUPABASE_URL')
-    )
-    SUPABASE_KEY = (
-        os.getenv('SUPABASE_SERVICE_ROLE_KEY') or 
-        os.getenv('SUPABASE_KEY') or
-        os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
-    )
+
+
+# Supabase 클라이언트 (처음 사용할 때 생성)
+_supabase_client = None
+
+
+def get_supabase_client():
+    """Supabase 클라이언트 반환 (환경 변수에서 가져와 처음 호출 시 한 번만 생성)
+
+    모듈 import 시점에는 연결하지 않으므로 오프라인 데이터 소스(Parquet/CSV/SQLite)로는
+    Supabase 자격 증명 없이 전체 파이프라인을 실행할 수 있다.
+    """
+    global _supabase_client
+    if _supabase_client is not None:
+        return _supabase_client
     
-    # 디버깅: 환경 변수 확인
-    print("\n🔍 환경 변수 확인:")
-    print(f"   NEXT_PUBLIC_SUPABASE_URL: {'설정됨' if SUPABASE_URL else '❌ 없음'}")
-    print(f"   SUPABASE_SERVICE_ROLE_KEY: {'설정됨' if SUPABASE_KEY else '❌ 없음'}")
-    
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print("\n⚠️  Supabase 환경 변수가 설정되지 않았습니다.")
-        print("\n해결 방법:")
-        print("1. PowerShell에서 환경 변수 설정:")
-        print("   $env:NEXT_PUBLIC_SUPABASE_URL='your-url'")
-        print("   $env:SUPABASE_SERVICE_ROLE_KEY='your-key'")
-        print("\n2. 또는 .env 파일 생성 (프로젝트 루트에):")
-        print("   NEXT_PUBLIC_SUPABASE_URL=your-url")
-        print("   SUPABASE_SERVICE_ROLE_KEY=your-key")
-        print("\n3. 또는 스크립트 내에서 직접 설정 (보안 주의)")
+    _load_env()
+    try:
+        from supabase import create_client
+        
+        # 환경 변수 읽기 (여러 이름 시도)
+        supabase_url = (
+            os.getenv('NEXT_PUBLIC_SUPABASE_URL') or 
+            os.getenv('SUPABASE_URL') or
+            os.environ.get('NEXT_PUBLIC_SUPABASE_URL')
+        )
+        supabase_key = (
+            os.getenv('SUPABASE_SERVICE_ROLE_KEY') or 
+            os.getenv('SUPABASE_KEY') or
+            os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+        )
+        
+        # 디버깅: 환경 변수 확인
+        print("\n🔍 환경 변수 확인:")
+        print(f"   NEXT_PUBLIC_SUPABASE_URL: {'설정됨' if supabase_url else '❌ 없음'}")
+        print(f"   SUPABASE_SERVICE_ROLE_KEY: {'설정됨' if supabase_key else '❌ 없음'}")
+        
+        if not supabase_url or not supabase_key:
+            print("\n⚠️  Supabase 환경 변수가 설정되지 않았습니다.")
+            print("\n해결 방법:")
+            print("1. PowerShell에서 환경 변수 설정:")
+            print("   $env:NEXT_PUBLIC_SUPABASE_URL='your-url'")
+            print("   $env:SUPABASE_SERVICE_ROLE_KEY='your-key'")
+            print("\n2. 또는 .env 파일 생성 (프로젝트 루트에):")
+            print("   NEXT_PUBLIC_SUPABASE_URL=your-url")
+            print("   SUPABASE_SERVICE_ROLE_KEY=your-key")
+            print("\n3. 또는 오프라인 데이터 소스 사용: --source parquet --source-path <파일>")
+            sys.exit(1)
+        
+        _supabase_client = create_client(supabase_url, supabase_key)
+        print("✅ Supabase 연결 성공\n")
+    except ImportError:
+        print("⚠️  supabase 패키지가 설치되지 않았습니다.")
+        print("   pip install supabase 실행하세요.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"⚠️  Supabase 연결 실패: {e}")
         sys.exit(1)
     
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    print("✅ Supabase 연결 성공\n")
-except ImportError:
-    print("⚠️  supabase 패키지가 설치되지 않았습니다.")
-    print("   pip install supabase 실행하세요.")
-    sys.exit(1)
-except Exception as e:
-    print(f"⚠️  Supabase 연결 실패: {e}")
-    sys.exit(1)
+    return _supabase_client
+
+# 단계별 실행 기록 (main()이 RunProfiler를 만들면 profile_stage()가 기록, 아니면 아무것도 하지 않음)
+_run_profiler = None
+PSUTIL_AVAILABLE = importlib.util.find_spec('psutil') is not None
+RSS_SAMPLE_INTERVAL = 0.02            # 단계별 최대 RSS 샘플링 간격 (초)
+STAGE_REGRESSION_TOLERANCE = 1.2      # 이전 실행보다 20% 넘게 느려진 단계는 경고
+STAGE_REGRESSION_MIN_SECONDS = 1.0    # 이보다 짧은 단계는 비교하지 않음 (측정 잡음)
+
+
+def current_rss_mb():
+    """현재 프로세스 RSS (MB, psutil → /proc/self/statm, 둘 다 없으면 None)"""
+    if PSUTIL_AVAILABLE:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RunProfiler:
+    """학습 파이프라인 단계별 wall/CPU 시간, RSS(시작/끝/최대), tracemalloc 최대, 레코드 수 기록
+
+    단계는 중첩할 수 있고 이름은 'preprocess_data/add_user_sof_performance_features'처럼 경로로 남는다.
+    최대 RSS는 백그라운드 스레드가 RSS_SAMPLE_INTERVAL마다 읽은 값이고, trace_memory=True면
+    tracemalloc으로 Python/NumPy 할당 최대치도 기록한다 (실행이 느려지므로 기본은 끔).
+    profile_stages에 포함된 단계는 cProfile로 감싸 output_dir에 .prof 파일을 남긴다.
+    """
+    
+    def __init__(self, output_dir, run_id, trace_memory=False, profile_stages=()):
+        self.output_dir = output_dir
+        self.run_id = run_id
+        self.trace_memory = trace_memory
+        self.profile_stages = set(profile_stages)
+        self.stages = []
+        self._open = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = (time.perf_counter(), time.process_time())
+        self.peak_rss_mb = current_rss_mb()
+        if trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+        self._sampler.start()
+    
+    def _sample_rss(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = current_rss_mb()
+            if rss is None:
+                return
+            with self._lock:
+                self.peak_rss_mb = max(self.peak_rss_mb or 0.0, rss)
+                for record in self._open:
+                    record['peak_rss_mb'] = max(record['peak_rss_mb'] or 0.0, rss)
+    
+    def _fold_traced_peak(self):
+        """tracemalloc 최대치를 열린 단계 전부에 반영하고 초기화 (중첩 단계마다 따로 재기 위해)"""
+        if not self.trace_memory:
+            return
+        import tracemalloc
+        peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        for record in self._open:
+            record['traced_peak_mb'] = max(record.get('traced_peak_mb', 0.0), peak)
+        tracemalloc.reset_peak()
+    
+    def profile_path(self, name):
+        """name 단계의 cProfile 덤프 경로 (profile_stages에 없으면 None)"""
+        if name not in self.profile_stages and name.split(':')[0] not in self.profile_stages:
+            return None
+        safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+        return os.path.join(self.output_dir, f'profile_{self.run_id}_{safe_name}.prof')
+    
+    def stage(self, name, rows=None):
+        return _ProfiledStage(self, name, rows)
+    
+    def add_stage(self, name, wall_time, cpu_time, rows=None, peak_rss_mb=None, profile=None):
+        """다른 프로세스(모델 학습 워커)에서 잰 단계 기록 추가 (열린 단계 아래에 중첩)"""
+        self.stages.append({
+            'name': f"{self._open[-1]['name']}/{name}" if self._open else name,
+            'wall_time': wall_time, 'cpu_time': cpu_time, 'rows': rows,
+            'rss_start_mb': None, 'rss_end_mb': None, 'peak_rss_mb': peak_rss_mb,
+            'process': 'worker', 'profile': profile,
+        })
+    
+    def report(self, **info):
+        self._stop.set()
+        self._sampler.join()
+        wall_start, cpu_start = self._started
+        return {
+            **info,
+            'run_id': self.run_id,
+            'python': sys.version.split()[0],
+            'platform': sys.platform,
+            'cpu_count': os.cpu_count(),
+            'wall_time': time.perf_counter() - wall_start,
+            'cpu_time': time.process_time() - cpu_start,
+            'peak_rss_mb': self.peak_rss_mb,
+            'trace_memory': self.trace_memory,
+            'stages': self.stages,
+        }
+
+
+class _ProfiledStage:
+    """RunProfiler.stage()의 컨텍스트 매니저 (with 블록 안에서 record['rows']를 채울 수 있다)"""
+    
+    def __init__(self, profiler, name, rows):
+        self.profiler = profiler
+        parents = [r['name'] for r in profiler._open]
+        self.record = {
+            'name': f"{parents[-1]}/{name}" if parents else name,
+            'rows': rows,
+            'peak_rss_mb': None,
+        }
+        self.short_name = name
+        self.profile = None
+    
+    def __enter__(self):
+        profiler = self.profiler
+        profiler._fold_traced_peak()
+        rss = current_rss_mb()
+        self.record.update({'rss_start_mb': rss, 'peak_rss_mb': rss})
+        with profiler._lock:
+            profiler._open.append(self.record)
+        profiler.stages.append(self.record)  # 시작 순서대로 기록
+        path = profiler.profile_path(self.short_name)
+        if path:
+            import cProfile
+            self.profile = (cProfile.Profile(), path)
+            self.profile[0].enable()
+        self._started = (time.perf_counter(), time.process_time())
+        return self.record
+    
+    def __exit__(self, *exc):
+        wall_start, cpu_start = self._started
+        self.record['wall_time'] = time.perf_counter() - wall_start
+        self.record['cpu_time'] = time.process_time() - cpu_start
+        if self.profile:
+            profile, path = self.profile
+            profile.disable()
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            profile.dump_stats(path)
+            self.record['profile'] = path
+        profiler = self.profiler
+        profiler._fold_traced_peak()
+        rss = current_rss_mb()
+        with profiler._lock:
+            profiler._open.remove(self.record)
+            self.record['rss_end_mb'] = rss
+            if rss is not None:
+                self.record['peak_rss_mb'] = max(self.record['peak_rss_mb'] or 0.0, rss)
+        return False
+
+
+def process_peak_rss_mb():
+    """현재 프로세스 전체 기간의 최대 RSS (MB, resource가 없는 Windows에서는 현재 RSS)"""
+    if importlib.util.find_spec('resource') is None:
+        return current_rss_mb()
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024  # macOS는 바이트, Linux는 KB
+
+
+def finish_run_profile(output_dir, mode, **info):
+    """실행 중인 RunProfiler의 리포트를 저장하고 기록 종료 (리포트 경로 반환)"""
+    global _run_profiler
+    if _run_profiler is None:
+        return None
+    report = _run_profiler.report(mode=mode, **info)
+    _run_profiler = None
+    return save_run_report(report, output_dir, mode)
+
+
+def profile_stage(name, rows=None):
+    """실행 중인 RunProfiler가 있으면 단계를 기록하는 컨텍스트 매니저 (yield 값은 단계 기록 dict)"""
+    if _run_profiler is None:
+        from contextlib import nullcontext
+        return nullcontext({})
+    return _run_profiler.stage(name, rows)
+
+
+def find_latest_run_report(output_dir, mode, exclude=None):
+    """ml_models/{mode}의 가장 최근 실행 리포트 경로 (없으면 None)"""
+    paths = [p for p in sorted(Path(output_dir).glob(f'run_report_{mode}_*.json')) if str(p) != exclude]
+    return str(paths[-1]) if paths else None
+
+
+def print_run_report(report, previous=None):
+    """단계별 시간/메모리 표 출력, previous가 있으면 느려진 단계 경고"""
+    previous_times = {s['name']: s.get('wall_time') for s in (previous or {}).get('stages', [])}
+    print(f"\n⏱️  단계별 실행 기록 (wall {report['wall_time']:.1f}초, CPU {report['cpu_time']:.1f}초, "
+          f"최대 RSS {report['peak_rss_mb'] or 0:.0f} MB):")
+    print(f"   {'stage':50s} {'wall(s)':>8s} {'cpu(s)':>8s} {'peak RSS':>9s} {'rows':>9s} {'이전 대비':>9s}")
+    regressions = []
+    for stage in report['stages']:
+        wall = stage.get('wall_time') or 0.0
+        before = previous_times.get(stage['name'])
+        change = f"{wall / before:8.2f}x" if before else ''
+        if before and wall >= STAGE_REGRESSION_MIN_SECONDS and wall > before * STAGE_REGRESSION_TOLERANCE:
+            regressions.append((stage['name'], before, wall))
+        peak = f"{stage['peak_rss_mb']:6.0f} MB" if stage.get('peak_rss_mb') is not None else ''
+        rows = f"{stage['rows']:9d}" if stage.get('rows') is not None else ''
+        print(f"   {stage['name'][:50]:50s} {wall:8.2f} {stage.get('cpu_time') or 0:8.2f} {peak:>9s} {rows:>9s} {change:>9s}")
+    for name, before, wall in regressions:
+        print(f"   ⚠️  {name}: {before:.1f}초 → {wall:.1f}초 (이전 실행 대비 {wall / before:.1f}배)")
+    return regressions
+
+
+def save_run_report(report, output_dir, mode):
+    """실행 리포트를 모델 메타데이터 옆(ml_models/{mode}/run_report_{mode}_{run_id}.json)에 저장하고 이전 실행과 비교"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"run_report_{mode}_{report['run_id']}.json")
+    previous_path = find_latest_run_report(output_dir, mode, exclude=path)
+    previous = None
+    if previous_path:
+        try:
+            with open(previous_path, 'r') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = None
+    report['regressions'] = [
+        {'stage': name, 'previous_wall_time': before, 'wall_time': wall}
+        for name, before, wall in print_run_report(report, previous)
+    ]
+    report['previous_report'] = os.path.basename(previous_path) if previous_path else None
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=_json_default)
+    print(f"✅ 실행 리포트 저장: {path}")
+    return path
+
+
+# 기본 특성 (레이스 시작 전에 알 수 있는 필드만!)
+BASE_FEATURES = [
+    # 핵심 특성 (레이스 시작 전 알 수 있음)
+    'i_rating',
+    'safety_rating',
+
+    # 상대 전력 통계 (핵심!) - 레이스 시작 전 알 수 있음
+    'avg_opponent_ir',
+    'max_opponent_ir',
+    'min_opponent_ir',
+    'ir_diff_from_avg',
+    'sof',
+
+    # 파생 변수 (상대 전력 기반)
+    'ir_advantage',
+    'ir_range',
+    'ir_rank_pct',
+    'ir_vs_max',
+    'ir_vs_min',
+    'ir_std_estimate',
+    'ir_relative_to_sof',
+
+    # 주행 특성 (과거 데이터, 레이스 시작 전 알 수 있음)
+    'best_lap_time',
+    'average_lap_time',
+    'lap_time_diff',
+    'lap_time_consistency',
+
+    # 세션 컨텍스트 (레이스 시작 전 알 수 있음)
+    'total_participants',
+
+    # 유저별 상대 전력(ir_diff_from_avg) 구간별 성능 특성 (핵심!)
+    # 내 iRating vs 상대 평균 iRating 차이에 따른 성능 패턴
+    'user_avg_finish_pct_much_lower',  # 내가 상대보다 200+ 낮을 때 → 강한 상대
+    'user_avg_finish_pct_lower',       # 내가 상대보다 50-200 낮을 때 → 약간 강한 상대
+    'user_avg_finish_pct_similar',    # 비슷할 때
+    'user_avg_finish_pct_higher',     # 내가 상대보다 50-200 높을 때 → 약간 약한 상대
+    'user_avg_finish_pct_much_higher', # 내가 상대보다 200+ 높을 때 → 약한 상대
+    'user_ir_diff_performance_diff',   # 강한 상대에서의 성능 - 약한 상대에서의 성능
+    'user_expected_finish_pct_by_ir_diff',  # 현재 상대 전력 구간에서의 예상 성능
+
+    # 사고 영향도 특성 (사고 발생 시 순위 변동 반영)
+    'incident_impact_on_position',      # 사고 발생 시 평균 순위 하락 (완주율 단위)
+    'incident_impact_rank_drop',        # 사고 발생 시 평균 순위 하락 (순위 단위)
+    'high_incident_risk',              # 사고 발생 확률이 높은지 여부 (0/1)
+]
 
 # Post-grid 모드에서만 사용되는 특성들
 POST_ONLY_FEATURES = [
@@ -112,54 +407,480 @@ POST_ONLY_FEATURES = [
 ]
 
 
-def load_data():
-    """Supabase에서 학습 데이터 로드"""
-    print("📥 데이터 로드 중...")
+# 전처리에서 하나라도 없으면 제외하는 필드 (레이스 시작 전에 알 수 있는 필드 + 타겟)
+# 제외: starting_position, laps_complete (레이스 시작 전에 알 수 없음)
+REQUIRED_FIELDS = [
+    'i_rating', 'safety_rating',
+    'avg_opponent_ir', 'max_opponent_ir', 'min_opponent_ir',
+    'ir_diff_from_avg', 'sof', 'total_participants',
+    'best_lap_time',
+    'actual_finish_position'  # 타겟 변수
+]
+
+# 학습 데이터 테이블과 로컬 스냅샷 설정
+TRAINING_TABLE = 'iracing_ml_training_data'
+SNAPSHOT_DIR = os.path.join('ml_models', 'cache')
+SNAPSHOT_KEY_COLUMNS = ['subsession_id', 'cust_id']
+# 수집 API는 insert만 하므로 created_at 기준이면 늦게 수집된 과거 세션도 놓치지 않는다
+# (session_start_time 기준은 idx_iracing_ml_training_data_session_time 인덱스를 사용)
+SNAPSHOT_SYNC_COLUMNS = ['created_at', 'session_start_time']
+
+# iracing_ml_training_data 중 학습에 사용하는 컬럼과 로드 시 dtype
+# (select('*') 대신 필요한 컬럼만 요청하고, 리스트 of dict를 거치지 않고 컬럼별 NumPy 배열로 바로 만든다)
+CATEGORICAL_COLUMNS = ['series_id', 'track_id', 'car_id']
+TARGET_COLUMN = 'actual_finish_position'
+TIME_COLUMN = 'session_start_time'
+TRAINING_DATA_SCHEMA = {
+    # 키 / 메타
+    'id': 'string',
+    'subsession_id': 'int32',
+    'cust_id': 'int32',
+    'created_at': 'datetime',
+    'session_start_time': 'datetime',
+    # 카테고리 (원-핫 또는 네이티브 카테고리 인코딩 대상)
+    'series_id': 'category',
+    'track_id': 'category',
+    'car_id': 'category',
+    # 기본 특성
+    'i_rating': 'float32',
+    'safety_rating': 'float32',
+    'avg_opponent_ir': 'float32',
+    'max_opponent_ir': 'float32',
+    'min_opponent_ir': 'float32',
+    'ir_diff_from_avg': 'float32',
+    'sof': 'float32',
+    'total_participants': 'float32',
+    'best_lap_time': 'float32',
+    'average_lap_time': 'float32',
+    # Post-grid 특성
+    'starting_position': 'float32',
+    'qualifying_position': 'float32',
+    'qualifying_best_lap_time': 'float32',
+    'practice_best_lap_time': 'float32',
+    'fastest_qualifying_lap_time': 'float32',
+    # 사고 영향도 계산용 / 타겟
+    'actual_incidents': 'float32',
+    'actual_finish_position': 'float32',
+}
+
+
+def training_columns(mode='pre'):
+    """모드별로 테이블에서 가져올 컬럼 목록 (특성 + 카테고리 + 타겟 + 키/시간)"""
+    features = BASE_FEATURES + (POST_ONLY_FEATURES if mode == 'post' else [])
+    columns = ['id', 'subsession_id', 'cust_id', 'created_at', TIME_COLUMN]
+    columns += [f for f in features if f in TRAINING_DATA_SCHEMA]
+    columns += CATEGORICAL_COLUMNS + ['actual_incidents', TARGET_COLUMN]
+    return list(dict.fromkeys(columns))
+
+
+def _int_categorical(values):
+    """정수 id 값을 int64 카테고리의 pandas Categorical로 변환 (결측은 NaN 코드)"""
+    categorical = pd.Categorical(pd.to_numeric(pd.Series(values), errors='coerce').astype('Int64'))
+    return categorical.set_categories(categorical.categories.astype('int64'))
+
+
+def _typed_column(values, dtype):
+    """JSON 값 리스트를 스키마 dtype의 배열로 변환"""
+    if dtype == 'float32':
+        return np.array(values, dtype=np.float32)  # None → NaN
+    if dtype == 'int32':
+        return np.array(values, dtype=np.int32)
+    if dtype == 'category':
+        return _int_categorical(values)
+    if dtype == 'datetime':
+        return pd.to_datetime(pd.Series(values, dtype=object), utc=True, format='ISO8601')
+    return pd.array(values, dtype='string')
+
+
+def rows_to_frame(rows, columns):
+    """Supabase 응답(list of dict)을 스키마 dtype의 DataFrame으로 변환"""
+    data = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        data[column] = _typed_column(values, TRAINING_DATA_SCHEMA[column]) if column in TRAINING_DATA_SCHEMA else values
+    return pd.DataFrame(data)
+
+
+def apply_training_schema(df):
+    """이미 로드된 DataFrame(스냅샷, 병합 결과 등)의 컬럼 dtype을 스키마에 맞춤"""
+    for column, dtype in TRAINING_DATA_SCHEMA.items():
+        if column not in df.columns:
+            continue
+        if dtype == 'category':
+            if not isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = _int_categorical(df[column].to_numpy())
+        elif dtype == 'datetime':
+            df[column] = pd.to_datetime(df[column], utc=True, format='ISO8601')
+        elif dtype in ('float32', 'int32'):
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+
+def _id_partitions(num_partitions):
+    """UUID 기본키(id) 공간을 균등한 [하한, 상한) 구간으로 분할
+
+    id는 gen_random_uuid()로 생성되므로 앞 32비트 기준으로 나누면 구간별 레코드 수가 비슷하다.
+    """
+    bounds = [
+        f'{i * (1 << 32) // num_partitions:08x}-0000-0000-0000-000000000000'
+        for i in range(num_partitions)
+    ]
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+def _execute_with_retry(build_query, retries=3, backoff=0.5):
+    """쿼리 실행 (실패 시 지수 백오프로 재시도)"""
+    for attempt in range(retries + 1):
+        try:
+            return build_query().execute()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            wait = backoff * (2 ** attempt)
+            print(f"   ⚠️  페이지 요청 실패 ({e}), {wait:.1f}초 후 재시도 ({attempt + 1}/{retries})")
+            time.sleep(wait)
+
+
+def fetch_training_rows(since=None, sync_column='created_at', page_size=1000, concurrency=4,
+                        columns=None, retries=3, client=None):
+    """Supabase에서 학습 데이터 레코드 조회 (키셋 페이지네이션 + 동시 요청)
+
+    id 공간을 여러 구간으로 나누고, 각 구간은 `id > 마지막 id` 키셋 방식으로 순서대로 페이지를 받는다.
+    구간들은 스레드 풀에서 동시에 처리되므로 내보내기 속도가 왕복 지연이 아니라 동시성에 비례하고,
+    export 도중 테이블이 바뀌어도 offset 방식처럼 레코드가 밀리거나 중복되지 않는다.
+
+    Args:
+        since: 이 시각(포함) 이후의 레코드만 조회 (None이면 전체)
+        sync_column: since를 비교할 컬럼 (created_at 또는 session_start_time)
+        page_size: 페이지당 요청 레코드 수 (서버 max-rows보다 크면 서버 상한만큼씩 받는다)
+        concurrency: 동시에 요청하는 페이지 수 (스레드 수)
+        columns: select할 컬럼 목록 (None이면 전체, 키셋용 id는 항상 포함)
+        retries: 페이지별 재시도 횟수
+        client: Supabase 클라이언트 (기본값: get_supabase_client())
+    """
+    client = client or get_supabase_client()
+    concurrency = max(1, concurrency)
+    if columns is not None and 'id' not in columns:
+        columns = ['id'] + list(columns)
+    select_columns = '*' if columns is None else ','.join(columns)
+    # 구간을 동시성보다 많이 나눠서 느린 구간 하나가 전체를 붙잡지 않도록 한다
+    partitions = _id_partitions(concurrency * 4 if concurrency > 1 else 1)
+    
+    progress = {'rows': 0, 'pages': 0}
+    progress_lock = threading.Lock()
+    started = time.perf_counter()
+    
+    def fetch_partition(lower, upper):
+        rows = []
+        last_id = None
+        while True:
+            def build_query():
+                query = client.table(TRAINING_TABLE).select(select_columns)
+                query = query.gte('id', lower) if last_id is None else query.gt('id', last_id)
+                if upper is not None:
+                    query = query.lt('id', upper)
+                if since is not None:
+                    query = query.gte(sync_column, since)
+                return query.order('id').limit(page_size)
+            
+            response = _execute_with_retry(build_query, retries=retries)
+            page = response.data or []
+            rows.extend(page)
+            
+            with progress_lock:
+                progress['rows'] += len(page)
+                progress['pages'] += 1
+                if progress['pages'] % 20 == 0:
+                    print(f"   {progress['rows']}개 레코드 로드됨...")
+            
+            # 짧은 페이지로 끝내지 않는다: PostgREST는 응답을 max-rows(기본 1000)로 자르므로
+            # page_size가 그보다 크면 모든 페이지가 짧다. 빈 페이지가 올 때까지 이어서 받는다.
+            if not page:
+                return rows
+            last_id = page[-1]['id']
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(fetch_partition, lower, upper) for lower, upper in partitions]
+        # 구간 순서대로 합치면 결과가 id 순으로 정렬된다
+        all_data = [row for future in futures for row in future.result()]
+    
+    elapsed = time.perf_counter() - started
+    rate = len(all_data) / elapsed if elapsed > 0 else float('inf')
+    print(f"   {len(all_data)}개 레코드, {progress['pages']}개 페이지, {elapsed:.1f}초 ({rate:,.0f} rows/s, 동시 요청 {concurrency})")
+    
+    if columns is None:
+        return apply_training_schema(pd.DataFrame(all_data))
+    return rows_to_frame(all_data, columns)
+
+
+def _snapshot_paths(snapshot_dir=SNAPSHOT_DIR):
+    data_path = os.path.join(snapshot_dir, f'{TRAINING_TABLE}.parquet')
+    meta_path = os.path.join(snapshot_dir, f'{TRAINING_TABLE}.meta.json')
+    return data_path, meta_path
+
+
+def _high_water_mark(df, sync_column):
+    """스냅샷의 동기화 기준 시각 (sync_column 최댓값, ISO 문자열)"""
+    if sync_column not in df.columns or len(df) == 0:
+        return None
+    latest = pd.to_datetime(df[sync_column], utc=True, errors='coerce').max()
+    return None if pd.isna(latest) else latest.isoformat()
+
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """로컬 스냅샷 로드. 없거나 읽을 수 없으면 (None, None)"""
+    data_path, meta_path = _snapshot_paths(snapshot_dir)
+    if not os.path.exists(data_path) or not os.path.exists(meta_path):
+        return None, None
+    
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        df = pd.read_parquet(data_path)
+    except (ImportError, ValueError, OSError) as e:
+        print(f"   ⚠️  스냅샷을 읽을 수 없습니다: {e}")
+        return None, None
+    
+    return df, meta
+
+
+def save_snapshot(df, sync_column='created_at', snapshot_dir=SNAPSHOT_DIR, all_columns=False):
+    """학습 데이터를 Parquet 스냅샷으로 저장 (pyarrow 필요)"""
+    data_path, meta_path = _snapshot_paths(snapshot_dir)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    
+    try:
+        # 다른 프로세스가 읽는 도중 깨진 파일을 보지 않도록 임시 파일에 쓴 뒤 교체
+        tmp_path = f'{data_path}.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, data_path)
+    except ImportError:
+        print("   ℹ️  pyarrow가 설치되지 않아 스냅샷을 저장하지 않습니다: pip install pyarrow")
+        return None
+    
+    meta = {
+        'table': TRAINING_TABLE,
+        'sync_column': sync_column,
+        'high_water_mark': _high_water_mark(df, sync_column),
+        'rows': int(len(df)),
+        'columns': list(df.columns),
+        'all_columns': all_columns,
+        'saved_at': datetime.now().isoformat(),
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    print(f"   💾 스냅샷 저장: {data_path} ({len(df)}개 레코드, 기준: {meta['high_water_mark']})")
+    return meta
+
+
+def merge_snapshot(snapshot_df, delta_df, key_columns=SNAPSHOT_KEY_COLUMNS):
+    """스냅샷과 델타를 (subsession_id, cust_id) 기준으로 병합 (델타 우선)"""
+    if delta_df is None or len(delta_df) == 0:
+        return snapshot_df
+    merged = pd.concat([snapshot_df, delta_df], ignore_index=True)
+    return merged.drop_duplicates(subset=key_columns, keep='last').reset_index(drop=True)
+
+
+class TrainingDataSource(ABC):
+    """학습 데이터 소스 인터페이스 (추상 메서드를 모두 구현해야 생성할 수 있다)
+
+    fetch()는 TRAINING_DATA_SCHEMA dtype으로 변환된 DataFrame을 반환한다.
+    since가 주어지면 sync_column 값이 since 이상인 레코드만 반환한다 (스냅샷 델타 동기화용).
+    """
+    name = 'base'
     
-    # 전체 데이터 로드 (페이지네이션)
-    all_data = []
-    page_size = 1000
-    offset = 0
+    @abstractmethod
+    def fetch(self, columns=None, since=None, sync_column='created_at'):
+        """TRAINING_DATA_SCHEMA dtype DataFrame 반환"""
     
-    while True:
-        response = supabase.table('iracing_ml_training_data')\
-            .select('*')\
-            .range(offset, offset + page_size - 1)\
-            .execute()
-        
-        if not response.data or len(response.data) == 0:
-            break
-        
-        all_data.extend(response.data)
-        offset += page_size
-        
-        if len(response.data) < page_size:
-            break
-        
-        print(f"   {len(all_data)}개 레코드 로드됨...")
+    def describe(self):
+        return self.name
+
+
+class SupabaseDataSource(TrainingDataSource):
+    """Supabase iracing_ml_training_data 테이블 (키셋 페이지네이션 + 동시 요청)"""
+    name = 'supabase'
+    
+    def __init__(self, client=None, page_size=1000, concurrency=4):
+        self.client = client
+        self.page_size = page_size
+        self.concurrency = concurrency
+    
+    def fetch(self, columns=None, since=None, sync_column='created_at'):
+        return fetch_training_rows(
+            since=since, sync_column=sync_column, page_size=self.page_size,
+            concurrency=self.concurrency, columns=columns, client=self.client
+        )
+
+
+class LocalFileDataSource(TrainingDataSource):
+    """로컬 파일 데이터 소스 공통 처리 (컬럼 선택, since 필터, dtype 변환)"""
+    
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"데이터 파일을 찾을 수 없습니다: {path}")
+        self.path = path
+    
+    def describe(self):
+        return f'{self.name}:{self.path}'
+    
+    @abstractmethod
+    def available_columns(self):
+        """파일에 있는 컬럼 이름 목록"""
+    
+    @abstractmethod
+    def read(self, columns):
+        """columns만 읽은 DataFrame (None이면 전체 컬럼)"""
+    
+    def fetch(self, columns=None, since=None, sync_column='created_at'):
+        if columns is not None:
+            available = set(self.available_columns())
+            columns = [c for c in columns if c in available]
+        df = apply_training_schema(self.read(columns))
+        if since is not None and sync_column in df.columns:
+            df = df[df[sync_column] >= pd.Timestamp(since)].reset_index(drop=True)
+        return df
+
+
+class ParquetDataSource(LocalFileDataSource):
+    """Parquet 파일 (예: --snapshot으로 저장한 ml_models/cache 스냅샷)"""
+    name = 'parquet'
+    
+    def available_columns(self):
+        import pyarrow.parquet as pq
+        return pq.read_schema(self.path).names
     
-    df = pd.DataFrame(all_data)
-    print(f"✅ 총 {len(df)}개 레코드 로드 완료")
+    def read(self, columns):
+        return pd.read_parquet(self.path, columns=columns)
+
+
+class CsvDataSource(LocalFileDataSource):
+    """CSV 파일 (Supabase 대시보드 export 등)"""
+    name = 'csv'
+    
+    def available_columns(self):
+        return pd.read_csv(self.path, nrows=0).columns.tolist()
+    
+    def read(self, columns):
+        return pd.read_csv(self.path, usecols=columns)
+
+
+class SqliteDataSource(LocalFileDataSource):
+    """SQLite 데이터베이스의 iracing_ml_training_data 테이블"""
+    name = 'sqlite'
+    
+    def __init__(self, path, table=TRAINING_TABLE):
+        super().__init__(path)
+        self.table = table
+    
+    def _connect(self):
+        import sqlite3
+        return sqlite3.connect(self.path)
+    
+    def available_columns(self):
+        with self._connect() as conn:
+            return [row[1] for row in conn.execute(f'PRAGMA table_info("{self.table}")')]
+    
+    def read(self, columns):
+        select = '*' if columns is None else ', '.join(f'"{c}"' for c in columns)
+        with self._connect() as conn:
+            return pd.read_sql_query(f'SELECT {select} FROM "{self.table}"', conn)
+
+
+DATA_SOURCES = {
+    'supabase': SupabaseDataSource,
+    'parquet': ParquetDataSource,
+    'csv': CsvDataSource,
+    'sqlite': SqliteDataSource,
+}
+
+
+def create_data_source(kind='supabase', path=None, page_size=1000, concurrency=4):
+    """CLI 옵션으로 데이터 소스 생성"""
+    if kind not in DATA_SOURCES:
+        raise ValueError(f"Unknown data source: {kind}")
+    if kind == 'supabase':
+        return SupabaseDataSource(page_size=page_size, concurrency=concurrency)
+    if not path:
+        raise ValueError(f"--source {kind}에는 --source-path가 필요합니다.")
+    return DATA_SOURCES[kind](path)
+
+
+def load_data(use_snapshot=False, refresh_snapshot=False, sync_column='created_at',
+              page_size=1000, concurrency=4, mode='pre', all_columns=False, source=None):
+    """학습 데이터 로드 (기본: Supabase)
+
+    기본적으로 mode에 필요한 컬럼(training_columns)만 요청하고 TRAINING_DATA_SCHEMA의 dtype
+    (int32 id, float32 수치, series_id/track_id/car_id 카테고리)으로 바로 변환한다.
+
+    Args:
+        use_snapshot: 로컬 Parquet 스냅샷을 사용하고 새 레코드만 델타 동기화
+        refresh_snapshot: 스냅샷을 무시하고 전체를 다시 받아 스냅샷 재작성
+        sync_column: 델타 동기화 기준 컬럼 (SNAPSHOT_SYNC_COLUMNS 중 하나)
+        page_size: 페이지당 요청 레코드 수 (서버 max-rows보다 크면 서버 상한만큼씩 받는다)
+        concurrency: 동시 페이지 요청 수
+        mode: 'pre' 또는 'post' (가져올 컬럼 결정)
+        all_columns: True면 select('*')로 전체 컬럼 로드
+        source: TrainingDataSource (None이면 SupabaseDataSource)
+    """
+    print("📥 데이터 로드 중...")
+    
+    if sync_column not in SNAPSHOT_SYNC_COLUMNS:
+        raise ValueError(f"Unknown sync column: {sync_column}")
+    
+    columns = None if all_columns else training_columns(mode)
+    if source is None:
+        source = SupabaseDataSource(page_size=page_size, concurrency=concurrency)
+    print(f"   데이터 소스: {source.describe()}")
+    
+    snapshot_df, meta = (None, None)
+    if use_snapshot and not refresh_snapshot:
+        snapshot_df, meta = load_snapshot()
+        if meta is not None and meta.get('sync_column') != sync_column:
+            print(f"   ⚠️  스냅샷 기준 컬럼({meta.get('sync_column')})이 달라 전체를 다시 로드합니다.")
+            snapshot_df, meta = (None, None)
+        elif meta is not None and columns is not None and not set(columns) <= set(meta.get('columns', [])):
+            print("   ⚠️  스냅샷에 필요한 컬럼이 없어 전체를 다시 로드합니다.")
+            snapshot_df, meta = (None, None)
+        elif meta is not None and columns is None and meta.get('all_columns') is not True:
+            print("   ⚠️  스냅샷이 일부 컬럼만 가지고 있어 전체를 다시 로드합니다.")
+            snapshot_df, meta = (None, None)
+    
+    if snapshot_df is not None and meta.get('high_water_mark'):
+        print(f"   💾 로컬 스냅샷 사용: {len(snapshot_df)}개 레코드 (기준: {meta['high_water_mark']})")
+        # 같은 시각의 레코드를 놓치지 않도록 기준 시각 포함(gte)으로 조회하고 병합 시 중복 제거
+        delta_df = source.fetch(columns=columns, since=meta['high_water_mark'], sync_column=sync_column)
+        if columns is not None:
+            snapshot_df = snapshot_df[columns]
+        df = apply_training_schema(merge_snapshot(snapshot_df, delta_df))
+        print(f"   🔄 델타 동기화: {len(delta_df)}개 레코드 조회, {len(df) - len(snapshot_df)}개 신규")
+        if len(df) != len(snapshot_df) or _high_water_mark(df, sync_column) != meta['high_water_mark']:
+            save_snapshot(df, sync_column=sync_column, all_columns=all_columns)
+    else:
+        df = source.fetch(columns=columns)
+        if use_snapshot or refresh_snapshot:
+            save_snapshot(df, sync_column=sync_column, all_columns=all_columns)
+    
+    memory_mb = df.memory_usage(deep=True).sum() / 1024 ** 2
+    print(f"✅ 총 {len(df)}개 레코드 로드 완료 ({len(df.columns)}개 컬럼, {memory_mb:.1f} MB)")
     return df
 
 
-def preprocess_data(df):
-    """데이터 전처리"""
+def preprocess_data(df, incident_point_in_time=False, fill_nan=True):
+    """데이터 전처리
+
+    Args:
+        df: load_data()로 로드한 원본 데이터
+        incident_point_in_time: 사고 영향도를 이전 세션 데이터만으로 계산할지 여부
+        fill_nan: 결측 대체와 남은 결측 레코드 제거까지 할지 여부 (False면 결측을 그대로 두고,
+            호출자가 fit_nan_fills()/apply_nan_fills()로 학습 구간 기준 대체값을 적용한다)
+    """
     print("\n🔧 데이터 전처리 중...")
     
-    # 필수 필드 확인 (레이스 시작 전에 알 수 있는 필드만)
-    required_fields = [
-        'i_rating', 'safety_rating',
-        'avg_opponent_ir', 'max_opponent_ir', 'min_opponent_ir',
-        'ir_diff_from_avg', 'sof', 'total_participants',
-        'best_lap_time',
-        'actual_finish_position'  # 타겟 변수
-    ]
-    # 제외: starting_position, laps_complete (레이스 시작 전에 알 수 없음)
-    
     # 필수 필드가 모두 있는 레코드만 선택
     initial_count = len(df)
-    df_clean = df.dropna(subset=required_fields)
+    df_clean = df.dropna(subset=REQUIRED_FIELDS)
     print(f"   필수 필드 확인: {initial_count}개 → {len(df_clean)}개")
     
     # average_lap_time null 처리 (best_lap_time으로 대체)
@@ -170,105 +891,34 @@ def preprocess_data(df):
     
     # 특성 엔지니어링 (개선)
     print("   파생 변수 생성 중...")
-    
-    # 상대 전력 관련 파생 변수
-    df_clean['ir_advantage'] = df_clean['ir_diff_from_avg'] / 100
-    df_clean['ir_range'] = df_clean['max_opponent_ir'] - df_clean['min_opponent_ir']
-    df_clean['ir_rank_pct'] = (
-        (df_clean['i_rating'] - df_clean['min_opponent_ir']) / 
-        (df_clean['max_opponent_ir'] - df_clean['min_opponent_ir'] + 1)
-    )
-    
-    # 추가 상대 전력 파생 변수
-    df_clean['ir_vs_max'] = df_clean['i_rating'] - df_clean['max_opponent_ir']  # 최고 상대와의 차이
-    df_clean['ir_vs_min'] = df_clean['i_rating'] - df_clean['min_opponent_ir']  # 최저 상대와의 차이
-    df_clean['ir_std_estimate'] = df_clean['ir_range'] / 4  # 대략적인 표준편차 추정
-    df_clean['ir_relative_to_sof'] = (df_clean['i_rating'] - df_clean['sof']) / df_clean['sof']  # SOF 대비 상대적 위치
-    
-    # 주행 특성 파생 변수
-    df_clean['lap_time_diff'] = df_clean['average_lap_time'] - df_clean['best_lap_time']
-    df_clean['lap_time_consistency'] = df_clean['lap_time_diff'] / (df_clean['best_lap_time'] + 1)  # 일관성 (낮을수록 좋음)
-    
-    if 'starting_position' in df_clean.columns:
-        df_clean['starting_rank_pct'] = df_clean['starting_position'] / df_clean['total_participants']
-    
-    # 세션 컨텍스트 파생 변수
-    df_clean['participant_density'] = df_clean['total_participants']  # 참가자 밀도 (추가 특성 엔지니어링 가능)
-    
-    # ⚠️ starting_rank_pct는 제외 (레이스 시작 전에 알 수 없음)
-    # df_clean['starting_rank_pct'] = df_clean['starting_position'] / df_clean['total_participants']
+    add_relative_features(df_clean)
     
     # 유저별 SOF 구간별 성능 특성 추가 (핵심!)
     print("   유저별 상대 전력 구간별 성능 특성 계산 중...")
-    df_clean = add_user_sof_performance_features(df_clean)
+    with profile_stage('add_user_sof_performance_features', rows=len(df_clean)):
+        df_clean = add_user_sof_performance_features(df_clean)
     
     # 사고 영향도 특성 추가
     print("   사고 영향도 특성 계산 중...")
-    df_clean = add_incident_impact_features(df_clean)
-    
-    # 유저별 상대 전력 특성들의 NaN 처리
-    user_ir_diff_features = [
-        'user_avg_finish_pct_much_lower',
-        'user_avg_finish_pct_lower',
-        'user_avg_finish_pct_similar',
-        'user_avg_finish_pct_higher',
-        'user_avg_finish_pct_much_higher',
-        'user_ir_diff_performance_diff',
-        'user_expected_finish_pct_by_ir_diff'
-    ]
+    with profile_stage('add_incident_impact_features', rows=len(df_clean)):
+        df_clean = add_incident_impact_features(df_clean, point_in_time=incident_point_in_time)
+    
+    if not fill_nan:
+        print(f"✅ 전처리 완료: {len(df_clean)}개 레코드 (결측 대체 생략)")
+        return df_clean
     
-    print("   유저별 상대 전력 특성 NaN 처리 중...")
-    for feature in user_ir_diff_features:
-        if feature in df_clean.columns:
-            null_count = df_clean[feature].isna().sum()
-            if null_count > 0:
-                # NaN을 중앙값으로 대체 (해당 유저의 전체 평균 성능이 없으면 0.5 사용)
-                if feature == 'user_ir_diff_performance_diff':
-                    # 성능 차이는 0으로 대체 (차이가 없다는 의미)
-                    df_clean[feature] = df_clean[feature].fillna(0.0)
-                elif feature == 'user_expected_finish_pct_by_ir_diff':
-                    # 예상 성능은 전체 평균 완주율로 대체
-                    if 'actual_finish_position' in df_clean.columns and 'total_participants' in df_clean.columns:
-                        avg_finish_pct = (df_clean['actual_finish_position'] / df_clean['total_participants']).median()
-                        df_clean[feature] = df_clean[feature].fillna(avg_finish_pct)
-                    else:
-                        df_clean[feature] = df_clean[feature].fillna(0.5)
-                else:
-                    # 각 구간별 평균 완주율은 전체 평균 완주율로 대체
-                    if 'actual_finish_position' in df_clean.columns and 'total_participants' in df_clean.columns:
-                        avg_finish_pct = (df_clean['actual_finish_position'] / df_clean['total_participants']).median()
-                        df_clean[feature] = df_clean[feature].fillna(avg_finish_pct)
-                    else:
-                        df_clean[feature] = df_clean[feature].fillna(0.5)
-                print(f"      {feature}: {null_count}개 NaN 처리 완료")
-    
-    # 최종 NaN 확인 및 처리 (나머지 특성들)
-    print("   최종 NaN 확인 중...")
-    nan_counts = df_clean.isna().sum()
-    features_with_nan = nan_counts[nan_counts > 0]
-    if len(features_with_nan) > 0:
-        print(f"   ⚠️  NaN이 있는 특성: {len(features_with_nan)}개")
-        for feature, count in features_with_nan.items():
-            if feature not in user_ir_diff_features and feature != 'actual_finish_position':
-                # 숫자형 특성은 중앙값으로, 그 외는 0으로 대체
-                if df_clean[feature].dtype in ['float64', 'int64']:
-                    median_val = df_clean[feature].median()
-                    if pd.isna(median_val):
-                        df_clean[feature] = df_clean[feature].fillna(0)
-                    else:
-                        df_clean[feature] = df_clean[feature].fillna(median_val)
-                else:
-                    df_clean[feature] = df_clean[feature].fillna(0)
-                print(f"      {feature}: {count}개 NaN 처리 완료")
+    # 결측 대체 (대체값은 전처리 결과 전체에서 계산)
+    df_clean = apply_nan_fills(df_clean, fit_nan_fills(df_clean))
     
     # 최종 확인: 학습에 사용할 특성들에 NaN이 없는지 확인
     print("   학습 특성 NaN 최종 확인...")
-    final_nan_check = df_clean.isna().sum().sum()
+    value_columns = df_clean.select_dtypes(exclude=['datetime', 'datetimetz']).columns
+    final_nan_check = df_clean[value_columns].isna().sum().sum()
     if final_nan_check > 0:
         print(f"   ⚠️  경고: 여전히 {final_nan_check}개 NaN이 남아있습니다.")
         # NaN이 있는 행 제거 (최후의 수단)
         initial_len = len(df_clean)
-        df_clean = df_clean.dropna()
+        df_clean = df_clean.dropna(subset=value_columns)
         removed = initial_len - len(df_clean)
         if removed > 0:
             print(f"   {removed}개 레코드 제거됨 (NaN 포함)")
@@ -279,8 +929,129 @@ def preprocess_data(df):
     return df_clean
 
 
-def add_incident_impact_features(df):
-    """사고 영향도 특성 추가: 사고 발생 시 평균 순위 하락 계산"""
+def fit_nan_fills(df):
+    """preprocess_data()의 컬럼별 결측 대체값 계산
+
+    유저별 상대 전력 특성은 전체 완주율 중앙값(성능 차이는 0), 나머지 숫자형은 중앙값,
+    카테고리/그 외는 0이다. 시간순 평가에서는 학습 구간 레코드만 넘겨야 평가 구간의
+    타겟(완주율)이 학습 구간 결측 대체값에 섞이지 않는다.
+
+    Returns:
+        컬럼 → 대체값 (결측이 없는 컬럼도 포함, 타겟/시간 컬럼 제외)
+    """
+    if 'actual_finish_position' in df.columns and 'total_participants' in df.columns:
+        avg_finish_pct = (df['actual_finish_position'] / df['total_participants']).median()
+    else:
+        avg_finish_pct = 0.5
+    fills = {}
+    for column in df.columns:
+        if column == 'actual_finish_position' or pd.api.types.is_datetime64_any_dtype(df[column]):
+            continue
+        if column in USER_IR_DIFF_FEATURES:
+            # 성능 차이는 0 (차이가 없다는 의미), 구간별/예상 완주율은 전체 평균 완주율
+            fills[column] = 0.0 if column == 'user_ir_diff_performance_diff' else avg_finish_pct
+        elif isinstance(df[column].dtype, pd.CategoricalDtype):
+            fills[column] = 0
+        elif pd.api.types.is_numeric_dtype(df[column]):
+            median_val = df[column].median()
+            fills[column] = 0 if pd.isna(median_val) else median_val
+        else:
+            fills[column] = 0
+    return fills
+
+
+def apply_nan_fills(df, fills):
+    """fit_nan_fills()로 계산한 대체값으로 결측 채우기 (결측이 있는 컬럼만)"""
+    print("   유저별 상대 전력 특성 / 나머지 특성 NaN 처리 중...")
+    for column, count in df.isna().sum().items():
+        if count == 0 or column not in fills:
+            continue
+        if isinstance(df[column].dtype, pd.CategoricalDtype) and fills[column] not in df[column].cat.categories:
+            df[column] = df[column].cat.add_categories([fills[column]])
+        df[column] = df[column].fillna(fills[column])
+        print(f"      {column}: {count}개 NaN 처리 완료")
+    return df
+
+
+def add_relative_features(frame):
+    """상대 전력/주행 파생 변수 추가 (DataFrame 또는 컬럼 이름 → 배열 dict, 제자리 수정)
+
+    학습 전처리와 온라인 특성 저장소(feature_store.py)가 같은 식을 쓰도록 여기 한 곳에 둔다.
+    """
+    # 상대 전력 관련 파생 변수
+    frame['ir_advantage'] = frame['ir_diff_from_avg'] / 100
+    frame['ir_range'] = frame['max_opponent_ir'] - frame['min_opponent_ir']
+    frame['ir_rank_pct'] = (
+        (frame['i_rating'] - frame['min_opponent_ir']) / 
+        (frame['max_opponent_ir'] - frame['min_opponent_ir'] + 1)
+    )
+    
+    # 추가 상대 전력 파생 변수
+    frame['ir_vs_max'] = frame['i_rating'] - frame['max_opponent_ir']  # 최고 상대와의 차이
+    frame['ir_vs_min'] = frame['i_rating'] - frame['min_opponent_ir']  # 최저 상대와의 차이
+    frame['ir_std_estimate'] = frame['ir_range'] / 4  # 대략적인 표준편차 추정
+    frame['ir_relative_to_sof'] = (frame['i_rating'] - frame['sof']) / frame['sof']  # SOF 대비 상대적 위치
+    
+    # 주행 특성 파생 변수
+    frame['lap_time_diff'] = frame['average_lap_time'] - frame['best_lap_time']
+    frame['lap_time_consistency'] = frame['lap_time_diff'] / (frame['best_lap_time'] + 1)  # 일관성 (낮을수록 좋음)
+    
+    if 'starting_position' in frame:
+        frame['starting_rank_pct'] = frame['starting_position'] / frame['total_participants']
+    
+    # 세션 컨텍스트 파생 변수
+    frame['participant_density'] = frame['total_participants']  # 참가자 밀도 (추가 특성 엔지니어링 가능)
+    return frame
+
+
+def _incident_impact_from_counts(counts):
+    """사고/무사고 레이스 집계값으로 사고 영향도와 사고 위험 플래그 계산
+
+    Args:
+        counts: races, with_races, with_sum, with_valid, without_races, without_sum,
+                without_valid, all_sum, all_valid 키를 가진 배열 묶음 (DataFrame 또는 dict)
+
+    Returns:
+        (incident_impact, high_incident_risk, eligible) 배열
+    """
+    races = np.asarray(counts['races'])
+    with_races = np.asarray(counts['with_races'])
+    without_races = np.asarray(counts['without_races'])
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_with = np.asarray(counts['with_sum']) / np.asarray(counts['with_valid'])
+        avg_without = np.asarray(counts['without_sum']) / np.asarray(counts['without_valid'])
+        overall_avg = np.asarray(counts['all_sum']) / np.asarray(counts['all_valid'])
+        # 사고 발생 확률
+        incident_rate = np.where(races > 0, with_races / np.maximum(races, 1), 0.0)
+    
+    # 사고 영향도: 양쪽 데이터가 모두 있으면 직접 비교, 사고 레이스만 있으면 전체 평균과 비교,
+    # 사고 없는 레이스만 있으면 0 (사고 영향 없음)
+    incident_impact = np.select(
+        [(with_races > 0) & (without_races > 0), with_races > 0],
+        [avg_with - avg_without, avg_with - overall_avg],
+        default=0.0
+    )
+    
+    eligible = races >= 3  # 최소 3개 레이스로 완화 (5 -> 3)
+    incident_impact = np.where(eligible, incident_impact, np.nan)
+    # 사고 발생 확률이 0.5 이상이면 높은 위험으로 간주
+    high_incident_risk = np.where(eligible & (incident_rate >= 0.5), 1, 0)
+    
+    return incident_impact, high_incident_risk, eligible
+
+
+def add_incident_impact_features(df, point_in_time=False):
+    """사고 영향도 특성 추가: 사고 발생 시 평균 순위 하락 계산
+
+    모든 유저의 사고/무사고 레이스 집계를 groupby 한 번으로 계산한다.
+
+    Args:
+        df: 학습 데이터
+        point_in_time: True면 각 레코드보다 이전 세션(session_start_time 순)만 사용
+                       (add_user_sof_performance_features와 같은 방식, 데이터 누수 방지).
+                       순위 하락 변환도 전체 평균 대신 레코드 자신의 참가자 수를 쓴다.
+    """
     print("   사고 영향도 특성 계산 중...")
     
     # 필요한 컬럼 확인
@@ -302,19 +1073,14 @@ def add_incident_impact_features(df):
     
     # 시간 순서대로 정렬 (과거 데이터만 사용하기 위해)
     if 'session_start_time' in df.columns:
-        df = df.sort_values(['cust_id', 'session_start_time']).reset_index(drop=True)
+        df = df.sort_values(['cust_id', 'session_start_time'], kind='stable').reset_index(drop=True)
     else:
-        df = df.sort_values('cust_id').reset_index(drop=True)
+        df = df.sort_values('cust_id', kind='stable').reset_index(drop=True)
     
-    # 각 유저별로 사고 영향도 계산
-    incident_impact_stats = {}
-    high_incident_risk_flags = {}
-    
-    unique_users = df['cust_id'].unique()
-    print(f"   {len(unique_users)}명의 유저에 대해 사고 영향도 계산 중...")
+    user_race_counts = df.groupby('cust_id').size()
+    print(f"   {len(user_race_counts)}명의 유저에 대해 사고 영향도 계산 중...")
     
     # 디버깅: 레이스 수 분포 확인
-    user_race_counts = df.groupby('cust_id').size()
     print(f"   📊 레이스 수 분포:")
     print(f"      - 0개: {sum(user_race_counts == 0)}명")
     print(f"      - 1개: {sum(user_race_counts == 1)}명")
@@ -323,78 +1089,64 @@ def add_incident_impact_features(df):
     print(f"      - 평균 레이스 수: {user_race_counts.mean():.1f}개")
     print(f"      - 중앙값 레이스 수: {user_race_counts.median():.1f}개")
     
-    for user_id in unique_users:
-        user_data = df[df['cust_id'] == user_id].copy()
-        
-        if len(user_data) < 3:  # 최소 3개 레이스로 완화 (5 -> 3)
-            continue
-        
-        # 사고 발생 레이스와 사고 없는 레이스 분리
-        races_with_incidents = user_data[user_data['incidents'] > 0]
-        races_without_incidents = user_data[user_data['incidents'] == 0]
-        
-        # 사고 발생 확률 계산
-        incident_rate = len(races_with_incidents) / len(user_data) if len(user_data) > 0 else 0.0
-        
-        # 사고 영향도 계산
-        if len(races_with_incidents) > 0 and len(races_without_incidents) > 0:
-            # 양쪽 데이터가 모두 있으면 직접 계산
-            avg_finish_pct_with_incidents = (races_with_incidents['actual_finish_position'] / 
-                                             races_with_incidents['total_participants']).mean()
-            avg_finish_pct_without_incidents = (races_without_incidents['actual_finish_position'] / 
-                                                races_without_incidents['total_participants']).mean()
-            incident_impact = avg_finish_pct_with_incidents - avg_finish_pct_without_incidents
-        elif len(races_with_incidents) > 0:
-            # 사고 발생 레이스만 있는 경우: 전체 평균과 비교
-            avg_finish_pct_with_incidents = (races_with_incidents['actual_finish_position'] / 
-                                             races_with_incidents['total_participants']).mean()
-            overall_avg = (user_data['actual_finish_position'] / user_data['total_participants']).mean()
-            incident_impact = avg_finish_pct_with_incidents - overall_avg
-        elif len(races_without_incidents) > 0:
-            # 사고 없는 레이스만 있는 경우: 0으로 설정 (사고 영향 없음)
-            incident_impact = 0.0
-        else:
-            # 데이터가 없는 경우
-            incident_impact = 0.0
-        
-        incident_impact_stats[user_id] = float(incident_impact)
-        
-        # 사고 발생 확률이 0.5 이상이면 높은 위험으로 간주
-        high_incident_risk_flags[user_id] = 1 if incident_rate >= 0.5 else 0
-        
-        # 평균 순위 계산 (완주율로 정규화)
-        avg_finish_pct_with_incidents = (races_with_incidents['actual_finish_position'] / 
-                                         races_with_incidents['total_participants']).mean()
-        avg_finish_pct_without_incidents = (races_without_incidents['actual_finish_position'] / 
-                                            races_without_incidents['total_participants']).mean()
-        
-        # 사고 발생 시 평균 순위 하락 (완주율 차이)
-        incident_impact = avg_finish_pct_with_incidents - avg_finish_pct_without_incidents
-        incident_impact_stats[user_id] = float(incident_impact)
-        
-        # 사고 발생 확률 계산
-        incident_rate = len(races_with_incidents) / len(user_data)
-        # 사고 발생 확률이 0.5 이상이면 높은 위험으로 간주
-        high_incident_risk_flags[user_id] = 1 if incident_rate >= 0.5 else 0
-    
-    # 통계를 데이터프레임에 추가
-    df['incident_impact_on_position'] = df['cust_id'].map(incident_impact_stats).fillna(0.0)
-    df['high_incident_risk'] = df['cust_id'].map(high_incident_risk_flags).fillna(0)
+    # 레코드별 완주율과 사고 여부
+    finish_pct = (df['actual_finish_position'] / df['total_participants']).to_numpy(dtype=float)
+    pct_valid = ~np.isnan(finish_pct)
+    pct_filled = np.where(pct_valid, finish_pct, 0.0)
+    incidents = df['incidents'].to_numpy(dtype=float)
+    with_incident = incidents > 0
+    without_incident = incidents == 0
+    
+    current = pd.DataFrame({
+        'races': np.ones(len(df), dtype=np.int64),
+        'with_races': with_incident.astype(np.int64),
+        'with_sum': np.where(with_incident, pct_filled, 0.0),
+        'with_valid': (with_incident & pct_valid).astype(np.int64),
+        'without_races': without_incident.astype(np.int64),
+        'without_sum': np.where(without_incident, pct_filled, 0.0),
+        'without_valid': (without_incident & pct_valid).astype(np.int64),
+        'all_sum': pct_filled,
+        'all_valid': pct_valid.astype(np.int64),
+    }, index=df.index)
+    cust_ids = df['cust_id'].to_numpy()
+    
+    # 유저별 전체 집계 (통계 출력용, 전체 기간 모드에서는 그대로 특성으로 사용)
+    user_counts = current.groupby(cust_ids, sort=False).sum()
+    user_impact, user_risk, user_eligible = _incident_impact_from_counts(user_counts)
+    
+    if point_in_time:
+        # 누적 합계에서 현재 레코드를 빼서 이전 세션만의 집계를 만든다
+        past_counts = current.groupby(cust_ids, sort=False).cumsum() - current
+        impact, risk, _ = _incident_impact_from_counts(past_counts)
+        df['incident_impact_on_position'] = np.nan_to_num(impact, nan=0.0)
+        df['high_incident_risk'] = risk
+        print("   (시점 기준 모드: 이전 세션 데이터만 사용)")
+    else:
+        impact_by_user = pd.Series(user_impact, index=user_counts.index)
+        risk_by_user = pd.Series(user_risk, index=user_counts.index)
+        df['incident_impact_on_position'] = df['cust_id'].map(impact_by_user).fillna(0.0)
+        df['high_incident_risk'] = df['cust_id'].map(risk_by_user).fillna(0)
     
     # 사고 발생 시 평균 순위 하락 (위치 단위로 변환)
     # 완주율 차이를 평균 참가자 수로 곱하여 실제 순위 하락으로 변환
-    avg_participants = df['total_participants'].mean() if 'total_participants' in df.columns else 20
-    df['incident_impact_rank_drop'] = df['incident_impact_on_position'] * avg_participants
+    if point_in_time:
+        # 전체 평균 참가자 수에는 이후 세션이 섞이므로 레코드 자신의 참가자 수로 변환 (없으면 20)
+        participants = df['total_participants'].astype(float).fillna(20)
+        df['incident_impact_rank_drop'] = df['incident_impact_on_position'] * participants
+    else:
+        avg_participants = df['total_participants'].mean() if 'total_participants' in df.columns else 20
+        df['incident_impact_rank_drop'] = df['incident_impact_on_position'] * avg_participants
     
     # 통계 출력
-    total_users = len(unique_users)
-    calculated_users = len(incident_impact_stats)
-    users_with_impact = sum(1 for v in incident_impact_stats.values() if abs(v) > 0.01)  # 0.01 이상 차이가 있는 경우
-    high_risk_users = sum(1 for v in high_incident_risk_flags.values() if v == 1)
+    total_users = len(user_counts)
+    calculated_users = int(user_eligible.sum())
+    users_with_impact = int((np.abs(np.nan_to_num(user_impact[user_eligible])) > 0.01).sum())  # 0.01 이상 차이가 있는 경우
+    high_risk_users = int(user_risk.sum())
     
     print(f"   ✅ {calculated_users}명의 유저에 대해 사고 영향도 계산 완료")
-    print(f"      - 사고 영향도가 있는 유저: {users_with_impact}명 ({users_with_impact/calculated_users*100:.1f}%)")
-    print(f"      - 높은 사고 위험 유저: {high_risk_users}명 ({high_risk_users/calculated_users*100:.1f}%)")
+    if calculated_users > 0:
+        print(f"      - 사고 영향도가 있는 유저: {users_with_impact}명 ({users_with_impact/calculated_users*100:.1f}%)")
+        print(f"      - 높은 사고 위험 유저: {high_risk_users}명 ({high_risk_users/calculated_users*100:.1f}%)")
     if calculated_users < total_users:
         skipped = total_users - calculated_users
         print(f"      - 계산 생략된 유저: {skipped}명 (최소 3개 레이스 필요)")
@@ -402,181 +1154,207 @@ def add_incident_impact_features(df):
     return df
 
 
+IR_DIFF_RANGES = ['much_lower', 'lower', 'similar', 'higher', 'much_higher']
+IR_DIFF_BOUNDS = [-200, -50, 50, 200]  # IR_DIFF_RANGES 사이 경계 (값 < 경계면 앞 구간)
+
+USER_IR_DIFF_FEATURES = [
+    'user_avg_finish_pct_much_lower',
+    'user_avg_finish_pct_lower',
+    'user_avg_finish_pct_similar',
+    'user_avg_finish_pct_higher',
+    'user_avg_finish_pct_much_higher',
+    'user_ir_diff_performance_diff',
+    'user_expected_finish_pct_by_ir_diff'
+]
+
+
+def get_ir_diff_ranges(ir_diff):
+    """ir_diff_from_avg 값을 상대 전력 구간 이름으로 변환 (벡터화)
+
+    구간 경계는 IR_DIFF_BOUNDS ([-200, -50, 50, 200]) 이며 NaN은 None으로 남긴다.
+    """
+    ir_diff = np.asarray(ir_diff, dtype=float)
+    conditions = [
+        ir_diff < IR_DIFF_BOUNDS[0],   # 내가 상대 평균보다 200 이상 낮음 → 강한 상대
+        ir_diff < IR_DIFF_BOUNDS[1],   # 내가 상대 평균보다 50-200 낮음 → 약간 강한 상대
+        ir_diff < IR_DIFF_BOUNDS[2],   # 비슷함
+        ir_diff < IR_DIFF_BOUNDS[3],   # 내가 상대 평균보다 50-200 높음 → 약간 약한 상대
+        ir_diff >= IR_DIFF_BOUNDS[3],  # 내가 상대 평균보다 200 이상 높음 → 약한 상대
+    ]
+    return np.select(conditions, IR_DIFF_RANGES, default=None).astype(object)
+
+
 def add_user_sof_performance_features(df):
-    """유저별 상대 전력(ir_diff_from_avg) 구간별 성능 특성 추가 (핵심!)"""
-    # ir_diff_from_avg 구간 정의 (상대 전력 대비 내 위치)
-    def get_ir_diff_range(ir_diff):
-        if pd.isna(ir_diff):
-            return None
-        if ir_diff < -200:
-            return 'much_lower'  # 내가 상대 평균보다 200 이상 낮음 → 강한 상대
-        elif ir_diff < -50:
-            return 'lower'  # 내가 상대 평균보다 50-200 낮음 → 약간 강한 상대
-        elif ir_diff < 50:
-            return 'similar'  # 비슷함
-        elif ir_diff < 200:
-            return 'higher'  # 내가 상대 평균보다 50-200 높음 → 약간 약한 상대
-        else:
-            return 'much_higher'  # 내가 상대 평균보다 200 이상 높음 → 약한 상대
-    
-    # ir_diff_from_avg 구간 추가
-    df['ir_diff_range'] = df['ir_diff_from_avg'].apply(get_ir_diff_range)
+    """유저별 상대 전력(ir_diff_from_avg) 구간별 성능 특성 추가 (핵심!)
+
+    (cust_id, ir_diff_range)별 누적 합계/개수를 groupby cumsum으로 한 번에 계산하고,
+    현재 레코드 값을 빼서 "과거 레이스만" 사용하는 통계를 만든다 (데이터 누수 방지).
+    레코드별 루프 대비 O(n) 이며 결과는 기존 루프 구현과 동일하다 (check_user_sof_features.py).
+    같은 유저의 session_start_time 동점은 안정 정렬로 입력 행 순서를 따른다.
+    """
+    df['ir_diff_range'] = get_ir_diff_ranges(df['ir_diff_from_avg'])
     
     # 시간 순서대로 정렬 (과거 데이터만 사용하기 위해)
     if 'session_start_time' in df.columns:
-        df = df.sort_values(['cust_id', 'session_start_time']).reset_index(drop=True)
+        df = df.sort_values(['cust_id', 'session_start_time'], kind='stable').reset_index(drop=True)
     else:
-        df = df.sort_values('cust_id').reset_index(drop=True)
+        df = df.sort_values('cust_id', kind='stable').reset_index(drop=True)
     
     print("   유저별 상대 전력 구간별 성능 특성 계산 중...")
     print("   (내 iRating vs 상대 평균 iRating 차이에 따른 성능 패턴)")
     
-    # 유저별로 그룹화하여 효율적으로 계산
-    new_features = []
+    finish_pct = (df['actual_finish_position'] / df['total_participants']).to_numpy(dtype=float)
+    pct_valid = ~np.isnan(finish_pct)
+    pct_filled = np.where(pct_valid, finish_pct, 0.0)
+    ir_diff_range = df['ir_diff_range'].to_numpy()
     
-    # 각 상대 전력 구간별 특성 컬럼 초기화
-    for ir_diff_range in ['much_lower', 'lower', 'similar', 'higher', 'much_higher']:
-        col_name = f'user_avg_finish_pct_{ir_diff_range}'
-        df[col_name] = None
-        new_features.append(col_name)
+    # 구간별 (합계, 레이스 수, 유효 완주율 수) + 전체 (합계, 유효 완주율 수)
+    columns = {}
+    for ir_range in IR_DIFF_RANGES:
+        in_range = ir_diff_range == ir_range
+        columns[f'sum_{ir_range}'] = np.where(in_range, pct_filled, 0.0)
+        columns[f'races_{ir_range}'] = in_range.astype(np.int64)
+        columns[f'valid_{ir_range}'] = (in_range & pct_valid).astype(np.int64)
+    columns['sum_all'] = pct_filled
+    columns['valid_all'] = pct_valid.astype(np.int64)
+    current = pd.DataFrame(columns, index=df.index)
     
-    # 상대 전력 성능 차이 (약한 상대에서의 성능 - 강한 상대에서의 성능)
-    df['user_ir_diff_performance_diff'] = None
-    new_features.append('user_ir_diff_performance_diff')
+    # 누적 합계에서 현재 레코드를 빼면 과거 레코드만의 합계가 된다
+    past = current.groupby(df['cust_id'].to_numpy(), sort=False).cumsum() - current
+    past_count = df.groupby('cust_id', sort=False).cumcount().to_numpy()
     
-    # 현재 상대 전력 구간에 대한 유저의 예상 성능
-    df['user_expected_finish_pct_by_ir_diff'] = None
-    new_features.append('user_expected_finish_pct_by_ir_diff')
-    
-    # 유저별로 처리
-    user_groups = df.groupby('cust_id')
-    total_users = len(user_groups)
-    processed = 0
-    
-    for cust_id, user_data in user_groups:
-        processed += 1
-        if processed % 100 == 0:
-            print(f"   진행: {processed}/{total_users}명 유저 처리됨")
-        
-        # 시간 순서대로 정렬
-        if 'session_start_time' in user_data.columns:
-            user_data = user_data.sort_values('session_start_time')
-        
-        user_indices = user_data.index.values
-        
-        # 각 레코드에 대해 과거 데이터만 사용하여 통계 계산
-        for i, idx in enumerate(user_indices):
-            # 현재 레코드 이전의 데이터만 선택
-            past_data = user_data.iloc[:i]
-            
-            # 유저의 전체 평균 완주율 계산 (기준점)
-            if len(past_data) > 0:
-                all_finish_pcts = past_data['actual_finish_position'] / past_data['total_participants']
-                overall_avg_finish_pct = all_finish_pcts.mean()
-            else:
-                # 과거 데이터가 없으면 기본값 사용 (나중에 NaN 처리)
-                overall_avg_finish_pct = None
-            
-            # 상대 전력 구간별 통계 계산 (최소 레코드 수를 1개로 낮춤)
-            stats = {}
-            for ir_diff_range in ['much_lower', 'lower', 'similar', 'higher', 'much_higher']:
-                if len(past_data) > 0:
-                    range_data = past_data[past_data['ir_diff_range'] == ir_diff_range]
-                    if len(range_data) >= 1:  # 최소 1개 레이스만 있어도 계산
-                        # 실제 완주 순위의 백분율 (낮을수록 좋음)
-                        finish_pcts = range_data['actual_finish_position'] / range_data['total_participants']
-                        stats[f'avg_finish_pct_{ir_diff_range}'] = finish_pcts.mean()
-                    else:
-                        stats[f'avg_finish_pct_{ir_diff_range}'] = None
-                else:
-                    stats[f'avg_finish_pct_{ir_diff_range}'] = None
-            
-            # 상대 전력 성능 차이 (강한 상대에서의 성능 - 약한 상대에서의 성능)
-            # 양수 = 강한 상대에서 더 잘함 (집중력 유형), 음수 = 약한 상대에서 더 잘함 (압도적 실력 유형)
-            # 더 유연한 계산: 강한 상대 그룹과 약한 상대 그룹의 평균을 비교
-            
-            # 강한 상대 그룹 (much_lower, lower)
-            strong_opponent_pcts = []
-            if stats.get('avg_finish_pct_much_lower') is not None:
-                strong_opponent_pcts.append(stats['avg_finish_pct_much_lower'])
-            if stats.get('avg_finish_pct_lower') is not None:
-                strong_opponent_pcts.append(stats['avg_finish_pct_lower'])
-            strong_avg = np.mean(strong_opponent_pcts) if len(strong_opponent_pcts) > 0 else None
-            
-            # 약한 상대 그룹 (much_higher, higher)
-            weak_opponent_pcts = []
-            if stats.get('avg_finish_pct_much_higher') is not None:
-                weak_opponent_pcts.append(stats['avg_finish_pct_much_higher'])
-            if stats.get('avg_finish_pct_higher') is not None:
-                weak_opponent_pcts.append(stats['avg_finish_pct_higher'])
-            weak_avg = np.mean(weak_opponent_pcts) if len(weak_opponent_pcts) > 0 else None
-            
-            # 성능 차이 계산 (더 유연하게)
-            ir_diff_performance_diff = None
-            if strong_avg is not None and weak_avg is not None:
-                # 두 그룹 모두 있으면 직접 비교
-                ir_diff_performance_diff = strong_avg - weak_avg
-            elif strong_avg is not None and overall_avg_finish_pct is not None:
-                # 강한 상대 그룹만 있으면 전체 평균과 비교
-                ir_diff_performance_diff = strong_avg - overall_avg_finish_pct
-            elif weak_avg is not None and overall_avg_finish_pct is not None:
-                # 약한 상대 그룹만 있으면 전체 평균과 비교 (부호 반전)
-                ir_diff_performance_diff = overall_avg_finish_pct - weak_avg
-            elif stats.get('avg_finish_pct_similar') is not None and overall_avg_finish_pct is not None:
-                # similar 구간과 전체 평균 비교 (최소한의 정보라도 활용)
-                ir_diff_performance_diff = stats['avg_finish_pct_similar'] - overall_avg_finish_pct
-            elif overall_avg_finish_pct is not None:
-                # 과거 데이터는 있지만 특정 구간 데이터가 없으면, 전체 평균을 기준으로 추정
-                # 현재 레이스의 ir_diff_from_avg를 기반으로 추정
-                current_ir_diff = user_data.loc[idx, 'ir_diff_from_avg']
-                if pd.notna(current_ir_diff):
-                    # ir_diff가 음수면 (내가 약함) 강한 상대에서 더 잘할 가능성, 양수면 (내가 강함) 약한 상대에서 더 잘할 가능성
-                    # 하지만 이건 추측이므로 보수적으로 0에 가까운 값 사용
-                    ir_diff_performance_diff = 0.0  # 성능 차이 없음으로 가정
-                else:
-                    ir_diff_performance_diff = 0.0
-            else:
-                # 과거 데이터가 전혀 없으면 0으로 설정 (성능 차이 없음)
-                ir_diff_performance_diff = 0.0
-            
-            stats['ir_diff_performance_diff'] = ir_diff_performance_diff
-            
-            # 각 상대 전력 구간별 특성 추가
-            for ir_diff_range in ['much_lower', 'lower', 'similar', 'higher', 'much_higher']:
-                col_name = f'user_avg_finish_pct_{ir_diff_range}'
-                df.at[idx, col_name] = stats.get(f'avg_finish_pct_{ir_diff_range}', None)
-            
-            # 상대 전력 성능 차이 특성
-            df.at[idx, 'user_ir_diff_performance_diff'] = stats.get('ir_diff_performance_diff', None)
-            
-            # 현재 상대 전력 구간에 대한 유저의 예상 성능
-            current_ir_diff_range = user_data.loc[idx, 'ir_diff_range']
-            if current_ir_diff_range:
-                df.at[idx, 'user_expected_finish_pct_by_ir_diff'] = stats.get(
-                    f'avg_finish_pct_{current_ir_diff_range}', None
-                )
+    for feature, values in _user_ir_diff_from_counts(past, past_count, ir_diff_range).items():
+        df[feature] = values
     
-    print(f"   ✅ {len(new_features)}개 유저 상대 전력 특성 추가")
+    print(f"   ✅ {len(USER_IR_DIFF_FEATURES)}개 유저 상대 전력 특성 추가")
     
     return df
 
 
-def encode_categorical_features(df, categorical_cols=['series_id', 'track_id', 'car_id'], use_onehot=True):
-    """카테고리 변수 인코딩"""
+def _user_ir_diff_from_counts(past, past_count, ir_diff_range):
+    """과거 레이스 집계값으로 유저 상대 전력 구간별 성능 특성 계산
+
+    Args:
+        past: 구간별 sum_/races_/valid_{ir_range}와 sum_all, valid_all 배열 묶음 (DataFrame 또는 dict)
+        past_count: 과거 레이스 수
+        ir_diff_range: 현재 레코드의 상대 전력 구간 (get_ir_diff_ranges 결과)
+
+    Returns:
+        {USER_IR_DIFF_FEATURES 이름: 배열}
+    """
+    past_count = np.asarray(past_count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        overall_avg = np.asarray(past['sum_all']) / np.asarray(past['valid_all'])
+        range_avg = {}
+        range_present = {}
+        for ir_range in IR_DIFF_RANGES:
+            range_present[ir_range] = np.asarray(past[f'races_{ir_range}']) >= 1  # 최소 1개 레이스만 있어도 계산
+            range_avg[ir_range] = np.where(
+                range_present[ir_range],
+                np.asarray(past[f'sum_{ir_range}']) / np.asarray(past[f'valid_{ir_range}']),
+                np.nan
+            )
+    has_past = past_count > 0
+    
+    def group_avg(ranges):
+        present = sum(range_present[r].astype(np.int64) for r in ranges)
+        total = sum(np.where(range_present[r], range_avg[r], 0.0) for r in ranges)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return present > 0, total / np.maximum(present, 1)
+    
+    # 강한 상대 그룹 (much_lower, lower) / 약한 상대 그룹 (much_higher, higher)
+    strong_present, strong_avg = group_avg(['much_lower', 'lower'])
+    weak_present, weak_avg = group_avg(['much_higher', 'higher'])
+    
+    # 상대 전력 성능 차이 (강한 상대에서의 성능 - 약한 상대에서의 성능)
+    # 양수 = 강한 상대에서 더 잘함 (집중력 유형), 음수 = 약한 상대에서 더 잘함 (압도적 실력 유형)
+    # 한쪽 그룹만 있으면 전체 평균과 비교하고, 과거 데이터가 없으면 0 (성능 차이 없음)
+    performance_diff = np.select(
+        [
+            strong_present & weak_present,
+            strong_present & has_past,
+            weak_present & has_past,
+            range_present['similar'] & has_past,
+        ],
+        [
+            strong_avg - weak_avg,
+            strong_avg - overall_avg,
+            overall_avg - weak_avg,
+            range_avg['similar'] - overall_avg,
+        ],
+        default=0.0
+    )
+    
+    # 각 상대 전력 구간별 특성
+    features = {f'user_avg_finish_pct_{ir_range}': range_avg[ir_range] for ir_range in IR_DIFF_RANGES}
+    features['user_ir_diff_performance_diff'] = performance_diff
+    
+    # 현재 상대 전력 구간에 대한 유저의 예상 성능
+    expected = np.full(len(past_count), np.nan)
+    for ir_range in IR_DIFF_RANGES:
+        in_range = ir_diff_range == ir_range
+        expected[in_range] = range_avg[ir_range][in_range]
+    features['user_expected_finish_pct_by_ir_diff'] = expected
+    return features
+
+
+# 카테고리 인코딩 방식
+# - onehot: 원-핫 인코딩 결과를 dense 컬럼으로 데이터프레임에 결합 (기존 방식)
+# - sparse: 원-핫 블록을 SciPy CSR 행렬로 유지 (build_feature_matrix에서 수치 특성과 hstack)
+# - native: 정수 카테고리 코드 컬럼 하나씩 (LightGBM/XGBoost 네이티브 카테고리 처리)
+CATEGORICAL_ENCODINGS = ['onehot', 'sparse', 'native']
+
+
+def encode_categorical_features(df, categorical_cols=CATEGORICAL_COLUMNS, use_onehot=True, encoding='onehot',
+                                encoder=None):
+    """카테고리 변수 인코딩
+
+    encoder가 주어지면 새로 학습하지 않고 그 인코더로 변환만 한다 (증분 학습: 부모 모델과 같은 특성 공간).
+
+    Returns:
+        (df_encoded, encoder, feature_names)
+        sparse 모드에서는 원본 카테고리 컬럼을 그대로 두고, feature_names의 값은
+        build_feature_matrix()가 CSR 블록으로 만든다.
+    """
     if not use_onehot or not categorical_cols:
         return df, None, []
+    if encoding not in CATEGORICAL_ENCODINGS:
+        raise ValueError(f"Unknown categorical encoding: {encoding}")
     
-    print(f"\n🔤 카테고리 변수 인코딩 중: {categorical_cols}")
+    print(f"\n🔤 카테고리 변수 인코딩 중 ({encoding}{', 기존 인코더' if encoder is not None else ''}): {categorical_cols}")
     
     # 존재하는 카테고리 컬럼만 선택
     available_cols = [col for col in categorical_cols if col in df.columns]
+    if encoder is not None:
+        available_cols = list(encoder.feature_names_in_)
     if not available_cols:
         print("   ⚠️  인코딩할 카테고리 변수가 없습니다.")
         return df, None, []
     
+    if encoding == 'native':
+        # 학습 때 없던 카테고리는 -1 (LightGBM/XGBoost는 결측으로 취급하고,
+        # NaN을 받지 않는 sklearn GradientBoosting도 그대로 예측할 수 있다)
+        if encoder is None:
+            from sklearn.preprocessing import OrdinalEncoder
+            encoder = OrdinalEncoder(
+                handle_unknown='use_encoded_value', unknown_value=-1,
+                encoded_missing_value=-1, dtype=np.float32
+            ).fit(df[available_cols])
+        codes = encoder.transform(df[available_cols])
+        df_encoded = df.drop(columns=available_cols)
+        for i, col in enumerate(available_cols):
+            df_encoded[col] = codes[:, i]
+        print(f"   ✅ {len(available_cols)}개 변수 → 정수 카테고리 코드 ({[len(c) for c in encoder.categories_]}개 카테고리)")
+        return df_encoded, encoder, list(available_cols)
+    
     # 원-핫 인코딩
-    encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore', drop='first')
-    encoded_features = encoder.fit_transform(df[available_cols])
+    if encoder is None:
+        from sklearn.preprocessing import OneHotEncoder
+        encoder = OneHotEncoder(
+            sparse_output=(encoding == 'sparse'), handle_unknown='ignore', drop='first',
+            dtype=np.float32 if encoding == 'sparse' else np.float64
+        ).fit(df[available_cols])
+    encoded_features = encoder.transform(df[available_cols])
     
     # 인코딩된 컬럼 이름 생성
     feature_names = []
@@ -585,6 +1363,10 @@ def encode_categorical_features(df, categorical_cols=['series_id', 'track_id', '
         for cat in categories[1:]:  # drop='first'이므로 첫 번째 카테고리 제외
             feature_names.append(f"{col}_{int(cat)}")
     
+    if encoding == 'sparse':
+        print(f"   ✅ {len(available_cols)}개 변수 → {len(feature_names)}개 특성 (CSR, nnz={encoded_features.nnz})")
+        return df, encoder, feature_names
+    
     # 인코딩된 데이터프레임 생성
     encoded_df = pd.DataFrame(encoded_features, columns=feature_names, index=df.index)
     
@@ -596,27 +1378,462 @@ def encode_categorical_features(df, categorical_cols=['series_id', 'track_id', '
     return df_encoded, encoder, feature_names
 
 
-def train_model(X_train, y_train, X_test, y_test, model_type='random_forest', tune_hyperparams=False):
-    """ML 모델 학습 (하이퍼파라미터 튜닝 옵션 포함)"""
-    print(f"\n🤖 {model_type} 모델 학습 중...")
+def build_feature_matrix(df, features, encoding='onehot', encoder=None, encoded_feature_names=None):
+    """학습/예측용 특성 행렬 생성
+
+    sparse 모드에서는 수치 특성(dense)과 원-핫 블록(CSR)을 이어붙인 CSR 행렬을 반환하고,
+    그 외에는 df[features]의 float32 NumPy 배열을 반환한다 (트리 모델은 내부적으로 float32로 분할하므로
+    float64의 절반 메모리로 같은 모델). 컬럼 순서는 항상 features와 같다.
+    """
+    if encoding != 'sparse' or encoder is None:
+        return df[features].to_numpy(dtype=np.float32)
+    
+    from scipy import sparse
+    encoded = set(encoded_feature_names or [])
+    dense_features = [f for f in features if f not in encoded]
+    if features[len(dense_features):] != [f for f in features if f in encoded]:
+        raise ValueError("sparse 인코딩 특성은 features 목록의 마지막에 있어야 합니다.")
+    onehot = encoder.transform(df[list(encoder.feature_names_in_)])
+    dense = sparse.csr_matrix(df[dense_features].to_numpy(dtype=np.float32))
+    return sparse.hstack([dense, onehot], format='csr')
+
+
+def categorical_feature_indices(features, encoding, encoded_feature_names):
+    """native 인코딩일 때 카테고리 코드 컬럼의 위치 (LightGBM categorical_feature 용)"""
+    if encoding != 'native' or not encoded_feature_names:
+        return []
+    return [i for i, f in enumerate(features) if f in set(encoded_feature_names)]
+
+
+# 큰 특성 행렬은 .npy로 한 번만 쓰고, 프로세스 풀/joblib 워커는 메모리 맵으로 연다
+# (워커마다 피클 복사본을 만들지 않고 페이지 캐시를 공유, 정리는 사용한 쪽에서)
+SHARED_MATRIX_DIR = os.path.join(SNAPSHOT_DIR, 'shared')
+SHARED_MATRIX_MIN_BYTES = 64 * 1024 ** 2
+
+
+def save_matrix(path, X):
+    """특성 행렬/타겟을 float32 .npy로 저장 (CSR은 data/indices/indptr 배열 세 개), 형식 정보 반환"""
+    if hasattr(X, 'tocsr'):
+        X = X.tocsr()
+        np.save(f'{path}.data.npy', X.data.astype(np.float32))
+        np.save(f'{path}.indices.npy', X.indices)
+        np.save(f'{path}.indptr.npy', X.indptr)
+        return {'format': 'csr', 'shape': list(X.shape)}
+    np.save(f'{path}.npy', np.ascontiguousarray(X, dtype=np.float32))
+    return {'format': 'dense', 'shape': list(X.shape)}
+
+
+def load_matrix(path, info):
+    """save_matrix()로 저장한 행렬을 읽기 전용 메모리 맵으로 연다 (복사 없음)"""
+    if info['format'] == 'csr':
+        from scipy import sparse
+        arrays = [np.load(f'{path}.{name}.npy', mmap_mode='r') for name in ('data', 'indices', 'indptr')]
+        return sparse.csr_matrix(tuple(arrays), shape=tuple(info['shape']), copy=False)
+    return np.load(f'{path}.npy', mmap_mode='r')
+
+
+class SharedMatrix:
+    """save_matrix()로 저장한 행렬 참조 (피클하면 경로만 전달되고, 워커는 load()로 복사 없이 연결)"""
+    
+    def __init__(self, path, info):
+        self.path = path
+        self.info = info
+        self.shape = tuple(info['shape'])
+    
+    def load(self):
+        return load_matrix(self.path, self.info)
+
+
+def matrix_nbytes(X):
+    """dense 배열/CSR 행렬의 메모리 크기 (바이트)"""
+    if hasattr(X, 'indptr'):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return np.asarray(X).nbytes
+
+
+def share_matrices(arrays, directory=None):
+    """{이름: 배열}을 한 번씩 저장하고 (디렉터리, {이름: SharedMatrix}) 반환"""
+    import tempfile
+    os.makedirs(SHARED_MATRIX_DIR, exist_ok=True)
+    directory = directory or tempfile.mkdtemp(prefix=f'{os.getpid()}_', dir=SHARED_MATRIX_DIR)
+    shared = {}
+    for name, X in arrays.items():
+        path = os.path.join(directory, name)
+        shared[name] = SharedMatrix(path, save_matrix(path, X))
+    return directory, shared
+
+
+def attach_matrix(X):
+    """SharedMatrix면 메모리 맵으로 열고, 그 외에는 그대로 반환"""
+    return X.load() if isinstance(X, SharedMatrix) else X
+
+
+# gradient_boosting 엔진: exact = GradientBoostingRegressor (단일 스레드, 정렬 기반 분할),
+# hist = HistGradientBoostingRegressor (히스토그램 분할, OpenMP 멀티스레드, 검증 분할 조기 종료)
+GB_ENGINES = ['exact', 'hist']
+
+# hist 엔진 조기 종료 설정 (학습 데이터에서 validation_fraction 만큼 떼어 검증)
+HIST_VALIDATION_FRACTION = 0.1
+HIST_N_ITER_NO_CHANGE = 10
+HIST_EARLY_STOPPING_MIN_SAMPLES = 200  # 이보다 작으면 검증 분할 없이 max_iter까지 학습
+HIST_MAX_BINS = 255
+
+
+def _dense_for_hist(X):
+    """HistGradientBoostingRegressor는 sparse 입력을 받지 않으므로 dense로 변환"""
+    return X.toarray() if hasattr(X, 'toarray') else X
+
+
+def make_gradient_boosting(engine='exact', X_train=None, categorical_features=None, **params):
+    """gradient_boosting 모델 생성
+
+    params는 GradientBoostingRegressor 이름(n_estimators, max_depth, min_samples_leaf ...)으로 받고
+    hist 엔진에서는 max_iter 등으로 옮긴다 (min_samples_split은 hist에 없으므로 무시).
+    hist 엔진은 native 인코딩 카테고리 코드 중 max_bins 미만인 컬럼을 네이티브 카테고리로 쓴다.
+    """
+    if engine == 'exact':
+        from sklearn.ensemble import GradientBoostingRegressor
+        return GradientBoostingRegressor(random_state=42, **params)
+    if engine != 'hist':
+        raise ValueError(f"Unknown gradient boosting engine: {engine}")
+    
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    hist_params = {k: v for k, v in params.items() if k != 'min_samples_split'}
+    if 'n_estimators' in hist_params:
+        hist_params['max_iter'] = hist_params.pop('n_estimators')
+    
+    n_samples = X_train.shape[0] if X_train is not None else HIST_EARLY_STOPPING_MIN_SAMPLES
+    categorical_mask = None
+    if categorical_features and X_train is not None:
+        # 코드가 max_bins 이상인 고카디널리티 컬럼은 수치 특성으로 남긴다 (-1 = 결측)
+        categorical_mask = np.zeros(X_train.shape[1], dtype=bool)
+        for i in categorical_features:
+            column = X_train[:, i]
+            column = column.toarray() if hasattr(column, 'toarray') else column
+            categorical_mask[i] = np.nanmax(column) < HIST_MAX_BINS
+        if not categorical_mask.any():
+            categorical_mask = None
+    
+    return HistGradientBoostingRegressor(
+        early_stopping=n_samples >= HIST_EARLY_STOPPING_MIN_SAMPLES,
+        validation_fraction=HIST_VALIDATION_FRACTION,
+        n_iter_no_change=HIST_N_ITER_NO_CHANGE,
+        categorical_features=categorical_mask,
+        max_bins=HIST_MAX_BINS,
+        random_state=42,
+        **hist_params
+    )
+
+
+# XGBoost/LightGBM 조기 종료: X_train에서 검증 fold를 떼어 검증 손실이 ROUNDS 동안 개선되지 않으면 중단
+# (n_estimators는 상한, 예측은 최적 반복까지만 사용)
+EARLY_STOPPING_MODELS = {'xgboost', 'lightgbm'}
+EARLY_STOPPING_ROUNDS = 30
+EARLY_STOPPING_VALIDATION_FRACTION = 0.1
+
+
+def fit_with_early_stopping(model, model_type, X_train, y_train, fit_params=None):
+    """검증 fold를 모니터링하며 XGBoost/LightGBM 학습 후 (model, early_stopping_info) 반환
+
+    early_stopping_info: 최적 반복 수(트리 개수), 학습한 반복 수, 검증 손실 학습 곡선.
+    저장된 모델의 predict()는 두 라이브러리 모두 최적 반복까지만 사용한다.
+    """
+    from sklearn.model_selection import train_test_split
+    fit_params = dict(fit_params or {})
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=EARLY_STOPPING_VALIDATION_FRACTION, random_state=42
+    )
+    
+    if model_type == 'xgboost':
+        model.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS, eval_metric='rmse')
+        model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False, **fit_params)
+        curve = model.evals_result()['validation_0']['rmse']
+        best = model.best_iteration + 1  # 0부터 시작하는 반복 번호 → 트리 개수
+        metric = 'rmse'
+    elif model_type == 'lightgbm':
+        import lightgbm as lgb
+        model.fit(
+            X_fit, y_fit, eval_set=[(X_val, y_val)], eval_metric='l2',
+            callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)], **fit_params
+        )
+        curve = model.evals_result_['valid_0']['l2']
+        best = model.best_iteration_ or len(curve)
+        metric = 'l2'
+    else:
+        raise ValueError(f"Early stopping is not supported for {model_type}")
+    
+    info = {
+        'best_iteration': int(best),
+        'iterations': len(curve),
+        'max_iterations': int(model.get_params()['n_estimators']),
+        'validation_fraction': EARLY_STOPPING_VALIDATION_FRACTION,
+        'metric': metric,
+        'learning_curve': [float(v) for v in curve],
+    }
+    print(f"   조기 종료: 최적 {info['best_iteration']}/{info['max_iterations']} 반복 "
+          f"(검증 {metric}={curve[best - 1]:.4f}, {info['iterations']}회 학습)")
+    return model, info
+
+
+# 하이퍼파라미터 탐색 방식: random = 후보 전체를 전체 데이터로 교차 검증,
+# halving = 연속 절반 탐색 (적은 샘플로 많은 후보를 평가하고 상위 1/factor만 다음 단계로)
+TUNING_STRATEGIES = ['halving', 'random']
+TUNING_CANDIDATES = {'random': 20, 'halving': 27}
+HALVING_FACTOR = 3
+TUNING_CV = 3
+
+
+def data_fingerprint(X, y):
+    """학습 데이터 스냅샷 식별자 (같은 지문이면 이전 탐색 점수를 그대로 재사용할 수 있다)"""
+    import hashlib
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(X.shape).encode())
+    if hasattr(X, 'tocsr'):
+        X = X.tocsr()
+        arrays = [X.data, X.indices, X.indptr]
+    else:
+        arrays = [X]
+    for array in arrays + [y]:
+        digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def _to_builtin(value):
+    """NumPy 스칼라를 JSON 저장 가능한 파이썬 값으로 변환"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def load_tuning_history(path):
+    """저장된 탐색 기록 로드 (없으면 빈 목록)"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f).get('results', [])
+
+
+def save_tuning_history(path, results):
+    """탐색 기록 저장 (임시 파일에 쓴 뒤 교체)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'results': results}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _neighbor_params(params, param_grid):
+    """그리드에서 한 파라미터만 한 칸 옮긴 이웃 설정들 (이전 최적 영역 주변 탐색)"""
+    neighbors = []
+    for name, values in param_grid.items():
+        if name not in params or params[name] not in values:
+            continue
+        i = values.index(params[name])
+        for j in (i - 1, i + 1):
+            if 0 <= j < len(values):
+                neighbors.append({**params, name: values[j]})
+    return neighbors
+
+
+def build_tuning_candidates(param_grid, history, estimator_name, fingerprint, n_candidates):
+    """이번 탐색에서 평가할 후보 목록
+
+    이전 실행의 상위 설정과 그 이웃을 먼저 넣고(warm start) 나머지는 그리드에서 무작위로 채운다.
+    같은 데이터 스냅샷에서 이미 평가한 설정은 제외한다.
+    """
+    from sklearn.model_selection import ParameterSampler
+    
+    history = [h for h in history if h['estimator'] == estimator_name]
+    evaluated = {_params_key(h['params']) for h in history if h['fingerprint'] == fingerprint}
+    grid_keys = set(param_grid)
+    
+    candidates = {}
+    
+    def add(params):
+        key = _params_key(params)
+        if set(params) == grid_keys and key not in evaluated and key not in candidates:
+            candidates[key] = params
+    
+    # 이전 최적 영역: 상위 3개 설정 (다른 스냅샷이면 재평가) + 이웃, 후보의 절반까지
+    for h in sorted(history, key=lambda h: h['score'], reverse=True)[:3]:
+        for params in [h['params']] + _neighbor_params(h['params'], param_grid):
+            if len(candidates) < n_candidates // 2:
+                add(params)
+    seeded = len(candidates)
+    
+    grid_size = int(np.prod([len(v) for v in param_grid.values()]))
+    sampler = ParameterSampler(param_grid, n_iter=min(grid_size, n_candidates * 4), random_state=42 + len(history))
+    for params in sampler:
+        if len(candidates) >= n_candidates:
+            break
+        add({k: _to_builtin(v) for k, v in params.items()})
+    return list(candidates.values()), seeded, len(evaluated)
+
+
+def run_hyperparameter_search(base_model, param_grid, X_train, y_train, fit_params=None, n_jobs=-1,
+                              strategy='halving', history_path=None):
+    """하이퍼파라미터 탐색 후 최적 파라미터를 적용한 (미학습) 모델 반환
+
+    결과는 history_path(JSON)에 누적 저장되고, 다음 실행은 이전 최적 영역부터 탐색하며
+    같은 데이터 스냅샷에서 이미 평가한 설정은 건너뛴다. 최종 선택은 이번 탐색과 같은 스냅샷의
+    이전 기록 중 각 탐색의 마지막 단계까지 평가된 최고 점수 설정이다.
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import GridSearchCV
+    if strategy not in TUNING_STRATEGIES:
+        raise ValueError(f"Unknown tuning strategy: {strategy}")
+    fit_params = fit_params or {}
+    
+    estimator_name = type(base_model).__name__
+    fingerprint = data_fingerprint(X_train, y_train)
+    history = load_tuning_history(history_path)
+    candidates, seeded, skipped = build_tuning_candidates(
+        param_grid, history, estimator_name, fingerprint, TUNING_CANDIDATES[strategy]
+    )
+    print(f"   탐색: {strategy}, 후보 {len(candidates)}개 (이전 최적 영역 {seeded}개, 기존 평가 {skipped}개 건너뜀)")
+    
+    n_samples = X_train.shape[0]
+    new_results = []
+    if candidates:
+        grid = [{k: [v] for k, v in params.items()} for params in candidates]
+        if strategy == 'halving':
+            from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+            from sklearn.model_selection import HalvingGridSearchCV
+            search = HalvingGridSearchCV(
+                base_model, grid, factor=HALVING_FACTOR, resource='n_samples', min_resources='exhaust',
+                cv=TUNING_CV, scoring='r2', n_jobs=n_jobs, random_state=42, refit=False, verbose=1
+            )
+        else:
+            search = GridSearchCV(
+                base_model, grid, cv=TUNING_CV, scoring='r2', n_jobs=n_jobs, refit=False, verbose=1
+            )
+        search.fit(X_train, y_train, **fit_params)
+        
+        # 후보별로 도달한 마지막 단계의 점수를 기록
+        cv_results = search.cv_results_
+        resources = cv_results.get('n_resources', [n_samples] * len(cv_results['params']))
+        last = {}
+        for params, score, resource in zip(cv_results['params'], cv_results['mean_test_score'], resources):
+            params = {k: _to_builtin(v) for k, v in params.items()}
+            key = _params_key(params)
+            if key not in last or resource >= last[key]['n_resources']:
+                last[key] = {
+                    'estimator': estimator_name,
+                    'fingerprint': fingerprint,
+                    'params': params,
+                    'score': float(score) if np.isfinite(score) else -1e9,
+                    'n_resources': int(resource),
+                    'strategy': strategy,
+                    'timestamp': datetime.now().strftime('%Y%m%d_%H%M%S'),
+                }
+        # 마지막 단계(가장 많은 샘플)까지 살아남은 후보만 최종 선택 대상
+        final_resource = max(r['n_resources'] for r in last.values())
+        for r in last.values():
+            r['final'] = r['n_resources'] == final_resource
+        new_results = list(last.values())
+    
+    if history_path:
+        save_tuning_history(history_path, history + new_results)
+        print(f"   탐색 기록 저장: {history_path} (+{len(new_results)}개)")
+    
+    # 같은 스냅샷에서 각 탐색의 마지막 단계까지 평가된 설정 중 최고 점수
+    finalists = [
+        h for h in history + new_results
+        if h['estimator'] == estimator_name and h['fingerprint'] == fingerprint and h.get('final')
+    ]
+    if not finalists:
+        print("   ⚠️  평가된 후보가 없어 기본 파라미터를 사용합니다.")
+        return clone(base_model)
+    best = max(finalists, key=lambda h: h['score'])
+    print(f"   최적 파라미터: {best['params']} (CV R²={best['score']:.4f}, 샘플 {best['n_resources']}개)")
+    return clone(base_model).set_params(**best['params'])
+
+
+# 학습 캐시 키에서 제외하는 파라미터 (결과 모델에 영향 없음)
+CACHE_IGNORED_PARAMS = {'n_jobs', 'verbose', 'verbosity'}
+
+
+def _json_default(value):
+    return value.tolist() if hasattr(value, 'tolist') else str(value)
+
+
+def training_cache_key(X_train, y_train, X_test, y_test, features, model_type, model, options=None):
+    """학습 결과를 결정하는 입력의 해시 (콘텐츠 주소 학습 캐시 키)
+
+    학습/테스트 행렬과 타깃, 특성 목록, 모델 종류, 모델 파라미터, 학습 옵션(튜닝 공간, 조기 종료),
+    모델 라이브러리 버전을 묶어 SHA-256으로 만든다.
+    """
+    import hashlib
+    library = type(model).__module__.split('.')[0]
+    payload = {
+        'data': [data_fingerprint(X_train, y_train), data_fingerprint(X_test, y_test)],
+        'features': list(features or []),
+        'model_type': model_type,
+        'estimator': type(model).__name__,
+        'params': {k: v for k, v in model.get_params().items() if k not in CACHE_IGNORED_PARAMS},
+        'options': options or {},
+        'library': [library, getattr(sys.modules.get(library), '__version__', None)],
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=_json_default).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def find_cached_model(mode, model_type, cache_key):
+    """같은 캐시 키로 저장된 모델의 (모델, 특성, 메타데이터) 경로 (없으면 None, 최신 우선)"""
+    output_dir = os.path.join('ml_models', mode)
+    metadata_paths = sorted(Path(output_dir).glob(f'model_metadata_{mode}_{model_type}_*.json'), reverse=True)
+    for metadata_path in metadata_paths:
+        try:
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if metadata.get('cache_key') != cache_key:
+            continue
+        prefix = f"{mode}_{model_type}_{metadata['timestamp']}"
+        model_path = f'{output_dir}/iracing_rank_predictor_{prefix}.pkl'
+        features_path = f'{output_dir}/model_features_{prefix}.json'
+        if os.path.exists(model_path) and os.path.exists(features_path):
+            return model_path, features_path, str(metadata_path)
+    return None
+
+
+def build_model(model_type, X_train, tune_hyperparams=False, categorical_features=None, n_jobs=-1, gb_engine='exact'):
+    """학습 전 모델 객체 생성
+
+    Returns:
+        (model, param_grid, fit_params) — param_grid는 튜닝 시 탐색 공간 (아니면 None),
+        fit_params는 fit()에 넘길 인자 (LightGBM categorical_feature)
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    
+    fit_params = {}
+    xgb_categorical = {}
+    if categorical_features:
+        if model_type == 'lightgbm':
+            fit_params['categorical_feature'] = list(categorical_features)
+        elif model_type == 'xgboost':
+            xgb_categorical = {
+                'feature_types': ['c' if i in set(categorical_features) else 'q' for i in range(X_train.shape[1])],
+                'enable_categorical': True,
+                'tree_method': 'hist',
+            }
+    
+    # 튜닝 시 병렬성은 탐색(교차 검증 fold × 후보) 쪽에만 둔다
+    model_jobs = 1 if tune_hyperparams else n_jobs
+    param_grid = None  # 튜닝 시 탐색 공간 (model은 탐색의 기본 모델)
     
     if model_type == 'random_forest':
         if tune_hyperparams:
-            print("   하이퍼파라미터 튜닝 중...")
             param_grid = {
                 'n_estimators': [100, 200, 300],
                 'max_depth': [15, 20, 25, None],
                 'min_samples_split': [5, 10, 15],
                 'min_samples_leaf': [2, 5, 10]
             }
-            base_model = RandomForestRegressor(random_state=42, n_jobs=-1)
-            search = RandomizedSearchCV(
-                base_model, param_grid, n_iter=20, cv=3, 
-                scoring='r2', n_jobs=-1, random_state=42, verbose=1
-            )
-            search.fit(X_train, y_train)
-            model = search.best_estimator_
-            print(f"   최적 파라미터: {search.best_params_}")
+            model = RandomForestRegressor(random_state=42, n_jobs=model_jobs)
         else:
             model = RandomForestRegressor(
                 n_estimators=200,
@@ -624,38 +1841,41 @@ def train_model(X_train, y_train, X_test, y_test, model_type='random_forest', tu
                 min_samples_split=5,
                 min_samples_leaf=2,
                 random_state=42,
-                n_jobs=-1
+                n_jobs=model_jobs
             )
     elif model_type == 'gradient_boosting':
         if tune_hyperparams:
-            print("   하이퍼파라미터 튜닝 중...")
-            param_grid = {
-                'n_estimators': [200, 300, 400],
-                'learning_rate': [0.05, 0.1, 0.15],
-                'max_depth': [8, 10, 12],
-                'min_samples_split': [5, 10, 15],
-                'min_samples_leaf': [2, 5]
-            }
-            base_model = GradientBoostingRegressor(random_state=42)
-            search = RandomizedSearchCV(
-                base_model, param_grid, n_iter=20, cv=3,
-                scoring='r2', n_jobs=-1, random_state=42, verbose=1
-            )
-            search.fit(X_train, y_train)
-            model = search.best_estimator_
-            print(f"   최적 파라미터: {search.best_params_}")
+            if gb_engine == 'hist':
+                # max_iter는 상한, 실제 반복 수는 조기 종료가 정한다
+                param_grid = {
+                    'max_iter': [300, 600, 1000],
+                    'learning_rate': [0.05, 0.1, 0.15],
+                    'max_depth': [None, 8, 12],
+                    'max_leaf_nodes': [31, 63, 127],
+                    'min_samples_leaf': [10, 20, 40],
+                    'l2_regularization': [0.0, 0.1, 1.0]
+                }
+            else:
+                param_grid = {
+                    'n_estimators': [200, 300, 400],
+                    'learning_rate': [0.05, 0.1, 0.15],
+                    'max_depth': [8, 10, 12],
+                    'min_samples_split': [5, 10, 15],
+                    'min_samples_leaf': [2, 5]
+                }
+            model = make_gradient_boosting(gb_engine, X_train, categorical_features)
         else:
-            model = GradientBoostingRegressor(
+            model = make_gradient_boosting(
+                gb_engine, X_train, categorical_features,
                 n_estimators=300,
                 learning_rate=0.1,
                 max_depth=12,
                 min_samples_split=5,
-                min_samples_leaf=2,
-                random_state=42
+                min_samples_leaf=2
             )
     elif model_type == 'xgboost' and XGBOOST_AVAILABLE:
+        import xgboost as xgb
         if tune_hyperparams:
-            print("   하이퍼파라미터 튜닝 중...")
             param_grid = {
                 'n_estimators': [200, 300, 400],
                 'learning_rate': [0.05, 0.1, 0.15],
@@ -663,14 +1883,7 @@ def train_model(X_train, y_train, X_test, y_test, model_type='random_forest', tu
                 'min_child_weight': [1, 3, 5],
                 'subsample': [0.8, 0.9, 1.0]
             }
-            base_model = xgb.XGBRegressor(random_state=42, n_jobs=-1)
-            search = RandomizedSearchCV(
-                base_model, param_grid, n_iter=20, cv=3,
-                scoring='r2', n_jobs=-1, random_state=42, verbose=1
-            )
-            search.fit(X_train, y_train)
-            model = search.best_estimator_
-            print(f"   최적 파라미터: {search.best_params_}")
+            model = xgb.XGBRegressor(random_state=42, n_jobs=model_jobs, **xgb_categorical)
         else:
             model = xgb.XGBRegressor(
                 n_estimators=300,
@@ -679,11 +1892,12 @@ def train_model(X_train, y_train, X_test, y_test, model_type='random_forest', tu
                 min_child_weight=3,
                 subsample=0.9,
                 random_state=42,
-                n_jobs=-1
+                n_jobs=model_jobs,
+                **xgb_categorical
             )
     elif model_type == 'lightgbm' and LIGHTGBM_AVAILABLE:
+        import lightgbm as lgb
         if tune_hyperparams:
-            print("   하이퍼파라미터 튜닝 중...")
             param_grid = {
                 'n_estimators': [200, 300, 400],
                 'learning_rate': [0.05, 0.1, 0.15],
@@ -691,14 +1905,7 @@ def train_model(X_train, y_train, X_test, y_test, model_type='random_forest', tu
                 'num_leaves': [31, 50, 70],
                 'min_child_samples': [10, 20, 30]
             }
-            base_model = lgb.LGBMRegressor(random_state=42, n_jobs=-1, verbose=-1)
-            search = RandomizedSearchCV(
-                base_model, param_grid, n_iter=20, cv=3,
-                scoring='r2', n_jobs=-1, random_state=42, verbose=1
-            )
-            search.fit(X_train, y_train)
-            model = search.best_estimator_
-            print(f"   최적 파라미터: {search.best_params_}")
+            model = lgb.LGBMRegressor(random_state=42, n_jobs=model_jobs, verbose=-1)
         else:
             model = lgb.LGBMRegressor(
                 n_estimators=300,
@@ -707,14 +1914,67 @@ def train_model(X_train, y_train, X_test, y_test, model_type='random_forest', tu
                 num_leaves=50,
                 min_child_samples=20,
                 random_state=42,
-                n_jobs=-1,
+                n_jobs=model_jobs,
                 verbose=-1
             )
     else:
         raise ValueError(f"Unknown model type: {model_type} or not available")
+    return model, param_grid, fit_params
+
+
+def train_model(X_train, y_train, X_test, y_test, model_type='random_forest', tune_hyperparams=False,
+                categorical_features=None, n_jobs=-1, gb_engine='exact', tune_strategy='halving', mode='pre',
+                early_stopping=False, features=None, use_cache=True):
+    """ML 모델 학습 (하이퍼파라미터 튜닝 옵션 포함)
+
+    Args:
+        categorical_features: native 인코딩 시 카테고리 코드 컬럼 위치.
+            LightGBM/XGBoost는 네이티브 카테고리로, 그 외 모델은 수치 특성으로 사용한다.
+        n_jobs: 이 모델에 허용된 코어 수. 튜닝 시에는 하이퍼파라미터 탐색이 코어를 쓰고
+            개별 모델은 단일 스레드로 학습한다 (중첩 병렬로 인한 과다 구독 방지).
+        gb_engine: gradient_boosting 엔진 ('exact' 또는 'hist', GB_ENGINES 참고)
+        tune_strategy: 튜닝 탐색 방식 ('halving' 또는 'random', TUNING_STRATEGIES 참고)
+        mode: 탐색 기록 저장 위치 (ml_models/{mode}/tuning_history_{mode}_{model_type}.json)
+        early_stopping: XGBoost/LightGBM을 검증 fold 조기 종료로 학습 (fit_with_early_stopping 참고)
+        features: 특성 이름 목록 (학습 캐시 키에 포함)
+        use_cache: 같은 캐시 키로 저장된 모델이 있으면 다시 학습하지 않고 재사용
+            (metrics['cached_paths']에 기존 (모델, 특성, 메타데이터) 경로)
+    """
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    print(f"\n🤖 {model_type} 모델 학습 중...")
     
-    # 학습
-    model.fit(X_train, y_train)
+    if model_type == 'gradient_boosting' and gb_engine == 'hist':
+        print("   엔진: HistGradientBoostingRegressor (조기 종료)")
+        X_train, X_test = _dense_for_hist(X_train), _dense_for_hist(X_test)
+    model, param_grid, fit_params = build_model(
+        model_type, X_train, tune_hyperparams, categorical_features, n_jobs, gb_engine
+    )
+    
+    # 학습 캐시: 같은 데이터/특성/모델/파라미터로 학습한 모델이 있으면 다시 학습하지 않는다
+    cache_key = training_cache_key(
+        X_train, y_train, X_test, y_test, features, model_type, model,
+        {'param_grid': param_grid, 'tune_strategy': tune_strategy if param_grid else None,
+         'early_stopping': early_stopping and model_type in EARLY_STOPPING_MODELS, 'fit_params': fit_params}
+    )
+    cached = find_cached_model(mode, model_type, cache_key) if use_cache else None
+    if cached:
+        import joblib
+        model_path, _, metadata_path = cached
+        print(f"   ♻️  학습 캐시 적중: {model_path} 재사용 (cache_key={cache_key[:12]})")
+        model = joblib.load(model_path)
+        with open(metadata_path, 'r') as f:
+            cached_metadata = json.load(f)
+        early_stopping_info = cached_metadata.get('early_stopping')
+    else:
+        if param_grid is not None:
+            print("   하이퍼파라미터 튜닝 중...")
+            # 탐색 기록은 모델 메타데이터 옆에 모델 종류별로 누적
+            history_path = os.path.join('ml_models', mode, f'tuning_history_{mode}_{model_type}.json')
+            model = run_hyperparameter_search(
+                model, param_grid, X_train, y_train, fit_params, n_jobs,
+                strategy=tune_strategy, history_path=history_path
+            )
+        model, early_stopping_info = _fit_model(model, model_type, X_train, y_train, fit_params, early_stopping)
     
     # 예측
     y_pred = model.predict(X_test)
@@ -729,17 +1989,239 @@ def train_model(X_train, y_train, X_test, y_test, model_type='random_forest', tu
     print(f"   RMSE: {rmse:.2f}")
     print(f"   R²: {r2:.4f}")
     
-    return model, {
+    metrics = {
         'mae': mae,
         'rmse': rmse,
         'r2': r2,
         'y_pred': y_pred,
-        'y_test': y_test
+        'y_test': np.array(y_test),  # 공유 메모리 맵이면 정리 후에도 쓸 수 있도록 복사
+        'cache_key': cache_key
+    }
+    if early_stopping_info:
+        metrics['early_stopping'] = early_stopping_info
+    if cached:
+        metrics['cached_paths'] = cached
+    return model, metrics
+
+
+def _fit_model(model, model_type, X_train, y_train, fit_params, early_stopping):
+    """모델 학습 후 (model, early_stopping_info) 반환"""
+    early_stopping_info = None
+    if early_stopping and model_type in EARLY_STOPPING_MODELS:
+        model, early_stopping_info = fit_with_early_stopping(model, model_type, X_train, y_train, fit_params)
+    else:
+        model.fit(X_train, y_train, **fit_params)
+    if getattr(model, 'n_iter_', None) is not None and getattr(model, 'early_stopping', False):
+        # HistGradientBoosting 내장 조기 종료 (validation_score_는 음의 손실, 0번째는 초기값)
+        print(f"   조기 종료: {model.n_iter_}/{model.max_iter} 반복")
+        early_stopping_info = {
+            'best_iteration': int(model.n_iter_),
+            'iterations': int(model.n_iter_),
+            'max_iterations': int(model.max_iter),
+            'validation_fraction': float(model.validation_fraction),
+            'metric': 'loss',
+            'learning_curve': [float(-v) for v in model.validation_score_[1:]],
+        }
+    return model, early_stopping_info
+
+
+# 전역 모델 학습 순서 (설치된 라이브러리만 사용)
+MODEL_TYPES = ['random_forest', 'gradient_boosting', 'xgboost', 'lightgbm']
+
+# n_jobs를 지원하지 않는 모델 (튜닝하지 않으면 코어 1개만 할당)
+SINGLE_THREADED_MODELS = {'gradient_boosting'}
+
+
+def available_model_types():
+    """설치된 라이브러리 기준으로 학습 가능한 모델 목록"""
+    available = {'xgboost': XGBOOST_AVAILABLE, 'lightgbm': LIGHTGBM_AVAILABLE}
+    return [m for m in MODEL_TYPES if available.get(m, True)]
+
+
+def allocate_core_budget(model_types, total_cores, tune_hyperparams=False, max_workers=None, gb_engine='exact'):
+    """전체 코어 예산을 모델별로 나눈다
+
+    단일 스레드 모델(exact 엔진 gradient_boosting)은 튜닝하지 않으면 1코어만 받는다. 모든 모델이 동시에 돌면 나머지 코어를
+    멀티스레드 모델에 고르게 분배하고, 동시 학습 수(max_workers)가 모델 수보다 적으면
+    각 모델은 워커 한 칸의 몫(total_cores // max_workers)을 받는다. 각 모델은 최소 1코어.
+    """
+    total_cores = max(1, int(total_cores))
+    max_workers = max_workers or len(model_types)
+    # hist 엔진은 OpenMP 멀티스레드
+    single_threaded = set() if tune_hyperparams else SINGLE_THREADED_MODELS
+    if gb_engine == 'hist':
+        single_threaded = single_threaded - {'gradient_boosting'}
+    if max_workers < len(model_types):
+        per_worker = max(1, total_cores // max_workers)
+        return {m: 1 if m in single_threaded else per_worker for m in model_types}
+    
+    budget = {}
+    multi = []
+    for model_type in model_types:
+        if model_type in single_threaded:
+            budget[model_type] = 1
+        else:
+            multi.append(model_type)
+    remaining = max(len(multi), total_cores - len(budget))
+    for i, model_type in enumerate(multi):
+        budget[model_type] = max(1, remaining // len(multi) + (1 if i < remaining % len(multi) else 0))
+    return budget
+
+
+def _train_model_worker(X_train, y_train, X_test, y_test, model_type, tune_hyperparams,
+                        categorical_features, n_jobs, gb_engine='exact', tune_strategy='halving', mode='pre',
+                        early_stopping=False, features=None, use_cache=True, profile_path=None):
+    """프로세스 풀 작업 단위: 코어 예산 안에서 모델 하나를 학습하고 (model, metrics, timing) 반환
+
+    X/y는 배열 또는 SharedMatrix (메모리 맵으로 연결). BLAS/OpenMP 스레드 수를 threadpoolctl로 n_jobs에 고정한다. CPU 시간은 이 프로세스의
+    모든 스레드 합계이며, 튜닝 시 joblib 워커 프로세스의 CPU 시간은 포함되지 않는다.
+    profile_path가 주어지면 학습을 cProfile로 감싸 그 경로에 저장한다.
+    """
+    from contextlib import nullcontext
+    if importlib.util.find_spec('threadpoolctl') is not None:
+        from threadpoolctl import threadpool_limits
+        limits = threadpool_limits(limits=n_jobs)
+    else:
+        limits = nullcontext()
+    
+    X_train, y_train, X_test, y_test = (attach_matrix(a) for a in (X_train, y_train, X_test, y_test))
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    with limits:
+        model, metrics = train_model(
+            X_train, y_train, X_test, y_test, model_type,
+            tune_hyperparams=tune_hyperparams, categorical_features=categorical_features, n_jobs=n_jobs,
+            gb_engine=gb_engine, tune_strategy=tune_strategy, mode=mode, early_stopping=early_stopping,
+            features=features, use_cache=use_cache
+        )
+    timing = {
+        'wall_time': time.perf_counter() - wall_start,
+        'cpu_time': time.process_time() - cpu_start,
+        'n_jobs': n_jobs,
+        'max_rss_mb': process_peak_rss_mb(),
     }
+    if profiler:
+        profiler.disable()
+        os.makedirs(os.path.dirname(profile_path) or '.', exist_ok=True)
+        profiler.dump_stats(profile_path)
+        timing['profile'] = profile_path
+    return model, metrics, timing
+
+
+def train_models_parallel(X_train, y_train, X_test, y_test, model_types=None, tune_hyperparams=False,
+                          categorical_features=None, total_cores=None, max_workers=None, gb_engine='exact',
+                          tune_strategy='halving', mode='pre', early_stopping=False, features=None, use_cache=True):
+    """여러 모델을 프로세스 풀에서 동시에 학습
+
+    Args:
+        model_types: 학습할 모델 목록 (None이면 설치된 모든 모델)
+        total_cores: 모든 모델이 나눠 쓸 전체 코어 수 (None이면 os.cpu_count())
+        max_workers: 동시에 학습할 모델 수 (1이면 현재 프로세스에서 순차 학습)
+        gb_engine: gradient_boosting 엔진 ('exact' 또는 'hist')
+        tune_strategy: 튜닝 탐색 방식 ('halving' 또는 'random')
+        mode: 모델 모드 (탐색 기록 위치)
+        early_stopping: XGBoost/LightGBM 조기 종료 학습
+        features: 특성 이름 목록 (학습 캐시 키)
+        use_cache: 학습 캐시 사용 여부
+
+    Returns:
+        {model_type: (model, metrics, timing)} (model_types 순서 유지)
+    """
+    model_types = list(model_types or available_model_types())
+    total_cores = total_cores or os.cpu_count() or 1
+    # 코어 예산보다 많은 모델을 동시에 돌리면 다시 과다 구독이 되므로 동시 학습 수도 예산으로 제한
+    max_workers = max(1, min(max_workers or len(model_types), len(model_types), total_cores))
+    
+    # 동시에 도는 모델끼리 코어를 나눈다 (순차 학습이면 모델마다 전체 예산 사용)
+    budget = allocate_core_budget(model_types, total_cores, tune_hyperparams, max_workers, gb_engine)
+    print(f"\n⚙️  모델 학습: {len(model_types)}개 모델, 동시 {max_workers}개, 코어 예산 {total_cores}개")
+    print(f"   모델별 코어: {', '.join(f'{m}={budget[m]}' for m in model_types)}")
+    
+    # 큰 행렬은 한 번만 파일로 쓰고 워커는 메모리 맵으로 연결 (프로세스마다 피클 복사본을 만들지 않음).
+    # 순차 학습에서도 튜닝 탐색의 joblib 워커가 np.memmap을 경로로 받도록 메모리 맵으로 바꾼다.
+    shared_dir = None
+    nbytes = sum(matrix_nbytes(a) for a in (X_train, y_train, X_test, y_test))
+    if nbytes >= SHARED_MATRIX_MIN_BYTES and (max_workers > 1 or tune_hyperparams):
+        shared_dir, shared = share_matrices({'X_train': X_train, 'y_train': y_train, 'X_test': X_test, 'y_test': y_test})
+        print(f"   💾 특성 행렬 메모리 맵 공유: {shared_dir} ({nbytes / 1024 ** 2:.0f} MB)")
+        X_train, y_train, X_test, y_test = (
+            shared[name].load() if max_workers == 1 else shared[name]
+            for name in ('X_train', 'y_train', 'X_test', 'y_test')
+        )
+    
+    wall_start = time.perf_counter()
+    results = {}
+    try:
+        results = _run_model_workers(
+            X_train, y_train, X_test, y_test, model_types, tune_hyperparams, categorical_features, budget,
+            max_workers, gb_engine, tune_strategy, mode, early_stopping, features, use_cache
+        )
+    finally:
+        if shared_dir:
+            import shutil
+            shutil.rmtree(shared_dir, ignore_errors=True)
+    total_wall = time.perf_counter() - wall_start
+    
+    print(f"\n⏱️  모델별 학습 시간:")
+    for model_type, (_, _, timing) in results.items():
+        print(f"   {model_type:20s}: wall {timing['wall_time']:.1f}초, CPU {timing['cpu_time']:.1f}초 ({timing['n_jobs']}코어)")
+    sum_wall = sum(timing['wall_time'] for _, _, timing in results.values())
+    print(f"   전체 wall {total_wall:.1f}초 (모델별 합계 {sum_wall:.1f}초)")
+    return results
+
+
+def _run_model_workers(X_train, y_train, X_test, y_test, model_types, tune_hyperparams, categorical_features,
+                       budget, max_workers, gb_engine, tune_strategy, mode, early_stopping, features, use_cache):
+    """train_models_parallel()의 실행부: 순차(max_workers=1) 또는 spawn 프로세스 풀"""
+    results = {}
+    if max_workers == 1:
+        for model_type in model_types:
+            with profile_stage(f'train_model:{model_type}', rows=X_train.shape[0]):
+                results[model_type] = _train_model_worker(
+                    X_train, y_train, X_test, y_test, model_type, tune_hyperparams,
+                    categorical_features, budget[model_type], gb_engine, tune_strategy, mode, early_stopping,
+                    features, use_cache
+                )
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # fork는 이미 초기화된 OpenMP 스레드 풀과 충돌할 수 있으므로 spawn 사용
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = {
+                model_type: executor.submit(
+                    _train_model_worker, X_train, y_train, X_test, y_test, model_type,
+                    tune_hyperparams, categorical_features, budget[model_type], gb_engine,
+                    tune_strategy, mode, early_stopping, features, use_cache,
+                    _run_profiler.profile_path(f'train_model:{model_type}') if _run_profiler else None
+                )
+                for model_type in model_types
+            }
+            for model_type, future in futures.items():
+                results[model_type] = future.result()
+        if _run_profiler is not None:
+            for model_type, (_, _, timing) in results.items():
+                _run_profiler.add_stage(
+                    f'train_model:{model_type}', timing['wall_time'], timing['cpu_time'], rows=X_train.shape[0],
+                    peak_rss_mb=timing['max_rss_mb'], profile=timing.get('profile')
+                )
+    return results
 
 
 def plot_feature_importance(model, features, model_type):
     """특성 중요도 시각화"""
+    if not hasattr(model, 'feature_importances_'):
+        # HistGradientBoostingRegressor 등은 불순도 기반 중요도를 제공하지 않는다
+        print(f"\nℹ️  {type(model).__name__}는 feature_importances_를 제공하지 않아 특성 중요도 그래프를 건너뜁니다.")
+        return
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
     print(f"\n📊 특성 중요도 분석 중...")
     
     feature_importance = pd.DataFrame({
@@ -766,8 +2248,15 @@ def plot_feature_importance(model, features, model_type):
     plt.close()
 
 
-def save_model(model, features, metrics, model_type, mode='pre'):
-    """모델 저장"""
+def save_model(model, features, metrics, model_type, mode='pre', encoder=None, encoding='onehot',
+               encoded_feature_names=None, training_data=None, lineage=None):
+    """모델 저장
+
+    encoder가 주어지면 학습에 사용한 카테고리 인코더를 모델 옆에 함께 저장하고
+    메타데이터에 경로와 인코딩 방식을 기록한다 (추론 시 같은 인코더를 재사용).
+    training_data(동기화 기준 컬럼, 최고 수위, 레코드 수)는 다음 증분 학습의 시작점이 되고,
+    lineage는 증분 학습으로 만든 버전의 부모 모델 정보다.
+    """
     output_dir = os.path.join('ml_models', mode)
     os.makedirs(output_dir, exist_ok=True)
     
@@ -776,6 +2265,7 @@ def save_model(model, features, metrics, model_type, mode='pre'):
     
     # 모델 저장
     model_path = f'{output_dir}/iracing_rank_predictor_{prefix}.pkl'
+    import joblib
     joblib.dump(model, model_path)
     print(f"✅ 모델 저장: {model_path}")
     
@@ -785,9 +2275,17 @@ def save_model(model, features, metrics, model_type, mode='pre'):
         json.dump(features, f, indent=2)
     print(f"✅ 특성 목록 저장: {features_path}")
     
+    # 카테고리 인코더 저장
+    encoder_path = None
+    if encoder is not None:
+        encoder_path = f'{output_dir}/categorical_encoder_{prefix}.pkl'
+        joblib.dump(encoder, encoder_path)
+        print(f"✅ 카테고리 인코더 저장: {encoder_path}")
+    
     # 메타데이터 저장
     metadata = {
         'model_type': model_type,
+        'estimator': type(model).__name__,
         'mode': mode,
         'timestamp': timestamp,
         'features': features,
@@ -797,6 +2295,25 @@ def save_model(model, features, metrics, model_type, mode='pre'):
             'r2': float(metrics['r2'])
         }
     }
+    if 'wall_time' in metrics:
+        metadata['training_time'] = {
+            'wall_time': float(metrics['wall_time']),
+            'cpu_time': float(metrics['cpu_time']),
+            'n_jobs': int(metrics['n_jobs']),
+        }
+    if 'early_stopping' in metrics:
+        metadata['early_stopping'] = metrics['early_stopping']
+    if 'cache_key' in metrics:
+        metadata['cache_key'] = metrics['cache_key']
+    if training_data is not None:
+        metadata['training_data'] = training_data
+    if lineage is not None:
+        metadata['lineage'] = lineage
+    if encoder is not None:
+        metadata['encoding'] = encoding
+        metadata['categorical_columns'] = list(encoder.feature_names_in_)
+        metadata['encoded_features'] = list(encoded_feature_names or [])
+        metadata['encoder_path'] = os.path.relpath(encoder_path, output_dir)
     metadata_path = f'{output_dir}/model_metadata_{prefix}.json'
     with open(metadata_path, 'w') as f:
         json.dump(metadata, f, indent=2)
@@ -805,230 +2322,736 @@ def save_model(model, features, metrics, model_type, mode='pre'):
     return model_path, features_path, metadata_path
 
 
-def train_specialized_models(df_clean, features, target='actual_finish_position'):
-    """유저별, 트랙별, 차량별 특화 모델 학습"""
-    print("\n" + "="*60)
-    print("🎯 특화 모델 학습 시작\n")
+def register_model(model_path, metadata_path, training_samples, client=None):
+    """저장한 모델을 iracing_ml_models 테이블에 등록 (model_file_hash = 학습 캐시 키)
+
+    (model_name, model_version) 기준 upsert이므로 캐시로 재사용한 모델을 다시 등록해도 중복되지 않는다.
+    """
+    with open(metadata_path, 'r') as f:
+        metadata = json.load(f)
+    metrics = metadata['metrics']
+    row = {
+        'model_name': f"iracing_rank_predictor_{metadata['mode']}_{metadata['model_type']}",
+        'model_type': 'finish_position',
+        'model_version': metadata['timestamp'],
+        'mean_absolute_error': round(metrics['mae'], 4),
+        'r2_score': round(min(max(metrics['r2'], -9.9999), 9.9999), 4),  # DECIMAL(5, 4)
+        'training_samples': int(training_samples),
+        'training_date': datetime.strptime(metadata['timestamp'], '%Y%m%d_%H%M%S').astimezone().isoformat(),
+        'features_used': metadata['features'],
+        'model_file_path': model_path,
+        'model_file_hash': metadata.get('cache_key'),
+    }
+    client = client or get_supabase_client()
+    _execute_with_retry(
+        lambda: client.table('iracing_ml_models').upsert(row, on_conflict='model_name,model_version')
+    )
+    print(f"✅ 모델 등록: {row['model_name']} ({row['model_version']}, hash={str(row['model_file_hash'])[:12]})")
+
+
+def find_cached_ensemble(mode, cache_key):
+    """같은 구성(모델 캐시 키 + 가중치)의 앙상블 설정 경로 (없으면 None)"""
+    for config_path in sorted(Path('ml_models', mode).glob(f'ensemble_config_{mode}_*.json'), reverse=True):
+        try:
+            with open(config_path, 'r') as f:
+                if json.load(f).get('cache_key') == cache_key:
+                    return str(config_path)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def restamp_ensemble_config(config_path, timestamp):
+    """재사용하는 앙상블 설정을 이번 실행 타임스탬프로 옮겨 최신 앙상블로 만든다
+
+    레지스트리/find_latest_ensemble_config()는 설정의 timestamp(없으면 파일 mtime)로 최신을 고르므로
+    파일만 다시 쓰면 이전 실행의 앙상블이 계속 선택된다. 설정의 timestamp를 바꿔
+    ensemble_config_{mode}_{timestamp}.json으로 옮기고, 컴파일 파일이 있으면 함께 옮긴다 (모델 파일은 그대로).
+
+    Returns:
+        새 설정 경로
+    """
+    from load_ensemble_model import compiled_ensemble_path
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    config['timestamp'] = timestamp
+    new_path = os.path.join(os.path.dirname(config_path), f"ensemble_config_{config['mode']}_{timestamp}.json")
+    if os.path.abspath(new_path) == os.path.abspath(config_path):
+        return config_path
+    with open(new_path, 'w') as f:
+        json.dump(config, f, indent=2)
+    compiled_path = compiled_ensemble_path(config_path)
+    if compiled_path.exists():
+        os.replace(compiled_path, compiled_ensemble_path(new_path))
+    os.remove(config_path)
+    return new_path
+
+
+# 특화 모델 차원: 그룹 컬럼, 최소 레코드 수, 모델 파라미터
+SPECIALIZED_DIMENSIONS = {
+    'user': {'column': 'cust_id', 'label': '유저', 'icon': '👤', 'min_samples': 50,
+             'params': {'n_estimators': 100, 'learning_rate': 0.1, 'max_depth': 5}},
+    'track': {'column': 'track_id', 'label': '트랙', 'icon': '🏁', 'min_samples': 100,
+              'params': {'n_estimators': 200, 'learning_rate': 0.1, 'max_depth': 8}},
+    'car': {'column': 'car_id', 'label': '차량', 'icon': '🚗', 'min_samples': 100,
+            'params': {'n_estimators': 200, 'learning_rate': 0.1, 'max_depth': 8}},
+}
+
+# 차원 하나의 학습 대상 레코드가 이보다 적으면 프로세스 풀 없이 현재 프로세스에서 학습한다.
+# spawn 워커는 pandas/sklearn/xgboost/lightgbm import에만 2초 이상 걸린다
+# (20k 레코드 합성 데이터의 특화 모델 학습: exact 약 2.5ms/레코드, hist 약 0.3ms/레코드).
+SPECIALIZED_POOL_MIN_ROWS = {'exact': 20_000, 'hist': 100_000}
+# 전역 테스트 세트 기준 분할에서 그룹의 테스트 레코드가 이보다 적으면 전역 모델과 비교할 수 없어 학습하지 않는다
+SPECIALIZED_MIN_TEST_ROWS = 5
+
+
+def _train_group_models(tasks, params, gb_engine, categorical_features, threads=1):
+    """프로세스 풀 작업 단위: [(group_key, X_group, y_group, test_mask, baseline), ...]의 각 그룹 모델 학습
+
+    test_mask가 None이면 그룹 안에서 무작위 80/20 분할, 있으면 True 행으로 평가한다.
+    baseline(테스트 행의 전역 모델 예측)이 있으면 같은 행의 전역 MAE/R²도 기록한다.
+    BLAS/OpenMP 스레드를 threads개로 제한한다 (풀 워커는 1개, 병렬성은 그룹 단위).
+    """
+    from contextlib import nullcontext
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error, r2_score
+    if importlib.util.find_spec('threadpoolctl') is not None:
+        from threadpoolctl import threadpool_limits
+        limits = threadpool_limits(limits=threads)
+    else:
+        limits = nullcontext()
     
-    specialized_results = {}
+    results = {}
+    with limits:
+        for key, X_group, y_group, test_mask, baseline in tasks:
+            if test_mask is None:
+                X_train, X_test, y_train, y_test = train_test_split(
+                    X_group, y_group, test_size=0.2, random_state=42
+                )
+            else:
+                X_train, X_test = X_group[~test_mask], X_group[test_mask]
+                y_train, y_test = y_group[~test_mask], y_group[test_mask]
+            model = make_gradient_boosting(gb_engine, X_train, categorical_features, **params)
+            model.fit(X_train, y_train)
+            y_pred = model.predict(X_test)
+            results[key] = {
+                'model': model,
+                'mae': float(mean_absolute_error(y_test, y_pred)),
+                'r2': float(r2_score(y_test, y_pred)),
+                'samples': int(len(y_group)),
+                'test_samples': int(len(y_test)),
+            }
+            if baseline is not None:
+                results[key]['global_mae'] = float(mean_absolute_error(y_test, baseline))
+                results[key]['global_r2'] = float(r2_score(y_test, baseline))
+    return results
+
+
+def specialized_cache_key(X, y, group_values, features, dimension, gb_engine, categorical_features,
+                          test_mask=None, baseline=None):
+    """특화 모델 차원 하나의 학습 캐시 키 (데이터, 그룹 ID, 특성, 차원 설정, 엔진, 평가 분할/전역 예측, 라이브러리 버전)"""
+    import hashlib
+    import sklearn
+    payload = {
+        'data': data_fingerprint(X, y),
+        'groups': data_fingerprint(np.asarray(group_values, dtype=np.float64), y),
+        'features': list(features),
+        'dimension': dimension,
+        'spec': {k: v for k, v in SPECIALIZED_DIMENSIONS[dimension].items() if k not in ('label', 'icon')},
+        'gb_engine': gb_engine,
+        'categorical_features': list(categorical_features or []),
+        'evaluation': None if test_mask is None else data_fingerprint(
+            np.asarray(test_mask, dtype=np.float64), np.nan_to_num(np.asarray(baseline, dtype=np.float64), nan=-1.0)
+        ),
+        'library': ['sklearn', sklearn.__version__],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=_json_default).encode()).hexdigest()
+
+
+def find_cached_specialized(mode, dimension, cache_key):
+    """같은 캐시 키로 저장된 특화 모델 인덱스 경로 (아티팩트가 있을 때만, 최신 우선)"""
+    output_dir = Path('ml_models', mode)
+    for index_path in sorted(output_dir.glob(f'specialized_index_{mode}_{dimension}_*.json'), reverse=True):
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if index.get('cache_key') == cache_key and (output_dir / index['artifact_path']).exists():
+            return str(index_path)
+    return None
+
+
+def train_specialized_models(df_clean, features, target='actual_finish_position', X=None,
+                             gb_engine='exact', categorical_features=None, n_jobs=None,
+                             mode='pre', use_cache=True, test_mask=None, baseline_pred=None):
+    """유저별, 트랙별, 차량별 특화 모델 학습
+
+    그룹별 행 위치를 groupby().indices로 한 번만 계산하고, 최소 레코드 수를 넘는 모든 그룹을
+    학습한다. 코어 예산은 allocate_core_budget()으로 그룹 모델 하나의 코어 수를 정해 워커 수로 나누고,
+    워커가 2개 이상이고 차원의 학습 레코드가 SPECIALIZED_POOL_MIN_ROWS 이상일 때만
+    프로세스 풀을 띄운다 (큰 그룹부터 작업 묶음에 고르게 분배). 그 밖에는 현재 프로세스에서 학습한다.
+
+    test_mask(전역 모델의 테스트 세트)를 주면 그룹마다 전역 학습 세트 행으로 학습하고 전역 테스트 세트 행으로
+    평가해서, baseline_pred(그 행의 전역 앙상블 예측)와 같은 행에서 비교한 global_mae/global_r2를 함께 기록한다.
+
+    Args:
+        df_clean: 그룹 컬럼(cust_id, track_id, car_id)의 원래 ID를 가진 DataFrame (X와 행 순서가 같아야 함)
+        X: build_feature_matrix()로 만든 특성 행렬 (None이면 df_clean[features])
+        gb_engine: 특화 모델 엔진 ('exact' 또는 'hist')
+        categorical_features: native 인코딩 카테고리 코드 컬럼 위치 (hist 엔진에서 사용)
+        n_jobs: 특화 모델 학습 코어 예산 (None이면 os.cpu_count(), 1이면 현재 프로세스에서 순차 학습)
+        mode: 모델 모드 (학습 캐시 조회 위치)
+        use_cache: 같은 캐시 키로 저장된 차원은 다시 학습하지 않고 기존 인덱스 재사용
+        test_mask: 전역 테스트 세트 행 여부 (X와 같은 길이의 bool 배열, None이면 그룹 안에서 무작위 분할)
+        baseline_pred: 전역 앙상블 예측 (X와 같은 길이, test_mask 행만 사용)
+
+    Returns:
+        {'user_models': {group_key: {'model', 'mae', 'r2', 'samples', 'test_samples', 'global_mae', 'global_r2'}},
+         'track_models': ..., 'car_models': ...,
+         'cache_keys': {dimension: cache_key}, 'cached_indices': {dimension: 재사용한 인덱스 경로}}
+        (재사용한 차원의 그룹 결과에는 'model'이 없다)
+    """
+    if X is None:
+        X = df_clean[features].values
+    if gb_engine == 'hist':
+        X = _dense_for_hist(X)
+    y = df_clean[target].to_numpy()
+    total_cores = max(1, n_jobs or os.cpu_count() or 1)
+    # 그룹 모델 하나의 코어 수 (exact: 1코어 → 코어 수만큼 워커, hist: 멀티스레드 → 현재 프로세스 하나)
+    threads = allocate_core_budget(['gradient_boosting'], total_cores, gb_engine=gb_engine)['gradient_boosting']
+    workers = max(1, total_cores // threads)
+    min_pool_rows = SPECIALIZED_POOL_MIN_ROWS.get(gb_engine, SPECIALIZED_POOL_MIN_ROWS['exact'])
+    print("\n" + "="*60)
+    print(f"🎯 특화 모델 학습 시작 (코어 예산 {total_cores}개: 워커 최대 {workers}개 × {threads}스레드)\n")
     
-    # 1. 유저별 특화 모델 (데이터가 많은 유저만)
-    print("👤 유저별 특화 모델 학습 중...")
-    user_counts = df_clean['cust_id'].value_counts()
-    top_users = user_counts[user_counts >= 50].index  # 최소 50개 레코드 이상
+    specialized_results = {'cache_keys': {}, 'cached_indices': {}}
+    executor = None
     
-    if len(top_users) > 0:
-        print(f"   {len(top_users)}명의 유저에 대해 특화 모델 학습 (최소 50개 레코드)")
-        user_models = {}
-        for user_id in top_users[:10]:  # 상위 10명만 (시간 절약)
-            user_data = df_clean[df_clean['cust_id'] == user_id]
-            if len(user_data) < 30:  # 테스트 세트를 위해 최소 30개 필요
-                continue
-            
-            X_user = user_data[features].values
-            y_user = user_data[target].values
-            
-            if len(X_user) < 30:
+    try:
+        for dimension, spec in SPECIALIZED_DIMENSIONS.items():
+            column = spec['column']
+            print(f"{spec['icon']} {spec['label']}별 특화 모델 학습 중...")
+            if column not in df_clean.columns:
+                print(f"   ⚠️  {column} 컬럼이 없어 건너뜁니다.")
                 continue
             
-            X_train, X_test, y_train, y_test = train_test_split(
-                X_user, y_user, test_size=0.2, random_state=42
+            indices = df_clean.groupby(column, observed=True, sort=False).indices
+            groups = sorted(
+                ((key, idx) for key, idx in indices.items()
+                 if len(idx) >= spec['min_samples']
+                 and (test_mask is None or test_mask[idx].sum() >= SPECIALIZED_MIN_TEST_ROWS)),
+                key=lambda item: len(item[1]), reverse=True
             )
+            if not groups:
+                print(f"   ℹ️  최소 {spec['min_samples']}개 레코드를 넘는 그룹이 없습니다.")
+                continue
             
-            # 간단한 모델 학습 (데이터가 적으므로)
-            model = GradientBoostingRegressor(
-                n_estimators=100,
-                learning_rate=0.1,
-                max_depth=5,
-                random_state=42
+            cache_key = specialized_cache_key(
+                X, y, df_clean[column].to_numpy(dtype=np.float64), features, dimension, gb_engine, categorical_features,
+                test_mask, baseline_pred
             )
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
+            specialized_results['cache_keys'][dimension] = cache_key
+            cached_index = find_cached_specialized(mode, dimension, cache_key) if use_cache else None
+            if cached_index:
+                with open(cached_index, 'r') as f:
+                    entries = json.load(f)['models']
+                specialized_results[f'{dimension}_models'] = {
+                    key: {k: v for k, v in entry.items() if k not in ('offset', 'length')}
+                    for key, entry in entries.items()
+                }
+                specialized_results['cached_indices'][dimension] = cached_index
+                print(f"   ♻️  학습 캐시 적중: {cached_index} 재사용 ({len(entries)}개 모델)")
+                continue
+            group_rows = sum(len(idx) for _, idx in groups)
+            use_pool = workers > 1 and len(groups) > 1 and group_rows >= min_pool_rows
+            print(f"   {len(groups)}개 그룹에 대해 특화 모델 학습 (최소 {spec['min_samples']}개 레코드, "
+                  f"{group_rows}개 레코드, {'워커 ' + str(workers) + '개' if use_pool else '현재 프로세스'})")
+            if use_pool and executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
             
-            mae = mean_absolute_error(y_test, y_pred)
-            r2 = r2_score(y_test, y_pred)
+            # 큰 그룹부터 라운드 로빈으로 작업 묶음에 분배 (워커 간 부하 균형)
+            n_tasks = min(len(groups), workers * 4) if use_pool else 1
+            chunks = [[] for _ in range(n_tasks)]
+            for i, (key, idx) in enumerate(groups):
+                group_test = None if test_mask is None else test_mask[idx]
+                baseline = None if baseline_pred is None else baseline_pred[idx][group_test]
+                chunks[i % n_tasks].append((_to_builtin(key), X[idx], y[idx], group_test, baseline))
             
-            user_models[user_id] = {
-                'model': model,
-                'mae': mae,
-                'r2': r2,
-                'samples': len(user_data)
-            }
+            start = time.perf_counter()
+            models = {}
+            if not use_pool:
+                for chunk in chunks:
+                    models.update(_train_group_models(chunk, spec['params'], gb_engine, categorical_features, threads))
+            else:
+                futures = [
+                    executor.submit(_train_group_models, chunk, spec['params'], gb_engine, categorical_features)
+                    for chunk in chunks
+                ]
+                for future in futures:
+                    models.update(future.result())
             
-            if len(user_models) % 5 == 0:
-                print(f"   진행: {len(user_models)}/{min(10, len(top_users))}명 완료")
+            avg_r2 = np.mean([m['r2'] for m in models.values()])
+            avg_mae = np.mean([m['mae'] for m in models.values()])
+            print(f"   ✅ {spec['label']}별 모델: 평균 R²={avg_r2:.4f}, 평균 MAE={avg_mae:.2f} "
+                  f"({len(models)}개 모델, {time.perf_counter() - start:.1f}초)")
+            if baseline_pred is not None:
+                better = sum(m['mae'] < m['global_mae'] for m in models.values())
+                avg_global_mae = np.mean([m['global_mae'] for m in models.values()])
+                print(f"      같은 테스트 행의 전역 앙상블: 평균 MAE={avg_global_mae:.2f}, "
+                      f"전역보다 나은 특화 모델 {better}/{len(models)}개 (이 모델만 라우팅)")
+            specialized_results[f'{dimension}_models'] = models
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    return specialized_results
+
+
+def save_specialized_models(specialized_results, features, mode='pre', encoder=None, encoding='onehot',
+                            encoded_feature_names=None):
+    """특화 모델을 차원별 인덱스 아티팩트 하나로 저장
+
+    specialized_models_{mode}_{dimension}_{timestamp}.bin: 그룹별 모델 pickle을 이어붙인 파일
+    specialized_index_{mode}_{dimension}_{timestamp}.json: 그룹 ID → (offset, length, 성능) 인덱스
+    인덱스만 읽고 필요한 그룹의 모델만 offset에서 역직렬화할 수 있다.
+    성능에는 같은 테스트 행의 전역 앙상블 global_mae/global_r2가 들어 있어 라우터가 더 나은 모델만 고른다.
+
+    Returns:
+        {dimension: index_path}
+    """
+    import pickle
+    output_dir = os.path.join('ml_models', mode)
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    index_paths = dict(specialized_results.get('cached_indices', {}))
+    for dimension, spec in SPECIALIZED_DIMENSIONS.items():
+        models = specialized_results.get(f'{dimension}_models')
+        if not models or dimension in index_paths:
+            continue
+        prefix = f'{mode}_{dimension}_{timestamp}'
+        artifact_path = f'{output_dir}/specialized_models_{prefix}.bin'
+        entries = {}
+        with open(artifact_path, 'wb') as f:
+            for key, result in models.items():
+                payload = pickle.dumps(result['model'], protocol=pickle.HIGHEST_PROTOCOL)
+                entries[str(key)] = {
+                    'offset': f.tell(),
+                    'length': len(payload),
+                    **{k: v for k, v in result.items() if k != 'model'},  # mae, r2, samples, global_mae, ...
+                }
+                f.write(payload)
+        
+        index = {
+            'dimension': dimension,
+            'column': spec['column'],
+            'mode': mode,
+            'timestamp': timestamp,
+            'features': features,
+            'artifact_path': os.path.relpath(artifact_path, output_dir),
+            'cache_key': specialized_results.get('cache_keys', {}).get(dimension),
+            'models': entries,
+        }
+        if encoder is not None:
+            import joblib
+            encoder_path = f'{output_dir}/categorical_encoder_specialized_{prefix}.pkl'
+            joblib.dump(encoder, encoder_path)
+            index['encoding'] = encoding
+            index['categorical_columns'] = list(encoder.feature_names_in_)
+            index['encoded_features'] = list(encoded_feature_names or [])
+            index['encoder_path'] = os.path.relpath(encoder_path, output_dir)
+        index_path = f'{output_dir}/specialized_index_{prefix}.json'
+        with open(index_path, 'w') as f:
+            json.dump(index, f, indent=2)
+        print(f"✅ {spec['label']}별 특화 모델 저장: {artifact_path} ({len(entries)}개, "
+              f"{os.path.getsize(artifact_path) / 1e6:.1f}MB)")
+        index_paths[dimension] = index_path
+    return index_paths
+
+
+# 증분 학습: 모델 종류별 최신 모델을 부모로, 부모의 학습 최고 수위 이후 레코드만으로 이어서 학습
+INCREMENTAL_METHODS = {
+    'random_forest': 'warm_start',      # 새 레코드로 학습한 트리를 추가
+    'gradient_boosting': 'warm_start',  # exact 엔진만 (hist는 빈 경계를 다시 계산하므로 이어 학습 불가)
+    'xgboost': 'xgb_model',             # 부모 부스터에서 라운드를 이어서 추가
+    'lightgbm': 'init_model',
+}
+# 추가할 라운드/트리 수는 부모 n_estimators × (새 레코드 / 부모 학습 레코드), 아래 값이 상한
+INCREMENTAL_MAX_ROUNDS = 100      # 부스팅 모델
+INCREMENTAL_MAX_TREES = 50        # 랜덤 포레스트
+INCREMENTAL_MIN_ROWS = 50         # 새 레코드가 이보다 적으면 갱신하지 않음
+INCREMENTAL_EVAL_FRACTION = 0.2   # 새 레코드 중 가장 최근 구간은 평가용 (다음 증분 학습에서 학습)
+
+
+def find_latest_model_metadata(mode, model_type):
+    """mode/model_type의 최신 모델 메타데이터 경로 (없으면 None)"""
+    metadata_paths = sorted(Path('ml_models', mode).glob(f'model_metadata_{mode}_{model_type}_*.json'))
+    return str(metadata_paths[-1]) if metadata_paths else None
+
+
+def parent_high_water_mark(metadata):
+    """부모 모델의 (동기화 기준 컬럼, 학습 최고 수위)
+
+    training_data가 없는 이전 모델은 학습 시각을 created_at 기준 최고 수위로 간주한다
+    (수집 API는 insert만 하므로 학습 이후 created_at 레코드는 모두 새 레코드).
+    """
+    training_data = metadata.get('training_data') or {}
+    if training_data.get('high_water_mark'):
+        return training_data['sync_column'], training_data['high_water_mark']
+    trained_at = datetime.strptime(metadata['timestamp'], '%Y%m%d_%H%M%S').astimezone()
+    return 'created_at', trained_at.isoformat()
+
+
+def incremental_size(parent, model_type, rows_added, parent_rows=None):
+    """이어서 학습할 라운드/트리 수 (새 데이터 비중만큼, 소량 데이터에 과적합하지 않도록)"""
+    limit = INCREMENTAL_MAX_TREES if model_type == 'random_forest' else INCREMENTAL_MAX_ROUNDS
+    if not parent_rows:
+        return limit
+    n_estimators = parent.get_params().get('n_estimators') or limit
+    return int(np.clip(round(n_estimators * rows_added / parent_rows), 1, limit))
+
+
+def continue_training(parent, model_type, X_new, y_new, n_added, categorical_features=None):
+    """부모 모델을 새 레코드로 n_added 라운드/트리만큼 이어서 학습하고 (model, method) 반환
+    (지원하지 않으면 (None, None))
+
+    random_forest/gradient_boosting은 부모 객체에 트리를 추가하고,
+    XGBoost/LightGBM은 부모 부스터(조기 종료했다면 최적 반복까지)에서 이어 학습한 새 모델을 만든다.
+    """
+    if model_type == 'lightgbm':
+        import lightgbm as lgb
+        model = lgb.LGBMRegressor(**{**parent.get_params(), 'n_estimators': n_added})
+        fit_params = {'categorical_feature': list(categorical_features)} if categorical_features else {}
+        # model_to_string()은 최적 반복이 있으면 거기까지만 저장한다
+        init_model = lgb.Booster(model_str=parent.booster_.model_to_string())
+        model.fit(X_new, y_new, init_model=init_model, **fit_params)
+    elif model_type == 'xgboost':
+        params = {**parent.get_params(), 'n_estimators': n_added, 'early_stopping_rounds': None}
+        model = type(parent)(**params)
+        booster = parent.get_booster()
+        best_iteration = getattr(parent, 'best_iteration', None)
+        if best_iteration is not None:
+            booster = booster[:best_iteration + 1]
+        model.fit(X_new, y_new, xgb_model=booster)
+    elif model_type in ('random_forest', 'gradient_boosting') and hasattr(parent, 'estimators_'):
+        model = parent.set_params(warm_start=True, n_estimators=parent.n_estimators + n_added)
+        model.fit(X_new, y_new)
+        model.set_params(warm_start=False)
+    else:
+        return None, None
+    return model, INCREMENTAL_METHODS[model_type]
+
+
+def _regression_metrics(y_true, y_pred):
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    return {
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+        'rmse': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'r2': float(r2_score(y_true, y_pred)),
+    }
+
+
+def _estimator_input(model, X):
+    """HistGradientBoosting은 희소 행렬을 받지 않으므로 dense로 변환"""
+    return _dense_for_hist(X) if type(model).__name__ == 'HistGradientBoostingRegressor' else X
+
+
+def update_ensemble_incrementally(mode, updated, df_eval):
+    """최신 앙상블 설정의 구성 모델 중 갱신된 모델을 새 버전으로 바꾼 설정 저장 (가중치 유지)
+
+    Args:
+        updated: model_type → {'parent_model_path', 'model_path', 'cache_key'} (ml_models/{mode} 기준 상대 경로)
+        df_eval: 앙상블 성능을 다시 계산할 전처리된 레코드
+    """
+    import joblib
+    import hashlib
+    output_dir = os.path.join('ml_models', mode)
+    config_paths = sorted(Path(output_dir).glob(f'ensemble_config_{mode}_*.json'))
+    if not config_paths:
+        return None
+    with open(config_paths[-1], 'r') as f:
+        config = json.load(f)
+    replaced = [
+        m['name'] for m in config['models']
+        if m['name'] in updated and updated[m['name']]['parent_model_path'] == m['model_path']
+    ]
+    if not replaced:
+        print(f"ℹ️  {config_paths[-1].name}의 구성 모델이 갱신되지 않아 앙상블 설정은 그대로 둡니다.")
+        return None
+    if not config.get('encoder_path'):
+        print(f"⚠️  {config_paths[-1].name}에 카테고리 인코더가 없어 앙상블 설정을 갱신하지 않습니다.")
+        return None
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    models = [
+        {**m, 'model_path': updated[m['name']]['model_path']} if m['name'] in replaced else dict(m)
+        for m in config['models']
+    ]
+    
+    # 새 구성으로 평가 레코드 예측 (앙상블과 같은 인코더/특성)
+    encoder = joblib.load(os.path.join(output_dir, config['encoder_path']))
+    encoded_features = config.get('encoded_features', [])
+    df_encoded, _, _ = encode_categorical_features(
+        df_eval, CATEGORICAL_COLUMNS, encoding=config['encoding'], encoder=encoder
+    )
+    X_eval = build_feature_matrix(df_encoded, config['features'], config['encoding'], encoder, encoded_features)
+    ensemble_pred = np.zeros(len(df_encoded))
+    for m in models:
+        model = joblib.load(os.path.join(output_dir, m['model_path']))
+        ensemble_pred += m['weight'] * model.predict(_estimator_input(model, X_eval))
+    metrics = _regression_metrics(df_encoded[TARGET_COLUMN].values, ensemble_pred)
+    
+    config.update({
+        'timestamp': timestamp,
+        'models': models,
+        'metrics': metrics,
+        'cache_key': hashlib.sha256(json.dumps(
+            [config.get('cache_key'), sorted([name, updated[name]['cache_key']] for name in replaced)]
+        ).encode()).hexdigest(),
+        'lineage': {
+            'parent': config_paths[-1].name,
+            'updated_models': replaced,
+            'evaluation_rows': int(len(df_encoded)),
+        },
+    })
+    config_path = f'{output_dir}/ensemble_config_{mode}_{timestamp}.json'
+    with open(config_path, 'w') as f:
+        json.dump(config, f, indent=2)
+    print(f"✅ 앙상블 설정 저장: {config_path} (갱신: {', '.join(replaced)}, MAE={metrics['mae']:.2f}, R²={metrics['r2']:.4f})")
+    return config_path
+
+
+def train_incremental(df_clean, mode='pre', model_types=None, register_models=False):
+    """모델 종류별 최신 모델을 새 레코드로 이어서 학습하고 새 버전(계보 메타데이터 포함) 저장
+
+    새 레코드는 부모 메타데이터의 training_data 최고 수위 이후 레코드다. 그중 가장 최근
+    INCREMENTAL_EVAL_FRACTION 구간은 부모/갱신 모델 비교용으로 남기고 학습 구간의 최고 수위를
+    새 버전에 기록하므로, 평가 구간은 다음 증분 학습에서 학습된다.
+    유저별 성능/사고 영향도 특성은 이전 이력으로 계산하므로 df_clean은 전체 기간을 전처리한 결과여야 한다
+    (--snapshot이면 네트워크로는 새 레코드만 가져온다).
+
+    Returns:
+        model_type → 새 모델 경로 (갱신된 모델만)
+    """
+    import joblib
+    import hashlib
+    output_dir = os.path.join('ml_models', mode)
+    updated = {}
+    eval_index = None
+    for model_type in model_types or MODEL_TYPES:
+        metadata_path = find_latest_model_metadata(mode, model_type)
+        if metadata_path is None:
+            continue
+        with open(metadata_path, 'r') as f:
+            parent_metadata = json.load(f)
+        parent_lineage = parent_metadata.get('lineage') or {}
+        prefix = f"{mode}_{model_type}_{parent_metadata['timestamp']}"
+        parent_model_path = f'{output_dir}/iracing_rank_predictor_{prefix}.pkl'
         
-        if user_models:
-            avg_r2 = np.mean([m['r2'] for m in user_models.values()])
-            avg_mae = np.mean([m['mae'] for m in user_models.values()])
-            print(f"   ✅ 유저별 모델: 평균 R²={avg_r2:.4f}, 평균 MAE={avg_mae:.2f} ({len(user_models)}개 모델)")
-            specialized_results['user_models'] = user_models
-    
-    # 2. 트랙별 특화 모델
-    print("\n🏁 트랙별 특화 모델 학습 중...")
-    if 'track_id' in df_clean.columns:
-        track_counts = df_clean['track_id'].value_counts()
-        top_tracks = track_counts[track_counts >= 100].index  # 최소 100개 레코드 이상
+        sync_column, high_water_mark = parent_high_water_mark(parent_metadata)
+        synced_at = pd.to_datetime(df_clean[sync_column], utc=True, errors='coerce')
+        new_mask = (synced_at > pd.Timestamp(high_water_mark)).to_numpy()
         
-        if len(top_tracks) > 0:
-            print(f"   {len(top_tracks)}개 트랙에 대해 특화 모델 학습 (최소 100개 레코드)")
-            track_models = {}
-            for track_id in top_tracks[:10]:  # 상위 10개만
-                track_data = df_clean[df_clean['track_id'] == track_id]
-                if len(track_data) < 50:
-                    continue
-                
-                X_track = track_data[features].values
-                y_track = track_data[target].values
-                
-                X_train, X_test, y_train, y_test = train_test_split(
-                    X_track, y_track, test_size=0.2, random_state=42
-                )
-                
-                model = GradientBoostingRegressor(
-                    n_estimators=200,
-                    learning_rate=0.1,
-                    max_depth=8,
-                    random_state=42
-                )
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_test)
-                
-                mae = mean_absolute_error(y_test, y_pred)
-                r2 = r2_score(y_test, y_pred)
-                
-                track_models[track_id] = {
-                    'model': model,
-                    'mae': mae,
-                    'r2': r2,
-                    'samples': len(track_data)
-                }
-            
-            if track_models:
-                avg_r2 = np.mean([m['r2'] for m in track_models.values()])
-                avg_mae = np.mean([m['mae'] for m in track_models.values()])
-                print(f"   ✅ 트랙별 모델: 평균 R²={avg_r2:.4f}, 평균 MAE={avg_mae:.2f} ({len(track_models)}개 모델)")
-                specialized_results['track_models'] = track_models
-    
-    # 3. 차량별 특화 모델
-    print("\n🚗 차량별 특화 모델 학습 중...")
-    if 'car_id' in df_clean.columns:
-        car_counts = df_clean['car_id'].value_counts()
-        top_cars = car_counts[car_counts >= 100].index  # 최소 100개 레코드 이상
+        print("\n" + "="*60)
+        print(f"🔁 {model_type} 증분 학습: 부모 {parent_metadata['timestamp']} "
+              f"(세대 {parent_lineage.get('generation', 0)}), {sync_column} > {high_water_mark} 새 레코드 {int(new_mask.sum())}개")
+        if model_type not in INCREMENTAL_METHODS:
+            print(f"   ⏭️  증분 학습을 지원하지 않는 모델입니다.")
+            continue
+        if new_mask.sum() < INCREMENTAL_MIN_ROWS:
+            print(f"   ⏭️  새 레코드가 {INCREMENTAL_MIN_ROWS}개 미만이라 건너뜁니다.")
+            continue
         
-        if len(top_cars) > 0:
-            print(f"   {len(top_cars)}개 차량에 대해 특화 모델 학습 (최소 100개 레코드)")
-            car_models = {}
-            for car_id in top_cars[:10]:  # 상위 10개만
-                car_data = df_clean[df_clean['car_id'] == car_id]
-                if len(car_data) < 50:
-                    continue
-                
-                X_car = car_data[features].values
-                y_car = car_data[target].values
-                
-                X_train, X_test, y_train, y_test = train_test_split(
-                    X_car, y_car, test_size=0.2, random_state=42
-                )
-                
-                model = GradientBoostingRegressor(
-                    n_estimators=200,
-                    learning_rate=0.1,
-                    max_depth=8,
-                    random_state=42
-                )
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_test)
-                
-                mae = mean_absolute_error(y_test, y_pred)
-                r2 = r2_score(y_test, y_pred)
-                
-                car_models[car_id] = {
-                    'model': model,
-                    'mae': mae,
-                    'r2': r2,
-                    'samples': len(car_data)
-                }
-            
-            if car_models:
-                avg_r2 = np.mean([m['r2'] for m in car_models.values()])
-                avg_mae = np.mean([m['mae'] for m in car_models.values()])
-                print(f"   ✅ 차량별 모델: 평균 R²={avg_r2:.4f}, 평균 MAE={avg_mae:.2f} ({len(car_models)}개 모델)")
-                specialized_results['car_models'] = car_models
+        # 부모와 같은 인코더/특성으로 새 레코드만 변환
+        features = parent_metadata['features']
+        encoding = parent_metadata.get('encoding', 'onehot')
+        encoded_features = parent_metadata.get('encoded_features', [])
+        encoder = None
+        if parent_metadata.get('encoder_path'):
+            encoder = joblib.load(os.path.join(output_dir, parent_metadata['encoder_path']))
+        df_new = df_clean[new_mask]
+        df_encoded, _, _ = encode_categorical_features(
+            df_new, CATEGORICAL_COLUMNS, use_onehot=encoder is not None, encoding=encoding, encoder=encoder
+        )
+        missing_features = [f for f in features if f not in set(df_encoded.columns) | set(encoded_features)]
+        if missing_features:
+            print(f"   ⚠️  부모 모델 특성이 데이터에 없어 건너뜁니다: {missing_features}")
+            continue
+        X_new = build_feature_matrix(df_encoded, features, encoding, encoder, encoded_features)
+        y_new = df_encoded[TARGET_COLUMN].values
+        categorical_features = categorical_feature_indices(features, encoding, encoded_features)
+        
+        # 시간순 분할: 가장 최근 구간은 평가용 (같은 시각은 같은 쪽으로)
+        new_times = synced_at[new_mask]
+        train_mask = (new_times <= new_times.quantile(1 - INCREMENTAL_EVAL_FRACTION)).to_numpy()
+        X_train, y_train = X_new[train_mask], y_new[train_mask]
+        if train_mask.all():
+            X_eval, y_eval, eval_rows = X_train, y_train, df_new.index
+        else:
+            X_eval, y_eval, eval_rows = X_new[~train_mask], y_new[~train_mask], df_new.index[~train_mask]
+        
+        parent = joblib.load(parent_model_path)
+        parent_metrics = _regression_metrics(y_eval, parent.predict(_estimator_input(parent, X_eval)))
+        parent_rows = (parent_metadata.get('training_data') or {}).get('rows')
+        n_added = incremental_size(parent, model_type, int(train_mask.sum()), parent_rows)
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        model, method = continue_training(parent, model_type, X_train, y_train, n_added, categorical_features)
+        if model is None:
+            print(f"   ⏭️  {type(parent).__name__}은 이어서 학습할 수 없어 부모 모델을 유지합니다.")
+            continue
+        y_pred = model.predict(X_eval)
+        metrics = _regression_metrics(y_eval, y_pred)
+        metrics.update({
+            'wall_time': time.perf_counter() - start_wall,
+            'cpu_time': time.process_time() - start_cpu,
+            'n_jobs': model.get_params().get('n_jobs') or 1,
+            'cache_key': hashlib.sha256(json.dumps(
+                [parent_metadata.get('cache_key'), data_fingerprint(X_train, y_train), method, n_added]
+            ).encode()).hexdigest(),
+        })
+        print(f"   {method}: {train_mask.sum()}개 레코드로 {n_added}개 {'트리' if model_type == 'random_forest' else '라운드'} 추가 ({metrics['wall_time']:.1f}초)")
+        print(f"   평가 {len(y_eval)}개: MAE {parent_metrics['mae']:.2f} → {metrics['mae']:.2f}, "
+              f"R² {parent_metrics['r2']:.4f} → {metrics['r2']:.4f}")
+        
+        training_data = {
+            'sync_column': sync_column,
+            'high_water_mark': new_times[train_mask].max().isoformat(),
+            'rows': parent_rows + int(train_mask.sum()) if parent_rows is not None else None,
+        }
+        lineage = {
+            'parent': os.path.basename(metadata_path),
+            'parent_model_path': os.path.relpath(parent_model_path, output_dir),
+            'parent_cache_key': parent_metadata.get('cache_key'),
+            'root': parent_lineage.get('root', parent_metadata['timestamp']),
+            'generation': parent_lineage.get('generation', 0) + 1,
+            'method': method,
+            'added_estimators': n_added,
+            'from_high_water_mark': high_water_mark,
+            'rows_added': int(train_mask.sum()),
+            'rows_evaluated': int(len(y_eval)),
+            'parent_metrics': parent_metrics,
+        }
+        model_path, _, new_metadata_path = save_model(
+            model, features, metrics, model_type, mode=mode, encoder=encoder, encoding=encoding,
+            encoded_feature_names=encoded_features, training_data=training_data, lineage=lineage
+        )
+        if register_models:
+            try:
+                register_model(model_path, new_metadata_path, training_data['rows'] or train_mask.sum())
+            except Exception as e:
+                print(f"⚠️  모델 등록 실패 ({model_type}): {e}")
+        updated[model_type] = {
+            'parent_model_path': lineage['parent_model_path'],
+            'model_path': os.path.relpath(model_path, output_dir),
+            'cache_key': metrics['cache_key'],
+        }
+        eval_index = eval_rows if eval_index is None else eval_index.intersection(eval_rows)
     
-    return specialized_results
+    print("\n" + "="*60)
+    if not updated:
+        print("ℹ️  갱신된 모델이 없습니다.")
+        return {}
+    if len(eval_index):
+        update_ensemble_incrementally(mode, updated, df_clean.loc[eval_index])
+    print(f"\n✅ 증분 학습 완료: {', '.join(updated)}")
+    return {model_type: info['model_path'] for model_type, info in updated.items()}
 
 
-def main(mode='pre', tune_hyperparams=False):
+def main(mode='pre', tune_hyperparams=False, incident_point_in_time=False,
+         use_snapshot=False, refresh_snapshot=False, sync_column='created_at',
+         page_size=1000, fetch_concurrency=4, all_columns=False,
+         source='supabase', source_path=None, encoding='onehot', n_jobs=None, parallel_models=None,
+         gb_engine='exact', tune_strategy='halving', early_stopping=False, use_cache=True,
+         register_models=False, incremental=False, trace_memory=False, profile_stages=None):
     """메인 함수
     
     Args:
         mode: 'pre' (레이스 전) 또는 'post' (그리드 반영)
         tune_hyperparams: 하이퍼파라미터 튜닝 여부 (기본값: False, 시간 소요)
+        incident_point_in_time: 사고 영향도를 이전 세션 데이터만으로 계산 (데이터 누수 방지)
+        use_snapshot: 로컬 스냅샷 + 델타 동기화로 데이터 로드
+        refresh_snapshot: 로컬 스냅샷을 전체 다시 받아 재작성
+        sync_column: 델타 동기화 기준 컬럼 (created_at 또는 session_start_time)
+        page_size: 데이터 로드 페이지 크기
+        fetch_concurrency: 데이터 로드 동시 페이지 요청 수
+        all_columns: 필요한 컬럼만이 아니라 전체 컬럼(select('*')) 로드
+        source: 데이터 소스 ('supabase', 'parquet', 'csv', 'sqlite')
+        source_path: 로컬 데이터 소스 파일 경로
+        encoding: 카테고리 인코딩 ('onehot', 'sparse': CSR 원-핫, 'native': LightGBM/XGBoost 네이티브 카테고리)
+        n_jobs: 전체 모델 학습에 쓸 코어 예산 (None이면 os.cpu_count())
+        parallel_models: 동시에 학습할 모델 수 (None이면 전부, 1이면 순차 학습)
+        gb_engine: gradient_boosting/특화 모델 엔진 ('exact', 'hist': 히스토그램 + 조기 종료)
+        tune_strategy: 튜닝 탐색 방식 ('halving': 연속 절반 탐색, 'random': 후보 전체 교차 검증)
+        early_stopping: XGBoost/LightGBM을 검증 fold 조기 종료로 학습 (최적 반복/학습 곡선은 메타데이터에 기록)
+        use_cache: 학습 캐시 사용 (데이터/특성/모델/파라미터가 같으면 기존 모델 재사용)
+        register_models: 모델을 iracing_ml_models 테이블에 등록 (model_file_hash = 학습 캐시 키)
+        incremental: 전체 재학습 대신 모델 종류별 최신 모델을 학습 최고 수위 이후 레코드로 이어서 학습
+            (train_incremental 참고, 부모 모델의 인코딩/특성을 그대로 사용)
+        trace_memory: 단계별 tracemalloc 최대 할당량도 기록 (느려짐)
+        profile_stages: cProfile로 감쌀 단계 이름 목록 (예: ['preprocess_data', 'train_model:lightgbm'],
+            'train_model'은 모든 모델). 단계별 시간/메모리 리포트는 항상 ml_models/{mode}/run_report_*.json에 저장
     """
+    global _run_profiler
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    
     print(f"🚀 iRacing 순위 예측 ML 모델 학습 시작 (mode={mode})\n")
     if tune_hyperparams:
         print("⚙️  하이퍼파라미터 튜닝 모드 활성화 (시간이 오래 걸릴 수 있습니다)\n")
+    if not XGBOOST_AVAILABLE:
+        print("ℹ️  XGBoost가 설치되지 않았습니다. 설치하면 성능이 향상될 수 있습니다: pip install xgboost")
+    if not LIGHTGBM_AVAILABLE:
+        print("ℹ️  LightGBM이 설치되지 않았습니다. 설치하면 성능이 향상될 수 있습니다: pip install lightgbm")
+    
+    # 단계별 실행 기록 (회귀 추적용, 모델 메타데이터 옆에 run_report_*.json으로 저장)
+    output_dir = os.path.join('ml_models', mode)
+    _run_profiler = RunProfiler(
+        output_dir, datetime.now().strftime('%Y%m%d_%H%M%S'),
+        trace_memory=trace_memory, profile_stages=profile_stages or ()
+    )
+    run_options = {
+        'encoding': encoding, 'gb_engine': gb_engine, 'tune_hyperparams': tune_hyperparams,
+        'tune_strategy': tune_strategy, 'early_stopping': early_stopping, 'n_jobs': n_jobs,
+        'parallel_models': parallel_models, 'incremental': incremental, 'source': source,
+    }
     
     # 1. 데이터 로드
-    df = load_data()
+    with profile_stage('load_data') as stage:
+        df = load_data(
+            use_snapshot=use_snapshot, refresh_snapshot=refresh_snapshot, sync_column=sync_column,
+            page_size=page_size, concurrency=fetch_concurrency, mode=mode, all_columns=all_columns,
+            source=create_data_source(source, source_path, page_size=page_size, concurrency=fetch_concurrency)
+        )
+        stage['rows'] = len(df)
     
     # 2. 데이터 전처리
-    df_clean = preprocess_data(df)
+    with profile_stage('preprocess_data', rows=len(df)):
+        df_clean = preprocess_data(df, incident_point_in_time=incident_point_in_time)
+    if incremental:
+        with profile_stage('train_incremental', rows=len(df_clean)):
+            result = train_incremental(df_clean, mode=mode, register_models=register_models)
+        finish_run_profile(output_dir, mode, options=run_options, rows=int(len(df_clean)))
+        return result
+    # 다음 증분 학습의 시작점 (모델 메타데이터 training_data)
+    training_data = {
+        'sync_column': sync_column,
+        'high_water_mark': _high_water_mark(df_clean, sync_column),
+        'rows': int(len(df_clean)),
+    }
     
     # 3. 카테고리 변수 인코딩
-    categorical_cols = ['series_id', 'track_id', 'car_id']
-    df_encoded, encoder, encoded_feature_names = encode_categorical_features(
-        df_clean, categorical_cols, use_onehot=True
-    )
+    categorical_cols = CATEGORICAL_COLUMNS
+    with profile_stage('encode_categorical_features', rows=len(df_clean)):
+        df_encoded, encoder, encoded_feature_names = encode_categorical_features(
+            df_clean, categorical_cols, use_onehot=True, encoding=encoding
+        )
     
     # 4. 특성 선택 (레이스 시작 전에 알 수 있는 필드만!)
     # ⚠️ 주의: starting_position, laps_complete는 레이스 종료 후 정보이므로 제외
-    base_features = [
-        # 핵심 특성 (레이스 시작 전 알 수 있음)
-        'i_rating',
-        'safety_rating',
-        
-        # 상대 전력 통계 (핵심!) - 레이스 시작 전 알 수 있음
-        'avg_opponent_ir',
-        'max_opponent_ir',
-        'min_opponent_ir',
-        'ir_diff_from_avg',
-        'sof',
-        
-        # 파생 변수 (상대 전력 기반)
-        'ir_advantage',
-        'ir_range',
-        'ir_rank_pct',
-        'ir_vs_max',
-        'ir_vs_min',
-        'ir_std_estimate',
-        'ir_relative_to_sof',
-        
-        # 주행 특성 (과거 데이터, 레이스 시작 전 알 수 있음)
-        'best_lap_time',
-        'average_lap_time',
-        'lap_time_diff',
-        'lap_time_consistency',
-        
-        # 세션 컨텍스트 (레이스 시작 전 알 수 있음)
-        'total_participants',
-        
-        # 유저별 상대 전력(ir_diff_from_avg) 구간별 성능 특성 (핵심!)
-        # 내 iRating vs 상대 평균 iRating 차이에 따른 성능 패턴
-        'user_avg_finish_pct_much_lower',  # 내가 상대보다 200+ 낮을 때 → 강한 상대
-        'user_avg_finish_pct_lower',       # 내가 상대보다 50-200 낮을 때 → 약간 강한 상대
-        'user_avg_finish_pct_similar',    # 비슷할 때
-        'user_avg_finish_pct_higher',     # 내가 상대보다 50-200 높을 때 → 약간 약한 상대
-        'user_avg_finish_pct_much_higher', # 내가 상대보다 200+ 높을 때 → 약한 상대
-        'user_ir_diff_performance_diff',   # 강한 상대에서의 성능 - 약한 상대에서의 성능
-        'user_expected_finish_pct_by_ir_diff',  # 현재 상대 전력 구간에서의 예상 성능
-        
-        # 사고 영향도 특성 (사고 발생 시 순위 변동 반영)
-        'incident_impact_on_position',      # 사고 발생 시 평균 순위 하락 (완주율 단위)
-        'incident_impact_rank_drop',        # 사고 발생 시 평균 순위 하락 (순위 단위)
-        'high_incident_risk',              # 사고 발생 확률이 높은지 여부 (0/1)
-    ]
+    base_features = list(BASE_FEATURES)
     
     if mode == 'post':
         base_features += POST_ONLY_FEATURES
@@ -1046,74 +3069,68 @@ def main(mode='pre', tune_hyperparams=False):
     # - laps_complete: 레이스 종료 후에만 알 수 있음
     
     # 특성이 모두 있는지 확인
-    missing_features = [f for f in features if f not in df_encoded.columns]
+    available_features = set(df_encoded.columns) | set(encoded_feature_names)
+    missing_features = [f for f in features if f not in available_features]
     if missing_features:
         print(f"⚠️  누락된 특성: {missing_features}")
-        features = [f for f in features if f in df_encoded.columns]
+        features = [f for f in features if f in available_features]
     
     # 5. 데이터 준비
-    X = df_encoded[features].values
+    with profile_stage('build_feature_matrix', rows=len(df_encoded)):
+        X = build_feature_matrix(df_encoded, features, encoding, encoder, encoded_feature_names)
     y = df_encoded['actual_finish_position'].values
+    categorical_features = categorical_feature_indices(features, encoding, encoded_feature_names)
+    encoder_info = {'encoder': encoder, 'encoding': encoding, 'encoded_feature_names': encoded_feature_names}
     
     print(f"\n📊 데이터 준비 완료:")
     print(f"   특성 수: {len(features)}")
-    print(f"   샘플 수: {len(X)}")
+    print(f"   샘플 수: {X.shape[0]}")
     
-    # 5. 학습/테스트 분할
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+    # 5. 학습/테스트 분할 (행 위치도 함께: 특화 모델을 같은 테스트 행에서 전역 앙상블과 비교)
+    X_train, X_test, y_train, y_test, _, test_idx = train_test_split(
+        X, y, np.arange(len(y)), test_size=0.2, random_state=42
     )
     
-    print(f"   학습 세트: {len(X_train)}개")
-    print(f"   테스트 세트: {len(X_test)}개")
-    
-    # 6. 특화 모델 학습 (유저별, 트랙별, 차량별)
-    specialized_results = train_specialized_models(df_encoded, features)
+    print(f"   학습 세트: {X_train.shape[0]}개")
+    print(f"   테스트 세트: {X_test.shape[0]}개")
     
-    # 7. 모델 학습 (여러 모델 시도)
+    # 6. 모델 학습 (여러 모델 시도)
     all_models = {}
     all_metrics = {}
     all_model_paths = {}  # 모델 파일 경로 저장
     
-    # Random Forest
-    print("\n" + "="*60)
-    model_rf, metrics_rf = train_model(X_train, y_train, X_test, y_test, 'random_forest', tune_hyperparams=tune_hyperparams)
-    plot_feature_importance(model_rf, features, 'random_forest')
-    model_path_rf, _, _ = save_model(model_rf, features, metrics_rf, 'random_forest', mode=mode)
-    all_models['random_forest'] = model_rf
-    all_metrics['random_forest'] = metrics_rf
-    all_model_paths['random_forest'] = model_path_rf
-    
-    # Gradient Boosting
-    print("\n" + "="*60)
-    model_gb, metrics_gb = train_model(X_train, y_train, X_test, y_test, 'gradient_boosting', tune_hyperparams=tune_hyperparams)
-    plot_feature_importance(model_gb, features, 'gradient_boosting')
-    model_path_gb, _, _ = save_model(model_gb, features, metrics_gb, 'gradient_boosting', mode=mode)
-    all_models['gradient_boosting'] = model_gb
-    all_metrics['gradient_boosting'] = metrics_gb
-    all_model_paths['gradient_boosting'] = model_path_gb
-    
-    # XGBoost (사용 가능한 경우)
-    if XGBOOST_AVAILABLE:
+    with profile_stage('train_models_parallel', rows=X_train.shape[0]):
+        results = train_models_parallel(
+            X_train, y_train, X_test, y_test, tune_hyperparams=tune_hyperparams,
+            categorical_features=categorical_features, total_cores=n_jobs, max_workers=parallel_models,
+            gb_engine=gb_engine, tune_strategy=tune_strategy, mode=mode, early_stopping=early_stopping,
+            features=features, use_cache=use_cache
+        )
+    for model_type, (model, metrics, timing) in results.items():
         print("\n" + "="*60)
-        model_xgb, metrics_xgb = train_model(X_train, y_train, X_test, y_test, 'xgboost', tune_hyperparams=tune_hyperparams)
-        plot_feature_importance(model_xgb, features, 'xgboost')
-        model_path_xgb, _, _ = save_model(model_xgb, features, metrics_xgb, 'xgboost', mode=mode)
-        all_models['xgboost'] = model_xgb
-        all_metrics['xgboost'] = metrics_xgb
-        all_model_paths['xgboost'] = model_path_xgb
-    
-    # LightGBM (사용 가능한 경우)
-    if LIGHTGBM_AVAILABLE:
-        print("\n" + "="*60)
-        model_lgb, metrics_lgb = train_model(X_train, y_train, X_test, y_test, 'lightgbm', tune_hyperparams=tune_hyperparams)
-        plot_feature_importance(model_lgb, features, 'lightgbm')
-        model_path_lgb, _, _ = save_model(model_lgb, features, metrics_lgb, 'lightgbm', mode=mode)
-        all_models['lightgbm'] = model_lgb
-        all_metrics['lightgbm'] = metrics_lgb
-        all_model_paths['lightgbm'] = model_path_lgb
-    
-    # 8. 앙상블 모델 (최고 성능 모델들 조합)
+        print(f"📦 {model_type} (MAE={metrics['mae']:.2f}, R²={metrics['r2']:.4f})")
+        if 'cached_paths' in metrics:
+            # 학습 캐시 적중: 기존 아티팩트를 그대로 사용 (새 타임스탬프로 다시 저장하지 않음)
+            model_path, _, metadata_path = metrics['cached_paths']
+            print(f"♻️  기존 모델 재사용: {model_path}")
+        else:
+            metrics.update(timing)
+            with profile_stage(f'plot_feature_importance:{model_type}'):
+                plot_feature_importance(model, features, model_type)
+            with profile_stage(f'save_model:{model_type}'):
+                model_path, _, metadata_path = save_model(
+                    model, features, metrics, model_type, mode=mode, training_data=training_data, **encoder_info
+                )
+        if register_models:
+            try:
+                register_model(model_path, metadata_path, X_train.shape[0])
+            except Exception as e:
+                print(f"⚠️  모델 등록 실패 ({model_type}): {e}")
+        all_models[model_type] = model
+        all_metrics[model_type] = metrics
+        all_model_paths[model_type] = model_path
+    
+    # 7. 앙상블 모델 (최고 성능 모델들 조합)
     print("\n" + "="*60)
     print("🎯 앙상블 모델 생성 중...")
     
@@ -1129,8 +3146,7 @@ def main(mode='pre', tune_hyperparams=False):
         ensemble_pred = np.zeros(len(y_test))
         for i, (name, metrics) in enumerate(top_models):
             weight = weights[i]
-            pred = all_models[name].predict(X_test)
-            ensemble_pred += weight * pred
+            ensemble_pred += weight * metrics['y_pred']  # train_model()이 X_test로 계산한 예측
             print(f"   {name}: 가중치 {weight:.3f} (R²={metrics['r2']:.4f})")
         
         # 앙상블 평가
@@ -1143,7 +3159,11 @@ def main(mode='pre', tune_hyperparams=False):
         print(f"   RMSE: {ensemble_rmse:.2f}")
         print(f"   R²: {ensemble_r2:.4f}")
         
-        # 앙상블 모델 저장
+        # 앙상블 모델 저장 (구성 모델과 가중치가 같은 설정이 이미 있으면 재사용)
+        import hashlib
+        ensemble_cache_key = hashlib.sha256(json.dumps(
+            [[name, metrics.get('cache_key'), round(float(weight), 12)] for (name, metrics), weight in zip(top_models, weights)]
+        ).encode()).hexdigest()
         ensemble_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         ensemble_config = {
             'model_type': 'ensemble',
@@ -1163,19 +3183,56 @@ def main(mode='pre', tune_hyperparams=False):
                 'mae': float(ensemble_mae),
                 'rmse': float(ensemble_rmse),
                 'r2': float(ensemble_r2)
-            }
+            },
+            # 추론 입력의 결측 대체값 (학습 전처리와 같은 값, 카테고리 컬럼은 인코더가 처리)
+            'fill_values': {
+                column: float(value) for column, value in fit_nan_fills(
+                    df_clean[[f for f in features if f in df_clean.columns and f not in set(encoded_feature_names)]
+                             + ['actual_finish_position']]
+                ).items()
+            },
+            'cache_key': ensemble_cache_key
         }
         
-        output_dir = os.path.join('ml_models', mode)
         os.makedirs(output_dir, exist_ok=True)
-        ensemble_config_path = f'{output_dir}/ensemble_config_{mode}_{ensemble_timestamp}.json'
-        with open(ensemble_config_path, 'w') as f:
-            json.dump(ensemble_config, f, indent=2)
-        print(f"✅ 앙상블 설정 저장: {ensemble_config_path}")
+        cached_ensemble_path = find_cached_ensemble(mode, ensemble_cache_key) if use_cache else None
+        
+        # 카테고리 인코더 (추론 시 원본 series_id/track_id/car_id → 특성 변환에 재사용)
+        if cached_ensemble_path:
+            ensemble_config_path = restamp_ensemble_config(cached_ensemble_path, ensemble_timestamp)
+            print(f"♻️  같은 구성의 앙상블 설정 재사용: {cached_ensemble_path} → {ensemble_config_path} (최신으로 지정)")
+        elif encoder is not None:
+            import joblib
+            encoder_path = f'{output_dir}/categorical_encoder_{mode}_ensemble_{ensemble_timestamp}.pkl'
+            joblib.dump(encoder, encoder_path)
+            ensemble_config['encoding'] = encoding
+            ensemble_config['categorical_columns'] = list(encoder.feature_names_in_)
+            ensemble_config['encoded_features'] = list(encoded_feature_names)
+            ensemble_config['encoder_path'] = os.path.relpath(encoder_path, output_dir)
+        if not cached_ensemble_path:
+            ensemble_config_path = f'{output_dir}/ensemble_config_{mode}_{ensemble_timestamp}.json'
+            with open(ensemble_config_path, 'w') as f:
+                json.dump(ensemble_config, f, indent=2)
+            print(f"✅ 앙상블 설정 저장: {ensemble_config_path}")
         print(f"   사용 모델: {', '.join([m['name'] for m in ensemble_config['models']])}")
     
+    # 8. 특화 모델 학습 (유저별, 트랙별, 차량별)
+    # 그룹 ID는 인코딩 전 df_clean 기준 (onehot은 카테고리 컬럼을 제거하고, native는 코드로 바꾼다)
+    # 전역 테스트 세트 행으로 평가해서 같은 행의 전역 앙상블(앙상블이 없으면 최고 모델) 성능과 함께 저장한다
+    test_mask = np.zeros(len(y), dtype=bool)
+    test_mask[test_idx] = True
+    baseline_pred = np.full(len(y), np.nan)
+    baseline_pred[test_idx] = ensemble_pred if len(top_models) >= 2 else top_models[0][1]['y_pred']
+    with profile_stage('train_specialized_models', rows=X.shape[0]):
+        specialized_results = train_specialized_models(
+            df_clean, features, X=X, gb_engine=gb_engine, categorical_features=categorical_features,
+            n_jobs=n_jobs, mode=mode, use_cache=use_cache, test_mask=test_mask, baseline_pred=baseline_pred
+        )
+    with profile_stage('save_specialized_models'):
+        save_specialized_models(specialized_results, features, mode=mode, **encoder_info)
+    
     # 9. 특화 모델 결과 요약
-    if specialized_results:
+    if any(f'{d}_models' in specialized_results for d in SPECIALIZED_DIMENSIONS):
         print("\n" + "="*60)
         print("📊 특화 모델 성능 요약:")
         if 'user_models' in specialized_results:
@@ -1197,6 +3254,8 @@ def main(mode='pre', tune_hyperparams=False):
     if len(top_models) >= 2:
         print(f"   {'Ensemble':20s}: MAE={ensemble_mae:.2f}, RMSE={ensemble_rmse:.2f}, R²={ensemble_r2:.4f}")
     
+    finish_run_profile(output_dir, mode, options=run_options, rows=int(len(df_clean)))
+    
     print("\n✅ 학습 완료!")
     print("\n💡 성능 개선 팁:")
     print("   1. 하이퍼파라미터 튜닝: tune_hyperparams=True로 설정 (시간 소요)")
@@ -1211,6 +3270,50 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='iRacing 순위 예측 모델 학습')
     parser.add_argument('--mode', choices=['pre', 'post'], default='pre', help='모델 모드 선택 (pre: 레이스 전, post: 그리드 반영)')
     parser.add_argument('--tune', '-t', action='store_true', help='하이퍼파라미터 튜닝 활성화')
+    parser.add_argument('--incident-point-in-time', action='store_true', help='사고 영향도를 이전 세션 데이터만으로 계산')
+    parser.add_argument('--snapshot', action='store_true', help='로컬 스냅샷(ml_models/cache) 사용, 새 레코드만 동기화')
+    parser.add_argument('--refresh-snapshot', action='store_true', help='로컬 스냅샷을 전체 다시 받아 재작성')
+    parser.add_argument('--sync-column', choices=SNAPSHOT_SYNC_COLUMNS, default='created_at', help='스냅샷 델타 동기화 기준 컬럼')
+    parser.add_argument('--page-size', type=int, default=1000, help='데이터 로드 페이지 크기')
+    parser.add_argument('--fetch-concurrency', type=int, default=4, help='데이터 로드 동시 페이지 요청 수')
+    parser.add_argument('--all-columns', action='store_true', help="필요한 컬럼만이 아니라 select('*')로 전체 컬럼 로드")
+    parser.add_argument('--source', choices=list(DATA_SOURCES), default='supabase', help='학습 데이터 소스')
+    parser.add_argument('--source-path', help='로컬 데이터 소스 파일 경로 (parquet/csv/sqlite)')
+    parser.add_argument('--encoding', choices=CATEGORICAL_ENCODINGS, default='onehot', help='카테고리 인코딩 방식 (sparse: CSR 원-핫, native: 정수 카테고리 코드)')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='모델 학습 전체 코어 예산 (기본: CPU 코어 수)')
+    parser.add_argument('--parallel-models', type=int, default=None, help='동시에 학습할 모델 수 (기본: 전부, 1: 순차)')
+    parser.add_argument('--gb-engine', choices=GB_ENGINES, default='exact', help='gradient_boosting 엔진 (hist: HistGradientBoosting + 조기 종료)')
+    parser.add_argument('--tune-strategy', choices=TUNING_STRATEGIES, default='halving', help='튜닝 탐색 방식 (halving: 연속 절반 탐색, 결과는 ml_models/{mode}/tuning_history_*.json에 누적)')
+    parser.add_argument('--early-stopping', action='store_true', help='XGBoost/LightGBM 검증 fold 조기 종료 (n_estimators는 상한)')
+    parser.add_argument('--no-cache', action='store_true', help='학습 캐시를 무시하고 모든 모델을 다시 학습')
+    parser.add_argument('--register-models', action='store_true', help='모델을 iracing_ml_models 테이블에 등록')
+    parser.add_argument('--incremental', action='store_true', help='최신 모델을 학습 이후 새 레코드로 이어서 학습 (새 버전 + 계보 메타데이터)')
+    parser.add_argument('--trace-memory', action='store_true', help='단계별 tracemalloc 최대 할당량 기록 (느려짐)')
+    parser.add_argument('--profile-stage', action='append', dest='profile_stages', metavar='STAGE',
+                        help='cProfile로 감쌀 단계 (반복 가능, 예: preprocess_data, train_model, train_model:lightgbm)')
     args = parser.parse_args()
-    main(mode=args.mode, tune_hyperparams=args.tune)
+    main(
+        mode=args.mode,
+        tune_hyperparams=args.tune,
+        incident_point_in_time=args.incident_point_in_time,
+        use_snapshot=args.snapshot,
+        refresh_snapshot=args.refresh_snapshot,
+        sync_column=args.sync_column,
+        page_size=args.page_size,
+        fetch_concurrency=args.fetch_concurrency,
+        all_columns=args.all_columns,
+        source=args.source,
+        source_path=args.source_path,
+        encoding=args.encoding,
+        n_jobs=args.jobs,
+        parallel_models=args.parallel_models,
+        gb_engine=args.gb_engine,
+        tune_strategy=args.tune_strategy,
+        early_stopping=args.early_stopping,
+        use_cache=not args.no_cache,
+        register_models=args.register_models,
+        incremental=args.incremental,
+        trace_memory=args.trace_memory,
+        profile_stages=args.profile_stages,
+    )
 